@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from epregressions.cache import SimulationCache, file_digest
+
+
+class BaselineStore:
+    """A shared, read-only copy of the build A simulation results for one baseline.
+
+    Comparing many mod builds against the same baseline build (say develop at one commit) means simulating the same
+    baseline over and over.  The first suite that runs the baseline copies each of its run directories into the store
+    as the simulations finish, and publishes them all at once when the suite is done, so that a baseline is either
+    complete or not there at all.  Later suites with the same baseline id, build digest, run type and reporting
+    frequency find the published results and read them in place, only simulating build B.  Only the cases that build A
+    simulated successfully are stored, the others are simulated again by every suite.  A published baseline is never
+    written to again; the diffs of each case are still written into build A's own test output directory."""
+
+    manifest_file_name = 'baseline.json'
+
+    def __init__(self, store_dir, baseline_id, build_digest, run_name):
+        self.run_name = run_name
+        self.run_directory = os.path.join(store_dir, baseline_id, build_digest, run_name)
+        self.cases = set()
+        self.staging_directory = None
+        self.staged_cases = []
+        manifest_file = os.path.join(self.run_directory, self.manifest_file_name)
+        if os.path.exists(manifest_file):
+            with io.open(manifest_file, encoding='utf-8') as f:
+                self.cases = set(json.load(f)['cases'])
+
+    def has_case(self, case_name):
+        return case_name in self.cases
+
+    def case_directory(self, case_name):
+        return os.path.join(self.run_directory, case_name)
+
+    def start_staging(self):
+        parent_dir = os.path.dirname(self.run_directory)
+        if not os.path.exists(parent_dir):
+            os.makedirs(parent_dir)
+        self.staging_directory = tempfile.mkdtemp(prefix=self.run_name + '.partial-', dir=parent_dir)
+        self.staged_cases = []
+
+    def stage(self, test_run_directory, case_name):
+        """Copy a finished build A run directory into the baseline being written"""
+        if self.staging_directory is None:
+            return
+        shutil.copytree(test_run_directory, os.path.join(self.staging_directory, case_name))
+        self.staged_cases.append(case_name)
+
+    def publish(self):
+        """Make the staged runs the baseline, returning False if there was nothing staged or another suite published
+        the same baseline first"""
+        if self.staging_directory is None:
+            return False
+        with io.open(os.path.join(self.staging_directory, self.manifest_file_name), 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'cases': sorted(self.staged_cases), 'created': time.time()}, ensure_ascii=False))
+        try:
+            os.rename(self.staging_directory, self.run_directory)
+        except OSError:
+            self.discard()
+            return False
+        self.staging_directory = None
+        return True
+
+    def discard(self):
+        if self.staging_directory is not None:
+            shutil.rmtree(self.staging_directory, ignore_errors=True)
+            self.staging_directory = None
+
+
+def build_digest(build_tree):
+    """Hashes the binaries of a build and its CMake configuration, so that builds of the same commit with different
+    options or compilers don't share a baseline"""
+    lines = SimulationCache.build_lines(build_tree, file_digest)
+    lines.append('configuration %s' % file_digest(os.path.join(build_tree['build_dir'], 'CMakeCache.txt')))
+    digest = hashlib.sha1()
+    digest.update('\n'.join(lines).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def source_commit(source_dir):
+    """Returns the commit checked out in a source directory, or None if it isn't a git repository"""
+    try:
+        output = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=source_dir, stderr=subprocess.STDOUT)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('utf-8').strip()
@@ -0,0 +1,5 @@
+import sys
+
+from epregressions.benchmarks.suite import main
+
+sys.exit(main())
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals
+
+import io
+import random
+
+# Deterministic synthetic outputs for the benchmarks: the same arguments always write the same files, and a
+# "modified" file is its base file with a given number of values nudged, some within the thresholds and some not,
+# so the diffs have something to find without the amount of work changing from run to run.
+
+# (variable, unit, aggregation) of the columns of the CSVs, repeated over zones until there are enough columns
+csv_variables = [
+    ('Zone Mean Air Temperature', 'C', 'Hourly'),
+    ('Zone Air System Sensible Heating Rate', 'W', 'Hourly'),
+    ('Zone Air System Sensible Cooling Energy', 'J', 'Hourly'),
+    ('Zone Air Relative Humidity', '%', 'Hourly'),
+    ('Zone Ventilation Air Change Rate', 'ach', 'Hourly'),
+    ('Zone Mean Air Humidity Ratio', 'kgWater/kgDryAir', 'Hourly'),
+    ('Zone Windows Total Transmitted Solar Radiation Rate', 'W', 'Hourly'),
+    ('Zone Lights Electricity Energy', 'J', 'Monthly'),
+]
+
+table_columns = [
+    'Total Energy [GJ]', 'Energy Per Total Building Area [MJ/m2]', 'Area [m2]', 'Electricity [kWh]',
+    'Natural Gas [kWh]', 'Peak Demand [W]', 'Time Setpoint Not Met [hr]', 'U-Factor [W/m2-K]',
+]
+
+
+def column_headers(columns):
+    headers = []
+    for i in range(columns):
+        variable, unit, aggregation = csv_variables[i % len(csv_variables)]
+        headers.append('ZONE %s:%s [%s](%s)' % (i // len(csv_variables) + 1, variable, unit, aggregation))
+    return headers
+
+
+def time_stamps(rows):
+    days_in_month = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    stamps = []
+    month, day, hour = 1, 1, 1
+    for _ in range(rows):
+        stamps.append(' %02d/%02d  %02d:00:00' % (month, day, hour))
+        hour += 1
+        if hour > 24:
+            hour = 1
+            day += 1
+            if day > days_in_month[month - 1]:
+                day = 1
+                month = month % 12 + 1
+    return stamps
+
+
+def nudged(rng, value, which):
+    """A changed value: odd ones are within the thresholds, even ones well outside them"""
+    if which % 2:
+        return value * (1.0 + rng.uniform(1e-6, 1e-5))
+    return value * rng.uniform(1.5, 2.0) + 1.0
+
+
+def write_csv(path, rows, columns, seed=0, changes=0):
+    """An ESO-style CSV of rows time steps of columns variables, with changes values nudged"""
+    rng = random.Random(seed)
+    change_rng = random.Random(seed + 1)
+    changed = set(change_rng.sample(range(rows * columns), min(changes, rows * columns)))
+    lines = [','.join(['Date/Time'] + column_headers(columns))]
+    for row, stamp in enumerate(time_stamps(rows)):
+        cells = [stamp]
+        for column in range(columns):
+            value = rng.uniform(0.0, 1000.0)
+            if row * columns + column in changed:
+                value = nudged(change_rng, value, len(cells))
+            cells.append('%.6f' % value)
+        lines.append(','.join(cells))
+    with io.open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('\n'.join(lines) + '\n')
+    return path
+
+
+def write_table_report(path, tables, rows, seed=0, changes=0):
+    """An eplustbl.htm of tables numeric tables of rows rows each, with changes cells nudged"""
+    rng = random.Random(seed)
+    change_rng = random.Random(seed + 1)
+    columns = len(table_columns)
+    changed = set(change_rng.sample(range(tables * rows * columns), min(changes, tables * rows * columns)))
+    parts = [
+        '<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.01 Transitional//EN""http://www.w3.org/TR/html4/loose.dtd">',
+        '<html>', '<head>', '<title> Benchmark - EnergyPlus</title>', '</head>', '<body>',
+    ]
+    cell = 0
+    for table in range(tables):
+        report = 'Benchmark Report %s' % (table // 10 + 1)
+        name = 'Benchmark Table %s' % (table + 1)
+        parts.append('<p>Report:<b> %s</b></p>' % report)
+        parts.append('<p>For:<b> Entire Facility</b></p>')
+        parts.append('<b>%s</b><br><br>' % name)
+        parts.append('<!-- FullName:%s_Entire Facility_%s-->' % (report, name))
+        parts.append('<table border="1" cellpadding="4" cellspacing="0">')
+        parts.append('  <tr><td></td>')
+        for heading in table_columns:
+            parts.append('    <td align="right">%s</td>' % heading)
+        parts.append('  </tr>')
+        for row in range(rows):
+            parts.append('  <tr>')
+            parts.append('    <td align="right">Row %s</td>' % (row + 1))
+            for column in range(columns):
+                value = rng.uniform(0.0, 1000.0)
+                if cell in changed:
+                    value = nudged(change_rng, value, column)
+                cell += 1
+                parts.append('    <td align="right">%12.2f</td>' % value)
+            parts.append('  </tr>')
+        parts.append('</table>')
+        parts.append('<br><br>')
+    parts.extend(['</body>', '</html>'])
+    with io.open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('\n'.join(parts) + '\n')
+    return path
+
+
+def write_eio(path, lines, seed=0, changes=0):
+    """An eio-style file of lines lines, a header line for each few data lines, with changes data lines altered"""
+    rng = random.Random(seed)
+    change_rng = random.Random(seed + 1)
+    changed = set(change_rng.sample(range(lines), min(changes, lines)))
+    output = ['Program Version,EnergyPlus, Version 9.9.9-benchmark, YMD=2020.01.01 00:00']
+    for line in range(lines):
+        if line % 10 == 0:
+            output.append('! <Benchmark Object %s>, Name, Value 1 {W}, Value 2 {m2}, Value 3 {C}' % (line // 10 + 1))
+        values = [rng.uniform(0.0, 1000.0) for _ in range(3)]
+        if line in changed:
+            values[0] = nudged(change_rng, values[0], 0)
+        output.append(
+            ' Benchmark Object %s, OBJECT %s, %.4f, %.4f, %.4f' % ((line // 10 + 1, line + 1) + tuple(values))
+        )
+    with io.open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('\n'.join(output) + '\n')
+    return path
+
+
+def write_err(path, lines, seed=0, changes=0):
+    """An eplusout.err-style file of lines warnings, with changes of them altered"""
+    rng = random.Random(seed)
+    change_rng = random.Random(seed + 1)
+    changed = set(change_rng.sample(range(lines), min(changes, lines)))
+    output = ['Program Version,EnergyPlus, Version 9.9.9-benchmark, YMD=2020.01.01 00:00,']
+    for line in range(lines):
+        temperature = rng.uniform(-20.0, 40.0)
+        if line in changed:
+            temperature = nudged(change_rng, temperature, 0)
+        output.append('   ** Warning ** Benchmark warning %s in ZONE %s' % (line + 1, rng.randint(1, 50)))
+        output.append('   **   ~~~   ** Temperature out of range [%.2f] C' % temperature)
+    output.append('   ************* EnergyPlus Completed Successfully-- %s Warning; 0 Severe Errors;' % lines)
+    with io.open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('\n'.join(output) + '\n')
+    return path
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover - python 2 has no tracemalloc, peak memory isn't recorded there
+    tracemalloc = None
+
+from epregressions.baseline import source_commit
+from epregressions.benchmarks import generators
+from epregressions.diffs import math_diff, table_diff
+from epregressions.diffs.math_diff import MathDiffEngine
+from epregressions.diffs.thresh_dict import ThreshDict
+from epregressions.runtests import SuiteRunner
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+package_dir = os.path.dirname(script_dir)
+thresholds_file = os.path.join(package_dir, 'diffs', 'math_diff.config')
+
+# the amount of generated output of each size; the CSVs of the large size are a year at 15 minute time steps
+sizes = {
+    'small': {'csv_rows': 168, 'csv_columns': 20, 'tables': 20, 'table_rows': 10, 'text_lines': 2000,
+              'lookups': 10000, 'changes': 10},
+    'medium': {'csv_rows': 8760, 'csv_columns': 50, 'tables': 200, 'table_rows': 20, 'text_lines': 20000,
+               'lookups': 100000, 'changes': 100},
+    'large': {'csv_rows': 35040, 'csv_columns': 100, 'tables': 1000, 'table_rows': 40, 'text_lines': 200000,
+              'lookups': 1000000, 'changes': 1000},
+}
+size_names = ['small', 'medium', 'large']
+
+
+class Scenario:
+    """One thing to time: setup writes the inputs into a directory and returns the arguments of run, so writing the
+    inputs isn't part of the time"""
+
+    def __init__(self, name, setup, run):
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+
+def math_diff_scenario(size, engine):
+    def setup(directory):
+        generators.write_csv(os.path.join(directory, 'base.csv'), size['csv_rows'], size['csv_columns'])
+        generators.write_csv(
+            os.path.join(directory, 'mod.csv'), size['csv_rows'], size['csv_columns'], changes=size['changes']
+        )
+        return directory,
+
+    def run(directory):
+        math_diff.math_diff(
+            ThreshDict(thresholds_file), os.path.join(directory, 'base.csv'), os.path.join(directory, 'mod.csv'),
+            os.path.join(directory, 'abs.csv'), os.path.join(directory, 'rel.csv'),
+            os.path.join(directory, 'math.err'), os.path.join(directory, 'summary.csv'), engine
+        )
+
+    return setup, run
+
+
+def table_diff_scenario(size):
+    def setup(directory):
+        generators.write_table_report(os.path.join(directory, 'base.htm'), size['tables'], size['table_rows'])
+        generators.write_table_report(
+            os.path.join(directory, 'mod.htm'), size['tables'], size['table_rows'], changes=size['changes']
+        )
+        return directory,
+
+    def run(directory):
+        table_diff.table_diff(
+            ThreshDict(thresholds_file), os.path.join(directory, 'base.htm'), os.path.join(directory, 'mod.htm'),
+            os.path.join(directory, 'abs.htm'), os.path.join(directory, 'rel.htm'),
+            os.path.join(directory, 'table.err'), os.path.join(directory, 'summary.htm')
+        )
+
+    return setup, run
+
+
+def text_diff_scenario(size, writer, changes):
+    def setup(directory):
+        writer(os.path.join(directory, 'base.txt'), size['text_lines'])
+        writer(os.path.join(directory, 'mod.txt'), size['text_lines'], changes=changes)
+        return directory,
+
+    def run(directory):
+        SuiteRunner.diff_text_files(
+            os.path.join(directory, 'base.txt'), os.path.join(directory, 'mod.txt'), os.path.join(directory, 'diff')
+        )
+
+    return setup, run
+
+
+def lookup_scenario(size):
+    def setup(_):
+        thresh_dict = ThreshDict(thresholds_file)
+        headers = generators.column_headers(size['csv_columns'])
+        return thresh_dict, [headers[i % len(headers)] for i in range(size['lookups'])]
+
+    def run(thresh_dict, headers):
+        for header in headers:
+            thresh_dict.lookup(header)
+
+    return setup, run
+
+
+def scenarios(size_name):
+    """The scenarios of a size, named after what they time"""
+    size = sizes[size_name]
+    engines = [MathDiffEngine.PYTHON, MathDiffEngine.STREAMING]
+    if math_diff.numpy is not None:
+        engines.append(MathDiffEngine.NUMPY)
+    found = []
+    for engine in engines:
+        found.append(Scenario('math_diff[%s]-%s' % (engine, size_name), *math_diff_scenario(size, engine)))
+    found.append(Scenario('table_diff-%s' % size_name, *table_diff_scenario(size)))
+    found.append(Scenario('diff_text_files[eio-equal]-%s' % size_name,
+                          *text_diff_scenario(size, generators.write_eio, 0)))
+    found.append(Scenario('diff_text_files[eio]-%s' % size_name,
+                          *text_diff_scenario(size, generators.write_eio, size['changes'])))
+    found.append(Scenario('diff_text_files[err]-%s' % size_name,
+                          *text_diff_scenario(size, generators.write_err, size['changes'])))
+    found.append(Scenario('ThreshDict.lookup-%s' % size_name, *lookup_scenario(size)))
+    return found
+
+
+def measure(scenario, repeat):
+    """Best time of repeat runs of a scenario in seconds, and the peak memory it allocated in MB from one more run;
+    the peak memory is measured apart from the timing since tracing the allocations slows everything down"""
+    directory = tempfile.mkdtemp(prefix='benchmark_')
+    try:
+        args = scenario.setup(directory)
+        times = []
+        for _ in range(repeat):
+            gc.collect()
+            start = timeit.default_timer()
+            scenario.run(*args)
+            times.append(timeit.default_timer() - start)
+        peak_memory_mb = None
+        if tracemalloc is not None:
+            gc.collect()
+            tracemalloc.start()
+            try:
+                scenario.run(*args)
+                peak_memory_mb = tracemalloc.get_traced_memory()[1] / (1024.0 * 1024.0)
+            finally:
+                tracemalloc.stop()
+        return {'seconds': min(times), 'peak_memory_mb': peak_memory_mb}
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class BenchmarkHistory:
+    """The results of every run of the benchmarks, oldest first, kept in a JSON file"""
+
+    def __init__(self, json_file_path):
+        self.json_file_path = json_file_path
+        self.runs = []
+        if os.path.exists(json_file_path):
+            with io.open(json_file_path, encoding='utf-8') as f:
+                self.runs = json.load(f)
+
+    def previous(self):
+        return self.runs[-1] if self.runs else None
+
+    def append(self, run):
+        self.runs.append(run)
+        with io.open(self.json_file_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self.runs, indent=2, ensure_ascii=False))
+
+
+def regressions(previous, results, time_tolerance, memory_tolerance):
+    """Messages for the scenarios that got slower, or needed more memory, than in the previous run by more than the
+    tolerance, a fraction of the previous value; scenarios that weren't run both times are left out"""
+    found = []
+    if previous is None:
+        return found
+    for name in sorted(results):
+        if name not in previous['results']:
+            continue
+        before = previous['results'][name]
+        after = results[name]
+        if after['seconds'] > before['seconds'] * (1.0 + time_tolerance):
+            found.append('%s took %.3f s, up from %.3f s' % (name, after['seconds'], before['seconds']))
+        if before.get('peak_memory_mb') is not None and after.get('peak_memory_mb') is not None:
+            if after['peak_memory_mb'] > before['peak_memory_mb'] * (1.0 + memory_tolerance):
+                found.append('%s needed %.1f MB, up from %.1f MB' % (
+                    name, after['peak_memory_mb'], before['peak_memory_mb']
+                ))
+    return found
+
+
+def run_benchmarks(size_names_to_run, repeat=3, name_filter=None, print_callback=print):
+    results = {}
+    for size_name in size_names_to_run:
+        for scenario in scenarios(size_name):
+            if name_filter and name_filter not in scenario.name:
+                continue
+            results[scenario.name] = measure(scenario, repeat)
+            peak_memory_mb = results[scenario.name]['peak_memory_mb']
+            print_callback('%-40s %10.4f s %10s MB' % (
+                scenario.name, results[scenario.name]['seconds'],
+                '-' if peak_memory_mb is None else '%.1f' % peak_memory_mb
+            ))
+    return results
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Time the diff engines on generated outputs, and compare with the previous run'
+    )
+    parser.add_argument('--history', default='benchmark_history.json',
+                        help='JSON file the results of every run are appended to')
+    parser.add_argument('--sizes', nargs='+', choices=size_names, default=['small', 'medium'],
+                        help='Sizes of generated outputs to run the scenarios on')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs of each scenario, the best counts')
+    parser.add_argument('--filter', dest='name_filter', default=None,
+                        help='Only run the scenarios with this in their name')
+    parser.add_argument('--time-tolerance', type=float, default=0.2,
+                        help='Fraction a scenario can get slower by before it is flagged as a regression')
+    parser.add_argument('--memory-tolerance', type=float, default=0.1,
+                        help='Fraction the peak memory of a scenario can grow by before it is flagged as a regression')
+    args = parser.parse_args(args)
+    history = BenchmarkHistory(args.history)
+    previous = history.previous()
+    results = run_benchmarks([s for s in size_names if s in args.sizes], args.repeat, args.name_filter)
+    history.append({
+        'timestamp': datetime.datetime.now().isoformat(),
+        'commit': source_commit(package_dir),
+        'python': platform.python_version(),
+        'results': results,
+    })
+    found = regressions(previous, results, args.time_tolerance, args.memory_tolerance)
+    if previous is None:
+        print('No previous run in %s to compare with' % args.history)
+    for message in found:
+        print('Regression: %s' % message)
+    return 1 if found else 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,500 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals
+
+import argparse
+import hashlib
+import io
+import os
+import shutil
+import socket
+import tarfile
+import tempfile
+import threading
+import time
+from collections import deque
+from multiprocessing import Process
+from multiprocessing.connection import Client, Listener
+
+try:
+    from queue import Empty, Queue
+except ImportError:  # pragma: no cover - python 2
+    from Queue import Empty, Queue
+
+from epregressions.scheduler import TaskScheduler
+from epregressions.staging import Stager
+
+# read for the key shared by the broker and its workers when it isn't passed on the command line
+authkey_variable = 'EPREGRESSIONS_BROKER_KEY'
+
+
+def parse_address(address):
+    """host:port as a (host, port) tuple"""
+    host, _, port = address.rpartition(':')
+    return host or 'localhost', int(port)
+
+
+def read_authkey(authkey=None, authkey_file=None):
+    """The key shared by the broker and its workers: authkey if given, otherwise the first line of authkey_file,
+    otherwise the EPREGRESSIONS_BROKER_KEY environment variable; None if there is none"""
+    if authkey:
+        return authkey
+    if authkey_file:
+        with io.open(authkey_file, encoding='utf-8') as f:
+            return f.readline().strip() or None
+    return os.environ.get(authkey_variable) or None
+
+
+def snapshot(directory):
+    """Size and modification time of every file under a directory, by path relative to it"""
+    files = {}
+    for root, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            file_path = os.path.join(root, file_name)
+            stat = os.stat(file_path)
+            files[os.path.relpath(file_path, directory)] = (stat.st_size, stat.st_mtime)
+    return files
+
+
+def pack(directory, unchanged=None, leave_out=()):
+    """A gzipped tar archive of the files in a directory, as bytes, leaving out the files that are the same as in the
+    unchanged snapshot of it, and the relative paths in leave_out.  Links are archived as the files they point to."""
+    unchanged = unchanged or {}
+    current = snapshot(directory)
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz', dereference=True) as archive:
+        for relative_path in sorted(current):
+            if relative_path in leave_out:
+                continue
+            if unchanged.get(relative_path) != current[relative_path]:
+                archive.add(os.path.join(directory, relative_path), arcname=relative_path)
+    deleted = sorted(relative_path for relative_path in unchanged if relative_path not in current)
+    return buffer.getvalue(), deleted
+
+
+def unpack(archive_bytes, directory, deleted=()):
+    """Write the files of a pack archive into a directory, replacing files rather than writing through them, in case
+    they are links to shared inputs, and remove the deleted ones"""
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    with tarfile.open(fileobj=io.BytesIO(archive_bytes), mode='r:gz') as archive:
+        for member in archive.getmembers():
+            target = os.path.join(directory, member.name)
+            if member.isfile() and os.path.lexists(target):
+                os.remove(target)
+            archive.extract(member, directory)
+    for relative_path in deleted:
+        file_path = os.path.join(directory, relative_path)
+        if os.path.lexists(file_path):
+            os.remove(file_path)
+
+
+def replace_paths(value, mapping):
+    """Swap the directories in mapping for their replacements in every string in value, and in the strings in the
+    lists, tuples and dictionaries in it"""
+    if isinstance(value, (list, tuple)):
+        return type(value)(replace_paths(item, mapping) for item in value)
+    if isinstance(value, dict):
+        return dict((key, replace_paths(item, mapping)) for key, item in value.items())
+    if isinstance(value, type('')):
+        for old, new in mapping:
+            if value == old or value.startswith(old + os.sep):
+                return new + value[len(old):]
+    return value
+
+
+class RemoteTask:
+    def __init__(self, key, func, args, directories, timeout, shared_inputs):
+        self.key = key
+        self.func = func
+        self.args = args
+        # (coordinator directory sent with the task, directory the changed files are written back to, or None)
+        self.directories = directories
+        self.timeout = timeout
+        # files in those directories that many tasks have in common, sent to each worker once
+        self.shared_inputs = shared_inputs
+        self.cancelled = False
+        self.start_time = None
+        self.attempts = 0
+
+
+class RemoteWorker:
+    def __init__(self, name, connection):
+        self.name = name
+        self.connection = connection
+        self.task = None
+        self.inputs = set()  # digests of the shared inputs this worker was sent
+
+
+class TaskBroker:
+    """Serves tasks to worker processes on other hosts, which pull them over TCP and send back the results.
+
+    This stands in for a TaskScheduler: tasks are queued with submit and collected with wait in the same way, and
+    tasks submitted with submit run on a local TaskScheduler as usual.  Tasks submitted with submit_remote go to the
+    workers instead, along with archives of the directories they read, so the workers only need the builds installed
+    at the same paths.  The changed files are archived and written back into the directories on this host.
+
+    Each worker runs one task at a time and checks in every few seconds while it runs.  A worker that disconnects, or
+    goes quiet for longer than heartbeat_timeout, is dropped and its task is queued again ahead of the others, unless
+    max_attempts workers were lost running it already; then the task is failed, so a case that brings down every
+    worker it runs on doesn't go round forever.  The shared inputs of the tasks, like the idd and weather files staged
+    into the run directories, are sent to each worker once and kept there by their digest.
+
+    The tasks and results are pickles, which run code when they are loaded, so only clients that know authkey are
+    let in; there is no default key, one has to be given."""
+
+    def __init__(self, address, authkey, max_local_workers, print_callback=None, heartbeat_timeout=60.0,
+                 status_interval=60.0, max_attempts=3):
+        if not authkey:
+            raise ValueError(
+                'The broker needs a key to keep other clients out: pass --broker-key or --broker-key-file, or set %s'
+                % authkey_variable
+            )
+        self.authkey = authkey.encode('utf-8')
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self.print_callback = print_callback
+        self.status_interval = status_interval
+        self.last_status_time = time.time()
+        self.local = TaskScheduler(max_local_workers, print_callback, status_interval=float('inf'))
+        self.lock = threading.Lock()
+        self.queue = deque()
+        self.workers = []
+        self.results = Queue()
+        self.messages = Queue()
+        self.closed = False
+        self.started_at = None
+        self.busy_time = 0.0
+        self.completed = 0
+        self.failed = 0
+        self.requeued = 0
+        self.inputs_sent = 0
+        self.input_digests = {}  # shared inputs are hashed once per file, and the files linked into runs are one
+        self.cancelled = 0
+        self.max_workers_connected = 0
+        self.listener = Listener(parse_address(address), authkey=self.authkey)
+        self.address = self.listener.address
+        self.accept_thread = threading.Thread(target=self.accept_workers)
+        self.accept_thread.daemon = True
+        self.accept_thread.start()
+
+    def accept_workers(self):
+        while True:
+            try:
+                connection = self.listener.accept()
+            except Exception:
+                if self.closed:
+                    return
+                continue  # a client that failed to authenticate
+            if self.closed:
+                connection.close()
+                return
+            thread = threading.Thread(target=self.serve_worker, args=(connection,))
+            thread.daemon = True
+            thread.start()
+
+    def serve_worker(self, connection):
+        worker = None
+        try:
+            while True:
+                if not connection.poll(self.heartbeat_timeout):
+                    raise EOFError('no word from the worker in %s seconds' % self.heartbeat_timeout)
+                message = connection.recv()
+                if worker is None:
+                    worker = RemoteWorker(message[1], connection)
+                    with self.lock:
+                        self.workers.append(worker)
+                        self.max_workers_connected = max(self.max_workers_connected, len(self.workers))
+                    self.messages.put('Worker %s connected' % worker.name)
+                if message[0] == 'result':
+                    self.task_returned(worker, *message[2:])
+                if message[0] == 'heartbeat':
+                    connection.send(('cancel',) if worker.task is None or worker.task.cancelled else ('continue',))
+                elif self.closed:
+                    connection.send(('stop',))
+                    return
+                else:
+                    self.send_next_task(worker)
+        except (EOFError, IOError, OSError) as e:
+            if worker is not None:
+                self.lose_worker(worker, e)
+        finally:
+            if worker is not None:
+                with self.lock:
+                    if worker in self.workers:
+                        self.workers.remove(worker)
+            connection.close()
+
+    def send_next_task(self, worker):
+        with self.lock:
+            task = self.queue.popleft() if self.queue else None
+            worker.task = task
+            if task is not None:
+                task.start_time = time.time()
+                task.attempts += 1
+                if self.started_at is None:
+                    self.started_at = task.start_time
+        if task is None:
+            worker.connection.send(('wait',))
+            return
+        shared = dict((path, self.input_digest(path)) for path in task.shared_inputs if os.path.isfile(path))
+        inputs = {}
+        for path, digest in shared.items():
+            if digest not in worker.inputs:
+                with open(path, 'rb') as f:
+                    inputs[digest] = f.read()
+        archives = []
+        for source, _ in task.directories:
+            linked = dict(
+                (os.path.relpath(path, source), digest) for path, digest in shared.items()
+                if path.startswith(source + os.sep)
+            )
+            archive_bytes, _ = pack(source, leave_out=linked)
+            archives.append((source, archive_bytes, linked))
+        worker.connection.send(('task', task.func, task.args, archives, task.timeout, inputs))
+        worker.inputs.update(inputs)
+        self.inputs_sent += len(inputs)
+
+    def input_digest(self, file_path):
+        stat = os.stat(file_path)
+        stamp = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime)
+        if stamp not in self.input_digests:
+            digest = hashlib.sha1()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            self.input_digests[stamp] = digest.hexdigest()
+        return self.input_digests[stamp]
+
+    def task_returned(self, worker, value, error, archives):
+        task = worker.task
+        if task is None or task.cancelled:
+            worker.task = None
+            return
+        for (_, destination), (archive_bytes, deleted) in zip(task.directories, archives):
+            if destination and archive_bytes is not None:
+                unpack(archive_bytes, destination, deleted)
+        with self.lock:
+            # the task is running until its result is queued, so the broker is never seen idle in between
+            self.results.put((task.key, value, error))
+            worker.task = None
+            self.busy_time += time.time() - task.start_time
+            if error:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def lose_worker(self, worker, reason):
+        with self.lock:
+            task = worker.task
+            worker.task = None
+            if task is not None and not task.cancelled:
+                if task.attempts < self.max_attempts:
+                    self.queue.appendleft(task)
+                    self.requeued += 1
+                else:
+                    self.results.put((task.key, None, 'lost the worker running it %s times, the last time: %s' % (
+                        task.attempts, reason
+                    )))
+                    self.busy_time += time.time() - task.start_time
+                    self.failed += 1
+        if task is None or task.cancelled:
+            self.messages.put('Worker %s disconnected' % worker.name)
+        elif task.attempts < self.max_attempts:
+            self.messages.put('Lost worker %s (%s), its task was queued again' % (worker.name, reason))
+        else:
+            self.messages.put('Lost worker %s (%s), its task failed after %s attempts' % (
+                worker.name, reason, task.attempts
+            ))
+
+    def submit(self, key, func, args, timeout=None, priority=False, thread=False):
+        """Queue func(*args) on the local workers, like TaskScheduler.submit"""
+        self.local.submit(key, func, args, timeout, priority, thread)
+
+    def submit_remote(self, key, func, args, directories, timeout=None, priority=False, shared_inputs=()):
+        """Queue func(*args) for the remote workers.  directories are (source, destination) pairs: each source is
+        sent along with the task and swapped for the worker's copy of it in args, and the files the task changed in
+        that copy are written back to the destination, unless it is None.  shared_inputs are paths of files in the
+        sources that other tasks have too, which are left out of the archives and linked in from the worker's copy."""
+        task = RemoteTask(key, func, args, directories, timeout, shared_inputs)
+        with self.lock:
+            if priority:
+                self.queue.appendleft(task)
+            else:
+                self.queue.append(task)
+
+    def running(self):
+        return [worker.task for worker in self.workers if worker.task is not None and not worker.task.cancelled]
+
+    def busy(self):
+        with self.lock:
+            remote_busy = bool(self.queue or self.running())
+        return remote_busy or not self.results.empty() or self.local.busy()
+
+    def wait(self, timeout=1.0):
+        """Wait up to timeout seconds for local or remote tasks to finish, returning (key, value, error) for each"""
+        finished = []
+        if self.local.busy():
+            finished.extend(self.local.wait(min(timeout, 0.1)))
+        block = not finished and not self.local.busy()
+        try:
+            finished.append(self.results.get(block, timeout))
+        except Empty:
+            pass
+        while not self.results.empty():
+            finished.append(self.results.get())
+        self.print_messages()
+        now = time.time()
+        if self.print_callback and now - self.last_status_time > self.status_interval:
+            self.last_status_time = now
+            self.print_callback(self.status())
+        return finished
+
+    def print_messages(self):
+        while not self.messages.empty():
+            message = self.messages.get()
+            if self.print_callback:
+                self.print_callback(message)
+
+    def cancel(self):
+        """Drop the queued tasks; running remote tasks are stopped when their workers next check in"""
+        self.local.cancel()
+        with self.lock:
+            running = self.running()
+            self.cancelled += len(self.queue) + len(running)
+            self.queue.clear()
+            for task in running:
+                task.cancelled = True
+
+    def close(self):
+        """Stop serving tasks; connected workers are told to stop the next time they check in"""
+        self.cancel()
+        self.closed = True
+        try:
+            Client(self.address, authkey=self.authkey).close()  # wake up the accept thread
+        except (IOError, OSError):  # pragma: no cover
+            pass
+        self.listener.close()
+        self.print_messages()
+
+    def utilization(self):
+        if self.started_at is None or not self.max_workers_connected:
+            return 0.0
+        now = time.time()
+        elapsed = now - self.started_at
+        with self.lock:
+            busy_time = self.busy_time + sum(now - task.start_time for task in self.running())
+        return busy_time / (elapsed * self.max_workers_connected) if elapsed > 0 else 0.0
+
+    def status(self):
+        with self.lock:
+            queued, running, connected = len(self.queue), len(self.running()), len(self.workers)
+        return 'Broker: %s queued, %s of %s remote workers busy, %.0f%% remote worker utilization' % (
+            queued, running, connected, 100.0 * self.utilization()
+        )
+
+    def summary(self):
+        return ('Broker: %s remote tasks completed, %s failed, %s queued again from lost workers, %s cancelled, '
+                '%s shared inputs sent, at most %s remote workers, %.0f%% remote worker utilization\n%s') % (
+            self.completed, self.failed, self.requeued, self.cancelled, self.inputs_sent, self.max_workers_connected,
+            100.0 * self.utilization(), self.local.summary()
+        )
+
+
+def connect(address, authkey, connect_timeout):
+    """Connect to a broker, waiting up to connect_timeout seconds for it to start listening"""
+    deadline = time.time() + connect_timeout
+    while True:
+        try:
+            return Client(parse_address(address), authkey=authkey.encode('utf-8'))
+        except (IOError, OSError):
+            if time.time() >= deadline:
+                raise
+            time.sleep(1.0)
+
+
+def run_worker(address, authkey, scratch_dir=None, heartbeat_interval=5.0, poll_interval=1.0,
+               connect_timeout=60.0, name=None):  # pragma: no cover - runs in a worker process, coverage misses this
+    """Pull tasks from the broker at address and run them, one at a time, until the broker stops or goes away.
+
+    Each task runs in a process of a local TaskScheduler, so it can be stopped if the suite is cancelled, in a fresh
+    directory under scratch_dir holding copies of the directories sent with it.  The shared inputs are kept for the
+    life of the worker, and linked into those copies."""
+    name = name or '%s:%s' % (socket.gethostname(), os.getpid())
+    connection = connect(address, authkey, connect_timeout)
+    scheduler = TaskScheduler(1)
+    inputs_dir = tempfile.mkdtemp(prefix='inputs-', dir=scratch_dir)
+    try:
+        connection.send(('ready', name))
+        while True:
+            message = connection.recv()
+            if message[0] == 'stop':
+                return
+            if message[0] == 'wait':
+                time.sleep(poll_interval)
+                connection.send(('ready', name))
+                continue
+            _, func, args, archives, timeout, inputs = message
+            for digest, contents in inputs.items():
+                with open(os.path.join(inputs_dir, digest), 'wb') as f:
+                    f.write(contents)
+            work_dir = tempfile.mkdtemp(prefix='task-', dir=scratch_dir)
+            try:
+                mapping = []
+                snapshots = []
+                stager = Stager()
+                for i, (source, archive_bytes, linked) in enumerate(archives):
+                    local_copy = os.path.join(work_dir, str(i), os.path.basename(source))
+                    unpack(archive_bytes, local_copy)
+                    for relative_path, digest in linked.items():
+                        destination = os.path.join(local_copy, relative_path)
+                        if not os.path.exists(os.path.dirname(destination)):
+                            os.makedirs(os.path.dirname(destination))
+                        stager.stage_file(os.path.join(inputs_dir, digest), destination)
+                    mapping.append((source, local_copy))
+                    snapshots.append(snapshot(local_copy))
+                scheduler.submit(None, func, replace_paths(args, mapping), timeout)
+                finished = []
+                while not finished:
+                    finished = scheduler.wait(heartbeat_interval)
+                    if not finished:
+                        connection.send(('heartbeat', name))
+                        if connection.recv()[0] == 'cancel':
+                            scheduler.cancel()
+                            finished = [(None, None, 'cancelled')]
+                _, value, error = finished[0]
+                value = replace_paths(value, [(local, source) for source, local in mapping])
+                returned = [pack(local, unchanged) for (_, local), unchanged in zip(mapping, snapshots)]
+                connection.send(('result', name, value, error, returned))
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+    except (EOFError, IOError, OSError):
+        return  # the broker went away
+    finally:
+        connection.close()
+        shutil.rmtree(inputs_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    parser = argparse.ArgumentParser(
+        description='Run worker processes that pull simulations and diffs from a test suite started with --broker'
+    )
+    parser.add_argument('address', help='host:port the suite is serving tasks on')
+    parser.add_argument('-j', dest='processes', type=int, default=1, help='Number of worker processes to run')
+    parser.add_argument('--broker-key', dest='authkey', default=None,
+                        help='Key shared with the suite, to keep other clients out; read from --broker-key-file or '
+                             'the %s environment variable if not given' % authkey_variable)
+    parser.add_argument('--broker-key-file', dest='authkey_file', default=None,
+                        help='File whose first line is the key shared with the suite')
+    parser.add_argument('--scratch-dir', dest='scratch_dir', default=None,
+                        help='Directory the tasks run in, the system temporary directory by default')
+    args = parser.parse_args()
+    authkey = read_authkey(args.authkey, args.authkey_file)
+    if not authkey:
+        parser.error('a key is needed: pass --broker-key or --broker-key-file, or set %s' % authkey_variable)
+    workers = [
+        Process(target=run_worker, args=(args.address, authkey, args.scratch_dir)) for _ in range(args.processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+from epregressions.structures import ForceRunType
+
+
+def file_digest(file_path):
+    if not os.path.isfile(file_path):
+        return 'missing'
+    digest = hashlib.sha1()
+    SimulationCache.hash_file(file_path, digest)
+    return digest.hexdigest()
+
+
+class SimulationCache:
+    """A content addressed store of finished simulation run directories.
+
+    A simulation is keyed on the contents of the tools in the build that run it, the contents of its prepared run
+    directory (which holds the input file and everything copied in with it), the weather file, and the run settings.
+    When a case is run again with the same key, the cached run directory is copied back instead of running
+    EnergyPlus.  The shared inputs staged into the run directory, like the weather file, aren't stored with each run;
+    the same key means the run directory being restored into was prepared with the same ones, so they are kept from
+    there.  The cache is kept under max_size bytes by evicting the least recently used runs."""
+
+    # bump this whenever the key or the layout of the cache changes, so that old entries are never restored
+    version = 2
+
+    # the tools in a build tree that are run by execute_energyplus, or read by them
+    build_tree_tools = [
+        'energyplus', 'basement', 'idd_path', 'slab', 'basementidd', 'slabidd', 'expandobjects', 'epmacro', 'readvars',
+        'parametric'
+    ]
+
+    # energyplus is linked against libraries that sit next to it in the products directory
+    library_extensions = ('.so', '.dylib', '.dll')
+
+    # inputs staged into the run directory that are already part of the key as a tool or the weather file
+    keyed_inputs = ('Energy+.idd', 'in.epw')
+
+    entry_file_name = 'cache_entry.json'
+
+    default_max_size = 10 * 1000 ** 3
+
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.file_digests = {}  # tools are hashed once per size and modification time
+        self.entries = {}  # key: [size, last used time]
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        for key in os.listdir(self.cache_dir):
+            entry_file = os.path.join(self.cache_dir, key, self.entry_file_name)
+            try:
+                with open(entry_file) as f:
+                    entry = json.load(f)
+                self.entries[key] = [entry['size'], os.path.getmtime(entry_file)]
+            except (IOError, OSError, ValueError, KeyError):
+                pass  # a partial store, another cache's files, or an entry evicted while reading
+
+    @staticmethod
+    def hash_file(file_path, digest):
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+
+    def file_digest(self, file_path):
+        if not os.path.isfile(file_path):
+            return 'missing'
+        stat = os.stat(file_path)
+        stamp = (file_path, stat.st_size, stat.st_mtime)
+        if stamp not in self.file_digests:
+            self.file_digests[stamp] = file_digest(file_path)
+        return self.file_digests[stamp]
+
+    @classmethod
+    def run_directory_digest(cls, test_run_directory):
+        """Hashes the contents of a prepared run directory, the part of the key that is different for every case; the
+        suite leaves this to the worker that prepared the directory"""
+        digest = hashlib.sha1()
+        for root, dirs, files in os.walk(test_run_directory):
+            dirs.sort()
+            for file_name in sorted(files):
+                if root == test_run_directory and file_name in cls.keyed_inputs:
+                    continue
+                file_path = os.path.join(root, file_name)
+                relative_path = os.path.relpath(file_path, test_run_directory).replace(os.sep, '/')
+                digest.update(('\ninput %s\n' % relative_path).encode('utf-8'))
+                cls.hash_file(file_path, digest)
+        return digest.hexdigest()
+
+    @classmethod
+    def build_lines(cls, build_tree, file_digest):
+        """The lines of a key that stand for the build itself, a digest of each of its tools and libraries"""
+        lines = []
+        for tool in cls.build_tree_tools:
+            lines.append('%s %s' % (tool, file_digest(build_tree[tool])))
+        products_dir = os.path.dirname(build_tree['energyplus'])
+        if os.path.isdir(products_dir):
+            for file_name in sorted(os.listdir(products_dir)):
+                if os.path.splitext(file_name)[1] in cls.library_extensions or '.so.' in file_name:
+                    lines.append('library %s %s' % (file_name, file_digest(os.path.join(products_dir, file_name))))
+        return lines
+
+    def key(self, build_tree, entry_name, test_run_directory, run_type, min_reporting_freq, this_parametric_file,
+            weather_file_name, skip_read_vars=False, run_directory_digest=None):
+        """Returns the cache key for a simulation, given the same arguments as energyplus.execute_energyplus, and the
+        run_directory_digest of its run directory if that was worked out already"""
+        if run_directory_digest is None:
+            run_directory_digest = self.run_directory_digest(test_run_directory)
+        lines = ['version %s' % self.version]
+        lines.extend(self.build_lines(build_tree, self.file_digest))
+        lines.append('run type %s' % run_type)
+        lines.append('minimum reporting frequency %s' % min_reporting_freq.upper())
+        lines.append('parametric %s' % this_parametric_file)
+        if skip_read_vars:
+            lines.append('no csv outputs')
+        if run_type != ForceRunType.DD:
+            lines.append('weather %s' % self.file_digest(weather_file_name))
+        lines.append('run directory %s' % run_directory_digest)
+        digest = hashlib.sha1()
+        digest.update('\n'.join(lines).encode('utf-8'))
+        return digest.hexdigest()
+
+    def restore(self, key, test_run_directory):
+        """Replace the contents of the prepared test_run_directory with the cached run for key, keeping the shared
+        inputs staged into it, and return False if there isn't one"""
+        entry_dir = os.path.join(self.cache_dir, key)
+        try:
+            with open(os.path.join(entry_dir, self.entry_file_name)) as f:
+                shared_inputs = json.load(f)['shared_inputs']
+        except (IOError, OSError, ValueError, KeyError):
+            shared_inputs = None
+        if key not in self.entries or shared_inputs is None:
+            self.entries.pop(key, None)
+            self.misses += 1
+            return False
+        shared_inputs = set(os.path.join(test_run_directory, *path.split('/')) for path in shared_inputs)
+        if not all(os.path.isfile(path) for path in shared_inputs):  # pragma: no cover - the key covers them
+            self.misses += 1
+            return False
+        try:
+            for root, dirs, files in os.walk(test_run_directory, topdown=False):
+                for file_name in files:
+                    if os.path.join(root, file_name) not in shared_inputs:
+                        os.remove(os.path.join(root, file_name))
+                if root != test_run_directory and not os.listdir(root):
+                    os.rmdir(root)
+            for root, dirs, files in os.walk(entry_dir):
+                restored_root = os.path.join(test_run_directory, os.path.relpath(root, entry_dir))
+                if not os.path.isdir(restored_root):
+                    os.mkdir(restored_root)
+                for file_name in files:
+                    if root != entry_dir or file_name != self.entry_file_name:
+                        shutil.copy2(os.path.join(root, file_name), os.path.join(restored_root, file_name))
+        except (IOError, OSError, shutil.Error):  # pragma: no cover - evicted by another suite while copying
+            self.entries.pop(key, None)
+            self.misses += 1
+            return False
+        self.touch(key)
+        self.hits += 1
+        return True
+
+    def touch(self, key):
+        now = time.time()
+        try:
+            os.utime(os.path.join(self.cache_dir, key, self.entry_file_name), (now, now))
+        except OSError:  # pragma: no cover - evicted by another suite
+            pass
+        self.entries[key][1] = now
+
+    def store(self, key, test_run_directory, shared_inputs=()):
+        """Copy a finished run directory into the cache under key, leaving out the shared inputs staged into it, given
+        as paths relative to the run directory"""
+        if key in self.entries:
+            self.touch(key)
+            return
+        shared_inputs = set(os.path.normpath(path) for path in shared_inputs)
+        left_out = []
+        size = 0
+        for root, _, files in os.walk(test_run_directory):
+            for file_name in files:
+                relative_path = os.path.relpath(os.path.join(root, file_name), test_run_directory)
+                if relative_path in shared_inputs:
+                    left_out.append(relative_path.replace(os.sep, '/'))
+                else:
+                    size += os.path.getsize(os.path.join(root, file_name))
+        if size > self.max_size:
+            return
+
+        def ignore_shared_inputs(directory, file_names):
+            relative_dir = os.path.relpath(directory, test_run_directory)
+            return [f for f in file_names if os.path.normpath(os.path.join(relative_dir, f)) in shared_inputs]
+
+        # copy to a temporary name first, so an entry is either complete or not there at all
+        temp_dir = os.path.join(self.cache_dir, 'tmp-%s' % uuid.uuid4().hex)
+        try:
+            shutil.copytree(test_run_directory, temp_dir, ignore=ignore_shared_inputs)
+            with open(os.path.join(temp_dir, self.entry_file_name), 'w') as f:
+                json.dump({'size': size, 'created': time.time(), 'shared_inputs': sorted(left_out)}, f)
+            os.rename(temp_dir, os.path.join(self.cache_dir, key))
+        except (IOError, OSError, shutil.Error):  # pragma: no cover - another suite stored the same run first
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            return
+        self.entries[key] = [size, time.time()]
+        self.stores += 1
+        self.evict()
+
+    def size(self):
+        return sum(entry[0] for entry in self.entries.values())
+
+    def evict(self):
+        total_size = self.size()
+        for key in sorted(self.entries, key=lambda k: self.entries[k][1]):
+            if total_size <= self.max_size:
+                break
+            total_size -= self.entries.pop(key)[0]
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+            self.evictions += 1
+
+    def summary(self):
+        return 'Simulation cache: %s hits, %s misses, %s stored, %s evicted, %.1f of %.1f MB used' % (
+            self.hits, self.misses, self.stores, self.evictions, self.size() / 1e6, self.max_size / 1e6
+        )
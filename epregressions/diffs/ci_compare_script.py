@@ -151,6 +151,22 @@ def main_function(file_name, base_dir, mod_dir, base_sha, mod_sha, make_public,
             has_small_diffs = True
             print_message("Table small diffs.")
 
+    # numeric diff
+    if entry.sql_diffs:
+        has_diffs, has_small_diffs = process_diffs("SQL", entry.sql_diffs, has_diffs, has_small_diffs)
+
+    if entry.sql_table_diffs:
+        if entry.sql_table_diffs.big_diff_count > 0:
+            has_diffs = True
+            print_message("SQL table big diffs.")
+        elif entry.sql_table_diffs.small_diff_count > 0:
+            has_small_diffs = True
+            print_message("SQL table small diffs.")
+
+    if entry.sql_errors_diffs and (entry.sql_errors_diffs.diff_type != TextDifferences.EQUAL):
+        has_small_diffs = True
+        print_message("SQL errors diffs.")
+
     if has_small_diffs:
         print("[decent_ci:test_result:warn]")
 
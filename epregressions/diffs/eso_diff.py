@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Compares two EnergyPlus eso (or mtr) files directly, without converting them to csv with ReadVarsESO first.
+
+The results, error file and diff files are the same kind math_diff writes for the csv files, using the same
+thresholds and diff categories, so the two can be used interchangeably in a test suite.
+"""
+
+from array import array
+
+from epregressions.diffs import mycsv
+from epregressions.diffs.math_diff import (
+    DiffAccumulator,
+    DuplicateHeaderException,
+    SummaryAccumulator,
+    abs_diff,
+    info,
+    rel_diff,
+    report_math_diff,
+    warn_about_uncompared_fields,
+)
+
+month_names = [
+    'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November',
+    'December'
+]
+
+# report codes of the time stamp lines; every other code up to this one is reserved and isn't a variable
+TIME_STEP_STAMP = 2
+DAILY_STAMP = 3
+MONTHLY_STAMP = 4
+RUN_PERIOD_STAMP = 5
+ANNUAL_STAMP = 6
+LAST_RESERVED_CODE = 6
+
+
+class EsoMalformedException(Exception):
+    pass
+
+
+class EsoVariable:
+    """One reported variable or meter: its values, and the record (time stamp) each value belongs to"""
+
+    def __init__(self, header):
+        self.header = header
+        self.values = array('d')
+        self.records = array('l')
+
+
+class EsoFile:
+    """The data dictionary and records of an eso or mtr file, read into a column for each variable.
+
+    Variables are named the way ReadVarsESO names its csv columns, like
+    Environment:Site Outdoor Air Drybulb Temperature [C](Hourly), so the threshold lookups match.  Every time stamp
+    line starts a new record, and its label is the Date/Time that ReadVarsESO would write for it."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.variables = {}  # report code: EsoVariable
+        self.order = []  # report codes, in dictionary order
+        self.records = []  # time labels
+        with open(file_path) as f:
+            self.read_dictionary(f)
+            self.read_data(f)
+
+    def read_dictionary(self, f):
+        next(f, None)  # program version line
+        for line in f:
+            line = line.strip()
+            if line == 'End of Data Dictionary':
+                return
+            definition, _, frequency = line.partition('!')
+            tokens = [token.strip() for token in definition.split(',')]
+            code = int(tokens[0])
+            if code <= LAST_RESERVED_CODE:
+                continue
+            name = ':'.join([tokens[2], ','.join(tokens[3:])]) if len(tokens) > 3 else tokens[2]
+            frequency = frequency.split('[')[0].strip()
+            self.variables[code] = EsoVariable('%s(%s)' % (name, frequency))
+            self.order.append(code)
+        raise EsoMalformedException('no end of the data dictionary in <%s>' % self.file_path)
+
+    def read_data(self, f):
+        record = -1
+        for line in f:
+            tokens = line.split(',')
+            try:
+                code = int(tokens[0])
+            except ValueError:
+                if line.strip() == 'End of Data':
+                    return
+                raise EsoMalformedException('unexpected line in <%s>: %s' % (self.file_path, line.strip()))
+            variable = self.variables.get(code)
+            if variable is not None:
+                variable.values.append(float(tokens[1]))
+                variable.records.append(record)
+            elif LAST_RESERVED_CODE >= code >= TIME_STEP_STAMP:
+                self.records.append(self.time_label(code, tokens))
+                record += 1
+        raise EsoMalformedException('no end of the data in <%s>' % self.file_path)
+
+    @staticmethod
+    def time_label(code, tokens):
+        if code == TIME_STEP_STAMP:
+            month, day, hour = int(tokens[2]), int(tokens[3]), int(tokens[5])
+            end_minute = int(round(float(tokens[7])))
+            if end_minute == 60:
+                return ' %02d/%02d  %02d:00:00' % (month, day, hour)
+            return ' %02d/%02d  %02d:%02d:00' % (month, day, hour - 1, end_minute)
+        if code == DAILY_STAMP:
+            return ' %02d/%02d' % (int(tokens[2]), int(tokens[3]))
+        if code == MONTHLY_STAMP:
+            return month_names[int(tokens[2]) - 1]
+        if code == RUN_PERIOD_STAMP:
+            return 'Run Period'
+        return 'Year %s' % tokens[1].strip()
+
+    def headers(self):
+        return [self.variables[code].header for code in self.order]
+
+    def columns(self):
+        """Header: variable, raising DuplicateHeaderException like math_diff for a name reported twice"""
+        columns = {}
+        for code in self.order:
+            variable = self.variables[code]
+            if variable.header in columns:
+                raise DuplicateHeaderException("There are two columns with the same header name " + variable.header)
+            columns[variable.header] = variable
+        return columns
+
+
+def eso_diff(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file, err_file, summary_csv):
+    """math_diff for two eso or mtr files, returning the same (diff type, records, big diffs, small diffs)"""
+    files = []
+    for input_file in [inputfile1, inputfile2]:
+        try:
+            files.append(EsoFile(input_file))
+        except (IOError, OSError):
+            info('unable to open file <%s>' % input_file, err_file)
+            return 'unable to open file <%s>' % input_file, 0, 0, 0
+        except (EsoMalformedException, ValueError, IndexError):
+            info('malformed eso file: <%s>' % input_file, err_file)
+            return 'malformed eso file: <%s>' % input_file, 0, 0, 0
+        if not files[-1].records:
+            info('<%s> has no data' % input_file, err_file)
+            return '<%s> has no data' % input_file, 0, 0, 0
+    eso1, eso2 = files
+
+    # Not going to compare two files with different time series
+    if eso1.records != eso2.records:
+        info('Time series in <%s> and <%s> do not match' % (inputfile1, inputfile2), err_file)
+        return 'Time series do not match', 0, 0, 0
+
+    # Only going to compare fields that are found in both files, in the order they appear in the first one
+    hset1 = set(eso1.headers())
+    hset2 = set(eso2.headers())
+    hset = hset1.intersection(hset2)
+    if len(hset) == 0:
+        info('Input files <%s> and <%s> have no common fields' % (inputfile1, inputfile2), err_file)
+        return 'No common fields', 0, 0, 0
+    columns1 = eso1.columns()
+    columns2 = eso2.columns()
+    horder = [h for h in eso1.headers() if h in hset]
+    for key in horder:
+        if columns1[key].records != columns2[key].records:
+            info('Time series in <%s> and <%s> do not match' % (inputfile1, inputfile2), err_file)
+            return 'Time series do not match', 0, 0, 0
+    # variables that are defined but never reported have nothing to compare
+    horder = [h for h in horder if columns1[h].values]
+
+    # Warn about fields that will not be compared
+    warn_about_uncompared_fields(hset1, hset2, inputfile1, inputfile2, err_file)
+
+    times = eso1.records
+    err_dict = {}
+    for key, (abs_thresh, rel_thresh) in zip(horder, thresh_dict.lookup_all(horder)):
+        variable1 = columns1[key]
+        variable2 = columns2[key]
+        accumulator = DiffAccumulator(abs_thresh, rel_thresh)
+        if variable1.values == variable2.values:
+            # the usual case: past the first value, equal values don't change anything the accumulator reports
+            accumulator.add(variable1.values[0], variable2.values[0], times[variable1.records[0]])
+        else:
+            for x, y, record in zip(variable1.values, variable2.values, variable1.records):
+                accumulator.add(x, y, times[record])
+        err_dict[key] = accumulator.errors()
+
+    def summarize():
+        summary_dict1 = {}
+        summary_dict2 = {}
+        for this_key in horder:
+            for columns, summary_dict in [(columns1, summary_dict1), (columns2, summary_dict2)]:
+                variable = columns[this_key]
+                accumulator = SummaryAccumulator()
+                for value, record in zip(variable.values, variable.records):
+                    accumulator.add(value, times[record])
+                summary_dict[this_key] = accumulator.summary()
+        return summary_dict1, summary_dict2
+
+    def write_diff_files(tdhorder):
+        # one row per record, with blanks for the variables that aren't reported at that time
+        abs_rows = [[time] + [''] * (len(tdhorder) - 1) for time in times]
+        rel_rows = [[time] + [''] * (len(tdhorder) - 1) for time in times]
+        for i, key in enumerate(tdhorder[1:]):
+            variable1 = columns1[key]
+            variable2 = columns2[key]
+            for x, y, record in zip(variable1.values, variable2.values, variable1.records):
+                abs_rows[record][i + 1] = abs_diff(x, y)
+                rel_rows[record][i + 1] = rel_diff(x, y)
+        mycsv.writecsv([tdhorder] + abs_rows, abs_diff_file)
+        mycsv.writecsv([tdhorder] + rel_rows, rel_diff_file)
+
+    return report_math_diff(
+        err_dict, summarize, write_diff_files, horder, 'Date/Time', len(times), inputfile1, inputfile2, err_file,
+        summary_csv
+    )
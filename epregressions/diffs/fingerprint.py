@@ -0,0 +1,28 @@
+"""Cheap fingerprints of EnergyPlus output files
+
+Most cases in a test suite don't change their outputs, and math_diff parses every number in every csv just to find
+that out.  The functions in here read a file once, without parsing more than is needed, and return a fingerprint that
+is equal for two files exactly when the full diff would find them equal.  The fingerprint also carries the counts the
+full diff would report for a file compared with itself, so the result of the diff can be recorded without running it.
+When a file has something in it that the full diff treats in a special way (duplicate headers, no data, etc.) the
+fingerprint is None and the full diff should be run.
+"""
+
+import csv
+import hashlib
+
+
+def csv_fingerprint(csv_file):
+    """returns (digest, number of records) for a csv file that math_diff can compare against itself, or None"""
+    digest = hashlib.sha1()
+    with open(csv_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    with open(csv_file) as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        num_records = sum(1 for _ in reader)
+    # math_diff reports on these instead of comparing: no data fields, no data rows, or duplicate headers
+    if len(header) < 2 or num_records == 0 or len(set(header[1:])) != len(header) - 1:
+        return None
+    return digest.hexdigest(), num_records
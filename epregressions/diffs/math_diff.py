@@ -54,10 +54,16 @@ __license__ = "GNU General Public License Version 3"
 # - how the program will respond when the time stamps do not match
 # - documentation of data structure in the program
 
+import csv
 import getopt
 import os
 import sys
 
+try:
+    import numpy
+except ImportError:  # pragma: no cover - numpy is optional, the pure-Python engine is always available
+    numpy = None
+
 from epregressions.diffs import mycsv
 from epregressions.diffs.thresh_dict import ThreshDict
 
@@ -67,6 +73,13 @@ path = os.path.dirname(__file__)
 script_dir = os.path.abspath(path)
 
 
+class MathDiffEngine:
+    # these are the engines math_diff can use to compute the cell-wise differences; they produce the same outputs
+    PYTHON = 'python'
+    NUMPY = 'numpy'
+    STREAMING = 'streaming'
+
+
 class DuplicateHeaderException(Exception):
     """docstring for DuplicateHeaderException"""
     pass
@@ -208,92 +221,10 @@ def rel_diff(x, y):
         return 9999  # 'exception'
 
 
-def info(line, logfile=None):
-    if logfile:
-        mycsv.writecsv([[line]], logfile, 'a')
-    # print >> sys.stderr, line
-
-
-def math_diff(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file, err_file, summary_csv):
-    # Test for existence of input files
-    if not os.path.exists(inputfile1):
-        info('unable to open file <%s>' % inputfile1, err_file)
-        return 'unable to open file <%s>' % inputfile1, 0, 0, 0
-    if not os.path.exists(inputfile2):
-        info('unable to open file <%s>' % inputfile2, err_file)
-        return 'unable to open file <%s>' % inputfile2, 0, 0, 0
-
-    # read data out of files
-    try:
-        mat1 = mycsv.getlist(inputfile1)
-    except IndexError:
-        return 'malformed or empty csv file: <%s>' % inputfile1, 0, 0, 0
-    if len(mat1) < 2:
-        info('<%s> has no data' % inputfile1, err_file)
-        return '<%s> has no data' % inputfile1, 0, 0, 0
-    try:
-        mat2 = mycsv.getlist(inputfile2)
-    except IndexError:
-        return 'malformed or empty csv file: <%s>' % inputfile2, 0, 0, 0
-    if len(mat2) < 2:
-        info('<%s> has no data' % inputfile2, err_file)
-        return '<%s> has no data' % inputfile2, 0, 0, 0
-
-    # clean up the files
-    matrix1 = fill_matrix_holes(mat1)
-    matrix2 = fill_matrix_holes(mat2)
-
-    # split out the time columns
-    time1, mat1 = slicetime(matrix1)
-    time2, mat2 = slicetime(matrix2)
-    # Not going to compare two files with different time series
-    if time1 != time2:
-        info('Time series in <%s> and <%s> do not match' % (inputfile1, inputfile2), err_file)
-        return 'Time series do not match', 0, 0, 0
-
-    # Only going to compare fields that are found in both files
-    hset1 = set(mat1[0])
-    hset2 = set(mat2[0])
-    hset = hset1.intersection(hset2)
-    if len(hset) == 0:
-        info('Input files <%s> and <%s> have no common fields' % (inputfile1, inputfile2), err_file)
-        return 'No common fields', 0, 0, 0
-
-    # Order will be order in which intersection fields appear in first file
-    horder = [h for h in mat1[0] if h in hset]
-
-    # Warn about fields that will not be compared
-    hset_sdiff = hset1.symmetric_difference(hset2)
-    for h in hset_sdiff:
-        if h in hset1:
-            mycsv.writecsv(
-                [
-                    [
-                        'Not comparing field %s, which appears in input files <%s>, but not <%s>' % (
-                            h, inputfile1, inputfile2
-                        )
-                    ]
-                ],
-                err_file,
-                'a'
-            )
-        else:
-            mycsv.writecsv(
-                [
-                    [
-                        'Not comparing field %s, which appears in input files <%s>, but not <%s>' % (
-                            h,
-                            inputfile2,
-                            inputfile1
-                        )
-                    ]
-                ],
-                err_file,
-                'a'
-            )
-
-    # convert time matrix to dictionary (both time matrices should be identical here)
-    tdict = matrix2hdict(time1)
+def python_column_diffs(thresh_dict, mat1, mat2, horder, tdict):
+    """compute the cell-wise differences and the error dictionary one cell at a time.
+    returns the absolute and relative difference dictionaries, the error dictionary, and a function that
+    summarizes both inputs"""
     tkey = list(tdict.keys())[0]
 
     # convert data matrices to dictionaries
@@ -308,11 +239,9 @@ def math_diff(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file,
         rel_diffs[key] = list(map(rel_diff, hdict1[key], hdict2[key]))
 
     err_dict = {}
-    for key in horder:
+    for key, (abs_thresh, rel_thresh) in zip(horder, thresh_dict.lookup_all(horder)):
         err_dict[key] = {}
 
-        (abs_thresh, rel_thresh) = thresh_dict.lookup(key)
-
         max_abs_diff = max(abs_diffs[key])
         index_max_abs_diff = abs_diffs[key].index(max_abs_diff)
         err_dict[key]['abs_thresh'] = abs_thresh
@@ -347,6 +276,340 @@ def math_diff(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file,
             err_dict[key]['count_of_small_abs_rel_diff'] = err_dict[key]['count_of_small_abs_diff']
             err_dict[key]['count_of_big_abs_rel_diff'] = err_dict[key]['count_of_big_abs_diff']
 
+    def summarize():
+        return make_summary_dict(tdict, hdict1), make_summary_dict(tdict, hdict2)
+
+    return abs_diffs, rel_diffs, err_dict, summarize
+
+
+def parse_float_column(column):
+    """convert a column (1-d object array of strings) to floats the same way float() would.
+    returns the float array (unparseable cells are 0.0) and a boolean array flagging the cells that parsed"""
+    try:
+        return column.astype(numpy.float64), numpy.ones(len(column), dtype=bool)
+    except (ValueError, TypeError):
+        values = numpy.zeros(len(column))
+        parsed = numpy.ones(len(column), dtype=bool)
+        for i, cell in enumerate(column):
+            try:
+                values[i] = float(cell)
+            except ValueError:
+                parsed[i] = False
+        return values, parsed
+
+
+def mixed_list(values, int_cells):
+    """convert a float array to a list, turning the cells flagged in int_cells back into ints, which is what
+    abs_diff and rel_diff return for equal cells and for their error codes"""
+    this_list = values.tolist()
+    for i in numpy.flatnonzero(int_cells):
+        this_list[i] = int(values[i])
+    return this_list
+
+
+def mixed_value(values, int_cells, i):
+    """the python value of one cell, following the same int/float rule as mixed_list"""
+    if int_cells[i]:
+        return int(values[i])
+    return float(values[i])
+
+
+def numpy_summary(times, values, parsed, column):
+    """the numpy equivalent of one column of make_summary_dict"""
+    blank = ~parsed
+    for i in numpy.flatnonzero(blank):
+        if str(column[i]).strip() != '':
+            return {}  # same as a column error in make_summary_dict: no summary calcs for this column
+    summary = {'count': len(values)}
+    if blank.all():
+        summary['sum'] = 0
+    else:
+        summary['sum'] = sum(values.tolist())
+    index_max = int(numpy.argmax(values))
+    index_min = int(numpy.argmin(values))
+    summary['max'] = mixed_value(values, blank, index_max)
+    summary['min'] = mixed_value(values, blank, index_min)
+    summary['average'] = summary['sum'] / summary['count']
+    summary['time_of_max'] = times[index_max]
+    summary['time_of_min'] = times[index_min]
+    nonzero = values != 0
+    if not nonzero.any():
+        summary['nz_count'] = 0
+        summary['nz_sum'] = 0.0
+        summary['nz_max'] = 0.0
+        summary['nz_min'] = 0.0
+        summary['nz_average'] = 0.0
+        summary['nz_time_of_max'] = 0.0
+        summary['nz_time_of_min'] = 0.0
+    else:
+        nz_values = values[nonzero]
+        summary['nz_count'] = len(nz_values)
+        summary['nz_sum'] = float(nz_values.max())
+        summary['nz_max'] = float(nz_values.max())
+        summary['nz_min'] = float(nz_values.min())
+        summary['nz_average'] = summary['nz_sum'] / summary['nz_count']
+        summary['nz_time_of_max'] = times[int(numpy.argmax(values == summary['nz_max']))]
+        summary['nz_time_of_min'] = times[int(numpy.argmax(values == summary['nz_min']))]
+    return summary
+
+
+def check_duplicate_headers(*headers):
+    for header in headers:
+        seen = set()
+        for h in header:
+            if h in seen:
+                raise DuplicateHeaderException("There are two columns with the same header name " + str(h))
+            seen.add(h)
+
+
+def numpy_column_diffs(thresh_dict, mat1, mat2, horder, tdict):
+    """compute the same results as python_column_diffs from the lists of strings read by mycsv, each column parsed
+    into an array"""
+    tkey = list(tdict.keys())[0]
+    check_duplicate_headers(mat1[0], mat2[0])
+    index1 = dict((h, i) for i, h in enumerate(mat1[0]))
+    index2 = dict((h, i) for i, h in enumerate(mat2[0]))
+    data1 = numpy.array(mat1[1:], dtype=object)
+    data2 = numpy.array(mat2[1:], dtype=object)
+
+    def column_pair(key):
+        column1 = data1[:, index1[key]]
+        column2 = data2[:, index2[key]]
+        values1, parsed1 = parse_float_column(column1)
+        values2, parsed2 = parse_float_column(column2)
+        return (column1, values1, parsed1), (column2, values2, parsed2), column1 == column2
+
+    return numpy_diffs(thresh_dict, horder, tdict[tkey], column_pair)
+
+
+def numpy_diffs(thresh_dict, horder, times, column_pair):
+    """compute the same results as python_column_diffs with whole-column array operations.  column_pair(key) gives
+    (cells, values, parsed) for the column of the field in each file, where cells are the strings, only needed where a
+    cell didn't parse, along with whether each cell is the same string in both files.
+    returns None if the data contains NaN values, where python's max() and numpy's argmax() disagree"""
+    abs_diffs = {}
+    rel_diffs = {}
+    err_dict = {}
+    parsed_columns = {}
+    for key, (abs_thresh, rel_thresh) in zip(horder, thresh_dict.lookup_all(horder)):
+        (column1, values1, parsed1), (column2, values2, parsed2), equal = column_pair(key)
+        if numpy.isnan(values1).any() or numpy.isnan(values2).any():
+            return None
+        parsed_columns[key] = (column1, values1, parsed1, column2, values2, parsed2)
+
+        # same rules as abs_diff and rel_diff: equal strings are 0, unparseable cells are 9999, and a zero in the
+        # first file gives a relative diff of 999
+        abs_error = ~equal & ~(parsed1 & parsed2)
+        x_is_zero = ~equal & parsed1 & ~(numpy.abs(values1) > 0)
+        rel_error = ~equal & ~x_is_zero & ~(parsed1 & parsed2)
+        rel_valid = ~equal & ~x_is_zero & ~rel_error
+        abs_valid = ~equal & ~abs_error
+        with numpy.errstate(invalid='ignore', over='ignore'):
+            abs_values = numpy.zeros(len(values1))
+            abs_values[abs_valid] = numpy.abs(values1[abs_valid] - values2[abs_valid])
+            abs_values[abs_error] = 9999
+            rel_values = numpy.zeros(len(values1))
+            rel_values[rel_valid] = numpy.abs(
+                (values1[rel_valid] - values2[rel_valid]) / values1[rel_valid]
+            )
+            rel_values[x_is_zero] = 999
+            rel_values[rel_error] = 9999
+        if numpy.isnan(abs_values).any() or numpy.isnan(rel_values).any():
+            return None
+        abs_ints = equal | abs_error
+        rel_ints = equal | x_is_zero | rel_error
+
+        err_dict[key] = {}
+
+        index_max_abs_diff = int(numpy.argmax(abs_values))
+        err_dict[key]['abs_thresh'] = abs_thresh
+        err_dict[key]['max_abs_diff'] = mixed_value(abs_values, abs_ints, index_max_abs_diff)
+        err_dict[key]['rel_diff_of_max_abs_diff'] = mixed_value(rel_values, rel_ints, index_max_abs_diff)
+        err_dict[key]['time_of_max_abs_diff'] = times[index_max_abs_diff]
+        small_abs = (abs_values > 0.0) & (abs_values <= abs_thresh)
+        big_abs = abs_values > abs_thresh
+        err_dict[key]['count_of_small_abs_diff'] = int(numpy.count_nonzero(small_abs))
+        err_dict[key]['count_of_big_abs_diff'] = int(numpy.count_nonzero(big_abs))
+
+        index_max_rel_diff = int(numpy.argmax(rel_values))
+        err_dict[key]['rel_thresh'] = rel_thresh
+        err_dict[key]['max_rel_diff'] = mixed_value(rel_values, rel_ints, index_max_rel_diff)
+        err_dict[key]['abs_diff_of_max_rel_diff'] = mixed_value(abs_values, abs_ints, index_max_rel_diff)
+        err_dict[key]['time_of_max_rel_diff'] = times[index_max_rel_diff]
+        if rel_thresh > 0:
+            small_rel = (rel_values > 0.0) & (rel_values <= rel_thresh)
+            big_rel = rel_values > rel_thresh
+            err_dict[key]['count_of_small_rel_diff'] = int(numpy.count_nonzero(small_rel))
+            err_dict[key]['count_of_big_rel_diff'] = int(numpy.count_nonzero(big_rel))
+            err_dict[key]['count_of_small_abs_rel_diff'] = int(numpy.count_nonzero(small_abs | small_rel))
+            err_dict[key]['count_of_big_abs_rel_diff'] = int(numpy.count_nonzero(big_abs & big_rel))
+        else:
+            err_dict[key]['count_of_small_rel_diff'] = 0
+            err_dict[key]['count_of_big_rel_diff'] = 0
+            err_dict[key]['count_of_small_abs_rel_diff'] = err_dict[key]['count_of_small_abs_diff']
+            err_dict[key]['count_of_big_abs_rel_diff'] = err_dict[key]['count_of_big_abs_diff']
+
+        # only the columns with diffs get written out, so only those need to become lists
+        if any(err_dict[key][label] > 0 for label in [
+            'count_of_small_abs_diff', 'count_of_big_abs_diff', 'count_of_small_rel_diff', 'count_of_big_rel_diff'
+        ]):
+            abs_diffs[key] = mixed_list(abs_values, abs_ints)
+            rel_diffs[key] = mixed_list(rel_values, rel_ints)
+
+    def summarize():
+        summary_dict1 = {}
+        summary_dict2 = {}
+        for this_key in horder:
+            column1, values1, parsed1, column2, values2, parsed2 = parsed_columns[this_key]
+            summary_dict1[this_key] = numpy_summary(times, values1, parsed1, column1)
+            summary_dict2[this_key] = numpy_summary(times, values2, parsed2, column2)
+        return summary_dict1, summary_dict2
+
+    return abs_diffs, rel_diffs, err_dict, summarize
+
+
+def read_numeric_csv(csv_file_path):
+    """read a csv of a time stamp column and columns of numbers alone, with the numbers parsed by numpy straight into
+    a float array.  returns the header, the time stamps, the lines of data and the array of values, or None if the
+    file is anything else (missing, without data, or with blank or text cells, quotes or rows of another length),
+    for mycsv to read instead"""
+    if not os.path.exists(csv_file_path):
+        return None
+    with open(csv_file_path) as f:
+        text = f.read()
+    if '"' in text:
+        return None
+    lines = text.split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    header = lines[0].split(',') if lines else []
+    data = lines[1:]
+    if len(header) < 2 or not data or any(line.count(',') != len(header) - 1 for line in data):
+        return None
+    times = [line[:line.index(',')] for line in data]
+    try:
+        values = numpy.loadtxt(data, delimiter=',', usecols=list(range(1, len(header))), comments=None, ndmin=2)
+    except ValueError:
+        return None
+    return header, times, data, values
+
+
+def math_diff_arrays(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file, err_file, summary_csv):
+    """same results as math_diff, with the values of both inputs parsed straight into float arrays by numpy instead of
+    into lists of strings.  returns None if an input isn't made of numbers alone, or holds values the array operations
+    can't reproduce exactly (NaN), for math_diff to read it with mycsv instead; that is decided before anything is
+    written to err_file, so the messages aren't written twice"""
+    csv1 = read_numeric_csv(inputfile1)
+    csv2 = read_numeric_csv(inputfile2) if csv1 else None
+    if not csv2:
+        return None
+    header1, times1, lines1, values1 = csv1
+    header2, times2, lines2, values2 = csv2
+    if numpy.isnan(values1).any() or numpy.isnan(values2).any():
+        return None
+
+    # Not going to compare two files with different time series
+    if header1[0] != header2[0] or times1 != times2:
+        info('Time series in <%s> and <%s> do not match' % (inputfile1, inputfile2), err_file)
+        return 'Time series do not match', 0, 0, 0
+
+    # Only going to compare fields that are found in both files, in the order they appear in the first file
+    hset1 = set(header1[1:])
+    hset2 = set(header2[1:])
+    hset = hset1.intersection(hset2)
+    if len(hset) == 0:
+        info('Input files <%s> and <%s> have no common fields' % (inputfile1, inputfile2), err_file)
+        return 'No common fields', 0, 0, 0
+    horder = [h for h in header1[1:] if h in hset]
+    warn_about_uncompared_fields(hset1, hset2, inputfile1, inputfile2, err_file)
+    check_duplicate_headers(header1, header2)
+
+    # the cells are compared as strings too, since equal strings are diffed differently from equal values; with the
+    # columns in the same order, only the lines that differ need to be split into cells for that
+    if header1 == header2:
+        differing = [i for i, (line1, line2) in enumerate(zip(lines1, lines2)) if line1 != line2]
+    else:
+        differing = list(range(len(lines1)))
+    cells1 = numpy.array([lines1[i].split(',')[1:] for i in differing], dtype=object).reshape(-1, len(header1) - 1)
+    cells2 = numpy.array([lines2[i].split(',')[1:] for i in differing], dtype=object).reshape(-1, len(header2) - 1)
+    differing = numpy.array(differing, dtype=int)
+    index1 = dict((h, i) for i, h in enumerate(header1[1:]))
+    index2 = dict((h, i) for i, h in enumerate(header2[1:]))
+    parsed = numpy.ones(len(times1), dtype=bool)
+
+    def column_pair(key):
+        equal = numpy.ones(len(times1), dtype=bool)
+        equal[differing] = cells1[:, index1[key]] == cells2[:, index2[key]]
+        return (None, values1[:, index1[key]], parsed), (None, values2[:, index2[key]], parsed), equal
+
+    abs_diffs, rel_diffs, err_dict, summarize = numpy_diffs(thresh_dict, horder, times1, column_pair)
+    tkey = header1[0]
+    return report_math_diff(
+        err_dict, summarize, diff_file_writer(abs_diffs, rel_diffs, tkey, times1, abs_diff_file, rel_diff_file),
+        horder, tkey, len(times1), inputfile1, inputfile2, err_file, summary_csv
+    )
+
+
+def diff_file_writer(abs_diffs, rel_diffs, tkey, times, abs_diff_file, rel_diff_file):
+    """the write_diff_files of report_math_diff for the diffs of a whole file held in memory"""
+
+    def write_diff_files(tdhorder):
+        # put the time column back
+        abs_diffs[tkey] = times
+        rel_diffs[tkey] = times
+
+        # Convert the absolute and relative diff dictionaries to matrices and write them to files
+        abs_diff_mat = hdict2matrix(tdhorder, abs_diffs)
+        mycsv.writecsv(abs_diff_mat, abs_diff_file)
+        rel_diff_mat = hdict2matrix(tdhorder, rel_diffs)
+        mycsv.writecsv(rel_diff_mat, rel_diff_file)
+
+    return write_diff_files
+
+
+def info(line, logfile=None):
+    if logfile:
+        mycsv.writecsv([[line]], logfile, 'a')
+    # print >> sys.stderr, line
+
+
+def warn_about_uncompared_fields(hset1, hset2, inputfile1, inputfile2, err_file):
+    """write a warning to the error file for each field that only appears in one of the inputs"""
+    hset_sdiff = hset1.symmetric_difference(hset2)
+    for h in hset_sdiff:
+        if h in hset1:
+            mycsv.writecsv(
+                [
+                    [
+                        'Not comparing field %s, which appears in input files <%s>, but not <%s>' % (
+                            h, inputfile1, inputfile2
+                        )
+                    ]
+                ],
+                err_file,
+                'a'
+            )
+        else:
+            mycsv.writecsv(
+                [
+                    [
+                        'Not comparing field %s, which appears in input files <%s>, but not <%s>' % (
+                            h,
+                            inputfile2,
+                            inputfile1
+                        )
+                    ]
+                ],
+                err_file,
+                'a'
+            )
+
+
+def report_math_diff(err_dict, summarize, write_diff_files, horder, tkey, num_records, inputfile1, inputfile2,
+                     err_file, summary_csv):
+    """tally up the error dictionary, write the summary csv and error file, and call write_diff_files with the
+    time key and the fields that had diffs so the absolute and relative diffs get written out.
+    returns the math_diff result tuple"""
     num_small = sum(err_dict[key]['count_of_small_abs_rel_diff'] for key in horder)
     num_big = sum(err_dict[key]['count_of_big_abs_rel_diff'] for key in horder)
 
@@ -356,8 +619,6 @@ def math_diff(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file,
     elif num_small > 0:
         diff_type = 'Small Diffs'
 
-    num_records = len(tdict[tkey])
-
     input_file_path_tokens = inputfile1.split(os.sep)
 
     # if it's the first pass, create the file with the header;
@@ -394,13 +655,8 @@ def math_diff(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file,
     abs_diff_of_max_max_rel_diff = err_dict[key_of_max_max_rel_diff]['abs_diff_of_max_rel_diff']
     time_of_max_max_rel_diff = err_dict[key_of_max_max_rel_diff]['time_of_max_rel_diff']
 
-    # put the time column back
-    abs_diffs[tkey] = tdict[tkey]
-    rel_diffs[tkey] = tdict[tkey]
-
     # Summarize the input files
-    summary_dict1 = make_summary_dict(tdict, hdict1)
-    summary_dict2 = make_summary_dict(tdict, hdict2)
+    summary_dict1, summary_dict2 = summarize()
 
     # Flatten summaries out to dictionaries of lists rather than dictionaries of dictionaries
     summary_dict12 = dict_of_dicts2dict_of_lists(summary_dict1, horder, list(summary_labels))
@@ -420,12 +676,8 @@ def math_diff(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file,
     thorder = [tkey] + horder
     tdhorder = [tkey] + dhorder
 
-    # Convert the absolute and relative diff dictionaries to matrices and write them to files
-    abs_diff_mat = hdict2matrix(tdhorder, abs_diffs)
-    # print("Trying to write to %s " % abs_diff_file)
-    mycsv.writecsv(abs_diff_mat, abs_diff_file)
-    rel_diff_mat = hdict2matrix(tdhorder, rel_diffs)
-    mycsv.writecsv(rel_diff_mat, rel_diff_file)
+    # Write the absolute and relative diffs of the columns that had diffs out to their files
+    write_diff_files(tdhorder)
 
     # Write the error file header
     mycsv.writecsv(
@@ -481,6 +733,366 @@ def math_diff(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file,
     return diff_type, num_records, num_big, num_small
 
 
+class SummaryAccumulator:
+    """running equivalent of one column of make_summary_dict, fed one cell at a time"""
+
+    def __init__(self):
+        self.column_error = False
+        self.count = 0
+        self.sum = 0  # the running total is the same as sum() on the whole column
+        self.max = None
+        self.time_of_max = None
+        self.min = None
+        self.time_of_min = None
+        self.nz_count = 0
+        self.nz_max = None
+        self.nz_time_of_max = None
+        self.nz_min = None
+        self.nz_time_of_min = None
+
+    def add(self, cell, time):
+        if self.column_error:
+            return
+        cell = str(cell)
+        if cell.strip() == '':
+            value = 0
+        else:
+            try:
+                value = float(cell)
+            except ValueError:
+                self.column_error = True  # Now we can't do any summary calcs for this column
+                return
+        # max() and min() keep the first of equal values, which is also the one list.index() finds for the times
+        if self.count == 0 or value > self.max:
+            self.max = value
+            self.time_of_max = time
+        if self.count == 0 or value < self.min:
+            self.min = value
+            self.time_of_min = time
+        self.sum = self.sum + value
+        self.count += 1
+        if value != 0:
+            if self.nz_count == 0 or value > self.nz_max:
+                self.nz_max = value
+                self.nz_time_of_max = time
+            if self.nz_count == 0 or value < self.nz_min:
+                self.nz_min = value
+                self.nz_time_of_min = time
+            self.nz_count += 1
+
+    def summary(self):
+        if self.column_error:
+            return {}
+        summary = {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'min': self.min,
+            'average': self.sum / self.count,
+            'time_of_max': self.time_of_max,
+            'time_of_min': self.time_of_min,
+        }
+        if self.nz_count == 0:
+            summary['nz_count'] = 0
+            summary['nz_sum'] = 0.0
+            summary['nz_max'] = 0.0
+            summary['nz_min'] = 0.0
+            summary['nz_average'] = 0.0
+            summary['nz_time_of_max'] = 0.0
+            summary['nz_time_of_min'] = 0.0
+        else:
+            summary['nz_count'] = self.nz_count
+            summary['nz_sum'] = self.nz_max
+            summary['nz_max'] = self.nz_max
+            summary['nz_min'] = self.nz_min
+            summary['nz_average'] = self.nz_max / self.nz_count
+            summary['nz_time_of_max'] = self.nz_time_of_max
+            summary['nz_time_of_min'] = self.nz_time_of_min
+        return summary
+
+
+class DiffAccumulator:
+    """running equivalent of one field of the error dictionary built in python_column_diffs"""
+
+    def __init__(self, abs_thresh, rel_thresh):
+        self.abs_thresh = abs_thresh
+        self.rel_thresh = rel_thresh
+        self.count = 0
+        self.max_abs_diff = None
+        self.rel_diff_of_max_abs_diff = None
+        self.time_of_max_abs_diff = None
+        self.max_rel_diff = None
+        self.abs_diff_of_max_rel_diff = None
+        self.time_of_max_rel_diff = None
+        self.count_of_small_abs_diff = 0
+        self.count_of_big_abs_diff = 0
+        self.count_of_small_rel_diff = 0
+        self.count_of_big_rel_diff = 0
+        self.count_of_small_abs_rel_diff = 0
+        self.count_of_big_abs_rel_diff = 0
+
+    def add(self, x, y, time):
+        this_abs_diff = abs_diff(x, y)
+        this_rel_diff = rel_diff(x, y)
+        if self.count == 0 or this_abs_diff > self.max_abs_diff:
+            self.max_abs_diff = this_abs_diff
+            self.rel_diff_of_max_abs_diff = this_rel_diff
+            self.time_of_max_abs_diff = time
+        if self.count == 0 or this_rel_diff > self.max_rel_diff:
+            self.max_rel_diff = this_rel_diff
+            self.abs_diff_of_max_rel_diff = this_abs_diff
+            self.time_of_max_rel_diff = time
+        self.count += 1
+        if 0.0 < this_abs_diff <= self.abs_thresh:
+            self.count_of_small_abs_diff += 1
+        if this_abs_diff > self.abs_thresh:
+            self.count_of_big_abs_diff += 1
+        if self.rel_thresh > 0:
+            if 0.0 < this_rel_diff <= self.rel_thresh:
+                self.count_of_small_rel_diff += 1
+            if this_rel_diff > self.rel_thresh:
+                self.count_of_big_rel_diff += 1
+            if 0 < this_abs_diff <= self.abs_thresh or 0 < this_rel_diff <= self.rel_thresh:
+                self.count_of_small_abs_rel_diff += 1
+            if this_abs_diff > self.abs_thresh and this_rel_diff > self.rel_thresh:
+                self.count_of_big_abs_rel_diff += 1
+        else:
+            self.count_of_small_abs_rel_diff = self.count_of_small_abs_diff
+            self.count_of_big_abs_rel_diff = self.count_of_big_abs_diff
+
+    def errors(self):
+        return {
+            'abs_thresh': self.abs_thresh,
+            'max_abs_diff': self.max_abs_diff,
+            'rel_diff_of_max_abs_diff': self.rel_diff_of_max_abs_diff,
+            'time_of_max_abs_diff': self.time_of_max_abs_diff,
+            'count_of_small_abs_diff': self.count_of_small_abs_diff,
+            'count_of_big_abs_diff': self.count_of_big_abs_diff,
+            'rel_thresh': self.rel_thresh,
+            'max_rel_diff': self.max_rel_diff,
+            'abs_diff_of_max_rel_diff': self.abs_diff_of_max_rel_diff,
+            'time_of_max_rel_diff': self.time_of_max_rel_diff,
+            'count_of_small_rel_diff': self.count_of_small_rel_diff,
+            'count_of_big_rel_diff': self.count_of_big_rel_diff,
+            'count_of_small_abs_rel_diff': self.count_of_small_abs_rel_diff,
+            'count_of_big_abs_rel_diff': self.count_of_big_abs_rel_diff,
+        }
+
+
+def fill_row(row, numcols):
+    """the single row version of fill_matrix_holes"""
+    morecells = numcols - len(row)
+    if morecells >= 0:
+        return row + [''] * morecells
+    return row[:morecells]
+
+
+def math_diff_streaming(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file, err_file, summary_csv):
+    """same results as math_diff, but the inputs are read a row at a time, so memory depends on the number of
+    columns and not the number of rows.  The first pass over the inputs accumulates the error and summary statistics,
+    and a second pass writes the absolute and relative diff files, only if there were diffs.
+    Inputs that are missing, empty, or have no data are handed to the in-memory path, which reports on them."""
+    if not os.path.exists(inputfile1) or not os.path.exists(inputfile2):
+        return math_diff(
+            thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file, err_file, summary_csv,
+            engine=MathDiffEngine.PYTHON
+        )
+
+    with open(inputfile1) as f1, open(inputfile2) as f2:
+        reader1 = csv.reader(f1)
+        reader2 = csv.reader(f2)
+        header1 = next(reader1, [])
+        header2 = next(reader2, [])
+        first_row1 = next(reader1, None)
+        first_row2 = next(reader2, None)
+        has_data = len(header1) > 1 and len(header2) > 1 and first_row1 is not None and first_row2 is not None
+
+        if has_data:
+            # Only going to compare fields that are found in both files
+            hset1 = set(header1[1:])
+            hset2 = set(header2[1:])
+            hset = hset1.intersection(hset2)
+
+            # Order will be order in which intersection fields appear in first file
+            horder = [h for h in header1[1:] if h in hset]
+            index1 = dict((h, i) for i, h in enumerate(header1))
+            index2 = dict((h, i) for i, h in enumerate(header2))
+            tkey = header1[0]
+
+            accumulators = []
+            for key, (abs_thresh, rel_thresh) in zip(horder, thresh_dict.lookup_all(horder)):
+                accumulators.append(
+                    (index1[key], index2[key], DiffAccumulator(abs_thresh, rel_thresh), SummaryAccumulator(),
+                     SummaryAccumulator())
+                )
+
+            # Not going to compare two files with different time series
+            times_match = header1[0] == header2[0]
+            num_records = 0
+            row1 = first_row1
+            row2 = first_row2
+            while times_match and row1 is not None:
+                if row2 is None:
+                    times_match = False
+                    break
+                row1 = fill_row(row1, len(header1))
+                row2 = fill_row(row2, len(header2))
+                time = row1[0]
+                if time != row2[0]:
+                    times_match = False
+                    break
+                num_records += 1
+                for i1, i2, diff_accumulator, summary_accumulator1, summary_accumulator2 in accumulators:
+                    diff_accumulator.add(row1[i1], row2[i2], time)
+                    summary_accumulator1.add(row1[i1], time)
+                    summary_accumulator2.add(row2[i2], time)
+                row1 = next(reader1, None)
+                row2 = next(reader2, None)
+            if times_match and row2 is not None:
+                times_match = False
+
+    if not has_data:
+        return math_diff(
+            thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file, err_file, summary_csv,
+            engine=MathDiffEngine.PYTHON
+        )
+
+    if not times_match:
+        info('Time series in <%s> and <%s> do not match' % (inputfile1, inputfile2), err_file)
+        return 'Time series do not match', 0, 0, 0
+
+    if len(hset) == 0:
+        info('Input files <%s> and <%s> have no common fields' % (inputfile1, inputfile2), err_file)
+        return 'No common fields', 0, 0, 0
+
+    # Warn about fields that will not be compared
+    warn_about_uncompared_fields(hset1, hset2, inputfile1, inputfile2, err_file)
+
+    for header in [header1[1:], header2[1:]]:
+        seen = set()
+        for h in header:
+            if h in seen:
+                raise DuplicateHeaderException("There are two columns with the same header name " + str(h))
+            seen.add(h)
+
+    err_dict = {}
+    for key, this_accumulators in zip(horder, accumulators):
+        err_dict[key] = this_accumulators[2].errors()
+
+    def summarize():
+        summary_dict1 = {}
+        summary_dict2 = {}
+        for this_key, this_accumulators in zip(horder, accumulators):
+            summary_dict1[this_key] = this_accumulators[3].summary()
+            summary_dict2[this_key] = this_accumulators[4].summary()
+        return summary_dict1, summary_dict2
+
+    def write_diff_files(tdhorder):
+        columns = [(index1[h], index2[h]) for h in tdhorder[1:]]
+        with open(inputfile1) as in1, open(inputfile2) as in2:
+            with open(abs_diff_file, 'w') as abs_out, open(rel_diff_file, 'w') as rel_out:
+                in_reader1 = csv.reader(in1)
+                in_reader2 = csv.reader(in2)
+                abs_writer = csv.writer(abs_out)
+                rel_writer = csv.writer(rel_out)
+                next(in_reader1)
+                next(in_reader2)
+                abs_writer.writerow(tdhorder)
+                rel_writer.writerow(tdhorder)
+                for in_row1, in_row2 in zip(in_reader1, in_reader2):
+                    in_row1 = fill_row(in_row1, len(header1))
+                    in_row2 = fill_row(in_row2, len(header2))
+                    abs_writer.writerow([in_row1[0]] + [abs_diff(in_row1[i1], in_row2[i2]) for i1, i2 in columns])
+                    rel_writer.writerow([in_row1[0]] + [rel_diff(in_row1[i1], in_row2[i2]) for i1, i2 in columns])
+
+    return report_math_diff(
+        err_dict, summarize, write_diff_files, horder, tkey, num_records, inputfile1, inputfile2, err_file, summary_csv
+    )
+
+
+def math_diff(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file, err_file, summary_csv,
+              engine=MathDiffEngine.PYTHON):
+    if engine == MathDiffEngine.STREAMING:
+        return math_diff_streaming(
+            thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file, err_file, summary_csv
+        )
+    if engine == MathDiffEngine.NUMPY and numpy is not None:
+        result = math_diff_arrays(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file, err_file,
+                                  summary_csv)
+        if result is not None:
+            return result
+
+    # Test for existence of input files
+    if not os.path.exists(inputfile1):
+        info('unable to open file <%s>' % inputfile1, err_file)
+        return 'unable to open file <%s>' % inputfile1, 0, 0, 0
+    if not os.path.exists(inputfile2):
+        info('unable to open file <%s>' % inputfile2, err_file)
+        return 'unable to open file <%s>' % inputfile2, 0, 0, 0
+
+    # read data out of files
+    try:
+        mat1 = mycsv.getlist(inputfile1)
+    except IndexError:
+        return 'malformed or empty csv file: <%s>' % inputfile1, 0, 0, 0
+    if len(mat1) < 2:
+        info('<%s> has no data' % inputfile1, err_file)
+        return '<%s> has no data' % inputfile1, 0, 0, 0
+    try:
+        mat2 = mycsv.getlist(inputfile2)
+    except IndexError:
+        return 'malformed or empty csv file: <%s>' % inputfile2, 0, 0, 0
+    if len(mat2) < 2:
+        info('<%s> has no data' % inputfile2, err_file)
+        return '<%s> has no data' % inputfile2, 0, 0, 0
+
+    # clean up the files
+    matrix1 = fill_matrix_holes(mat1)
+    matrix2 = fill_matrix_holes(mat2)
+
+    # split out the time columns
+    time1, mat1 = slicetime(matrix1)
+    time2, mat2 = slicetime(matrix2)
+    # Not going to compare two files with different time series
+    if time1 != time2:
+        info('Time series in <%s> and <%s> do not match' % (inputfile1, inputfile2), err_file)
+        return 'Time series do not match', 0, 0, 0
+
+    # Only going to compare fields that are found in both files
+    hset1 = set(mat1[0])
+    hset2 = set(mat2[0])
+    hset = hset1.intersection(hset2)
+    if len(hset) == 0:
+        info('Input files <%s> and <%s> have no common fields' % (inputfile1, inputfile2), err_file)
+        return 'No common fields', 0, 0, 0
+
+    # Order will be order in which intersection fields appear in first file
+    horder = [h for h in mat1[0] if h in hset]
+
+    # Warn about fields that will not be compared
+    warn_about_uncompared_fields(hset1, hset2, inputfile1, inputfile2, err_file)
+
+    # convert time matrix to dictionary (both time matrices should be identical here)
+    tdict = matrix2hdict(time1)
+    tkey = list(tdict.keys())[0]
+
+    # Compute the column-wise differences with the requested engine; the numpy engine gets here for inputs with blank
+    # or text cells, and hands back None when the data holds something it can't reproduce exactly, in which case the
+    # pure-Python engine does the work
+    column_diffs = None
+    if engine == MathDiffEngine.NUMPY and numpy is not None:
+        column_diffs = numpy_column_diffs(thresh_dict, mat1, mat2, horder, tdict)
+    if column_diffs is None:
+        column_diffs = python_column_diffs(thresh_dict, mat1, mat2, horder, tdict)
+    abs_diffs, rel_diffs, err_dict, summarize = column_diffs
+
+    num_records = len(tdict[tkey])
+    write_diff_files = diff_file_writer(abs_diffs, rel_diffs, tkey, tdict[tkey], abs_diff_file, rel_diff_file)
+    return report_math_diff(
+        err_dict, summarize, write_diff_files, horder, tkey, num_records, inputfile1, inputfile2, err_file, summary_csv
+    )
+
+
 def main(argv=None):  # pragma: no cover
     if argv is None:
         argv = sys.argv
@@ -0,0 +1,562 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Compares the eplusout.sql files that Output:SQLite writes, with SQLite doing the work instead of first reading the csv
+or html outputs.
+
+Both files are attached to one in-memory connection, and the ReportData, TabularData and Errors tables are matched
+up with joins and set operations on indexed temporary tables.  Only the values that actually differ come back into
+python, so the usual case of a mostly equal file costs a few queries.  The thresholds and diff categories are the ones
+math_diff and table_diff use, so the results fill the same MathDifferences, TableDifferences and TextDifferences
+structures as the csv, html and text diffs.
+"""
+
+import os
+import sqlite3
+
+from epregressions.diffs import mycsv
+from epregressions.diffs.math_diff import (
+    DuplicateHeaderException,
+    abs_diff,
+    error_labels,
+    info,
+    rel_diff,
+    report_math_diff,
+    warn_about_uncompared_fields,
+)
+from epregressions.diffs.table_diff import thresh_abs_rel_diff
+from epregressions.structures import TextDifferences
+
+month_names = [
+    'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November',
+    'December'
+]
+
+# the IntervalType of the Time table
+DAILY_INTERVAL = 2
+MONTHLY_INTERVAL = 3
+RUN_PERIOD_INTERVAL = 4
+
+# variables and meters are named the way ReadVarsESO names its csv columns, so the threshold lookups match
+SERIES_HEADER = (
+    "CASE WHEN IFNULL(d.KeyValue, '') = '' THEN d.Name ELSE d.KeyValue || ':' || d.Name END"
+    " || ' [' || IFNULL(d.Units, '') || '](' || d.ReportingFrequency || ')'"
+)
+
+# identifies the same point in time in both files, independent of the row numbers in the Time tables
+TIME_STAMP = " || '|' || ".join(
+    'IFNULL(t.%s, 0)' % column for column in [
+        'EnvironmentPeriodIndex', 'IntervalType', 'SimulationDays', 'Month', 'Day', 'Hour', 'Minute'
+    ]
+)
+
+# the absolute and relative differences of math_diff's abs_diff and rel_diff
+ABS_DIFF = 'ABS({x} - {y})'
+REL_DIFF = 'CASE WHEN {x} = {y} THEN 0 WHEN ABS({x}) > 0 THEN ABS(({x} - {y}) / {x}) ELSE 999 END'
+
+# when the rows of both ReportData tables are the same fields at the same times, they are paired up by row number
+ALIGNED_VIEWS = """
+CREATE TEMP VIEW values_a AS SELECT f.field AS field, s.stamp AS stamp, r.Value AS value FROM a.ReportData r
+    JOIN field_of_a f ON f.id = r.ReportDataDictionaryIndex JOIN stamp_of_a s ON s.id = r.TimeIndex;
+CREATE TEMP VIEW values_b AS SELECT f.field AS field, s.stamp AS stamp, r.Value AS value FROM b.ReportData r
+    JOIN field_of_b f ON f.id = r.ReportDataDictionaryIndex JOIN stamp_of_b s ON s.id = r.TimeIndex;
+CREATE TEMP VIEW pairs AS SELECT f.field AS field, s.stamp AS stamp, ra.Value AS x, rb.Value AS y,
+    {abs_diff} AS abs_diff, {rel_diff} AS rel_diff
+FROM a.ReportData ra JOIN b.ReportData rb ON rb.ReportDataIndex = ra.ReportDataIndex
+    JOIN field_of_a f ON f.id = ra.ReportDataDictionaryIndex JOIN stamp_of_a s ON s.id = ra.TimeIndex;
+""".format(abs_diff=ABS_DIFF.format(x='ra.Value', y='rb.Value'), rel_diff=REL_DIFF.format(x='ra.Value', y='rb.Value'))
+
+# otherwise the values of each file are indexed by field and time stamp, and paired up with the index
+INDEXED_VALUES = """
+CREATE TEMP TABLE values_{db} (field INTEGER, stamp INTEGER, value REAL, PRIMARY KEY (field, stamp)) WITHOUT ROWID;
+INSERT INTO values_{db} SELECT f.field, s.stamp, r.Value FROM {db}.ReportData r
+    JOIN field_of_{db} f ON f.id = r.ReportDataDictionaryIndex JOIN stamp_of_{db} s ON s.id = r.TimeIndex;
+"""
+INDEXED_PAIRS = """
+CREATE TEMP VIEW pairs AS SELECT a.field AS field, a.stamp AS stamp, a.value AS x, b.value AS y,
+    {abs_diff} AS abs_diff, {rel_diff} AS rel_diff
+FROM values_a a JOIN values_b b ON b.field = a.field AND b.stamp = a.stamp
+""".format(abs_diff=ABS_DIFF.format(x='a.value', y='b.value'), rel_diff=REL_DIFF.format(x='a.value', y='b.value'))
+
+# the counts of math_diff's error dictionary for the fields with diffs, where a relative threshold of zero means the
+# relative differences aren't counted.  Equal values don't add to any of them.
+ERROR_COUNTS = """
+SELECT p.field,
+    SUM(p.abs_diff > 0 AND p.abs_diff <= f.abs_thresh),
+    SUM(p.abs_diff > f.abs_thresh),
+    SUM(f.rel_thresh > 0 AND p.rel_diff > 0 AND p.rel_diff <= f.rel_thresh),
+    SUM(f.rel_thresh > 0 AND p.rel_diff > f.rel_thresh),
+    SUM(CASE WHEN f.rel_thresh > 0
+        THEN (p.abs_diff > 0 AND p.abs_diff <= f.abs_thresh) OR (p.rel_diff > 0 AND p.rel_diff <= f.rel_thresh)
+        ELSE p.abs_diff > 0 AND p.abs_diff <= f.abs_thresh END),
+    SUM(CASE WHEN f.rel_thresh > 0
+        THEN p.abs_diff > f.abs_thresh AND p.rel_diff > f.rel_thresh
+        ELSE p.abs_diff > f.abs_thresh END)
+FROM pairs p JOIN fields f ON f.id = p.field
+WHERE p.x != p.y AND p.field IN ({fields})
+GROUP BY p.field
+"""
+
+# make_summary_dict for each field, with the times as the first stamps where the extremes are found.  Like
+# make_summary_dict, the nonzero sum is the nonzero maximum.
+summary_columns = [
+    'count', 'sum', 'max', 'min', 'nz_count', 'nz_sum', 'nz_max', 'nz_min',
+    'time_of_max', 'time_of_min', 'nz_time_of_max', 'nz_time_of_min'
+]
+SUMMARIES = """
+DROP TABLE IF EXISTS extremes;
+CREATE TEMP TABLE extremes (field INTEGER PRIMARY KEY, count INTEGER, sum REAL, max REAL, min REAL, nz_count INTEGER,
+    nz_max REAL, nz_min REAL);
+INSERT INTO extremes SELECT field, COUNT(*), SUM(value), MAX(value), MIN(value), SUM(value != 0),
+    MAX(NULLIF(value, 0)), MIN(NULLIF(value, 0))
+FROM values_{db} WHERE field IN ({fields}) GROUP BY field;
+"""
+SUMMARY_TIMES = """
+SELECT e.field, e.count, e.sum, e.max, e.min, e.nz_count, IFNULL(e.nz_max, 0.0), IFNULL(e.nz_max, 0.0),
+    IFNULL(e.nz_min, 0.0),
+    MIN(CASE WHEN v.value = e.max THEN v.stamp END), MIN(CASE WHEN v.value = e.min THEN v.stamp END),
+    MIN(CASE WHEN v.value = e.nz_max THEN v.stamp END), MIN(CASE WHEN v.value = e.nz_min THEN v.stamp END)
+FROM values_{db} v JOIN extremes e ON e.field = v.field
+GROUP BY e.field
+"""
+
+# a table is its report, the object it is reported for, and its name; cells are found by row number and column
+TABULAR_CELLS = """
+CREATE TEMP TABLE cells_{db} AS SELECT
+    report.Value AS report, report_for.Value AS report_for, table_name.Value AS table_name, td.RowId AS row_id,
+    row_name.Value AS row_name,
+    column_name.Value || CASE WHEN IFNULL(units.Value, '') = '' THEN '' ELSE ' [' || units.Value || ']' END
+        AS column_header,
+    TRIM(td.Value) AS value
+FROM {db}.TabularData td
+    JOIN {db}.Strings report ON report.StringIndex = td.ReportNameIndex
+    JOIN {db}.Strings report_for ON report_for.StringIndex = td.ReportForStringIndex
+    JOIN {db}.Strings table_name ON table_name.StringIndex = td.TableNameIndex
+    JOIN {db}.Strings row_name ON row_name.StringIndex = td.RowNameIndex
+    JOIN {db}.Strings column_name ON column_name.StringIndex = td.ColumnNameIndex
+    LEFT JOIN {db}.Strings units ON units.StringIndex = td.UnitsIndex
+"""
+
+TABLE_KEY = 'report, report_for, table_name'
+
+
+class SqlComparison:
+    """Both builds' eplusout.sql files, attached to one connection as the a and b schemas"""
+
+    def __init__(self, inputfile1, inputfile2):
+        # attaching a file that isn't there would create an empty database in its place
+        for input_file in [inputfile1, inputfile2]:
+            if not os.path.exists(input_file):
+                raise IOError('unable to open file <%s>' % input_file)
+        self.inputfile1 = inputfile1
+        self.inputfile2 = inputfile2
+        self.connection = sqlite3.connect(':memory:')
+        # a file that isn't a database is reported by each of the diffs, like the other malformed files are
+        self.malformed_file = None
+        for db, input_file in [('a', inputfile1), ('b', inputfile2)]:
+            try:
+                self.connection.execute('ATTACH DATABASE ? AS %s' % db, (input_file,))
+            except sqlite3.DatabaseError:
+                self.malformed_file = input_file
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def query(self, sql, parameters=()):
+        return self.connection.execute(sql, parameters).fetchall()
+
+    def count(self, sql, parameters=()):
+        return self.query('SELECT COUNT(*) FROM (%s)' % sql, parameters)[0][0]
+
+    def file_name(self, db):
+        return self.inputfile1 if db == 'a' else self.inputfile2
+
+    def read_report_data_dictionary(self, db):
+        """Number the fields and time stamps of one file in tables shared by both files.
+
+        Everything is numbered in the order of the first file, so the values of the two files are matched up on a pair
+        of integers, and sorting on those puts them in the first file's order."""
+        if db == 'a':
+            self.connection.executescript("""
+                CREATE TEMP TABLE fields (id INTEGER PRIMARY KEY, header TEXT UNIQUE, abs_thresh REAL, rel_thresh REAL);
+                CREATE TEMP TABLE stamps (id INTEGER PRIMARY KEY, stamp TEXT UNIQUE, interval_type INTEGER,
+                    year INTEGER, month INTEGER, day INTEGER, hour INTEGER, minute INTEGER);
+            """)
+        self.connection.execute(
+            'CREATE TEMP TABLE series_%s AS SELECT d.ReportDataDictionaryIndex AS id, %s AS header '
+            'FROM %s.ReportDataDictionary d' % (db, SERIES_HEADER, db)
+        )
+        duplicates = self.query('SELECT header FROM series_%s GROUP BY header HAVING COUNT(*) > 1' % db)
+        if duplicates:
+            raise DuplicateHeaderException("There are two columns with the same header name " + duplicates[0][0])
+        self.connection.executescript("""
+            INSERT OR IGNORE INTO fields (header) SELECT header FROM series_{db} ORDER BY id;
+            CREATE TEMP TABLE field_of_{db} (id INTEGER PRIMARY KEY, field INTEGER);
+            INSERT INTO field_of_{db} SELECT s.id, f.id FROM series_{db} s JOIN fields f ON f.header = s.header;
+            INSERT OR IGNORE INTO stamps (stamp, interval_type, year, month, day, hour, minute)
+                SELECT {stamp}, t.IntervalType, t.Year, t.Month, t.Day, t.Hour, t.Minute FROM {db}.Time t
+                ORDER BY t.TimeIndex;
+            CREATE TEMP TABLE stamp_of_{db} (id INTEGER PRIMARY KEY, stamp INTEGER);
+            INSERT INTO stamp_of_{db} SELECT t.TimeIndex, s.id FROM {db}.Time t JOIN stamps s ON s.stamp = {stamp};
+        """.format(db=db, stamp=TIME_STAMP))
+
+    def aligned(self):
+        """Whether the ReportData rows of the two files are the same fields at the same times, row for row, which is
+        the usual case unless the change adds or removes outputs"""
+        for mapping in ['field_of', 'stamp_of']:
+            if self.count('SELECT * FROM %s_a EXCEPT SELECT * FROM %s_b' % (mapping, mapping)) or self.count(
+                    'SELECT * FROM %s_b EXCEPT SELECT * FROM %s_a' % (mapping, mapping)):
+                return False
+        rows = self.query('SELECT (SELECT COUNT(*) FROM a.ReportData), (SELECT COUNT(*) FROM b.ReportData)')[0]
+        if rows[0] != rows[1]:
+            return False
+        paired, mismatched = self.query(
+            'SELECT COUNT(*), SUM(ra.TimeIndex != rb.TimeIndex OR '
+            'ra.ReportDataDictionaryIndex != rb.ReportDataDictionaryIndex) '
+            'FROM a.ReportData ra JOIN b.ReportData rb ON rb.ReportDataIndex = ra.ReportDataIndex'
+        )[0]
+        return paired == rows[0] and not mismatched
+
+    def read_report_data(self):
+        """Set up the values_a, values_b and pairs views of the ReportData values, by field and time stamp, returning
+        whether every value of each file has a match in the other"""
+        for db in ['a', 'b']:
+            self.read_report_data_dictionary(db)
+        if self.aligned():
+            self.connection.executescript(ALIGNED_VIEWS)
+            return True
+        for db in ['a', 'b']:
+            self.connection.executescript(INDEXED_VALUES.format(db=db))
+        self.connection.execute(INDEXED_PAIRS)
+        return False
+
+    def report_data_diff(self, thresh_dict, abs_diff_file, rel_diff_file, err_file, summary_csv):
+        """math_diff for the ReportData of the two files, returning (diff type, records, big diffs, small diffs)"""
+        inputfile1, inputfile2 = self.inputfile1, self.inputfile2
+        if self.malformed_file:
+            info('malformed sql file: <%s>' % self.malformed_file, err_file)
+            return 'malformed sql file: <%s>' % self.malformed_file, 0, 0, 0
+        try:
+            aligned = self.read_report_data()
+        except sqlite3.DatabaseError:
+            info('malformed sql file: <%s> or <%s>' % (inputfile1, inputfile2), err_file)
+            return 'malformed sql file: <%s> or <%s>' % (inputfile1, inputfile2), 0, 0, 0
+
+        reported = {}
+        for db in ['a', 'b']:
+            if aligned and db == 'b':
+                # the same rows at the same times
+                reported[db] = reported['a']
+            else:
+                reported[db] = set(row[0] for row in self.query('SELECT DISTINCT stamp FROM values_%s' % db))
+            if not reported[db]:
+                info('<%s> has no data' % self.file_name(db), err_file)
+                return '<%s> has no data' % self.file_name(db), 0, 0, 0
+
+        # Not going to compare two files with different time series
+        if reported['a'] != reported['b']:
+            info('Time series in <%s> and <%s> do not match' % (inputfile1, inputfile2), err_file)
+            return 'Time series do not match', 0, 0, 0
+
+        # Only going to compare fields that are found in both files, in the order they appear in the first one
+        hset1 = set(row[0] for row in self.query('SELECT header FROM series_a'))
+        hset2 = set(row[0] for row in self.query('SELECT header FROM series_b'))
+        headers = list(hset1.intersection(hset2))
+        if len(headers) == 0:
+            info('Input files <%s> and <%s> have no common fields' % (inputfile1, inputfile2), err_file)
+            return 'No common fields', 0, 0, 0
+        self.connection.executemany(
+            'UPDATE fields SET abs_thresh = ?, rel_thresh = ? WHERE header = ?',
+            [tuple(thresholds) + (h,) for h, thresholds in zip(headers, thresh_dict.lookup_all(headers))]
+        )
+        fields = self.query('SELECT id, header FROM fields WHERE abs_thresh IS NOT NULL ORDER BY id')
+        field_of_header = dict((header, field) for field, header in fields)
+        fields_by_id = dict(fields)
+        if not aligned:
+            # every value of a common field must have a match at the same time in the other file
+            counts = []
+            for table in ['values_a', 'values_b', 'pairs']:
+                counts.append(self.query(
+                    'SELECT field, COUNT(*) FROM %s '
+                    'WHERE field IN (SELECT id FROM fields WHERE abs_thresh IS NOT NULL) GROUP BY field' % table
+                ))
+            if counts[0] != counts[2] or counts[1] != counts[2]:
+                info('Time series in <%s> and <%s> do not match' % (inputfile1, inputfile2), err_file)
+                return 'Time series do not match', 0, 0, 0
+
+        # Warn about fields that will not be compared
+        warn_about_uncompared_fields(hset1, hset2, inputfile1, inputfile2, err_file)
+
+        records = [
+            (row[0], time_label(*row[1:])) for row in self.query(
+                'SELECT id, interval_type, year, month, day, hour, minute FROM stamps ORDER BY id'
+            ) if row[0] in reported['a']
+        ]
+        times = dict(records)
+
+        # most fields are equal, and only the ones that aren't need their differences counted up
+        different = [row[0] for row in self.query('SELECT DISTINCT field FROM pairs WHERE x != y')]
+        if not different:
+            horder = [header for _, header in fields]
+            err_dict = dict((key, dict((label, 0) for label in error_labels)) for key in horder)
+            return report_math_diff(
+                err_dict, None, None, horder, 'Date/Time', len(records), inputfile1, inputfile2, err_file, summary_csv
+            )
+        different_fields = ', '.join(str(field) for field in different)
+        counts = dict((row[0], row[1:]) for row in self.query(ERROR_COUNTS.format(fields=different_fields)))
+        # the largest differences, and the time of one of them
+        largest_abs = dict((row[0], row[1:]) for row in self.query(
+            'SELECT field, MAX(abs_diff), rel_diff, stamp FROM pairs WHERE x != y AND field IN (%s) '
+            'GROUP BY field' % different_fields
+        ))
+        largest_rel = dict((row[0], row[1:]) for row in self.query(
+            'SELECT field, MAX(rel_diff), abs_diff, stamp FROM pairs WHERE x != y AND field IN (%s) '
+            'GROUP BY field' % different_fields
+        ))
+        # variables that are defined but never reported have nothing to compare
+        first_stamps = dict(self.query(
+            'SELECT field, MIN(stamp) FROM values_a WHERE field IN (%s) GROUP BY field' % ', '.join(
+                str(field) for field, _ in fields
+            )
+        ))
+        horder = [header for field, header in fields if field in first_stamps]
+
+        err_dict = {}
+        for key in horder:
+            field = field_of_header[key]
+            (abs_thresh, rel_thresh) = thresh_dict.lookup(key)
+            small_abs, big_abs, small_rel, big_rel, small_abs_rel, big_abs_rel = counts.get(field, [0] * 6)
+            max_abs, rel_of_max_abs, time_of_max_abs = largest_abs.get(field, (0, 0, first_stamps[field]))
+            max_rel, abs_of_max_rel, time_of_max_rel = largest_rel.get(field, (0, 0, first_stamps[field]))
+            err_dict[key] = {
+                'abs_thresh': abs_thresh,
+                'max_abs_diff': max_abs,
+                'rel_diff_of_max_abs_diff': rel_of_max_abs,
+                'time_of_max_abs_diff': times[time_of_max_abs],
+                'count_of_small_abs_diff': small_abs,
+                'count_of_big_abs_diff': big_abs,
+                'rel_thresh': rel_thresh,
+                'max_rel_diff': max_rel,
+                'abs_diff_of_max_rel_diff': abs_of_max_rel,
+                'time_of_max_rel_diff': times[time_of_max_rel],
+                'count_of_small_rel_diff': small_rel,
+                'count_of_big_rel_diff': big_rel,
+                'count_of_small_abs_rel_diff': small_abs_rel,
+                'count_of_big_abs_rel_diff': big_abs_rel,
+            }
+
+        def summarize():
+            summary_dicts = []
+            for db in ['a', 'b']:
+                summary_dict = {}
+                self.connection.executescript(SUMMARIES.format(db=db, fields=', '.join(
+                    str(field_of_header[key]) for key in horder)))
+                for row in self.query(SUMMARY_TIMES.format(db=db)):
+                    summary = dict(zip(summary_columns, row[1:]))
+                    summary['average'] = summary['sum'] / summary['count']
+                    summary['nz_average'] = summary['nz_sum'] / summary['nz_count'] if summary['nz_count'] else 0.0
+                    for label in ['time_of_max', 'time_of_min', 'nz_time_of_max', 'nz_time_of_min']:
+                        summary[label] = times[summary[label]] if summary[label] is not None else 0.0
+                    summary_dict[fields_by_id[row[0]]] = summary
+                summary_dicts.append(summary_dict)
+            return summary_dicts[0], summary_dicts[1]
+
+        def write_diff_files(tdhorder):
+            # one row per record, with blanks for the variables that aren't reported at that time
+            row_of_stamp = dict((stamp, i) for i, (stamp, _) in enumerate(records))
+            column_of_field = dict((field_of_header[key], i + 1) for i, key in enumerate(tdhorder[1:]))
+            abs_rows = [[time] + [''] * (len(tdhorder) - 1) for _, time in records]
+            rel_rows = [[time] + [''] * (len(tdhorder) - 1) for _, time in records]
+            for field, stamp, x, y in self.query('SELECT field, stamp, x, y FROM pairs WHERE field IN (%s)' % ', '.join(
+                    str(field) for field in column_of_field)):
+                abs_rows[row_of_stamp[stamp]][column_of_field[field]] = abs_diff(x, y)
+                rel_rows[row_of_stamp[stamp]][column_of_field[field]] = rel_diff(x, y)
+            mycsv.writecsv([tdhorder] + abs_rows, abs_diff_file)
+            mycsv.writecsv([tdhorder] + rel_rows, rel_diff_file)
+
+        return report_math_diff(
+            err_dict, summarize, write_diff_files, horder, 'Date/Time', len(records), inputfile1, inputfile2,
+            err_file, summary_csv
+        )
+
+    def read_tabular_data(self, db):
+        self.connection.execute(TABULAR_CELLS.format(db=db))
+        self.connection.execute(
+            'CREATE INDEX temp.cells_%s_key ON cells_%s (%s, row_id, column_header)' % (db, db, TABLE_KEY)
+        )
+        self.connection.execute(
+            'CREATE TEMP TABLE tables_%s AS SELECT %s, COUNT(DISTINCT row_id) AS rows, COUNT(*) AS cells, '
+            'MIN(rowid) AS position FROM cells_%s GROUP BY %s' % (db, TABLE_KEY, db, TABLE_KEY)
+        )
+
+    def tabular_data_diff(self, thresh_dict, diff_file, err_file, summary_file):
+        """table_diff for the TabularData of the two files, returning
+        (
+            <message>, <#tables>, <#big_diff>,
+            <#small_diff>, <#equals>, <#string_diff>,
+            <#size_diff>, <#not_in_file1>, <#not_in_file2>
+        )
+        Cells are matched by table, row number and column heading, like table_diff matches them"""
+        if self.malformed_file:
+            return 'malformed sql file: <%s>' % self.malformed_file, 0, 0, 0, 0, 0, 0, 0, 0
+        for db in ['a', 'b']:
+            try:
+                self.read_tabular_data(db)
+            except sqlite3.DatabaseError:
+                return 'malformed sql file: <%s>' % self.file_name(db), 0, 0, 0, 0, 0, 0, 0, 0
+
+        # table: [big diffs, small diffs, equals, string diffs, size errors, not in 1, not in 2]
+        results = {}
+        order = []
+        for row in self.query(
+                'SELECT a.report, a.report_for, a.table_name, b.report IS NULL, a.rows != b.rows OR a.cells != b.cells '
+                'FROM tables_a a LEFT JOIN tables_b b USING (%s) ORDER BY a.position' % TABLE_KEY
+        ):
+            table, missing, size_error = tuple(row[:3]), row[3], row[4]
+            order.append(table)
+            results[table] = [0, 0, 0, 0, 0, 0, 1 if missing else 0]
+            if not missing and size_error:
+                results[table][4] = 1
+        for row in self.query(
+                'SELECT %s FROM tables_b EXCEPT SELECT %s FROM tables_a ORDER BY 1, 2, 3' % (TABLE_KEY, TABLE_KEY)
+        ):
+            order.append(tuple(row))
+            results[tuple(row)] = [0, 0, 0, 0, 0, 1, 0]
+        self.connection.execute(
+            'CREATE TEMP TABLE compared AS SELECT a.report, a.report_for, a.table_name '
+            'FROM tables_a a JOIN tables_b b USING (%s) WHERE a.rows = b.rows AND a.cells = b.cells' % TABLE_KEY
+        )
+
+        # a table whose column headings changed needs a close look: it counts as a size error, a string diff and a
+        # big diff, and every cell in a column that is missing from the second file is a big diff
+        columns = 'SELECT %s, c.column_header FROM cells_%s c JOIN compared USING (%s)'
+        columns_a = columns % (TABLE_KEY, 'a', TABLE_KEY)
+        columns_b = columns % (TABLE_KEY, 'b', TABLE_KEY)
+        for row in self.query(
+                'SELECT %s FROM (%s EXCEPT %s) UNION SELECT %s FROM (%s EXCEPT %s)' % (
+                    TABLE_KEY, columns_a, columns_b, TABLE_KEY, columns_b, columns_a
+                )
+        ):
+            result = results[tuple(row)]
+            result[0] += 1
+            result[3] += 1
+            result[4] += 1
+        for row in self.query(
+                'SELECT a.report, a.report_for, a.table_name, COUNT(*) FROM cells_a a JOIN compared USING (%s) '
+                'WHERE NOT EXISTS (SELECT 1 FROM cells_b b WHERE b.report = a.report AND b.report_for = a.report_for '
+                'AND b.table_name = a.table_name AND b.column_header = a.column_header) GROUP BY %s' % (
+                    TABLE_KEY, TABLE_KEY
+                )
+        ):
+            results[tuple(row[:3])][0] += row[3]
+
+        # equal cells are only counted, the others are compared the way table_diff compares them
+        matched = (
+            'FROM cells_a a JOIN compared USING (%s) JOIN cells_b b ON b.report = a.report AND '
+            'b.report_for = a.report_for AND b.table_name = a.table_name AND b.row_id = a.row_id AND '
+            'b.column_header = a.column_header' % TABLE_KEY
+        )
+        for row in self.query(
+                'SELECT a.report, a.report_for, a.table_name, COUNT(*) %s '
+                'WHERE a.value = b.value GROUP BY 1, 2, 3' % matched
+        ):
+            results[tuple(row[:3])][2] += row[3]
+        diff_rows = []
+        for row in self.query(
+                'SELECT a.report, a.report_for, a.table_name, a.row_name, a.column_header, a.value, b.value %s '
+                'WHERE a.value IS NOT b.value ORDER BY a.rowid' % matched
+        ):
+            table, row_name, column_header, x, y = tuple(row[:3]), row[3], row[4], row[5], row[6]
+            abs_thresh, rel_thresh = thresh_dict.lookup(column_header)
+            this_abs_diff, this_rel_diff, diff = thresh_abs_rel_diff(abs_thresh, rel_thresh, x, y)
+            result = results[table]
+            if diff == 'big':
+                result[0] += 1
+            elif diff == 'small':
+                result[1] += 1
+            elif diff == 'equal':
+                result[2] += 1
+            else:
+                result[3] += 1
+            if diff != 'equal':
+                diff_rows.append(list(table) + [row_name, column_header, x, y, this_abs_diff, this_rel_diff, diff])
+
+        totals = [sum(result[i] for result in results.values()) for i in range(7)]
+        count_of_big_diff, count_of_small_diff, count_of_equal, count_of_string_diff = totals[:4]
+        count_of_size_error, count_of_not_in_1, count_of_not_in_2 = totals[4:]
+
+        err_rows = [['Report', 'For', 'Table', 'Big diffs', 'Small diffs', 'Equals', 'String diffs', 'Size diffs',
+                     'Not in 1', 'Not in 2']]
+        err_rows.extend(list(table) + results[table] for table in order)
+        mycsv.writecsv(err_rows, err_file)
+        if diff_rows:
+            diff_header = ['Report', 'For', 'Table', 'Row', 'Column', 'Value 1', 'Value 2', 'Abs diff', 'Rel diff',
+                           'Diff']
+            mycsv.writecsv([diff_header] + diff_rows, diff_file)
+
+        if summary_file:
+            write_table_summary(
+                summary_file, self.inputfile1, len(order), count_of_big_diff, count_of_small_diff, count_of_equal,
+                count_of_string_diff, count_of_size_error, count_of_not_in_1, count_of_not_in_2
+            )
+
+        return ('', len(order), count_of_big_diff, count_of_small_diff, count_of_equal, count_of_string_diff,
+                count_of_size_error, count_of_not_in_1, count_of_not_in_2)
+
+    def errors_diff(self, diff_file):
+        """Compare the warnings and errors in the Errors tables, returning a TextDifferences diff type"""
+        if self.malformed_file:
+            with open(diff_file, 'w') as f:
+                f.write('malformed sql file: <%s>\n' % self.malformed_file)
+            return TextDifferences.DIFFS
+        errors = 'SELECT ErrorType, ErrorMessage, Count, COUNT(*) FROM %s.Errors GROUP BY 1, 2, 3'
+        try:
+            only_in_a = self.query(errors % 'a' + ' EXCEPT ' + errors % 'b')
+            only_in_b = self.query(errors % 'b' + ' EXCEPT ' + errors % 'a')
+        except sqlite3.DatabaseError:
+            with open(diff_file, 'w') as f:
+                f.write('unable to read the Errors tables of <%s> and <%s>\n' % (self.inputfile1, self.inputfile2))
+            return TextDifferences.DIFFS
+        if not only_in_a and not only_in_b:
+            return TextDifferences.EQUAL
+        with open(diff_file, 'w') as f:
+            for prefix, rows in [('<', only_in_a), ('>', only_in_b)]:
+                for error_type, message, count, copies in rows:
+                    for _ in range(copies):
+                        f.write('%s [%s] %s (count %s)\n' % (prefix, error_type, message, count))
+        return TextDifferences.DIFFS
+
+
+def time_label(interval_type, year, month, day, hour, minute):
+    """The Date/Time that ReadVarsESO would write for a row of the Time table"""
+    if interval_type == DAILY_INTERVAL:
+        return ' %02d/%02d' % (month, day)
+    if interval_type == MONTHLY_INTERVAL:
+        return month_names[month - 1]
+    if interval_type == RUN_PERIOD_INTERVAL:
+        return 'Run Period'
+    if interval_type > RUN_PERIOD_INTERVAL:
+        return 'Year %s' % year
+    # the hour is the one the interval ends in, and a whole hour is reported as its end
+    if minute in [0, 60]:
+        return ' %02d/%02d  %02d:00:00' % (month, day, hour)
+    return ' %02d/%02d  %02d:%02d:00' % (month, day, hour - 1, minute)
+
+
+def write_table_summary(summary_file, inputfile1, *counts):
+    """append a row to the table diff summary csv that table_diff writes"""
+    if not os.path.exists(summary_file):
+        with open(summary_file, 'w') as summarize:
+            summarize.write(
+                "Case,TableCount,BigDiffCount,SmallDiffCount,EqualCount,"
+                "StringDiffCount,SizeErrorCount,NotIn1Count,NotIn2Count\n"
+            )
+    with open(summary_file, 'a') as summarize:
+        summarize.write(','.join([inputfile1.split(os.sep)[-2]] + [str(count) for count in counts]) + '\n')
@@ -39,8 +39,10 @@ __license__ = "GNU General Public License Version 3"
 import sys
 import getopt
 import os.path
+import re
 
-from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4 import BeautifulSoup, NavigableString
+from bs4.dammit import EntitySubstitution
 from epregressions.diffs.thresh_dict import ThreshDict
 
 help_message = __doc__
@@ -151,103 +153,342 @@ def get_table_unique_heading(table):
         return None
 
 
-def hdict2soup(soup, heading, num, hdict, tdict, horder):
-    """Create soup table (including anchor and heading) from header dictionary and error dictionary"""
-    # Append table anchor
-    atag = Tag(soup, name='a', attrs=[('name', '%s%s' % ('tablehead', num,))])
-    soup.body.append(atag)
+def soup_tables(txt):
+    """Soup up an html file and return a [unique heading, rows, number of cells] for each table, where each row is a
+    list of the first thing in each of its cells (None for an empty cell)"""
+    soup = BeautifulSoup(txt, features='html.parser')
+    tables = []
+    for table in soup('table'):
+        rows = []
+        for trow in table('tr'):
+            rows.append([td.contents[0] if td.contents else None for td in trow('td')])
+        tables.append([get_table_unique_heading(table), rows, len(table('td'))])
+    return tables
+
+
+# The tags, comments and doctype in an html file, matched the way python's html.parser reads them.  Any other < is
+# something that html.parser reads in its own way, so those files are left to BeautifulSoup.
+html_token = re.compile(
+    r'<!--(?P<comment>.*?)-->'
+    r'|<(?P<decl>![dD][oO][cC][tT][yY][pP][eE][^>]*)>'
+    r'|<(?P<start>[a-zA-Z][a-zA-Z0-9]*)'
+    r'(?:\s+[a-zA-Z_:][-.:a-zA-Z0-9_]*(?:\s*=\s*(?:"[^"]*"|\'[^\']*\'|[^\s"\'=<>`]+))?)*\s*(?P<close>/?)>'
+    r'|</(?P<end>[a-zA-Z][a-zA-Z0-9]*)\s*>'
+    r'|<',
+    re.DOTALL
+)
+
+# Character references, and anything else html.parser might take for one
+html_reference = re.compile(
+    r'&(?:#(?P<dec>[0-9]+)|#[xX](?P<hex>[0-9a-fA-F]+)|(?P<name>[a-zA-Z][a-zA-Z0-9]*));'
+    r'|&[#a-zA-Z]'
+)
+
+# BeautifulSoup closes these as soon as they are opened
+empty_element_tags = {
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr', 'image', 'img', 'input',
+    'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid', 'param', 'source', 'spacer', 'track', 'wbr'
+}
+
+# html.parser reads the contents of the first two as raw text, and BeautifulSoup keeps the white space in the others
+special_content_tags = {'script', 'style', 'pre', 'textarea'}
+
+
+def decode_text(text):
+    """convert the character references in text the way BeautifulSoup does, or return None if there is something
+    that html.parser might read in its own way"""
+    if '&' not in text:
+        return text
+    pieces = []
+    i = 0
+    for match in html_reference.finditer(text):
+        if match.group('name') is not None:
+            character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(match.group('name'))
+            if character is None:
+                return None
+        elif match.group('dec') is not None or match.group('hex') is not None:
+            if match.group('dec') is not None:
+                code = int(match.group('dec'))
+            else:
+                code = int(match.group('hex'), 16)
+            character = None
+            if code < 256:
+                # BeautifulSoup reads these as windows-1252 where it can
+                try:
+                    character = bytearray([code]).decode('windows-1252')
+                except UnicodeDecodeError:
+                    pass
+            if character is None:
+                try:
+                    character = chr(code)
+                except (ValueError, OverflowError):
+                    character = '\N{REPLACEMENT CHARACTER}'
+        else:
+            return None
+        pieces.append(text[i:match.start()])
+        pieces.append(character)
+        i = match.end()
+    pieces.append(text[i:])
+    return ''.join(pieces)
+
+
+class TableScanFrame:
+    """A tag that is open while scanning for tables"""
+
+    def __init__(self, name):
+        self.name = name
+        self.has_child = False
+        self.last_child = None  # (kind, value) of the last child that isn't blank text
+
+
+class TableScanner:
+    """Nests tags the way BeautifulSoup does with html.parser, keeping just the tables in the same form as soup_tables.
+    Only the regular html that EnergyPlus writes is followed: every tag is closed in the order it was opened, there
+    are no nested tables, every table comes right after its heading comment, and cells don't start with a tag.  On
+    anything else, regular is set to False and the file should be souped up instead."""
+
+    def __init__(self):
+        self.tables = []
+        self.regular = True
+        self.stack = [TableScanFrame(None)]
+        self.already_closed_empty_element = {}  # how many closing tags BeautifulSoup will ignore, for each name
+        self.table = None  # the open table and the open row in it
+        self.row = None
+        self.table_depth = None  # the stack index of each of the open table, row and cell
+        self.row_depth = None
+        self.cell_depth = None
+
+    def add_child(self, kind, value):
+        frame = self.stack[-1]
+        if not frame.has_child and self.cell_depth == len(self.stack) - 1:
+            # this is the first thing in a cell, which is what table_diff compares
+            if kind != 'text':
+                self.regular = False
+            elif self.row is not None:
+                self.row[-1] = value
+        frame.has_child = True
+        if kind != 'text' or value.strip() != '':
+            frame.last_child = (kind, value)
+
+    def add_text(self, pieces):
+        text = ''.join(pieces)
+        if '&' in text:
+            pieces = [decode_text(piece) for piece in pieces]
+            if None in pieces:
+                self.regular = False
+                return
+            text = ''.join(pieces)
+        if not text.strip(' \n\t\f\r'):
+            # BeautifulSoup collapses strings of ascii spaces
+            text = '\n' if '\n' in text else ' '
+        self.add_child('text', text)
+
+    def open_tag(self, name):
+        depth = len(self.stack)
+        if name in special_content_tags:
+            self.regular = False
+        elif name == 'table':
+            last_child = self.stack[-1].last_child
+            if self.table is not None or last_child is None or last_child[0] != 'comment' or not last_child[1]:
+                self.regular = False
+                return
+            self.table = [last_child[1], [], 0]
+            self.tables.append(self.table)
+            self.table_depth = depth
+        elif self.table is not None and name == 'tr':
+            if self.row_depth is not None:
+                self.regular = False
+                return
+            self.row = []
+            self.table[1].append(self.row)
+            self.row_depth = depth
+        elif self.table is not None and name == 'td':
+            if self.cell_depth is not None:
+                self.regular = False
+                return
+            self.table[2] += 1
+            if self.row is not None:
+                self.row.append(None)
+            self.cell_depth = depth
+        self.add_child('tag', name)
+        self.stack.append(TableScanFrame(name))
+
+    def close_tag(self, name):
+        if self.stack[-1].name != name:
+            self.regular = False  # BeautifulSoup would close all the tags down to this one, or all of them
+            return
+        self.stack.pop()
+        depth = len(self.stack)
+        if depth == self.cell_depth:
+            self.cell_depth = None
+        elif depth == self.row_depth:
+            self.row = None
+            self.row_depth = None
+        elif depth == self.table_depth:
+            self.table = None
+            self.table_depth = None
+
+    def scan(self, txt):
+        text = []  # the text since the last tag, which BeautifulSoup joins into one string
+        i = 0
+        for match in html_token.finditer(txt):
+            if match.start() > i:
+                text.append(txt[i:match.start()])
+            i = match.end()
+            comment, decl, start, close, end = match.group('comment', 'decl', 'start', 'close', 'end')
+            if end is not None:
+                name = end.lower()
+                if self.already_closed_empty_element.get(name):
+                    # BeautifulSoup ignores this one completely, and keeps adding to the same string after it
+                    self.already_closed_empty_element[name] -= 1
+                    continue
+            if text:
+                self.add_text(text)
+                text = []
+            if comment is not None:
+                if '--' in comment or comment.startswith('>') or comment.startswith('->'):
+                    self.regular = False  # python versions disagree on where these comments end
+                self.add_child('comment', comment)
+            elif decl is not None:
+                self.add_child('decl', decl)
+            elif start is not None:
+                name = start.lower()
+                self.open_tag(name)
+                if close:
+                    if self.already_closed_empty_element.get(name):
+                        self.regular = False  # BeautifulSoup would leave this one open
+                    self.close_tag(name)
+                elif name in empty_element_tags:
+                    self.close_tag(name)
+                    self.already_closed_empty_element[name] = self.already_closed_empty_element.get(name, 0) + 1
+            elif end is not None:
+                self.close_tag(name)
+            else:
+                self.regular = False
+            if not self.regular:
+                return
+        if len(txt) > i:
+            text.append(txt[i:])
+        if text:
+            self.add_text(text)
+
+
+def scan_tables(txt):
+    """Returns the same tables as soup_tables from a single pass over the html, without building a soup, or None when
+    the html isn't regular enough to be sure of that"""
+    if not isinstance(txt, type('')):
+        return None  # pragma: no cover - python 2 reads bytes, which BeautifulSoup decodes
+    scanner = TableScanner()
+    scanner.scan(txt)
+    if not scanner.regular:
+        return None
+    return scanner.tables
+
+
+def html_tag(indent_level, name, attrs=None, contents=''):
+    """Make a tag the way BeautifulSoup's prettify lays it out, where contents are already laid out a level deeper"""
+    attribute_string = ''
+    if attrs:
+        for key, val in sorted(attrs.items()):
+            attribute_string += ' %s=%s' % (key, EntitySubstitution.substitute_xml(val, make_quoted_attribute=True))
+    indent_space = ' ' * (indent_level - 1)
+    return '%s<%s%s>\n%s%s</%s>\n' % (indent_space, name, attribute_string, contents, indent_space, name)
+
 
-    # Append table heading
-    htag = Tag(soup, name='b')
-    htag.append(heading)
-    soup.body.append(htag)
+def html_text(indent_level, text):
+    """Lay out a string the way BeautifulSoup's prettify does"""
+    text = EntitySubstitution.substitute_xml(text).strip()
+    if not text:
+        return ''
+    return '%s%s\n' % (' ' * (indent_level - 1), text)
 
-    # Append table
-    tabletag = Tag(soup, name='table', attrs=[('border', '1')])
-    soup.body.append(tabletag)
 
-    # Append column headings
-    trtag = Tag(soup, name='tr')
-    tabletag.append(trtag)
+def html_page(title, body):
+    """Lay out a page with the given body contents, which are laid out for tags directly in the body"""
+    page = BeautifulSoup(title_css % (title, the_css,), features='html.parser').prettify()
+    head, tail = page.split(' <body>\n', 1)
+    return head + ' <body>\n' + body + tail
+
+
+def hdict2html(heading, num, hdict, tdict, horder):
+    """Create html table (including anchor and heading) from header dictionary and error dictionary"""
+    # Table anchor and heading
+    html = html_tag(3, 'a', {'name': '%s%s' % ('tablehead', num,)})
+    html += html_tag(3, 'b', contents=html_text(4, heading))
+
+    # Column headings
+    cells = []
     for h in horder:
-        tdtag = Tag(soup, name='th')
         if h != 'DummyPlaceholder':
-            tdtag.append(str(h))
+            cells.append(html_tag(5, 'th', contents=html_text(6, str(h))))
         else:
-            tdtag.append('')
-        trtag.append(tdtag)
+            cells.append(html_tag(5, 'th'))
+    rows = [html_tag(4, 'tr', contents=''.join(cells))]
 
-    # Append column thresholds
-    trtag = Tag(soup, name='tr')
-    tabletag.append(trtag)
+    # Column thresholds
+    cells = []
     for h in horder:
-        tdtag = Tag(soup, name='td')
-        trtag.append(tdtag)
         if h in tdict:
             (abs_thresh, rel_thresh) = tdict[h]
-            tdtag.append(str(abs_thresh))
+            cells.append(html_tag(5, 'td', contents=html_text(6, str(abs_thresh))))
         else:
-            tdtag.append('Absolute threshold')
+            cells.append(html_tag(5, 'td', contents=html_text(6, 'Absolute threshold')))
+    rows.append(html_tag(4, 'tr', contents=''.join(cells)))
 
-    trtag = Tag(soup, name='tr')
-    tabletag.append(trtag)
+    cells = []
     for h in horder:
-        tdtag = Tag(soup, name='td')
-        trtag.append(tdtag)
         if h in tdict:
             (abs_thresh, rel_thresh) = tdict[h]
-            tdtag.append(str(rel_thresh))
+            cells.append(html_tag(5, 'td', contents=html_text(6, str(rel_thresh))))
         else:
-            tdtag.append('Relative threshold')
+            cells.append(html_tag(5, 'td', contents=html_text(6, 'Relative threshold')))
+    rows.append(html_tag(4, 'tr', contents=''.join(cells)))
 
-    # Append table rows
+    # Table rows
     for i in range(0, len(hdict[horder[0]])):
-        trtag = Tag(soup, name='tr')
-        tabletag.append(trtag)
+        cells = []
         for h in horder:
             if h not in hdict:
-                tdtag = Tag(soup, name='td', attrs=[("class", "big")])
-                tdtag.append('ColumnHeadingDifference')
+                cells.append(html_tag(5, 'td', {'class': 'big'}, html_text(6, 'ColumnHeadingDifference')))
             elif h == 'DummyPlaceholder' or h == 'Subcategory':
-                tdtag = Tag(soup, name='td')
-                tdtag.append((str(hdict[h][i])))
+                cells.append(html_tag(5, 'td', contents=html_text(6, str(hdict[h][i]))))
             else:
                 (diff, which) = hdict[h][i]
-                tdtag = Tag(soup, name='td', attrs=[('class', which)])
                 try:
-                    tdtag.append(str(diff))
+                    diff_text = str(diff)
                 except Exception:  # pragma: no cover
                     diff = diff.encode('ascii', 'ignore').decode('ascii')
-                    tdtag.append(str(diff))
-            trtag.append(tdtag)
+                    diff_text = str(diff)
+                cells.append(html_tag(5, 'td', {'class': which}, html_text(6, diff_text)))
+        rows.append(html_tag(4, 'tr', contents=''.join(cells)))
+
+    return html + html_tag(3, 'table', {'border': '1'}, ''.join(rows))
 
 
-# Convert html table to heading dictionary (and header list) in single step
-def table2hdict_horder(table):
+def index_tables(uheadings):
+    """map each unique heading to the indexes of the tables with that heading, in order"""
+    index = {}
+    for i, uheading in enumerate(uheadings):
+        index.setdefault(uheading, []).append(i)
+    return index
+
+
+# Convert table rows to heading dictionary (and header list) in single step
+def table2hdict_horder(rows):
     hdict = {}
     horder = []
-    trows = table('tr')
 
     # Create dictionary headings
-    for htd in trows[0]('td'):
-        try:
-            hcontents = htd.contents[0]
-        except IndexError:
+    for hcontents in rows[0]:
+        if hcontents is None:
             hcontents = 'DummyPlaceholder'
 
         hdict[hcontents] = []
         horder.append(hcontents)
 
-    for trow in trows[1:]:
-        for htd, td in zip(trows[0]('td'), trow('td')):
-            try:
-                hcontents = htd.contents[0]
-            except IndexError:
-                hcontents = 'DummyPlaceholder'
-
-            try:
-                contents = td.contents[0]
-            except IndexError:
+    for row in rows[1:]:
+        for hcontents, contents in zip(horder, row):
+            if contents is None:
                 contents = ''
 
             hdict[hcontents].append(contents)
@@ -255,52 +496,34 @@ def table2hdict_horder(table):
     return hdict, horder
 
 
-def make_err_table_row(err_soup, tabletag, uheading, count_of_tables, abs_diff_file, rel_diff_file,
+def make_err_table_row(uheading, count_of_tables, abs_diff_file, rel_diff_file,
                        small_diff, big_diff, equal, string_diff, size_error, not_in_1, not_in_2):
     # Create entry in error table
-    trtag = Tag(err_soup, name='tr')
-    tabletag.append(trtag)
-
-    tdtag_name = Tag(err_soup, name='td')
-    trtag.append(tdtag_name)
-    tdtag_name.append(uheading)
-
-    tdtag_abs_link = Tag(err_soup, name='td')
-    trtag.append(tdtag_abs_link)
-
-    tdtag_rel_link = Tag(err_soup, name='td')
-    trtag.append(tdtag_rel_link)
+    cells = html_tag(5, 'td', contents=html_text(6, uheading))
 
     if small_diff > 0 or big_diff > 0 or string_diff > 0:
-        atag = Tag(err_soup, name='a', attrs=[('href', '%s#tablehead%s' % (abs_diff_file, count_of_tables))])
-        atag.append('abs file')
-        tdtag_abs_link.append(atag)
+        atag = html_tag(6, 'a', {'href': '%s#tablehead%s' % (abs_diff_file, count_of_tables)}, html_text(7, 'abs file'))
+        cells += html_tag(5, 'td', contents=atag)
 
-        atag = Tag(err_soup, name='a', attrs=[('href', '%s#tablehead%s' % (rel_diff_file, count_of_tables))])
-        atag.append('rel file')
-        tdtag_rel_link.append(atag)
+        atag = html_tag(6, 'a', {'href': '%s#tablehead%s' % (rel_diff_file, count_of_tables)}, html_text(7, 'rel file'))
+        cells += html_tag(5, 'td', contents=atag)
+    else:
+        cells += html_tag(5, 'td') + html_tag(5, 'td')
 
-    tdtag_big_diff = Tag(err_soup, name='td', attrs=[('class', 'big')] if big_diff > 0 else [])
-    trtag.append(tdtag_big_diff)
-    tdtag_big_diff.append(str(big_diff))
+    cells += html_tag(5, 'td', {'class': 'big'} if big_diff > 0 else None, html_text(6, str(big_diff)))
 
-    tdtag_small_diff = Tag(err_soup, name='td', attrs=[('class', 'small')] if small_diff > 0 else [])
-    trtag.append(tdtag_small_diff)
-    tdtag_small_diff.append(str(small_diff))
+    cells += html_tag(5, 'td', {'class': 'small'} if small_diff > 0 else None, html_text(6, str(small_diff)))
 
-    tdtag_equal = Tag(err_soup, name='td', attrs=[])
-    trtag.append(tdtag_equal)
-    tdtag_equal.append(str(equal))
+    cells += html_tag(5, 'td', contents=html_text(6, str(equal)))
 
-    tdtag_string_diff = Tag(err_soup, name='td', attrs=[('class', 'stringdiff')] if string_diff > 0 else [])
-    trtag.append(tdtag_string_diff)
-    tdtag_string_diff.append(str(string_diff))
+    cells += html_tag(5, 'td', {'class': 'stringdiff'} if string_diff > 0 else None, html_text(6, str(string_diff)))
 
-    tdtag_table_size_error = Tag(err_soup, name='td', attrs=[
-        ('class', 'table_size_error')] if size_error > 0 or not_in_1 > 0 or not_in_2 > 0 else [])
-    trtag.append(tdtag_table_size_error)
-    tdtag_table_size_error.append(
-        'size mismatch' if size_error > 0 else 'not in 1' if not_in_1 > 0 else 'not in 2' if not_in_2 > 0 else '')
+    size_class = {'class': 'table_size_error'} if size_error > 0 or not_in_1 > 0 or not_in_2 > 0 else None
+    cells += html_tag(5, 'td', size_class,
+                      html_text(6, 'size mismatch' if size_error > 0 else 'not in 1' if not_in_1 > 0 else
+                                'not in 2' if not_in_2 > 0 else ''))
+
+    return html_tag(4, 'tr', contents=cells)
 
 
 def table_diff(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file, err_file, summary_file):
@@ -328,52 +551,45 @@ def table_diff(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file
 
     pagetitle = '%s vs %s' % (os.path.basename(inputfile1), os.path.basename(inputfile2))
 
-    # Error soup
-    err_soup = BeautifulSoup(title_css % (pagetitle + ' -- summary', the_css,),
-                             features='html.parser')
-
-    # Abs diff soup
-    abs_diff_soup = BeautifulSoup(title_css % (pagetitle + ' -- absolute differences', the_css,),
-                                  features='html.parser')
-
-    # Rel diff soup
-    rel_diff_soup = BeautifulSoup(title_css % (pagetitle + ' -- relative differences', the_css,),
-                                  features='html.parser')
-
-    # Make error table
-    tabletag = Tag(err_soup, name='table', attrs=[('border', '1')])
-    err_soup.body.append(tabletag)
+    # Error table rows, and the body contents of the abs and rel diff pages
+    err_rows = []
+    abs_diff_html = []
+    rel_diff_html = []
 
     # Make error table headings
-    trtag = Tag(err_soup, name='tr')
-    tabletag.append(trtag)
+    err_headings = ''
     for title in ['Table', 'Abs file', 'Rel file', 'Big diffs', 'Small diffs', 'Equals', 'String diffs', 'Size diffs']:
-        thtag = Tag(err_soup, name='th')
-        trtag.append(thtag)
-        thtag.append(title)
-
-    # Soup up the HTML input files
-    soup2 = BeautifulSoup(txt2, features='html.parser')
-    soup1 = BeautifulSoup(txt1, features='html.parser')
+        err_headings += html_tag(5, 'th', contents=html_text(6, title))
+    err_rows.append(html_tag(4, 'tr', contents=err_headings))
 
-    tables1 = soup1('table')
-    tables2 = soup2('table')
+    # Read the tables from the HTML input files, only souping them up if they aren't the regular EnergyPlus layout
+    tables2 = scan_tables(txt2)
+    if tables2 is None:
+        tables2 = soup_tables(txt2)
+    tables1 = scan_tables(txt1)
+    if tables1 is None:
+        tables1 = soup_tables(txt1)
 
     uheadings1 = []
     uheadings2 = []
     for table in tables1:
-        uheadings1.append(get_table_unique_heading(table))
+        uheadings1.append(table[0])
     for table in tables2:
-        uheadings2.append(get_table_unique_heading(table))
+        uheadings2.append(table[0])
 
     if any([x is None for x in uheadings1]):
         return 'malformed comment/table structure in <%s>' % inputfile1, 0, 0, 0, 0, 0, 0, 0, 0
     if any([x is None for x in uheadings2]):
         return 'malformed comment/table structure in <%s>' % inputfile2, 0, 0, 0, 0, 0, 0, 0, 0
 
-    uhset1 = set(uheadings1)
-    uhset2 = set(uheadings2)
-    uhset_match = set.intersection(uhset1, uhset2)
+    # Match up the tables by heading.  If a heading is used more than once in a file, the first table with it in file
+    # 1 is compared to the first table with it in file 2, the second to the second, and any extras are unmatched.
+    index2 = index_tables(uheadings2)
+    matches = {}
+    for uheading, indexes1 in index_tables(uheadings1).items():
+        for i1, i2 in zip(indexes1, index2.get(uheading, [])):
+            matches[i1] = i2
+    matched2 = set(matches.values())
 
     count_of_tables = 0
     count_of_tables_diff = 0
@@ -401,28 +617,30 @@ def table_diff(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file
         uheading1 = uheadings1[i1]
 
         # Table missing in second input file
-        if uheading1 not in uhset_match:
+        if i1 not in matches:
             table_not_in_2 = 1
             count_of_not_in_2 += table_not_in_2
-            make_err_table_row(err_soup, tabletag, uheading1, count_of_tables, abs_diff_file, rel_diff_file,
-                               table_small_diff, table_big_diff, table_equal, table_string_diff, table_size_error,
-                               table_not_in_1, table_not_in_2)
+            err_rows.append(make_err_table_row(uheading1, count_of_tables, abs_diff_file, rel_diff_file,
+                                               table_small_diff, table_big_diff, table_equal, table_string_diff,
+                                               table_size_error, table_not_in_1, table_not_in_2))
             continue
 
         table1 = tables1[i1]
-        table2 = tables2[uheadings2.index(uheading1)]
+        table2 = tables2[matches[i1]]
 
         # Table size error
-        if len(table1('tr')) != len(table2('tr')) or len(table1('td')) != len(table2('td')):
+        if len(table1[1]) != len(table2[1]) or table1[2] != table2[2]:
             table_size_error = 1
             count_of_size_error += table_size_error
-            make_err_table_row(err_soup, tabletag, uheading1, count_of_tables, abs_diff_file, rel_diff_file,
-                               table_small_diff, table_big_diff, table_equal, table_string_diff, table_size_error,
-                               table_not_in_1, table_not_in_2)
+            err_rows.append(make_err_table_row(uheading1, count_of_tables, abs_diff_file, rel_diff_file,
+                                               table_small_diff, table_big_diff, table_equal, table_string_diff,
+                                               table_size_error, table_not_in_1, table_not_in_2))
             continue
 
-        hdict1, horder1 = table2hdict_horder(table1)
-        hdict2, horder2 = table2hdict_horder(table2)
+        hdict1, horder1 = table2hdict_horder(table1[1])
+        hdict2, horder2 = table2hdict_horder(table2[1])
+        hset1 = set(horder1)
+        hset2 = set(horder2)
 
         # honestly, if the column headings have changed, this should be an indicator to all reviewers that this needs
         # up close investigation.  As such, we are going to trigger the following things:
@@ -432,7 +650,7 @@ def table_diff(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file
         #    even if it is duplicate, it is different because there is another one)
         # 3) a table_big_diff here, because something has definitely changed that needs attention
         # 4) each datum in each row that doesn't have a match should trigger a big diff as well later
-        if any([h not in horder2 for h in horder1]) or any([h not in horder1 for h in horder2]):
+        if hset1 != hset2:
             table_size_error += 1
             count_of_size_error += 1
             table_string_diff += 1
@@ -443,15 +661,16 @@ def table_diff(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file
         # Dictionaries of absolute and relative differences
         diff_dict = {}
         h_thresh_dict = {}
+        thresholds = dict(zip(horder1, thresh_dict.lookup_all(horder1)))
 
         for h in horder1:
             if h == 'DummyPlaceholder':
                 diff_dict[h] = hdict1[h]
             else:
-                if h not in horder2:
-                    diff_dict[h] = [[0, 0, 'big']] * (len(table1('tr')) - 1)
+                if h not in hset2:
+                    diff_dict[h] = [[0, 0, 'big']] * (len(table1[1]) - 1)
                 else:
-                    (abs_thresh, rel_thresh) = thresh_dict.lookup(h)
+                    (abs_thresh, rel_thresh) = thresholds[h]
                     h_thresh_dict[h] = (abs_thresh, rel_thresh)
                     diff_dict[h] = []
                     for x, y in zip(hdict1[h], hdict2[h]):
@@ -473,52 +692,52 @@ def table_diff(thresh_dict, inputfile1, inputfile2, abs_diff_file, rel_diff_file
                         table_string_diff += 1
                         count_of_string_diff += 1
 
-        make_err_table_row(err_soup, tabletag, uheading1, count_of_tables, abs_diff_file, rel_diff_file,
-                           table_small_diff, table_big_diff, table_equal, table_string_diff, table_size_error,
-                           table_not_in_1, table_not_in_2)
+        err_rows.append(make_err_table_row(uheading1, count_of_tables, abs_diff_file, rel_diff_file,
+                                           table_small_diff, table_big_diff, table_equal, table_string_diff,
+                                           table_size_error, table_not_in_1, table_not_in_2))
 
         # If there were no differences, we are done
         if (table_small_diff == 0) and (table_big_diff == 0) and (table_string_diff == 0):
             continue
 
-        # Add difference tables to absolute and relative difference soups
+        # Add difference tables to absolute and relative difference pages
         abs_diff_dict = {}
         for h in horder1:
-            if h not in horder2:
+            if h not in hset2:
                 continue
             abs_diff_dict[h] = diff_dict[h] if (h == 'DummyPlaceholder' or h == 'Subcategory') else [
                 (x_y_z[0], x_y_z[2]) for x_y_z in diff_dict[h]]
-        hdict2soup(abs_diff_soup, uheading1, count_of_tables, abs_diff_dict.copy(), h_thresh_dict, horder1)
+        abs_diff_html.append(hdict2html(uheading1, count_of_tables, abs_diff_dict.copy(), h_thresh_dict, horder1))
 
         rel_diff_dict = {}
         for h in horder1:
-            if h not in horder2:
+            if h not in hset2:
                 continue
             rel_diff_dict[h] = diff_dict[h] if (h == 'DummyPlaceholder' or h == 'Subcategory') else [
                 (x_y_z[1], x_y_z[2]) for x_y_z in diff_dict[h]]
-        hdict2soup(rel_diff_soup, uheading1, count_of_tables, rel_diff_dict.copy(), h_thresh_dict, horder1)
+        rel_diff_html.append(hdict2html(uheading1, count_of_tables, rel_diff_dict.copy(), h_thresh_dict, horder1))
 
         count_of_tables_diff += 1
 
-    for uheading2 in uheadings2:
-        if uheading2 not in uhset_match:
+    for i2, uheading2 in enumerate(uheadings2):
+        if i2 not in matched2:
             count_of_tables += 1
             count_of_not_in_1 += 1
-            make_err_table_row(err_soup, tabletag, uheading2, count_of_tables, abs_diff_file, rel_diff_file,
-                               0, 0, 0, 0, 0, 1, 0)
+            err_rows.append(make_err_table_row(uheading2, count_of_tables, abs_diff_file, rel_diff_file,
+                                               0, 0, 0, 0, 0, 1, 0))
 
     # Write error file
-    err_txt = err_soup.prettify()
+    err_txt = html_page(pagetitle + ' -- summary', html_tag(3, 'table', {'border': '1'}, ''.join(err_rows)))
     with open(err_file, 'w') as f_out:
         f_out.write(err_txt)
 
     # Only write absolute and relative diff files if any tables were actually different
     if count_of_tables_diff > 0:
-        abs_diff_txt = abs_diff_soup.prettify()
+        abs_diff_txt = html_page(pagetitle + ' -- absolute differences', ''.join(abs_diff_html))
         with open(abs_diff_file, 'w') as f_abs:
             f_abs.write(abs_diff_txt)
 
-        rel_diff_txt = rel_diff_soup.prettify()
+        rel_diff_txt = html_page(pagetitle + ' -- relative differences', ''.join(rel_diff_html))
         with open(rel_diff_file, 'w') as f_rel:
             f_rel.write(rel_diff_txt)
 
@@ -33,13 +33,23 @@ __copyright__ = "Copyright (c) 2013 Amir Roth"
 __license__ = "GNU General Public License Version 3"
 
 import re
+from collections import OrderedDict
+
+# the patterns splitting a config line and a column header, compiled once rather than on every line and lookup
+config_line_pattern = re.compile('[,=]')
+unit_pattern = re.compile(r'[\[\]]')
+aggregation_pattern = re.compile(r'[{\}]')
 
 
 # Load threshold dictionary from math_diff.config file
 class ThreshDict(object):
 
+    # the most header strings whose unit and aggregation are remembered; the oldest are forgotten first past that
+    cache_size = 10000
+
     def __init__(self, tdname):
         self.thresholds = {}
+        self.cache = OrderedDict()
         f = open(tdname, 'r')
         while f:
             line = f.readline().rstrip('\n')
@@ -55,7 +65,7 @@ class ThreshDict(object):
                 if line.find('#') > -1:
                     line = line[:line.find('#')]
 
-                [unit, agg, abs_thresh, rel_thresh] = [x.strip() for x in re.split('[,=]', line) if x != '']
+                [unit, agg, abs_thresh, rel_thresh] = [x.strip() for x in config_line_pattern.split(line) if x != '']
                 tag = unit + '|' + agg
 
                 if tag in self.thresholds:
@@ -76,17 +86,41 @@ class ThreshDict(object):
         if hstr == 'Date/Time' or hstr == 'Time':
             return 0.0, 0.0
 
+        # The same headers come up in every file of every case, so remember the tags they parse to; the thresholds
+        # themselves are looked up every time, so that changes to them are seen
+        try:
+            tag, tag_d1 = self.cache[hstr]
+        except KeyError:
+            tag, tag_d1 = self.cache_tags(hstr)
+        tag_d2 = '*|*'
+        # Look for matching Quantity and Aggregation
+        if tag in self.thresholds:
+            return self.thresholds[tag]
+        # Then just matching Quantity
+        elif tag_d1 in self.thresholds:
+            return self.thresholds[tag_d1]
+        # Then the global default
+        elif tag_d2 in self.thresholds:
+            return self.thresholds[tag_d2]
+        else:
+            return 0.0, 0.0
+
+    def lookup_all(self, headers):
+        """The (absolute, relative) thresholds of each of a row of column headers, in the same order"""
+        return [self.lookup(hstr) for hstr in headers]
+
+    def cache_tags(self, hstr):
         # Parse hstr (column header) to extract Unit and Aggregation
 
         # noinspection PyBroadException
         try:
             if hstr.find('[]') == -1 and hstr.find('[') > -1:
-                tokens = [x.strip() for x in re.split(r'[\[\]]', hstr) if x.strip() != '']
+                tokens = [x.strip() for x in unit_pattern.split(hstr) if x.strip() != '']
                 unit = tokens[1] if len(tokens) > 1 else tokens[0]
             else:
                 unit = '*'
             if hstr.find('{}') == -1 and hstr.find('{') > -1:
-                tokens = [x.strip() for x in re.split(r'[{\}]', hstr) if x.strip() != '']
+                tokens = [x.strip() for x in aggregation_pattern.split(hstr) if x.strip() != '']
                 agg = tokens[1] if len(tokens) > 1 else tokens[0]
             else:
                 agg = '*'
@@ -96,17 +130,8 @@ class ThreshDict(object):
             unit = '*'
             agg = '*'
 
-        tag = unit + '|' + agg
-        tag_d1 = unit + '|*'
-        tag_d2 = '*|*'
-        # Look for matching Quantity and Aggregation
-        if tag in self.thresholds:
-            return self.thresholds[tag]
-        # Then just matching Quantity
-        elif tag_d1 in self.thresholds:
-            return self.thresholds[tag_d1]
-        # Then the global default
-        elif tag_d2 in self.thresholds:
-            return self.thresholds[tag_d2]
-        else:
-            return 0.0, 0.0
+        tags = (unit + '|' + agg, unit + '|*')
+        if len(self.cache) >= self.cache_size:
+            self.cache.popitem(last=False)
+        self.cache[hstr] = tags
+        return tags
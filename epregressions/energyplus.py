@@ -2,19 +2,102 @@
 from __future__ import print_function
 
 import glob
+import json
 import os
 import shutil
+import signal
 import subprocess
+import sys
+import threading
+import time
 from multiprocessing import current_process
 
-from epregressions.structures import ForceRunType
+from epregressions.scheduler import borrow_worker, in_task_context, task_programs
+from epregressions.staging import Stager
+from epregressions.structures import ForceRunType, ProgramUsage, ToolUsage
 
 path = os.path.dirname(__file__)
 script_dir = os.path.abspath(path)
 
+# written into the run directory with what each program run for the simulation took
+usage_file_name = 'aa_testSuite_usage.json'
+# the directories in the run directory that programs running together each run in, numbered after this
+program_directory_prefix = 'aa_testSuite_program_'
+
+
+def worker_name():
+    """Name of the process, and the thread if it isn't the main one, that is running a simulation"""
+    name = current_process().name
+    thread_name = threading.current_thread().name
+    if thread_name != 'MainThread':
+        name += ' ' + thread_name
+    return name
+
+
+def write_tool_usage(run_directory, tool_usage):
+    with open(os.path.join(run_directory, usage_file_name), 'w') as f:
+        json.dump(tool_usage.to_dict(), f)
+
+
+def read_tool_usage(run_directory):
+    """The usage written into a run directory, or an empty one if there is none"""
+    try:
+        with open(os.path.join(run_directory, usage_file_name)) as f:
+            return ToolUsage.from_dict(json.load(f))
+    except (IOError, OSError, ValueError, KeyError):
+        return ToolUsage()
+
+
+def run_program(tool, command, run_directory, environment=None):
+    """Run a program in the simulation directory, without touching the working directory of this process.
+
+    Returns the ProgramUsage of the program, which only has the start and wall time where the platform has no wait4.
+    In a task the scheduler runs on a thread, the program leads a process group of its own and is registered with the
+    task, so the scheduler can kill it if the task times out or is cancelled."""
+    programs = task_programs()
+    new_group = {}
+    if programs is not None and hasattr(os, 'setsid'):
+        new_group['preexec_fn'] = os.setsid
+    start_time = time.time()
+    with open(os.devnull, 'w') as devnull:
+        program_run = subprocess.Popen(
+            command, shell=True, stdout=devnull, stderr=devnull, cwd=run_directory, env=environment, **new_group
+        )
+        if programs is not None:
+            programs.add(program_run)
+        try:
+            if not hasattr(os, 'wait4'):  # pragma: no cover - windows only
+                program_run.wait()
+                return ProgramUsage(tool, time.time() - start_time, start_time=start_time)
+            # reap the program here rather than through wait, to get its resource usage along with its exit status
+            _, status, resource_usage = os.wait4(program_run.pid, 0)
+        finally:
+            if programs is not None:
+                programs.remove(program_run)
+    wall_time = time.time() - start_time
+    if os.WIFSIGNALED(status):
+        program_run.returncode = -os.WTERMSIG(status)
+    else:
+        program_run.returncode = os.WEXITSTATUS(status)
+    # the shell reports a program it ran that was killed as exiting with 128 + the signal
+    killed = program_run.returncode in [-signal.SIGKILL, 128 + signal.SIGKILL]
+    # the usage covers the shell and the program it ran; ru_maxrss is in kB, or bytes on mac, and ru_oublock in blocks
+    # of 512 bytes
+    peak_memory = resource_usage.ru_maxrss / 1024.0
+    if sys.platform == 'darwin':  # pragma: no cover
+        peak_memory /= 1024.0
+    return ProgramUsage(
+        tool, wall_time, resource_usage.ru_utime, resource_usage.ru_stime, peak_memory,
+        resource_usage.ru_oublock * 512, killed, start_time
+    )
+
 
 def execute_energyplus(build_tree, entry_name, test_run_directory,
-                       run_type, min_reporting_freq, this_parametric_file, weather_file_name):
+                       run_type, min_reporting_freq, this_parametric_file, weather_file_name, skip_read_vars=False):
+    """Run one simulation in test_run_directory; with skip_read_vars the eso and mtr files aren't converted to csv.
+
+    Every file is addressed by its full path and every program is given its working directory and environment
+    explicitly, so this neither changes directory nor writes to os.environ, and simulations can run on threads."""
 
     # setup a few paths
     energyplus = build_tree['energyplus']
@@ -28,22 +111,83 @@ def execute_energyplus(build_tree, entry_name, test_run_directory,
     readvars = build_tree['readvars']
     parametric = build_tree['parametric']
 
-    # Save the current path so we can go back here
-    start_path = os.getcwd()
+    def run_file(file_name):
+        return os.path.join(test_run_directory, file_name)
+
+    tool_usage = ToolUsage()
+
+    def run_program_here(tool, command, environment=None):
+        tool_usage.add(run_program(tool, command, test_run_directory, environment))
+
+    def run_programs_here(programs):
+        # Independent programs, (tool, command, environment, input file names) each, run alongside the first one on
+        # workers the suite has idle, and one after another when there are none, so the host still runs no more than
+        # its workers.  Each one runs in a directory of its own with its inputs linked in, since they write side files
+        # with fixed names, like readvars.audit; what they write is moved into the run directory afterwards, in
+        # order, so a side file ends up the same as if they had run one after another in the run directory.
+        usages = [None] * len(programs)
+        errors = []
+        stager = Stager()
+
+        def program_directory(index):
+            return run_file('%s%s' % (program_directory_prefix, index))
+
+        def run_one(index, give_back=None):
+            tool, command, environment, inputs = programs[index]
+            try:
+                os.mkdir(program_directory(index))
+                for input_name in inputs:
+                    if os.path.exists(run_file(input_name)):
+                        stager.stage_file(run_file(input_name), os.path.join(program_directory(index), input_name))
+                usages[index] = run_program(tool, command, program_directory(index), environment)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                if give_back:
+                    give_back()
+
+        helpers = []
+        in_turn = []
+        for index in range(1, len(programs)):
+            give_back = borrow_worker()
+            if give_back:
+                helper = threading.Thread(target=in_task_context(run_one), args=(index, give_back))
+                helper.start()
+                helpers.append(helper)
+            else:
+                in_turn.append(index)
+        for index in [0] + in_turn:
+            run_one(index)
+        for helper in helpers:
+            helper.join()
+        for index, usage in enumerate(usages):
+            inputs = programs[index][3]
+            if os.path.isdir(program_directory(index)):
+                for file_name in os.listdir(program_directory(index)):
+                    file_path = os.path.join(program_directory(index), file_name)
+                    if file_name in inputs or not os.path.isfile(file_path):
+                        continue
+                    if os.path.exists(run_file(file_name)):
+                        os.remove(run_file(file_name))
+                    os.rename(file_path, run_file(file_name))
+                shutil.rmtree(program_directory(index))
+            if usage is not None:
+                tool_usage.add(usage)
+        if errors:
+            raise errors[0]
 
     try:
-        shutil.copy(idd_path, os.path.join(test_run_directory, 'Energy+.idd'))
+        # The suite normally stages the idd and weather file into the run directory already
+        if not os.path.exists(run_file('Energy+.idd')):
+            shutil.copy(idd_path, run_file('Energy+.idd'))
 
         # Copy the weather file into the simulation directory
-        if run_type != ForceRunType.DD:
-            shutil.copy(weather_file_name, os.path.join(test_run_directory, 'in.epw'))
-
-        # Switch to the simulation directory
-        os.chdir(test_run_directory)
+        if run_type != ForceRunType.DD and not os.path.exists(run_file('in.epw')):
+            shutil.copy(weather_file_name, run_file('in.epw'))
 
         # Run EPMacro as necessary
-        if os.path.exists('in.imf'):
-            with open('in.imf', 'rb') as f:
+        if os.path.exists(run_file('in.imf')):
+            with open(run_file('in.imf'), 'rb') as f:
                 lines = f.readlines()
             newlines = []
             for line in lines:
@@ -52,117 +196,118 @@ def execute_energyplus(build_tree, entry_name, test_run_directory,
                     newlines.append('')
                 else:
                     newlines.append(encoded_line)
-            with open('in.imf', 'w') as f:
+            with open(run_file('in.imf'), 'w') as f:
                 for line in newlines:
                     f.write(line)
-            macro_run = subprocess.Popen(epmacro, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            macro_run.communicate()
-            os.rename('out.idf', 'in.idf')
+            run_program_here(ToolUsage.EPMACRO, epmacro)
+            os.rename(run_file('out.idf'), run_file('in.idf'))
 
         # Run Preprocessor -- after EPMacro?
         if this_parametric_file:
-            parametric_run = subprocess.Popen(parametric + ' in.idf', shell=True, stdout=subprocess.PIPE,
-                                              stderr=subprocess.PIPE)
-            parametric_run.communicate()
-            candidate_files = glob.glob('in-*.idf')
+            run_program_here(ToolUsage.PARAMETRIC, parametric + ' in.idf')
+            candidate_files = glob.glob(run_file('in-*.idf'))
             if len(candidate_files) > 0:
                 file_to_run_here = sorted(candidate_files)[0]
-                if os.path.exists('in.idf'):
-                    os.remove('in.idf')
-                os.rename(file_to_run_here, 'in.idf')
+                if os.path.exists(run_file('in.idf')):
+                    os.remove(run_file('in.idf'))
+                os.rename(file_to_run_here, run_file('in.idf'))
             else:
-                return [build_tree['build_dir'], entry_name, False, False, current_process().name]
+                write_tool_usage(test_run_directory, tool_usage)
+                return [build_tree['build_dir'], entry_name, False, False, worker_name()]
 
         # Run ExpandObjects and process as necessary
-        expand_objects_run = subprocess.Popen(expandobjects, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        expand_objects_run.communicate()
-        if os.path.exists('expanded.idf'):
-            if os.path.exists('in.idf'):
-                os.remove('in.idf')
-            os.rename('expanded.idf', 'in.idf')
-
-            if os.path.exists('BasementGHTIn.idf'):
+        run_program_here(ToolUsage.EXPAND_OBJECTS, expandobjects)
+        if os.path.exists(run_file('expanded.idf')):
+            if os.path.exists(run_file('in.idf')):
+                os.remove(run_file('in.idf'))
+            os.rename(run_file('expanded.idf'), run_file('in.idf'))
+
+            # The basement and slab preprocessors read their own inputs, so they can run together; each reads its
+            # input file, its idd and the weather file from its directory.  What they write is appended to the input
+            # file afterwards, basement first
+            ground_programs = []
+            if os.path.exists(run_file('BasementGHTIn.idf')):
                 shutil.copy(basementidd, test_run_directory)
                 basement_environment = os.environ.copy()
                 basement_environment['CI_BASEMENT_NUMYEARS'] = '2'
-                basement_run = subprocess.Popen(
-                    basement, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=basement_environment
-                )
-                basement_run.communicate()
-                with open('EPObjects.TXT') as f:
+                ground_programs.append((ToolUsage.BASEMENT, basement, basement_environment,
+                                        ['BasementGHTIn.idf', os.path.basename(basementidd), 'in.epw']))
+            if os.path.exists(run_file('GHTIn.idf')):
+                shutil.copy(slabidd, test_run_directory)
+                ground_programs.append((ToolUsage.SLAB, slab, None,
+                                        ['GHTIn.idf', os.path.basename(slabidd), 'in.epw']))
+            run_programs_here(ground_programs)
+
+            if os.path.exists(run_file('BasementGHTIn.idf')):
+                with open(run_file('EPObjects.TXT')) as f:
                     append_text = f.read()
-                with open('in.idf', 'a') as f:
+                with open(run_file('in.idf'), 'a') as f:
                     f.write("\n%s\n" % append_text)
-                os.remove('RunINPUT.TXT')
-                os.remove('RunDEBUGOUT.TXT')
-                os.remove('EPObjects.TXT')
-                os.remove('BasementGHTIn.idf')
-                os.remove('MonthlyResults.csv')
-                os.remove('BasementGHT.idd')
-
-            if os.path.exists('GHTIn.idf'):
-                shutil.copy(slabidd, test_run_directory)
-                slab_run = subprocess.Popen(slab, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                slab_run.communicate()
-                with open('SLABSurfaceTemps.TXT') as f:
+                os.remove(run_file('RunINPUT.TXT'))
+                os.remove(run_file('RunDEBUGOUT.TXT'))
+                os.remove(run_file('EPObjects.TXT'))
+                os.remove(run_file('BasementGHTIn.idf'))
+                os.remove(run_file('MonthlyResults.csv'))
+                os.remove(run_file('BasementGHT.idd'))
+
+            if os.path.exists(run_file('GHTIn.idf')):
+                with open(run_file('SLABSurfaceTemps.TXT')) as f:
                     append_text = f.read()
-                with open('in.idf', 'a') as f:
+                with open(run_file('in.idf'), 'a') as f:
                     f.write("\n%s\n" % append_text)
-                os.remove('SLABINP.TXT')
-                os.remove('GHTIn.idf')
-                os.remove('SLABSurfaceTemps.TXT')
-                os.remove('SLABSplit Surface Temps.TXT')
-                os.remove('SlabGHT.idd')
+                os.remove(run_file('SLABINP.TXT'))
+                os.remove(run_file('GHTIn.idf'))
+                os.remove(run_file('SLABSurfaceTemps.TXT'))
+                os.remove(run_file('SLABSplit Surface Temps.TXT'))
+                os.remove(run_file('SlabGHT.idd'))
 
         # Set up environment
-        os.environ["DISPLAYADVANCEDREPORTVARIABLES"] = "YES"
-        os.environ["DISPLAYALLWARNINGS"] = "YES"
+        eplus_environment = os.environ.copy()
+        eplus_environment["DISPLAYADVANCEDREPORTVARIABLES"] = "YES"
+        eplus_environment["DISPLAYALLWARNINGS"] = "YES"
         if run_type == ForceRunType.DD:
-            os.environ["DDONLY"] = "Y"
-            os.environ["REVERSEDD"] = ""
-            os.environ["FULLANNUALRUN"] = ""
+            eplus_environment["DDONLY"] = "Y"
+            eplus_environment["REVERSEDD"] = ""
+            eplus_environment["FULLANNUALRUN"] = ""
         elif run_type == ForceRunType.ANNUAL:
-            os.environ["DDONLY"] = ""
-            os.environ["REVERSEDD"] = ""
-            os.environ["FULLANNUALRUN"] = "Y"
+            eplus_environment["DDONLY"] = ""
+            eplus_environment["REVERSEDD"] = ""
+            eplus_environment["FULLANNUALRUN"] = "Y"
         elif run_type == ForceRunType.NONE:
-            os.environ["DDONLY"] = ""
-            os.environ["REVERSEDD"] = ""
-            os.environ["FULLANNUALRUN"] = ""
+            eplus_environment["DDONLY"] = ""
+            eplus_environment["REVERSEDD"] = ""
+            eplus_environment["FULLANNUALRUN"] = ""
         else:
             pass
             # nothing
 
         # use the user-entered minimum reporting frequency
         #  (useful for limiting to daily outputs for annual simulation, etc.)
-        os.environ["MINREPORTFREQUENCY"] = min_reporting_freq.upper()
+        eplus_environment["MINREPORTFREQUENCY"] = min_reporting_freq.upper()
 
         # Execute EnergyPlus
-        eplus_run = subprocess.Popen(energyplus, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        eplus_run.communicate()
+        run_program_here(ToolUsage.ENERGYPLUS, energyplus, eplus_environment)
 
-        # Execute readvars
-        if os.path.exists('in.rvi'):
-            csv_run = subprocess.Popen(readvars + ' in.rvi', shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        else:
-            csv_run = subprocess.Popen(readvars, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        csv_run.communicate()
-        if os.path.exists('in.mvi'):
-            mtr_run = subprocess.Popen(readvars + ' in.mvi', shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        else:
-            with open('in.mvi', 'w') as f:
-                f.write("eplusout.mtr\n")
-                f.write("eplusmtr.csv\n")
-            mtr_run = subprocess.Popen(readvars + ' in.mvi', shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        mtr_run.communicate()
+        # Execute readvars, unless the eso and mtr files are diffed directly; the eso and the mtr conversions are
+        # independent of each other, and run together when the suite has a worker to spare
+        if not skip_read_vars:
+            if not os.path.exists(run_file('in.mvi')):
+                with open(run_file('in.mvi'), 'w') as f:
+                    f.write("eplusout.mtr\n")
+                    f.write("eplusmtr.csv\n")
+            run_programs_here([
+                (ToolUsage.READ_VARS, readvars + (' in.rvi' if os.path.exists(run_file('in.rvi')) else ''),
+                 eplus_environment, ['in.rvi', 'eplusout.eso']),
+                (ToolUsage.READ_VARS, readvars + ' in.mvi', eplus_environment, ['in.mvi', 'eplusout.mtr']),
+            ])
 
-        os.remove('Energy+.idd')
-        return [build_tree['build_dir'], entry_name, True, False, current_process().name]
+        os.remove(run_file('Energy+.idd'))
+        write_tool_usage(test_run_directory, tool_usage)
+        return [build_tree['build_dir'], entry_name, True, False, worker_name()]
 
     except Exception as e:
-        with open("aa_testSuite_error.txt", 'w') as f:
-            print(e, file=f)
-        return [build_tree['build_dir'], entry_name, False, False, current_process().name]
-
-    finally:
-        os.chdir(start_path)
+        if os.path.isdir(test_run_directory):
+            with open(run_file("aa_testSuite_error.txt"), 'w') as f:
+                print(e, file=f)
+            write_tool_usage(test_run_directory, tool_usage)
+        return [build_tree['build_dir'], entry_name, False, False, worker_name()]
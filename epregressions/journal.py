@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+
+from epregressions.structures import TestEntry
+
+
+class ResultsJournal:
+    """An append-only record of the simulations and diffs of a suite, one JSON object per line.
+
+    Every simulation and every diffed case is written to the journal in the suite's output directory as soon as it
+    finishes, and flushed to disk, so the results of an interrupted suite aren't lost with it.  A suite resumed in the
+    same output directory reads the journal back a line at a time to find the work that is already done.  A line cut
+    short by the interruption is ignored, and cut off before the resumed suite adds its own records.  The results
+    summary of the suite is written from the journal too, one case at a time."""
+
+    file_name = 'journal.jsonl'
+
+    def __init__(self, results_dir):
+        self.file_path = os.path.join(results_dir, self.file_name)
+        self.torn_record_removed = False
+
+    def records(self):
+        """The records in the journal, in the order they were written"""
+        if not os.path.exists(self.file_path):
+            return
+        with io.open(self.file_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # the suite was interrupted while writing this record
+
+    def read(self):
+        """Returns the finished simulations, as {(build, case name): success}, and the entries of the diffed cases,
+        as {case name: TestEntry}"""
+        simulations = {}
+        entries = {}
+        for record in self.records():
+            if record['event'] == 'simulation':
+                simulations[(record['build'], record['case'])] = record['success']
+            elif record['event'] == 'diff':
+                entries[record['case']] = TestEntry.from_dict(record['entry'])
+        return simulations, entries
+
+    def diff_positions(self):
+        """The position in the journal of the last diff record of each case, as {case name: offset}"""
+        positions = {}
+        if not os.path.exists(self.file_path):
+            return positions
+        with io.open(self.file_path, 'rb') as f:
+            position = 0
+            for line in f:
+                try:
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    record = None  # the suite was interrupted while writing this record
+                if record and record['event'] == 'diff':
+                    positions[record['case']] = position
+                position += len(line)
+        return positions
+
+    def entries(self, case_names):
+        """The entries of the diffed cases among case_names, as their to_dict, in that order.  Each one is read back
+        from the journal when it is needed, so a summary written from these never holds all of them at once."""
+        positions = self.diff_positions()
+        if not positions:
+            return
+        with io.open(self.file_path, 'rb') as f:
+            for case_name in case_names:
+                if case_name in positions:
+                    f.seek(positions[case_name])
+                    yield json.loads(f.readline().decode('utf-8'))['entry']
+
+    def remove_torn_record(self):
+        """Truncate the journal back to its last complete line, so the next record starts on a line of its own"""
+        if not os.path.exists(self.file_path):
+            return
+        with io.open(self.file_path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            position = end
+            while position > 0:
+                chunk_start = max(0, position - 4096)
+                f.seek(chunk_start)
+                newline = f.read(position - chunk_start).rfind(b'\n')
+                if newline >= 0:
+                    position = chunk_start + newline + 1
+                    break
+                position = chunk_start
+            if position < end:
+                f.truncate(position)
+
+    def append(self, record):
+        if not self.torn_record_removed:
+            self.remove_torn_record()
+            self.torn_record_removed = True
+        with io.open(self.file_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record_simulation(self, build, case_name, success):
+        self.append({'event': 'simulation', 'build': build, 'case': case_name, 'success': bool(success)})
+
+    def record_diff(self, this_entry):
+        self.append({'event': 'diff', 'case': this_entry.basename, 'entry': this_entry.to_dict()})
@@ -599,20 +599,19 @@ class RegressionGUI(Gtk.Window):
         this_h_box.pack_start(alignment, False, False, box_spacing)
         notebook_page_suite_options.pack_start(this_h_box, False, False, box_spacing)
 
-        # multi-threading in the GUI doesn't works in windows, so don't add the spin-button if we are on windows
-        if platform() != Platforms.Windows:
-            num_threads_box = Gtk.HBox(homogeneous=False, spacing=box_spacing)
-            self.suite_option_num_threads = Gtk.SpinButton()
-            self.suite_option_num_threads.set_range(1, cpu_count())
-            self.suite_option_num_threads.set_increments(1, 4)
-            self.suite_option_num_threads.spin(Gtk.SpinType.PAGE_FORWARD, 1)
-            self.suite_option_num_threads.connect("value-changed", self.suite_option_handler_num_threads)
-            num_threads_label = Gtk.Label(label="Number of threads to use for suite: ")
-            num_threads_label_aligner = Gtk.Alignment(xalign=0.0, yalign=0.5, xscale=1.0, yscale=0.0)
-            num_threads_label_aligner.add(num_threads_label)
-            num_threads_box.pack_start(num_threads_label_aligner, False, False, box_spacing)
-            num_threads_box.pack_start(self.suite_option_num_threads, True, True, box_spacing)
-            notebook_page_suite_options.pack_start(num_threads_box, False, False, box_spacing)
+        # worker processes can't be started from the GUI on windows, but the suite runs on threads there instead
+        num_threads_box = Gtk.HBox(homogeneous=False, spacing=box_spacing)
+        self.suite_option_num_threads = Gtk.SpinButton()
+        self.suite_option_num_threads.set_range(1, cpu_count())
+        self.suite_option_num_threads.set_increments(1, 4)
+        self.suite_option_num_threads.spin(Gtk.SpinType.PAGE_FORWARD, 1)
+        self.suite_option_num_threads.connect("value-changed", self.suite_option_handler_num_threads)
+        num_threads_label = Gtk.Label(label="Number of threads to use for suite: ")
+        num_threads_label_aligner = Gtk.Alignment(xalign=0.0, yalign=0.5, xscale=1.0, yscale=0.0)
+        num_threads_label_aligner.add(num_threads_label)
+        num_threads_box.pack_start(num_threads_label_aligner, False, False, box_spacing)
+        num_threads_box.pack_start(self.suite_option_num_threads, True, True, box_spacing)
+        notebook_page_suite_options.pack_start(num_threads_box, False, False, box_spacing)
 
         h_box_1 = Gtk.HBox(homogeneous=False, spacing=box_spacing)
         label1 = Gtk.Label(label="Select a test suite run configuration: ")
@@ -1229,11 +1228,8 @@ class RegressionGUI(Gtk.Window):
             self.case_2_run = True
             self.case_2_type = KnownBuildTypes.Makefile
 
-        # Build the run configuration and the number of threads; using 1 for
-        #  windows causes the runtests script to not even use the multi-thread libraries
-        self.num_threads_to_run = 1
-        if this_platform != Platforms.Windows:
-            self.num_threads_to_run = 4
+        # Build the run configuration and the number of threads
+        self.num_threads_to_run = 4
 
         self.force_run_type = ForceRunType.NONE
         self.report_frequency = ReportingFreq.HOURLY
@@ -1296,7 +1292,8 @@ class RegressionGUI(Gtk.Window):
             num_threads=self.num_threads_to_run,
             report_freq=self.report_frequency,
             build_a=build_a,
-            build_b=build_b
+            build_b=build_b,
+            use_threads=platform() == Platforms.Windows
         )
 
         # Now create a file list to pass in
@@ -3,18 +3,27 @@
 from __future__ import unicode_literals
 
 import argparse
+import copy
 from datetime import datetime
+import glob
 import io
 import json
 import os
 import shutil
 import sys
+import time
 
 from difflib import unified_diff  # python's own diff library
-from multiprocessing import Process, Queue, freeze_support  # add stuff to either make series calls, or multi-threading
-
-from epregressions.diffs import math_diff, table_diff, thresh_dict as td
-from epregressions import energyplus
+from multiprocessing import freeze_support
+
+from epregressions.baseline import BaselineStore, build_digest, source_commit
+from epregressions.broker import TaskBroker, authkey_variable, read_authkey
+from epregressions.cache import SimulationCache
+from epregressions.diffs import eso_diff, fingerprint, math_diff, sql_diff, table_diff, thresh_dict as td
+from epregressions import energyplus, scratch
+from epregressions.journal import ResultsJournal
+from epregressions.scheduler import RuntimeHistory, TaskScheduler, killed_error, projected_makespan
+from epregressions.staging import StageMethod, Stager
 from epregressions.structures import (
     ForceRunType,
     TextDifferences,
@@ -25,6 +34,7 @@ from epregressions.structures import (
     ReportingFreq,
     TestEntry
 )
+from epregressions.trace import SuiteTrace
 
 
 # get the current file path for convenience
@@ -33,22 +43,96 @@ script_dir = os.path.abspath(path)
 
 
 class TestRunConfiguration:
-    def __init__(self, force_run_type, num_threads, report_freq, build_a, build_b, single_test_run=False):
+    def __init__(self, force_run_type, num_threads, report_freq, build_a, build_b, single_test_run=False,
+                 pipeline=False, math_diff_engine=math_diff.MathDiffEngine.PYTHON, cache_dir=None,
+                 cache_size=SimulationCache.default_max_size, baseline_store=None, baseline_id=None,
+                 simulation_timeout=None, runtime_history=None, use_threads=False, link_inputs=True,
+                 eso_diffs=False, sql_diffs=False, resume_dir=None, broker_address=None, broker_key=None,
+                 memory_budget=None, trace=False, scratch_dir=None, scratch_keep=None, scratch_min_free=1024.0):
         self.force_run_type = force_run_type
         self.TestOneFile = single_test_run
         self.num_threads = num_threads
         self.buildA = build_a
         self.buildB = build_b
         self.report_freq = report_freq
+        self.pipeline = pipeline
+        self.math_diff_engine = math_diff_engine
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.baseline_store = baseline_store
+        self.baseline_id = baseline_id
+        self.simulation_timeout = simulation_timeout
+        self.runtime_history = runtime_history
+        self.use_threads = use_threads
+        self.link_inputs = link_inputs
+        self.eso_diffs = eso_diffs
+        self.sql_diffs = sql_diffs
+        self.resume_dir = resume_dir
+        self.broker_address = broker_address
+        self.broker_key = broker_key
+        self.memory_budget = memory_budget
+        self.trace = trace
+        self.scratch_dir = scratch_dir
+        self.scratch_keep = scratch_keep
+        self.scratch_min_free = scratch_min_free
 
 
 class TestCaseCompleted:
-    def __init__(self, run_directory, case_name, run_status, error_msg_reported_already, name_of_thread):
+    def __init__(self, run_directory, case_name, run_status, error_msg_reported_already, name_of_thread,
+                 tool_usage=None):
         self.run_directory = run_directory
         self.case_name = case_name
         self.run_success = run_status
         self.name_of_thread = name_of_thread
         self.muffle_err_msg = error_msg_reported_already
+        self.tool_usage = tool_usage  # what each program run for the simulation took, when it was simulated
+
+
+def diff_worker(runner, this_entry, ci_mode=False):  # pragma: no cover - runs in a child process
+    """Process the diffs for a single case inside a pool worker.
+
+    Messages are collected and handed back so that the parent can push them through its own print callback,
+    along with the updated entry, the text of any unexpected exception and the spans of the trace.  The runner is
+    copied first, without its callbacks, in case the worker is a thread sharing it with the parent and the other
+    workers."""
+    messages = []
+    runner = copy.copy(runner)
+    runner.print_callback = messages.append
+    runner.trace = runner.trace.fork(energyplus.worker_name())
+    try:
+        with runner.trace.span('Diff', 'diff', case=this_entry.basename):
+            this_entry = runner.process_diffs_for_one_case(this_entry, ci_mode)
+        return this_entry, messages, None, runner.trace.events
+    except Exception as e:
+        return this_entry, messages, str(e), runner.trace.events
+
+
+def remote_diff_worker(runner, this_entry, case_result_dir_1, case_result_dir_2):  # pragma: no cover - remote worker
+    """diff_worker on a remote worker, which is handed copies of the two run directories of the case.  The diffs are
+    written into the first, like in ci mode, where the build directories are the run directories."""
+    runner = copy.copy(runner)
+    runner.build_tree_a = dict(runner.build_tree_a, build_dir=case_result_dir_1)
+    runner.build_tree_b = dict(runner.build_tree_b, build_dir=case_result_dir_2)
+    return diff_worker(runner, this_entry, ci_mode=True)
+
+
+def prepare_worker(runner, build_tree, this_entry):  # pragma: no cover - runs in a child process, coverage misses this
+    """Prepare the run directory of one case of one build inside a pool worker.
+
+    Like diff_worker, the messages and completed cases are handed back for the parent to report, along with the
+    staging counts of this case, the spans of the trace and the execute_energyplus arguments, or None if the case
+    can't be run.  With a simulation cache, the prepared run directory is hashed here too, for the cache_inputs."""
+    messages = []
+    completed_cases = []
+    runner = copy.copy(runner)
+    runner.print_callback = messages.append
+    runner.case_completed_callback = completed_cases.append
+    runner.stager = Stager(runner.stager.methods)
+    runner.trace = runner.trace.fork(energyplus.worker_name())
+    with runner.trace.span('Prepare', 'preparation', case=this_entry.basename, build=runner.build_name(build_tree)):
+        these_args = runner.prepare_case(build_tree, this_entry)
+        cache_inputs = runner.cache_inputs(these_args, runner.stager.take_staged())
+    return these_args, cache_inputs, messages, completed_cases, runner.stager, runner.trace.events
 
 
 # the actual main test suite run class
@@ -71,6 +155,32 @@ class SuiteRunner:
         self.TestOneFile = run_config.TestOneFile
         self.number_of_threads = int(run_config.num_threads)
         self.min_reporting_freq = run_config.report_freq
+        self.pipeline = run_config.pipeline
+        self.math_diff_engine = run_config.math_diff_engine
+        self.eso_diffs = run_config.eso_diffs
+        self.sql_diffs = run_config.sql_diffs
+        self.simulation_timeout = run_config.simulation_timeout
+        self.runtime_history_files = run_config.runtime_history
+        self.runtime_history = RuntimeHistory()
+        self.use_threads = run_config.use_threads
+        # simulations are only started together while their peak memory in earlier suites fits in the budget, in MB
+        self.memory_budget = run_config.memory_budget
+        self.memory_retries = set()  # (build, case name) of the runs killed once already, for running out of memory
+        # the spans of the preparation, simulation and diffs of every case, written out as a Chrome trace if enabled
+        self.trace = SuiteTrace(run_config.trace)
+        # simulations run in a local scratch directory, and only the outputs worth keeping are copied back
+        self.scratch = None
+        if run_config.scratch_dir:
+            keep = scratch.kept_outputs + (scratch.eso_outputs if self.eso_diffs else [])
+            self.scratch = scratch.ScratchSpace(
+                run_config.scratch_dir, keep + list(run_config.scratch_keep or []), run_config.scratch_min_free
+            )
+        self.cache = None
+        self.caching = bool(run_config.cache_dir)  # the cache itself stays in the parent, this goes to the workers
+        if run_config.cache_dir:
+            self.cache = SimulationCache(run_config.cache_dir, run_config.cache_size)
+        # the shared, read-only inputs are linked into the run directories unless copies are asked for
+        self.stager = Stager() if run_config.link_inputs else Stager([StageMethod.COPY])
 
         # File list brought in separately
         self.entries = these_entries
@@ -84,19 +194,47 @@ class SuiteRunner:
         # Settings/paths defined relative to this script
         self.path_to_file_list = os.path.join(script_dir, "files_to_run.txt")
         self.thresh_dict_file = os.path.join(script_dir, 'diffs', "math_diff.config")
+        # parsed once for the suite; it goes along to the workers with the rest of this instance
+        self.thresh_dict = td.ThreshDict(self.thresh_dict_file)
         self.math_diff_executable = os.path.join(script_dir, "math_diff.py")
         self.table_diff_executable = os.path.join(script_dir, "table_diff.py")
 
         # Settings/paths defined relative to the buildA/buildB test directories
         # the tests directory will be different based on forceRunType
         if self.force_run_type == ForceRunType.ANNUAL:
-            self.test_output_dir = "Tests-Annual"
+            self.test_run_name = "Tests-Annual"
         elif self.force_run_type == ForceRunType.DD:
-            self.test_output_dir = "Tests-DDOnly"
+            self.test_run_name = "Tests-DDOnly"
         elif self.force_run_type == ForceRunType.NONE:
-            self.test_output_dir = "Tests"
+            self.test_run_name = "Tests"
         i = datetime.now()
-        self.test_output_dir += i.strftime('_%Y%m%d_%H%M%S')
+        self.test_output_dir = self.test_run_name + i.strftime('_%Y%m%d_%H%M%S')
+
+        # An interrupted suite is picked up in its own output directory, skipping the work in its journal
+        self.resume = bool(run_config.resume_dir)
+        if self.resume:
+            self.test_output_dir = os.path.basename(os.path.normpath(run_config.resume_dir))
+        self.journal = None
+        self.resumed_simulations = {}  # (build, case name): success
+        self.resumed_entries = {}  # case name: TestEntry
+
+        # Simulations and diffs can be served to workers on other hosts instead of being run here
+        self.broker_address = run_config.broker_address
+        self.broker_key = run_config.broker_key
+        self.broker = None
+        # the shared inputs staged into each prepared run directory, which the broker sends to each worker once
+        self.shared_inputs = {}
+
+        # Build A results shared between suites, keyed on the baseline and everything that changes the outputs
+        self.baseline = None
+        if run_config.baseline_store and run_config.baseline_id:
+            self.baseline = BaselineStore(
+                run_config.baseline_store,
+                run_config.baseline_id,
+                build_digest(self.build_tree_a),
+                # without ReadVarsESO there are no csv outputs, so those runs can't stand in for the usual ones
+                '%s-%s%s' % (self.test_run_name, self.min_reporting_freq, '-eso' if self.eso_diffs else '')
+            )
 
         # Filename specification, not path specific
         self.ep_in_filename = "in.idf"
@@ -108,6 +246,22 @@ class SuiteRunner:
         if self.number_of_threads == 1:
             freeze_support()
 
+    def __getstate__(self):
+        # this instance gets pickled over to worker processes; the callbacks may reference GUI objects that can't be
+        # pickled, and the workers are handed the one entry they need, so don't ship the whole list every time
+        state = self.__dict__.copy()
+        for callback in ['print_callback', 'starting_callback', 'case_completed_callback',
+                         'simulations_complete_callback', 'diff_completed_callback', 'all_done_callback',
+                         'cancel_callback']:
+            state[callback] = None
+        state['entries'] = []
+        state['cache'] = None  # only the parent process reads and writes the cache
+        state['journal'] = None  # or the journal
+        state['broker'] = None  # or serves the remote workers
+        state['shared_inputs'] = {}
+        state['resumed_entries'] = {}
+        return state
+
     def run_test_suite(self):
 
         # reset this flag
@@ -120,23 +274,58 @@ class SuiteRunner:
             self.my_cancelled()
             return
 
+        self.journal = ResultsJournal(os.path.join(self.build_tree_a['build_dir'], self.test_output_dir))
+        if self.resume:
+            self.resumed_simulations, self.resumed_entries = self.journal.read()
+            self.my_print('Resuming the suite in <build-dir>/%s; %s simulations and %s diffs were already done' % (
+                self.test_output_dir, len(self.resumed_simulations), len(self.resumed_entries)
+            ))
+
+        if self.baseline:
+            if self.baseline.cases:
+                self.my_print('Reading build A results from baseline at %s' % self.baseline.run_directory)
+            elif self.run_case_a:
+                self.baseline.start_staging()
+                self.my_print('Build A results will be stored as a baseline at %s' % self.baseline.run_directory)
+
+        self.load_runtime_history()
+
+        if self.scratch:
+            if self.broker_address:
+                self.my_print('Remote workers run the simulations in their own --scratch-dir, ignoring the local one')
+                self.scratch = None
+            else:
+                if not os.path.exists(self.scratch.directory):
+                    os.makedirs(self.scratch.directory)
+                self.my_print('Running the simulations in %s while they leave %.0f MB free there' % (
+                    self.scratch.directory, self.scratch.min_free_mb
+                ))
+
         num_builds = 2
         self.my_starting(num_builds, len(self.entries))
 
-        # run the energyplus script
-        if self.run_case_a:
-            self.run_build(self.build_tree_a)
-            if self.id_like_to_stop_now:  # pragma: no cover
-                self.my_cancelled()
-                return
-        if self.run_case_b:
-            self.run_build(self.build_tree_b)
-            if self.id_like_to_stop_now:  # pragma: no cover
-                self.my_cancelled()
-                return
-        self.my_simulationscomplete()
+        if self.broker_address:
+            self.broker = TaskBroker(self.broker_address, self.broker_key, self.number_of_threads, self.my_print)
+            self.my_print('Serving simulations and diffs to remote workers at %s:%s' % self.broker.address)
+        try:
+            response = self.run_simulations_and_diffs()
+        finally:
+            if self.broker:
+                self.broker.close()
+                self.broker = None
+        # the shared inputs staged into each prepared run directory, which the broker sends to each worker once
+        self.shared_inputs = {}
+        if response is None:  # pragma: no cover
+            self.my_cancelled()
+            return
 
-        response = self.diff_logs_for_build()
+        self.my_print(self.stager.summary())
+
+        if self.cache:
+            self.my_print(self.cache.summary())
+
+        if self.baseline and self.baseline.publish():
+            self.my_print('Stored build A results as a baseline at %s' % self.baseline.run_directory)
 
         try:
             self.my_print('Writing runtime summary file')
@@ -149,11 +338,24 @@ class SuiteRunner:
         try:
             self.my_print('Writing simulation results summary file')
             json_file_path = os.path.join(self.build_tree_a['build_dir'], self.test_output_dir, 'test_results.json')
-            response.to_json_summary(json_file_path)
+            # from the journal, so the results of every case aren't held in memory at once to write it
+            response.to_json_summary(
+                json_file_path, lambda: self.journal.entries([this_entry.basename for this_entry in self.entries])
+            )
             self.my_print('Results summary written successfully')
         except Exception as this_exception:  # pragma: no cover
             self.my_print('Could not write results summary file: ' + str(this_exception))
 
+        if self.trace.enabled:
+            try:
+                trace_file_path = os.path.join(
+                    self.build_tree_a['build_dir'], self.test_output_dir, SuiteTrace.file_name
+                )
+                self.trace.write(trace_file_path)
+                self.my_print('Trace of the suite written to %s' % trace_file_path)
+            except Exception as this_exception:  # pragma: no cover
+                self.my_print('Could not write the trace of the suite: ' + str(this_exception))
+
         self.my_print("Test suite complete for directories:")
         self.my_print("\t%s" % self.build_tree_a['build_dir'])
         self.my_print("\t%s" % self.build_tree_b['build_dir'])
@@ -162,6 +364,73 @@ class SuiteRunner:
         self.my_alldone(response)
         return response
 
+    def run_simulations_and_diffs(self):
+        """Run the simulations and diffs of the suite, returning the completed structure, or None if cancelled"""
+        if self.pipeline and (self.number_of_threads > 1 or self.broker):
+            # simulations and diffs share one pool, each case is diffed as soon as its simulations finish
+            response = self.run_pipelined()
+            if self.id_like_to_stop_now:  # pragma: no cover
+                return None
+            return response
+
+        # run the energyplus script
+        if self.run_case_a:
+            self.run_build(self.build_tree_a)
+            if self.id_like_to_stop_now:  # pragma: no cover
+                return None
+        if self.run_case_b:
+            self.run_build(self.build_tree_b)
+            if self.id_like_to_stop_now:  # pragma: no cover
+                return None
+        self.my_simulationscomplete()
+
+        return self.diff_logs_for_build()
+
+    def new_scheduler(self, max_workers):
+        """The broker when tasks are served to remote workers, otherwise a new local pool"""
+        if self.broker:
+            return self.broker
+        return TaskScheduler(max_workers, self.my_print, memory_budget=self.memory_budget)
+
+    def submit_simulation(self, scheduler, key, these_args):
+        if self.broker:
+            # the run directory is sent along with the simulation, and its outputs come back into it
+            scheduler.submit_remote(
+                key, energyplus.execute_energyplus, these_args, [(these_args[2], these_args[2])],
+                self.simulation_timeout, priority=True, shared_inputs=self.shared_inputs.get(these_args[2], [])
+            )
+        else:
+            build = self.build_name(these_args[0])
+            func, args = energyplus.execute_energyplus, these_args
+            if self.scratch and self.reserve_scratch(these_args):
+                func = scratch.execute_in_scratch
+                args = (these_args, self.scratch_run_directory(these_args))
+            scheduler.submit(
+                key, func, args, self.simulation_timeout, priority=True,
+                thread=self.use_threads,
+                memory=self.runtime_history.memory_estimate(these_args[1], 0 if build == 'a' else 1),
+                exclusive=(build, these_args[1]) in self.memory_retries
+            )
+
+    def submit_diff(self, scheduler, key, this_entry, priority=False):
+        if self.broker:
+            # both run directories are sent along, and only the diff files come back, into build A's directory
+            out_dir = os.path.join(self.build_tree_a['build_dir'], self.test_output_dir, this_entry.basename)
+            case_result_dir_1 = out_dir
+            if self.baseline and self.baseline.has_case(this_entry.basename):
+                case_result_dir_1 = self.baseline.case_directory(this_entry.basename)
+            case_result_dir_2 = os.path.join(self.build_tree_b['build_dir'], self.test_output_dir, this_entry.basename)
+            shared_inputs = []
+            for case_result_dir in [case_result_dir_1, case_result_dir_2]:
+                shared_inputs.extend(self.shared_inputs.get(case_result_dir, []))
+            scheduler.submit_remote(
+                key, remote_diff_worker, (self, this_entry, case_result_dir_1, case_result_dir_2),
+                [(case_result_dir_1, out_dir), (case_result_dir_2, None)], priority=priority,
+                shared_inputs=shared_inputs
+            )
+        else:
+            scheduler.submit(key, diff_worker, (self, this_entry), priority=priority, thread=self.use_threads)
+
     def prepare_dir_structure(self, b_a, b_b, d_test):
 
         # make tests directory as needed
@@ -175,201 +444,519 @@ class SuiteRunner:
 
     def run_build(self, build_tree):
 
-        this_test_dir = self.test_output_dir
-        local_run_type = self.force_run_type
-
-        # Create queues for threaded operation
-        task_queue = Queue()
-        done_queue = Queue()
-
-        # Create a job list
-        energy_plus_runs = []
-
-        # loop over all entries
-        for this_entry in self.entries:
-
-            # first remove the previous test directory for this file and rename it
-            test_run_directory = os.path.join(build_tree['build_dir'], this_test_dir, this_entry.basename)
-            if os.path.exists(test_run_directory):  # pragma: no cover - dir name is generated by local timestamp now
-                shutil.rmtree(test_run_directory)
-            os.mkdir(test_run_directory)
-
-            # establish the absolute path to the idf or imf, and append .idf or .imf as necessary
-            idf_base = os.path.join(build_tree['test_files_dir'], this_entry.basename)
-            idf_base = idf_base.strip()
-            idf_path = idf_base + ".idf"
-            imf_path = idf_base + ".imf"
-
-            parametric_file = False
-            if os.path.exists(idf_path):
-
-                # copy the idf into the test directory, renaming to in.idf
-                shutil.copy(idf_path, os.path.join(test_run_directory, self.ep_in_filename))
-
-                # read in the entire text of the idf to do some special operations;
-                # could put in one line, but the with block ensures the file handle is closed
-                with io.open(os.path.join(test_run_directory, self.ep_in_filename), encoding='utf-8', errors='ignore') as f_idf:
-                    idf_text = f_idf.read()  # EDWIN: Make sure this reads the IDF properly
-                    # idf_text = unicode(idf_text, errors='ignore')
-
-                # if the file requires the window 5 data set file, bring it into the test run directory
-                if 'Window5DataFile.dat' in idf_text:
-                    os.mkdir(os.path.join(test_run_directory, 'datasets'))
-                    shutil.copy(os.path.join(build_tree['data_sets_dir'], 'Window5DataFile.dat'),
-                                os.path.join(test_run_directory, 'datasets'))
-                    idf_text = idf_text.replace('..\\datasets\\Window5DataFile.dat', 'datasets/Window5DataFile.dat')
-
-                # if the file requires the TDV data set file, bring it
-                #  into the test run directory, right now I think it's broken
-                if 'DataSets\\TDV' in idf_text or 'DataSets\\\\TDV' in idf_text:
-                    os.mkdir(os.path.join(test_run_directory, 'datasets'))
-                    os.mkdir(os.path.join(test_run_directory, 'datasets', 'TDV'))
-                    tdv_dir = os.path.join(build_tree['data_sets_dir'], 'TDV')
-                    src_files = os.listdir(tdv_dir)
-                    for file_name in src_files:
-                        full_file_name = os.path.join(tdv_dir, file_name)
-                        if os.path.isfile(full_file_name):
-                            shutil.copy(
-                                full_file_name,
-                                os.path.join(test_run_directory, 'datasets', 'TDV')
-                            )
-                    idf_text = idf_text.replace(
-                        '..\\datasets\\TDV\\TDV_2008_kBtu_CTZ06.csv',
-                        os.path.join('datasets', 'TDV', 'TDV_2008_kBtu_CTZ06.csv')
-                    )
+        # Create a job list, leaving out the cases read from the baseline
+        cases = [
+            (index, build_tree, this_entry) for index, this_entry in enumerate(self.entries)
+            if not self.already_run(build_tree, this_entry)
+        ]
 
-                if 'HybridZoneModel_TemperatureData.csv' in idf_text:
-                    shutil.copy(
-                        os.path.join(build_tree['test_files_dir'], 'HybridZoneModel_TemperatureData.csv'),
-                        os.path.join(test_run_directory, 'HybridZoneModel_TemperatureData.csv')
-                    )
+        if self.number_of_threads == 1 and not self.broker:
+            for _, _, this_entry in cases:
+                if self.id_like_to_stop_now:  # pragma: no cover
+                    return  # self.my_cancelled() is called in parent function
+                with self.trace.span('Prepare', 'preparation', case=this_entry.basename,
+                                     build=self.build_name(build_tree)):
+                    these_args = self.prepare_case(build_tree, this_entry)
+                    cache_inputs = self.cache_inputs(these_args, self.stager.take_staged())
+                if not these_args:
+                    continue
+                cache_entry, ret = self.restore_cached_run(these_args, cache_inputs)
+                if not ret:
+                    ret = self.simulate(these_args)
+                    self.trace_simulation(these_args, ret)
+                    self.simulation_finished(ret, cache_entry, these_args)
+                self.run_completed(these_args, ret)
+        else:
+            # each case is prepared by a worker, and its simulation queued as soon as it is ready
+            cases, projected_time = self.longest_first(cases)
+            start_time = time.time()
+            scheduler = self.new_scheduler(self.number_of_threads)
+            for index, build_tree, this_entry in cases:
+                self.submit_preparation(scheduler, index, build_tree, this_entry)
+            try:
+                while scheduler.busy():
+                    if self.id_like_to_stop_now:  # pragma: no cover
+                        return  # self.my_cancelled() is called in parent function
+                    for (task_type, index, first, second), ret, error in scheduler.wait():
+                        if task_type == 'prepare':
+                            self.case_prepared(scheduler, index, first, second, ret, error)
+                        else:
+                            self.case_simulated(scheduler, index, first, second, ret, error, task_type)
+            finally:
+                scheduler.cancel()  # only does anything if the suite was cancelled
+                self.my_print(scheduler.summary())
+            self.report_makespan(projected_time, start_time)
+
+    def submit_preparation(self, scheduler, index, build_tree, this_entry):
+        scheduler.submit(
+            ('prepare', index, build_tree, this_entry), prepare_worker, (self, build_tree, this_entry),
+            thread=self.use_threads
+        )
 
-                if 'report variable dictionary' in idf_text:
-                    idf_text = idf_text.replace('report variable dictionary', '')
+    def case_prepared(self, scheduler, index, build_tree, this_entry, result, error):
+        """Report a finished prepare_worker task and queue the simulation it prepared ahead of the cases still waiting
+        to be prepared, returning False if there is nothing to simulate"""
+        if error:
+            self.my_print('Preparation of %s for %s failed: %s' % (this_entry.basename, build_tree['build_dir'], error))
+            self.my_casecompleted(TestCaseCompleted(build_tree['build_dir'], this_entry.basename, False, False, ''))
+            return False
+        these_args, cache_inputs, messages, completed_cases, stager, trace_events = result
+        self.trace.merge(trace_events)
+        for message in messages:
+            self.my_print(message)
+        for completed_case in completed_cases:
+            self.my_casecompleted(completed_case)
+        self.stager.merge(stager)
+        if not these_args:
+            return False
+        # a process worker hands back a copy of the build tree, and build trees are told apart by identity
+        these_args = (build_tree,) + tuple(these_args[1:])
+        cache_entry, ret = self.restore_cached_run(these_args, cache_inputs)
+        if ret:
+            self.run_completed(these_args, ret)
+            return False
+        if self.broker:
+            self.shared_inputs[these_args[2]] = [os.path.join(these_args[2], path) for path in cache_inputs[1]]
+        self.submit_simulation(scheduler, ('simulation', index, cache_entry, these_args), these_args)
+        return True
+
+    def case_simulated(self, scheduler, index, cache_entry, these_args, ret, error, task_type='simulation'):
+        """Report a finished simulation, returning True instead if it was killed for running out of memory and queued
+        again, to be prepared from scratch and run on its own, or if it ran in the scratch directory and its outputs are
+        first copied back in the background; the task_type of that copy is 'copy_back'"""
+        ran_in_scratch = self.scratch and self.scratch.is_reserved(self.scratch_run_directory(these_args))
+        if task_type == 'simulation' and ran_in_scratch:
+            scheduler.submit(('copy_back', index, cache_entry, these_args), scratch.copy_back, (
+                self.scratch, self.scratch_run_directory(these_args), these_args[2], (ret, error)
+            ), background=True)
+            return True
+        if task_type == 'copy_back':
+            self.scratch.release(self.scratch_run_directory(these_args))
+            if error:
+                ret, error = None, 'could not copy the outputs back from the scratch directory: %s' % error
+            else:
+                ret, error = ret
+        if error == killed_error or (not error and energyplus.read_tool_usage(these_args[2]).killed):
+            run = (self.build_name(these_args[0]), these_args[1])
+            if run not in self.memory_retries:
+                self.memory_retries.add(run)
+                self.my_print('Simulation of %s for %s was killed, most likely for running out of memory; '
+                              'running it again on its own' % (these_args[1], these_args[0]['build_dir']))
+                self.submit_preparation(scheduler, index, these_args[0], self.entries[index])
+                return True
+            error = killed_error
+        if error:
+            ret = self.failed_simulation(these_args, error)
+        else:
+            self.trace_simulation(these_args, ret)
+        self.simulation_finished(ret, cache_entry, these_args)
+        self.run_completed(these_args, ret)
+        return False
 
-                if 'Parametric:' in idf_text:
-                    parametric_file = True
+    def simulate(self, these_args):
+        """Run a simulation here and now, in the scratch directory if there is one and the simulation fits in it"""
+        if not self.scratch or not self.reserve_scratch(these_args):
+            return energyplus.execute_energyplus(*these_args)
+        scratch_run_directory = self.scratch_run_directory(these_args)
+        try:
+            return scratch.copy_back(
+                self.scratch, scratch_run_directory, these_args[2],
+                scratch.execute_in_scratch(these_args, scratch_run_directory)
+            )
+        finally:
+            self.scratch.release(scratch_run_directory)
+
+    def reserve_scratch(self, these_args):
+        """Set space aside in the scratch directory for a simulation, the size of its run directory and of the outputs
+        it wrote in earlier suites, returning False if it doesn't fit alongside the simulations already there"""
+        footprint_mb = scratch.directory_size_mb(these_args[2]) + self.runtime_history.output_size_estimate(
+            these_args[1], 0 if self.build_name(these_args[0]) == 'a' else 1
+        )
+        return self.scratch.reserve(self.scratch_run_directory(these_args), footprint_mb)
 
-                # if the file requires the FMUs data set file, bring it
-                #  into the test run directory, right now I think it's broken
-                if 'ExternalInterface:' in idf_text:
-                    self.my_print('Skipping an FMU based file as this is not set up to run yet')
-                    continue
-                    # os.mkdir(os.path.join(test_run_directory, 'datasets'))
-                    # os.mkdir(os.path.join(test_run_directory, 'datasets', 'FMUs'))
-                    # source_dir = os.path.join('datasets', 'FMUs')
-                    # src_files = os.listdir(source_dir)
-                    # for file_name in src_files:
-                    #     full_file_name = os.path.join(source_dir, file_name)
-                    #     if os.path.isfile(full_file_name):
-                    #         shutil.copy(
-                    #             full_file_name,
-                    #             os.path.join(test_run_directory, 'datasets', 'FMUs')
-                    #         )
-
-                # rewrite the idf with the (potentially) modified idf text
-                with io.open(
-                    os.path.join(build_tree['build_dir'], this_test_dir, this_entry.basename, self.ep_in_filename),
-                    'w',
-                    encoding='utf-8'
-                ) as f_i:
-                    f_i.write("%s\n" % idf_text)
-
-            elif os.path.exists(imf_path):
-
-                shutil.copy(
-                    imf_path, os.path.join(build_tree['build_dir'], this_test_dir, this_entry.basename, 'in.imf')
-                )
-                # find the rest of the imf files and copy them into the test directory
-                source_files = os.listdir(build_tree['test_files_dir'])
-                for file_name in source_files:
-                    if file_name[-4:] == '.imf':
-                        full_file_name = os.path.join(build_tree['test_files_dir'], file_name)
-                        shutil.copy(
-                            full_file_name, os.path.join(build_tree['build_dir'], this_test_dir, this_entry.basename)
-                        )
+    def scratch_run_directory(self, these_args):
+        return self.scratch.run_directory(self.test_output_dir, self.build_name(these_args[0]), these_args[1])
 
+    def trace_simulation(self, these_args, ret):
+        """Add the programs of a simulation that just ran to the trace, from the usage it wrote into its directory"""
+        if not self.trace.enabled:
+            return
+        programs = [p for p in energyplus.read_tool_usage(these_args[2]).programs if p.start_time is not None]
+        if not programs:
+            return
+        args = {'case': these_args[1], 'build': self.build_name(these_args[0]), 'worker': ret[4]}
+        lane = ('simulation', args['build'], args['case'])
+        start_time = programs[0].start_time
+        end_time = max(p.start_time + p.wall_time for p in programs)
+        self.trace.add('Simulate', 'simulation', start_time, end_time - start_time, args, lane)
+        # programs that ran alongside another one, on a worker the simulation borrowed, go on a lane of their own
+        lane_ends = []
+        for program in programs:
+            for index, lane_end in enumerate(lane_ends):
+                if lane_end <= program.start_time:
+                    break
             else:
+                index = len(lane_ends)
+                lane_ends.append(0.0)
+            lane_ends[index] = program.start_time + program.wall_time
+            program_lane = lane if index == 0 else lane + (index,)
+            self.trace.add(program.tool, 'simulation', program.start_time, program.wall_time, args, program_lane)
+
+    def run_completed(self, these_args, ret):
+        """Report a finished run, given the execute_energyplus arguments and result, and record it in the journal"""
+        if self.journal:
+            self.journal.record_simulation(self.build_name(these_args[0]), these_args[1], ret[2])
+        self.my_casecompleted(
+            TestCaseCompleted(ret[0], ret[1], ret[2], ret[3], ret[4], energyplus.read_tool_usage(these_args[2]))
+        )
 
-                # if the file doesn't exist, just move along
-                self.my_print("Input file doesn't exist in either idf or imf form:")
-                self.my_print("   IDF: %s" % idf_path)
-                self.my_print("   IMF: %s" % imf_path)
-                self.my_casecompleted(TestCaseCompleted(this_test_dir, this_entry.basename, False, False, ""))
-                continue
+    def build_name(self, build_tree):
+        return 'a' if build_tree is self.build_tree_a else 'b'
+
+    def load_runtime_history(self):
+        """Read the case runtimes of earlier suites, by default from the run_times.csv files of the earlier suites of
+        this run type in build A's directory"""
+        self.runtime_history = RuntimeHistory()
+        history_files = self.runtime_history_files
+        if history_files is None:
+            history_files = sorted(glob.glob(
+                os.path.join(self.build_tree_a['build_dir'], self.test_run_name + '_*', 'run_times.csv')
+            ))
+        for history_file in history_files:
+            try:
+                self.runtime_history.read_csv(history_file)
+            except (IOError, OSError) as this_exception:
+                self.my_print('Could not read runtime history file: ' + str(this_exception))
+        if self.runtime_history.runtimes:
+            self.my_print('Read runtimes of %s cases from %s earlier suites' % (
+                len(self.runtime_history.runtimes), self.runtime_history.files_read
+            ))
+        if self.memory_budget is not None:
+            known_peaks = sum(1 for peaks in self.runtime_history.peak_memory.values() if any(peaks))
+            self.my_print('Starting simulations while their expected peak memory fits in %.0f MB (%s cases with a '
+                          'known peak memory)' % (self.memory_budget, known_peaks))
+
+    def longest_first(self, cases):
+        """Order (entry index, build tree, entry) runs by the expected runtime of their case, longest first, so that
+        long cases don't start at the end of the suite while the other workers sit idle.  The runs of one case stay
+        next to each other.  Returns the ordered runs and their projected makespan, which is None without a runtime
+        history."""
+        if not self.runtime_history.runtimes:
+            return cases, None
+
+        def estimate(case):
+            return self.runtime_history.estimate(case[2].basename, 0 if case[1] is self.build_tree_a else 1)
+
+        case_estimates = {}
+        for case in cases:
+            case_estimates[case[2].basename] = max(case_estimates.get(case[2].basename, 0.0), estimate(case))
+        cases = sorted(cases, key=lambda case: -case_estimates[case[2].basename])
+        projected_time = projected_makespan([estimate(case) for case in cases], self.number_of_threads)
+        unknown = sum(1 for case_name in case_estimates if not self.runtime_history.known(case_name))
+        self.my_print('Queued %s runs longest first, projected to take %.1f minutes on %s workers '
+                      '(%s cases without a runtime history)' % (
+                          len(cases), projected_time / 60.0, self.number_of_threads, unknown
+                      ))
+        return cases, projected_time
+
+    def report_makespan(self, projected_time, start_time):
+        if projected_time is not None:
+            self.my_print('Simulations took %.1f minutes, projected %.1f minutes' % (
+                (time.time() - start_time) / 60.0, projected_time / 60.0
+            ))
+
+    def failed_simulation(self, these_args, error):
+        """Report a simulation that didn't return, and make up the result execute_energyplus would have returned"""
+        self.my_print('Simulation of %s for %s did not finish: %s' % (these_args[1], these_args[0]['build_dir'], error))
+        return [these_args[0]['build_dir'], these_args[1], False, False, '']
+
+    def cache_inputs(self, these_args, staged):
+        """The part of the cache key and entry of a simulation that comes from its prepared run directory: the digest
+        of its contents (None without a cache), and the shared inputs staged into it, relative to it, which cache
+        entries leave out and the broker sends to each remote worker once.  This is worked out where the directory was
+        prepared, so a pool of workers hashes the run directories side by side."""
+        if not these_args:
+            return None
+        test_run_directory = these_args[2]
+        return (
+            SimulationCache.run_directory_digest(test_run_directory) if self.caching else None,
+            [os.path.relpath(path, test_run_directory) for path in staged]
+        )
 
-            rvi = os.path.join(build_tree['test_files_dir'], this_entry.basename) + '.rvi'
-            if os.path.exists(rvi):
-                shutil.copy(rvi, os.path.join(build_tree['build_dir'], this_test_dir, this_entry.basename, 'in.rvi'))
-
-            mvi = os.path.join(build_tree['test_files_dir'], this_entry.basename) + '.mvi'
-            if os.path.exists(mvi):
-                shutil.copy(mvi, os.path.join(build_tree['build_dir'], this_test_dir, this_entry.basename, 'in.mvi'))
-
-            epw_path = os.path.join(build_tree['source_dir'], 'weather', self.default_weather_filename)
-            if this_entry.epw:
-                epw_path = os.path.join(build_tree['weather_dir'], this_entry.epw + '.epw')
-                epw_exists = os.path.exists(epw_path)
-                if not epw_exists:
-                    self.my_print(
-                        "For case %s, weather file did not exist at %s, using a default one!" % (
-                            this_entry.basename, epw_path
+    def restore_cached_run(self, these_args, cache_inputs):
+        """Look up a prepared simulation in the cache, returning its cache entry, the key and the shared inputs to leave
+        out of it (None without a cache) and, if the run directory was restored from the cache, a result in the form
+        that execute_energyplus returns"""
+        if not self.cache:
+            return None, None
+        run_directory_digest, shared_inputs = cache_inputs
+        cache_key = self.cache.key(*these_args, run_directory_digest=run_directory_digest)
+        if self.cache.restore(cache_key, these_args[2]):
+            self.my_print('Restored %s for %s from the simulation cache' % (these_args[1], these_args[0]['build_dir']))
+            return (cache_key, shared_inputs), [these_args[0]['build_dir'], these_args[1], True, False, 'cache']
+        return (cache_key, shared_inputs), None
+
+    def simulation_finished(self, ret, cache_entry, these_args):
+        """Keep the results of a run that was just simulated in the cache and the baseline being stored"""
+        if cache_entry and ret[2]:
+            cache_key, shared_inputs = cache_entry
+            self.cache.store(cache_key, these_args[2], shared_inputs)
+        # a failed run isn't a reference for anything, leave it to be simulated again
+        if self.baseline and these_args[0] is self.build_tree_a and ret[2] and self.simulation_succeeded(these_args[2]):
+            self.baseline.stage(these_args[2], these_args[1])
+
+    def simulation_succeeded(self, test_run_directory):
+        """Whether EnergyPlus completed successfully in a run directory, going by its end file"""
+        end_path = os.path.join(test_run_directory, 'eplusout.end')
+        return os.path.exists(end_path) and self.process_end_file(end_path)[0] == EndErrSummary.STATUS_SUCCESS
+
+    def read_from_baseline(self, build_tree, this_entry):
+        """Report a build A case as complete, without preparing or running it, when its results are in the baseline"""
+        if self.baseline and build_tree is self.build_tree_a and self.baseline.has_case(this_entry.basename):
+            self.my_casecompleted(
+                TestCaseCompleted(self.baseline.run_directory, this_entry.basename, True, False, 'baseline')
+            )
+            return True
+        return False
+
+    def read_from_journal(self, build_tree, this_entry):
+        """Report a case as complete, without preparing or running it, when the suite being resumed already ran it:
+        either its diffs are in the journal, or the run is and it left its end file behind"""
+        build = self.build_name(build_tree)
+        test_run_directory = os.path.join(build_tree['build_dir'], self.test_output_dir, this_entry.basename)
+        if this_entry.basename not in self.resumed_entries:
+            if (build, this_entry.basename) not in self.resumed_simulations:
+                return False
+            if not os.path.exists(os.path.join(test_run_directory, 'eplusout.end')):
+                return False
+        ret = [build_tree['build_dir'], this_entry.basename,
+               self.resumed_simulations.get((build, this_entry.basename), True), False, 'journal']
+        if os.path.exists(test_run_directory):
+            self.simulation_finished(ret, None, (build_tree, this_entry.basename, test_run_directory))
+        self.my_casecompleted(TestCaseCompleted(ret[0], ret[1], ret[2], ret[3], ret[4]))
+        return True
+
+    def already_run(self, build_tree, this_entry):
+        return self.read_from_baseline(build_tree, this_entry) or self.read_from_journal(build_tree, this_entry)
+
+    def prepare_case(self, build_tree, this_entry):
+        """Set up the run directory for one case of one build, returning the execute_energyplus arguments, or None if
+        the case can't be run"""
+
+        # first remove the previous test directory for this file and rename it
+        test_run_directory = os.path.join(build_tree['build_dir'], self.test_output_dir, this_entry.basename)
+        if os.path.exists(test_run_directory):  # pragma: no cover - dir name is generated by local timestamp now
+            shutil.rmtree(test_run_directory)
+        os.mkdir(test_run_directory)
+
+        # establish the absolute path to the idf or imf, and append .idf or .imf as necessary
+        idf_base = os.path.join(build_tree['test_files_dir'], this_entry.basename)
+        idf_base = idf_base.strip()
+        idf_path = idf_base + ".idf"
+        imf_path = idf_base + ".imf"
+
+        parametric_file = False
+        if os.path.exists(idf_path):
+
+            # copy the idf into the test directory, renaming to in.idf
+            shutil.copy(idf_path, os.path.join(test_run_directory, self.ep_in_filename))
+
+            # read in the entire text of the idf to do some special operations;
+            # could put in one line, but the with block ensures the file handle is closed
+            in_idf = os.path.join(test_run_directory, self.ep_in_filename)
+            with io.open(in_idf, encoding='utf-8', errors='ignore') as f_idf:
+                idf_text = f_idf.read()  # EDWIN: Make sure this reads the IDF properly
+                # idf_text = unicode(idf_text, errors='ignore')
+
+            # if the file requires the window 5 data set file, bring it into the test run directory
+            if 'Window5DataFile.dat' in idf_text:
+                os.mkdir(os.path.join(test_run_directory, 'datasets'))
+                self.stager.stage_file(os.path.join(build_tree['data_sets_dir'], 'Window5DataFile.dat'),
+                                       os.path.join(test_run_directory, 'datasets', 'Window5DataFile.dat'))
+                idf_text = idf_text.replace('..\\datasets\\Window5DataFile.dat', 'datasets/Window5DataFile.dat')
+
+            # if the file requires the TDV data set file, bring it
+            #  into the test run directory, right now I think it's broken
+            if 'DataSets\\TDV' in idf_text or 'DataSets\\\\TDV' in idf_text:
+                os.mkdir(os.path.join(test_run_directory, 'datasets'))
+                os.mkdir(os.path.join(test_run_directory, 'datasets', 'TDV'))
+                tdv_dir = os.path.join(build_tree['data_sets_dir'], 'TDV')
+                src_files = os.listdir(tdv_dir)
+                for file_name in src_files:
+                    full_file_name = os.path.join(tdv_dir, file_name)
+                    if os.path.isfile(full_file_name):
+                        self.stager.stage_file(
+                            full_file_name,
+                            os.path.join(test_run_directory, 'datasets', 'TDV', file_name)
                         )
+                idf_text = idf_text.replace(
+                    '..\\datasets\\TDV\\TDV_2008_kBtu_CTZ06.csv',
+                    os.path.join('datasets', 'TDV', 'TDV_2008_kBtu_CTZ06.csv')
+                )
+
+            if 'HybridZoneModel_TemperatureData.csv' in idf_text:
+                self.stager.stage_file(
+                    os.path.join(build_tree['test_files_dir'], 'HybridZoneModel_TemperatureData.csv'),
+                    os.path.join(test_run_directory, 'HybridZoneModel_TemperatureData.csv')
+                )
+
+            if 'report variable dictionary' in idf_text:
+                idf_text = idf_text.replace('report variable dictionary', '')
+
+            if 'Parametric:' in idf_text:
+                parametric_file = True
+
+            # if the file requires the FMUs data set file, bring it
+            #  into the test run directory, right now I think it's broken
+            if 'ExternalInterface:' in idf_text:
+                self.my_print('Skipping an FMU based file as this is not set up to run yet')
+                return None
+                # os.mkdir(os.path.join(test_run_directory, 'datasets'))
+                # os.mkdir(os.path.join(test_run_directory, 'datasets', 'FMUs'))
+                # source_dir = os.path.join('datasets', 'FMUs')
+                # src_files = os.listdir(source_dir)
+                # for file_name in src_files:
+                #     full_file_name = os.path.join(source_dir, file_name)
+                #     if os.path.isfile(full_file_name):
+                #         shutil.copy(
+                #             full_file_name,
+                #             os.path.join(test_run_directory, 'datasets', 'FMUs')
+                #         )
+
+            # rewrite the idf with the (potentially) modified idf text
+            with io.open(
+                os.path.join(test_run_directory, self.ep_in_filename),
+                'w',
+                encoding='utf-8'
+            ) as f_i:
+                f_i.write("%s\n" % idf_text)
+
+        elif os.path.exists(imf_path):
+
+            # in.imf is rewritten before EPMacro runs, so it has to be a real copy
+            shutil.copy(
+                imf_path, os.path.join(test_run_directory, 'in.imf')
+            )
+            # find the rest of the imf files, which EPMacro only reads, and stage them into the test directory
+            source_files = os.listdir(build_tree['test_files_dir'])
+            for file_name in source_files:
+                if file_name[-4:] == '.imf':
+                    full_file_name = os.path.join(build_tree['test_files_dir'], file_name)
+                    self.stager.stage_file(
+                        full_file_name, os.path.join(test_run_directory, file_name)
                     )
-                    epw_path = os.path.join(build_tree['source_dir'], 'weather', self.default_weather_filename)
-
-            energy_plus_runs.append(
-                (
-                    energyplus.execute_energyplus,
-                    (
-                        build_tree,
-                        this_entry.basename,
-                        test_run_directory,
-                        local_run_type,
-                        self.min_reporting_freq,
-                        parametric_file,
-                        epw_path
+
+        else:
+
+            # if the file doesn't exist, just move along
+            self.my_print("Input file doesn't exist in either idf or imf form:")
+            self.my_print("   IDF: %s" % idf_path)
+            self.my_print("   IMF: %s" % imf_path)
+            self.my_casecompleted(TestCaseCompleted(self.test_output_dir, this_entry.basename, False, False, ""))
+            return None
+
+        rvi = os.path.join(build_tree['test_files_dir'], this_entry.basename) + '.rvi'
+        if os.path.exists(rvi):
+            shutil.copy(rvi, os.path.join(test_run_directory, 'in.rvi'))
+
+        mvi = os.path.join(build_tree['test_files_dir'], this_entry.basename) + '.mvi'
+        if os.path.exists(mvi):
+            shutil.copy(mvi, os.path.join(test_run_directory, 'in.mvi'))
+
+        epw_path = os.path.join(build_tree['source_dir'], 'weather', self.default_weather_filename)
+        if this_entry.epw:
+            epw_path = os.path.join(build_tree['weather_dir'], this_entry.epw + '.epw')
+            epw_exists = os.path.exists(epw_path)
+            if not epw_exists:
+                self.my_print(
+                    "For case %s, weather file did not exist at %s, using a default one!" % (
+                        this_entry.basename, epw_path
                     )
                 )
-            )
+                epw_path = os.path.join(build_tree['source_dir'], 'weather', self.default_weather_filename)
+
+        # execute_energyplus only copies these in itself when they aren't there already
+        if os.path.exists(build_tree['idd_path']):
+            self.stager.stage_file(build_tree['idd_path'], os.path.join(test_run_directory, 'Energy+.idd'))
+        if self.force_run_type != ForceRunType.DD and os.path.exists(epw_path):
+            self.stager.stage_file(epw_path, os.path.join(test_run_directory, 'in.epw'))
+
+        return (
+            build_tree,
+            this_entry.basename,
+            test_run_directory,
+            self.force_run_type,
+            self.min_reporting_freq,
+            parametric_file,
+            epw_path,
+            self.eso_diffs
+        )
 
-        if self.number_of_threads == 1:
-            for task in energy_plus_runs:
-                # Sometime I'll look at how to squash the args down, for now just fill a temp array as needed
-                tmp_array = []
-                for val in task[1]:
-                    tmp_array.append(val)
+    def run_pipelined(self):
+        """Run the simulations and diffs of every case through a single pool of workers.
+
+        The build A and build B runs of a case are queued next to each other, and the diff for the case is queued as
+        soon as both simulations have returned, so diffing overlaps with the remaining simulations instead of waiting
+        for the slowest run of the whole suite.  Free workers always take a ready diff before another simulation."""
+
+        builds = []
+        if self.run_case_a:
+            builds.append(self.build_tree_a)
+        if self.run_case_b:
+            builds.append(self.build_tree_b)
+
+        scheduler = self.new_scheduler(self.number_of_threads)
+        runs_remaining = [0] * len(self.entries)
+        diffed_entries = [None] * len(self.entries)
+        cases = []
+        for index, this_entry in enumerate(self.entries):
+            for build_tree in builds:
+                if not self.already_run(build_tree, this_entry):
+                    cases.append((index, build_tree, this_entry))
+                    runs_remaining[index] += 1
+            if this_entry.basename in self.resumed_entries:
+                diffed_entries[index] = self.resumed_diff(this_entry)
+            elif runs_remaining[index] == 0:
+                self.submit_diff(scheduler, ('diff', index, None, None), this_entry, priority=True)
+        cases, projected_time = self.longest_first(cases)
+        start_time = time.time()
+        for index, build_tree, this_entry in cases:
+            self.submit_preparation(scheduler, index, build_tree, this_entry)
+        total_runs = len(cases)
+        if total_runs == 0:
+            self.my_simulationscomplete()
+
+        completed_structure = self.new_completed_structure()
+        try:
+            while scheduler.busy():
                 if self.id_like_to_stop_now:  # pragma: no cover
-                    return  # self.my_cancelled() is called in parent function
-                ret = energyplus.execute_energyplus(*tmp_array)
-                self.my_casecompleted(TestCaseCompleted(ret[0], ret[1], ret[2], ret[3], ret[4]))
-        else:
-            # Submit tasks
-            for task in energy_plus_runs:
-                task_queue.put(task)
-
-            # Start worker processes
-            for i in range(self.number_of_threads):
-                p = Process(target=self.threaded_worker, args=(task_queue, done_queue))
-                p.daemon = True  # this *is* "necessary" to allow cancelling the suite
-                p.start()
-
-            # Get and print results
-            for i in range(len(energy_plus_runs)):
-                ret = done_queue.get()
-                self.my_casecompleted(TestCaseCompleted(ret[0], ret[1], ret[2], ret[3], ret[4]))
-
-            # Tell child processes to stop
-            for i in range(self.number_of_threads):
-                task_queue.put('STOP')
-
-    def threaded_worker(self, input_data, output):  # pragma: no cover - even with multiprocess, coverage misses this
-        for func, these_args in iter(input_data.get, 'STOP'):
-            if self.id_like_to_stop_now:
-                print("I'd like to stop now.")
-                return
-            return_val = func(*these_args)
-            output.put(return_val)  # something needs to be put into the output queue for everything to work
+                    return None  # self.my_cancelled() is called in parent function
+                # wake up periodically even if nothing finished so that a cancel request is noticed
+                for (task_type, index, first, second), ret, error in scheduler.wait():
+                    if task_type == 'diff':
+                        self.collect_diff_result(index, ret, error, diffed_entries)
+                        continue
+                    if task_type == 'prepare':
+                        if self.case_prepared(scheduler, index, first, second, ret, error):
+                            continue  # its simulation is queued
+                    elif self.case_simulated(scheduler, index, first, second, ret, error, task_type):
+                        continue  # its outputs are being copied back, or it ran out of memory and is queued again
+                    # the run was simulated, restored from the cache, or turned out not to be runnable
+                    total_runs -= 1
+                    if total_runs == 0:
+                        self.report_makespan(projected_time, start_time)
+                        self.my_simulationscomplete()
+                    runs_remaining[index] -= 1
+                    if runs_remaining[index] == 0:
+                        self.submit_diff(scheduler, ('diff', index, None, None), self.entries[index], priority=True)
+        finally:
+            scheduler.cancel()  # only does anything if the suite was cancelled
+            self.my_print(scheduler.summary())
+
+        for this_entry in diffed_entries:
+            if this_entry:
+                completed_structure.add_test_entry(this_entry)
+        return completed_structure
 
     @staticmethod
     def both_files_exist(base_path_a, base_path_b, common_relative_path):
@@ -380,13 +967,7 @@ class SuiteRunner:
 
     @staticmethod
     def diff_text_files(file_a, file_b, diff_file):
-        # read the contents of the two files into a list, could read it into text first
-        with io.open(file_a, encoding='utf-8') as f_txt_1:
-            txt1 = f_txt_1.readlines()
-        with io.open(file_b, encoding='utf-8') as f_txt_2:
-            txt2 = f_txt_2.readlines()
         # remove any lines that have some specific listed strings in them
-        txt1_cleaned = []
         skip_strings = [
             "Program Version,EnergyPlus",
             "EnergyPlus Completed",
@@ -396,17 +977,11 @@ class SuiteRunner:
             "(user input)=",
             "(input file)="
         ]
-        for line in txt1:
-            if any([x in line for x in skip_strings]):
-                pass
-            else:
-                txt1_cleaned.append(line)
-        txt2_cleaned = []
-        for line in txt2:
-            if any([x in line for x in skip_strings]):
-                pass
-            else:
-                txt2_cleaned.append(line)
+        # read the lines of the two files that are compared, each file once
+        with io.open(file_a, encoding='utf-8') as f_txt_1:
+            txt1_cleaned = [line for line in f_txt_1 if not any([x in line for x in skip_strings])]
+        with io.open(file_b, encoding='utf-8') as f_txt_2:
+            txt2_cleaned = [line for line in f_txt_2 if not any([x in line for x in skip_strings])]
         # compare for equality, if it is faster to compare strings then lists, may want to refactor
         if txt1_cleaned == txt2_cleaned:
             return TextDifferences.EQUAL
@@ -421,6 +996,33 @@ class SuiteRunner:
         out_file.close()
         return TextDifferences.DIFFS
 
+    def diff_math_files(self, thresh_dict, file_a, file_b, abs_diff_file, rel_diff_file, err_file, summary_csv):
+        # most cases don't change the csv outputs, and identical files don't need to be parsed to know they are equal
+        if not summary_csv:
+            fingerprint_a = fingerprint.csv_fingerprint(file_a)
+            if fingerprint_a is not None and fingerprint_a == fingerprint.csv_fingerprint(file_b):
+                return 'All Equal', fingerprint_a[1], 0, 0
+        return math_diff.math_diff(thresh_dict, file_a, file_b, abs_diff_file, rel_diff_file, err_file, summary_csv,
+                                   engine=self.math_diff_engine)
+
+    @staticmethod
+    def diff_sql_files(thresh_dict, this_entry, file_a, file_b, out_prefix):
+        # the report data, tabular data and errors all come out of one connection with both files attached
+        with sql_diff.SqlComparison(file_a, file_b) as comparison:
+            this_entry.add_math_differences(MathDifferences(comparison.report_data_diff(
+                thresh_dict,
+                out_prefix + '.absdiff.csv',
+                out_prefix + '.percdiff.csv',
+                out_prefix + '.diffsummary.csv',
+                '')), MathDifferences.SQL)
+            this_entry.add_sql_table_differences(TableDifferences(comparison.tabular_data_diff(
+                thresh_dict,
+                out_prefix + '.tablediff.csv',
+                out_prefix + '.tablesummary.csv',
+                '')))
+            this_entry.add_text_differences(TextDifferences(comparison.errors_diff(
+                out_prefix + '.errors.diff')), TextDifferences.SQL_ERRORS)
+
     def process_diffs_for_one_case(self, this_entry, ci_mode=False):
 
         if ci_mode:  # in "ci_mode" the build directory is actually the output directory of each file
@@ -436,6 +1038,12 @@ class SuiteRunner:
 
         out_dir = case_result_dir_1
 
+        # build A results in a baseline are read in place, the diffs are still written to build A's test directory
+        if not ci_mode and self.baseline and self.baseline.has_case(this_entry.basename):
+            case_result_dir_1 = self.baseline.case_directory(this_entry.basename)
+            if not os.path.exists(out_dir):
+                os.makedirs(out_dir)
+
         # we aren't using math_diff and table_diffs summary csv files, so use blanks
         path_to_math_diff_log = ""
         path_to_table_diff_log = ""
@@ -454,6 +1062,9 @@ class SuiteRunner:
         end_path = join(case_result_dir_2, 'eplusout.end')
         if os.path.exists(end_path):
             [status_case2, runtime_case2] = self.process_end_file(end_path)
+        this_entry.add_tool_usage(
+            energyplus.read_tool_usage(case_result_dir_1), energyplus.read_tool_usage(case_result_dir_2)
+        )
 
         # one quick check here for expect-fatal tests
         if this_entry.basename == 'EMSTestMathAndKill':
@@ -512,116 +1123,147 @@ class SuiteRunner:
             )
             return this_entry
 
-        # Load diffing threshold dictionary
-        thresh_dict = td.ThreshDict(self.thresh_dict_file)
-
-        # Do Math (CSV) Diffs
-        if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.csv'):
-            this_entry.add_math_differences(MathDifferences(math_diff.math_diff(
-                thresh_dict,
-                join(case_result_dir_1, 'eplusout.csv'),
-                join(case_result_dir_2, 'eplusout.csv'),
-                join(out_dir, 'eplusout.csv.absdiff.csv'),
-                join(out_dir, 'eplusout.csv.percdiff.csv'),
-                join(out_dir, 'eplusout.csv.diffsummary.csv'),
-                path_to_math_diff_log)), MathDifferences.ESO)
-        if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusmtr.csv'):
-            this_entry.add_math_differences(MathDifferences(math_diff.math_diff(
-                thresh_dict,
-                join(case_result_dir_1, 'eplusmtr.csv'),
-                join(case_result_dir_2, 'eplusmtr.csv'),
-                join(out_dir, 'eplusmtr.csv.absdiff.csv'),
-                join(out_dir, 'eplusmtr.csv.percdiff.csv'),
-                join(out_dir, 'eplusmtr.csv.diffsummary.csv'),
-                path_to_math_diff_log)), MathDifferences.MTR)
-
-        if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'epluszsz.csv'):
-            this_entry.add_math_differences(MathDifferences(math_diff.math_diff(
-                thresh_dict,
-                join(case_result_dir_1, 'epluszsz.csv'),
-                join(case_result_dir_2, 'epluszsz.csv'),
-                join(out_dir, 'epluszsz.csv.absdiff.csv'),
-                join(out_dir, 'epluszsz.csv.percdiff.csv'),
-                join(out_dir, 'epluszsz.csv.diffsummary.csv'),
-                path_to_math_diff_log)), MathDifferences.ZSZ)
-
-        if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusssz.csv'):
-            this_entry.add_math_differences(MathDifferences(math_diff.math_diff(
-                thresh_dict,
-                join(case_result_dir_1, 'eplusssz.csv'),
-                join(case_result_dir_2, 'eplusssz.csv'),
-                join(out_dir, 'eplusssz.csv.absdiff.csv'),
-                join(out_dir, 'eplusssz.csv.percdiff.csv'),
-                join(out_dir, 'eplusssz.csv.diffsummary.csv'),
-                path_to_math_diff_log)), MathDifferences.SSZ)
+        thresh_dict = self.thresh_dict
+
+        # With sql diffs, a case that both builds wrote an eplusout.sql for is diffed from those instead of the csv and
+        # html outputs, since its report data and tabular data hold the same values
+        sql_diffs = self.sql_diffs and self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.sql')
+
+        # Do Math (CSV) Diffs, or diff the eso and mtr files that would have been turned into those csv files
+        with self.trace.span('Math diffs', 'diff', case=this_entry.basename):
+            if sql_diffs:
+                pass  # the variables and meters are in the report data
+            elif self.eso_diffs:
+                for file_name, diff_slot in [('eplusout.eso', MathDifferences.ESO),
+                                             ('eplusout.mtr', MathDifferences.MTR)]:
+                    if self.both_files_exist(case_result_dir_1, case_result_dir_2, file_name):
+                        this_entry.add_math_differences(MathDifferences(eso_diff.eso_diff(
+                            thresh_dict,
+                            join(case_result_dir_1, file_name),
+                            join(case_result_dir_2, file_name),
+                            join(out_dir, file_name + '.absdiff.csv'),
+                            join(out_dir, file_name + '.percdiff.csv'),
+                            join(out_dir, file_name + '.diffsummary.csv'),
+                            path_to_math_diff_log)), diff_slot)
+            else:
+                if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.csv'):
+                    this_entry.add_math_differences(MathDifferences(self.diff_math_files(
+                        thresh_dict,
+                        join(case_result_dir_1, 'eplusout.csv'),
+                        join(case_result_dir_2, 'eplusout.csv'),
+                        join(out_dir, 'eplusout.csv.absdiff.csv'),
+                        join(out_dir, 'eplusout.csv.percdiff.csv'),
+                        join(out_dir, 'eplusout.csv.diffsummary.csv'),
+                        path_to_math_diff_log)), MathDifferences.ESO)
+                if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusmtr.csv'):
+                    this_entry.add_math_differences(MathDifferences(self.diff_math_files(
+                        thresh_dict,
+                        join(case_result_dir_1, 'eplusmtr.csv'),
+                        join(case_result_dir_2, 'eplusmtr.csv'),
+                        join(out_dir, 'eplusmtr.csv.absdiff.csv'),
+                        join(out_dir, 'eplusmtr.csv.percdiff.csv'),
+                        join(out_dir, 'eplusmtr.csv.diffsummary.csv'),
+                        path_to_math_diff_log)), MathDifferences.MTR)
+
+            if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'epluszsz.csv'):
+                this_entry.add_math_differences(MathDifferences(self.diff_math_files(
+                    thresh_dict,
+                    join(case_result_dir_1, 'epluszsz.csv'),
+                    join(case_result_dir_2, 'epluszsz.csv'),
+                    join(out_dir, 'epluszsz.csv.absdiff.csv'),
+                    join(out_dir, 'epluszsz.csv.percdiff.csv'),
+                    join(out_dir, 'epluszsz.csv.diffsummary.csv'),
+                    path_to_math_diff_log)), MathDifferences.ZSZ)
+
+            if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusssz.csv'):
+                this_entry.add_math_differences(MathDifferences(self.diff_math_files(
+                    thresh_dict,
+                    join(case_result_dir_1, 'eplusssz.csv'),
+                    join(case_result_dir_2, 'eplusssz.csv'),
+                    join(out_dir, 'eplusssz.csv.absdiff.csv'),
+                    join(out_dir, 'eplusssz.csv.percdiff.csv'),
+                    join(out_dir, 'eplusssz.csv.diffsummary.csv'),
+                    path_to_math_diff_log)), MathDifferences.SSZ)
 
         # Do Tabular (HTML) Diffs
-        if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplustbl.htm'):
-            this_entry.add_table_differences(TableDifferences(table_diff.table_diff(
-                thresh_dict,
-                join(case_result_dir_1, 'eplustbl.htm'),
-                join(case_result_dir_2, 'eplustbl.htm'),
-                join(out_dir, 'eplustbl.htm.absdiff.htm'),
-                join(out_dir, 'eplustbl.htm.percdiff.htm'),
-                join(out_dir, 'eplustbl.htm.summarydiff.htm'),
-                path_to_table_diff_log)))
+        with self.trace.span('Table diffs', 'diff', case=this_entry.basename):
+            if not sql_diffs and self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplustbl.htm'):
+                this_entry.add_table_differences(TableDifferences(table_diff.table_diff(
+                    thresh_dict,
+                    join(case_result_dir_1, 'eplustbl.htm'),
+                    join(case_result_dir_2, 'eplustbl.htm'),
+                    join(out_dir, 'eplustbl.htm.absdiff.htm'),
+                    join(out_dir, 'eplustbl.htm.percdiff.htm'),
+                    join(out_dir, 'eplustbl.htm.summarydiff.htm'),
+                    path_to_table_diff_log)))
+
+        # Do SQLite Diffs of the report data, tabular data and errors
+        with self.trace.span('SQL diffs', 'diff', case=this_entry.basename):
+            if sql_diffs:
+                self.diff_sql_files(
+                    thresh_dict,
+                    this_entry,
+                    join(case_result_dir_1, 'eplusout.sql'),
+                    join(case_result_dir_2, 'eplusout.sql'),
+                    join(out_dir, 'eplusout.sql'))
 
         # Do Textual Diffs
-        if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.audit'):
-            this_entry.add_text_differences(TextDifferences(self.diff_text_files(
-                join(case_result_dir_1, 'eplusout.audit'),
-                join(case_result_dir_2, 'eplusout.audit'),
-                join(out_dir, 'eplusout.audit.diff'))), TextDifferences.AUD)
-        if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.bnd'):
-            this_entry.add_text_differences(TextDifferences(self.diff_text_files(
-                join(case_result_dir_1, 'eplusout.bnd'),
-                join(case_result_dir_2, 'eplusout.bnd'),
-                join(out_dir, 'eplusout.bnd.diff'))), TextDifferences.BND)
-        if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.dxf'):
-            this_entry.add_text_differences(TextDifferences(self.diff_text_files(
-                join(case_result_dir_1, 'eplusout.dxf'),
-                join(case_result_dir_2, 'eplusout.dxf'),
-                join(out_dir, 'eplusout.dxf.diff'))), TextDifferences.DXF)
-        if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.eio'):
-            this_entry.add_text_differences(TextDifferences(self.diff_text_files(
-                join(case_result_dir_1, 'eplusout.eio'),
-                join(case_result_dir_2, 'eplusout.eio'),
-                join(out_dir, 'eplusout.eio.diff'))), TextDifferences.EIO)
-        if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.mdd'):
-            this_entry.add_text_differences(TextDifferences(self.diff_text_files(
-                join(case_result_dir_1, 'eplusout.mdd'),
-                join(case_result_dir_2, 'eplusout.mdd'),
-                join(out_dir, 'eplusout.mdd.diff'))), TextDifferences.MDD)
-        if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.mtd'):
-            this_entry.add_text_differences(TextDifferences(self.diff_text_files(
-                join(case_result_dir_1, 'eplusout.mtd'),
-                join(case_result_dir_2, 'eplusout.mtd'),
-                join(out_dir, 'eplusout.mtd.diff'))), TextDifferences.MTD)
-        if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.rdd'):
-            this_entry.add_text_differences(TextDifferences(self.diff_text_files(
-                join(case_result_dir_1, 'eplusout.rdd'),
-                join(case_result_dir_2, 'eplusout.rdd'),
-                join(out_dir, 'eplusout.rdd.diff'))), TextDifferences.RDD)
-        if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.shd'):
-            this_entry.add_text_differences(TextDifferences(self.diff_text_files(
-                join(case_result_dir_1, 'eplusout.shd'),
-                join(case_result_dir_2, 'eplusout.shd'),
-                join(out_dir, 'eplusout.shd.diff'))), TextDifferences.SHD)
-        if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.err'):
-            this_entry.add_text_differences(TextDifferences(self.diff_text_files(
-                join(case_result_dir_1, 'eplusout.err'),
-                join(case_result_dir_2, 'eplusout.err'),
-                join(out_dir, 'eplusout.err.diff'))), TextDifferences.ERR)
-        if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.delightin'):
-            this_entry.add_text_differences(TextDifferences(self.diff_text_files(
-                join(case_result_dir_1, 'eplusout.delightin'),
-                join(case_result_dir_2, 'eplusout.delightin'),
-                join(out_dir, 'eplusout.delightin.diff'))), TextDifferences.DL_IN)
-        if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.delightout'):
-            this_entry.add_text_differences(TextDifferences(self.diff_text_files(
-                join(case_result_dir_1, 'eplusout.delightout'),
-                join(case_result_dir_2, 'eplusout.delightout'),
-                join(out_dir, 'eplusout.delightout.diff'))), TextDifferences.DL_OUT)
+        with self.trace.span('Text diffs', 'diff', case=this_entry.basename):
+            if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.audit'):
+                this_entry.add_text_differences(TextDifferences(self.diff_text_files(
+                    join(case_result_dir_1, 'eplusout.audit'),
+                    join(case_result_dir_2, 'eplusout.audit'),
+                    join(out_dir, 'eplusout.audit.diff'))), TextDifferences.AUD)
+            if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.bnd'):
+                this_entry.add_text_differences(TextDifferences(self.diff_text_files(
+                    join(case_result_dir_1, 'eplusout.bnd'),
+                    join(case_result_dir_2, 'eplusout.bnd'),
+                    join(out_dir, 'eplusout.bnd.diff'))), TextDifferences.BND)
+            if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.dxf'):
+                this_entry.add_text_differences(TextDifferences(self.diff_text_files(
+                    join(case_result_dir_1, 'eplusout.dxf'),
+                    join(case_result_dir_2, 'eplusout.dxf'),
+                    join(out_dir, 'eplusout.dxf.diff'))), TextDifferences.DXF)
+            if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.eio'):
+                this_entry.add_text_differences(TextDifferences(self.diff_text_files(
+                    join(case_result_dir_1, 'eplusout.eio'),
+                    join(case_result_dir_2, 'eplusout.eio'),
+                    join(out_dir, 'eplusout.eio.diff'))), TextDifferences.EIO)
+            if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.mdd'):
+                this_entry.add_text_differences(TextDifferences(self.diff_text_files(
+                    join(case_result_dir_1, 'eplusout.mdd'),
+                    join(case_result_dir_2, 'eplusout.mdd'),
+                    join(out_dir, 'eplusout.mdd.diff'))), TextDifferences.MDD)
+            if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.mtd'):
+                this_entry.add_text_differences(TextDifferences(self.diff_text_files(
+                    join(case_result_dir_1, 'eplusout.mtd'),
+                    join(case_result_dir_2, 'eplusout.mtd'),
+                    join(out_dir, 'eplusout.mtd.diff'))), TextDifferences.MTD)
+            if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.rdd'):
+                this_entry.add_text_differences(TextDifferences(self.diff_text_files(
+                    join(case_result_dir_1, 'eplusout.rdd'),
+                    join(case_result_dir_2, 'eplusout.rdd'),
+                    join(out_dir, 'eplusout.rdd.diff'))), TextDifferences.RDD)
+            if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.shd'):
+                this_entry.add_text_differences(TextDifferences(self.diff_text_files(
+                    join(case_result_dir_1, 'eplusout.shd'),
+                    join(case_result_dir_2, 'eplusout.shd'),
+                    join(out_dir, 'eplusout.shd.diff'))), TextDifferences.SHD)
+            if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.err'):
+                this_entry.add_text_differences(TextDifferences(self.diff_text_files(
+                    join(case_result_dir_1, 'eplusout.err'),
+                    join(case_result_dir_2, 'eplusout.err'),
+                    join(out_dir, 'eplusout.err.diff'))), TextDifferences.ERR)
+            if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.delightin'):
+                this_entry.add_text_differences(TextDifferences(self.diff_text_files(
+                    join(case_result_dir_1, 'eplusout.delightin'),
+                    join(case_result_dir_2, 'eplusout.delightin'),
+                    join(out_dir, 'eplusout.delightin.diff'))), TextDifferences.DL_IN)
+            if self.both_files_exist(case_result_dir_1, case_result_dir_2, 'eplusout.delightout'):
+                this_entry.add_text_differences(TextDifferences(self.diff_text_files(
+                    join(case_result_dir_1, 'eplusout.delightout'),
+                    join(case_result_dir_2, 'eplusout.delightout'),
+                    join(out_dir, 'eplusout.delightout.diff'))), TextDifferences.DL_OUT)
 
         # return the updated entry
         return this_entry
@@ -663,29 +1305,88 @@ class SuiteRunner:
         # return results from this end file
         return [status, total_runtime_seconds]
 
-    # diff_logs_for_build creates diff logs between simulations in two build directories
-    def diff_logs_for_build(self):
-
-        completed_structure = CompletedStructure(
+    def new_completed_structure(self):
+        return CompletedStructure(
             self.build_tree_a['source_dir'], self.build_tree_a['build_dir'],
             self.build_tree_b['source_dir'], self.build_tree_b['build_dir'],
             os.path.join(self.build_tree_a['build_dir'], self.test_output_dir)
         )
-        for this_entry in self.entries:
-            try:
-                this_entry = self.process_diffs_for_one_case(this_entry)
+
+    # diff_logs_for_build creates diff logs between simulations in two build directories
+    def diff_logs_for_build(self):
+
+        completed_structure = self.new_completed_structure()
+        if (self.number_of_threads == 1 or len(self.entries) < 2) and not self.broker:
+            for this_entry in self.entries:
+                if this_entry.basename in self.resumed_entries:
+                    completed_structure.add_test_entry(self.resumed_diff(this_entry))
+                    continue
+                try:
+                    with self.trace.span('Diff', 'diff', case=this_entry.basename):
+                        this_entry = self.process_diffs_for_one_case(this_entry)
+                    completed_structure.add_test_entry(this_entry)
+                    self.diff_finished(this_entry)
+                except Exception as e:  # pragma: no cover -- I'm not trying to catch every possible case here
+                    self.report_diff_error(this_entry, e)
+                finally:
+                    self.my_diffcompleted(this_entry.basename)
+            return completed_structure
+
+        # fan the cases out across a process pool; callbacks fire as each case finishes, but the entries are added to
+        # the completed structure in the original order so that the results don't depend on the scheduling
+        diffed_entries = [None] * len(self.entries)
+        scheduler = self.new_scheduler(min(self.number_of_threads, len(self.entries)))
+        for index, this_entry in enumerate(self.entries):
+            if this_entry.basename in self.resumed_entries:
+                diffed_entries[index] = self.resumed_diff(this_entry)
+                continue
+            self.submit_diff(scheduler, index, this_entry)
+        try:
+            while scheduler.busy():
+                if self.id_like_to_stop_now:  # pragma: no cover
+                    break
+                for index, result, error in scheduler.wait():
+                    self.collect_diff_result(index, result, error, diffed_entries)
+        finally:
+            scheduler.cancel()  # only does anything if the suite was cancelled
+        for this_entry in diffed_entries:
+            if this_entry:
                 completed_structure.add_test_entry(this_entry)
-            except Exception as e:  # pragma: no cover -- I'm not trying to catch every possible case here
-                self.my_print(
-                    (
-                        "Unexpected error processing diffs for %s, could indicate an E+ crash caused corrupted files"
-                    ) % this_entry.basename
-                )
-                self.my_print("Message: %s" % e)
-            finally:
-                self.my_diffcompleted(this_entry.basename)
         return completed_structure
 
+    def collect_diff_result(self, index, result, error, diffed_entries):
+        """Replay the messages from a finished diff_worker task and slot the entry into its original position"""
+        this_entry = self.entries[index]
+        messages = []
+        if not error:
+            this_entry, messages, error, trace_events = result
+            self.trace.merge(trace_events)
+        for message in messages:
+            self.my_print(message)
+        if error:  # pragma: no cover -- I'm not trying to catch every possible case here
+            self.report_diff_error(this_entry, error)
+        else:
+            diffed_entries[index] = this_entry
+            self.diff_finished(this_entry)
+        self.my_diffcompleted(this_entry.basename)
+
+    def resumed_diff(self, this_entry):
+        """The entry of a case the suite being resumed already diffed, reported as completed like a fresh diff"""
+        self.my_diffcompleted(this_entry.basename)
+        return self.resumed_entries[this_entry.basename]
+
+    def diff_finished(self, this_entry):
+        if self.journal:
+            self.journal.record_diff(this_entry)
+
+    def report_diff_error(self, this_entry, error):  # pragma: no cover -- only hit on unexpected diff failures
+        self.my_print(
+            (
+                "Unexpected error processing diffs for %s, could indicate an E+ crash caused corrupted files"
+            ) % this_entry.basename
+        )
+        self.my_print("Message: %s" % error)
+
     def add_callbacks(self, print_callback, simstarting_callback, casecompleted_callback, simulationscomplete_callback,
                       diffcompleted_callback, alldone_callback, cancel_callback):
         self.print_callback = print_callback
@@ -744,6 +1445,8 @@ class SuiteRunner:
             self.my_print("Completed runtests")
 
     def my_cancelled(self):  # pragma: no cover
+        if self.baseline:
+            self.baseline.discard()
         if self.cancel_callback:
             self.cancel_callback()
         else:
@@ -773,8 +1476,71 @@ if __name__ == "__main__":  # pragma: no cover
     parser.add_argument('-f', choices=['DD', 'Annual'], help='Force a specific run type', default=None)
     parser.add_argument('-j', action="store", dest="j", type=int, default=1, help='Number of processors to use')
     parser.add_argument('-t', action='store_true', default=False, help='Use this flag to run in test mode')
+    parser.add_argument('--pipeline', action='store_true', default=False,
+                        help='Diff each case as soon as its simulations finish instead of after the whole suite')
+    parser.add_argument('--math-diff-engine', dest='math_diff_engine', default=math_diff.MathDiffEngine.PYTHON,
+                        choices=[math_diff.MathDiffEngine.PYTHON, math_diff.MathDiffEngine.NUMPY,
+                                 math_diff.MathDiffEngine.STREAMING],
+                        help='Engine used to diff the csv outputs; numpy parses them into arrays and falls back to '
+                             'python if it is not installed (pip install .[numpy]), streaming reads the csv files '
+                             'a row at a time to keep memory down')
+    parser.add_argument('--eso-diffs', dest='eso_diffs', action='store_true', default=False,
+                        help='Diff the eso and mtr files directly instead of converting them to csv with ReadVarsESO')
+    parser.add_argument('--sql-diffs', dest='sql_diffs', action='store_true', default=False,
+                        help='Diff the eplusout.sql files of the cases that write them instead of their csv and html '
+                             'outputs')
+    parser.add_argument('--threads', dest='use_threads', action='store_true', default=False,
+                        help='Run the simulations and diffs on threads of this process instead of worker processes')
+    parser.add_argument('--timeout', dest='timeout', type=float, default=None,
+                        help='Kill simulations that run longer than this many minutes (with -j greater than one)')
+    parser.add_argument('--memory-budget', dest='memory_budget', type=float, default=None,
+                        help='Memory in GB the simulations running together are kept within, going by their peak '
+                             'memory in the runtime history')
+    parser.add_argument('--trace', dest='trace', action='store_true', default=False,
+                        help='Write a Chrome trace of the preparation, simulation and diffs of every case next to '
+                             'test_results.json, to open in Perfetto or chrome://tracing')
+    parser.add_argument('--scratch-dir', dest='scratch_dir', default=None,
+                        help='Local directory, like /dev/shm, to run the simulations in; only the outputs the diffs '
+                             'need, and those given with --scratch-keep, are copied back to the build directories')
+    parser.add_argument('--scratch-keep', dest='scratch_keep', action='append', default=None,
+                        help='File name pattern of other outputs to copy back from the scratch directory, like '
+                             '"*.rdd"; can be given more than once')
+    parser.add_argument('--scratch-min-free', dest='scratch_min_free', type=float, default=1.0,
+                        help='Space in GB to leave free in the scratch directory; cases expected to take more than '
+                             'the space left, going by their outputs in the runtime history, run in the build '
+                             'directories instead')
+    parser.add_argument('--runtime-history', dest='runtime_history', action='append', default=None,
+                        help='run_times.csv file of an earlier suite, used to start the longest cases first; can be '
+                             'given more than once, by default the earlier suites in a_build are used')
+    parser.add_argument('--copy-inputs', dest='link_inputs', action='store_false', default=True,
+                        help='Copy the idd, weather and dataset files into each run directory instead of linking them')
+    parser.add_argument('--cache-dir', dest='cache_dir', default=None,
+                        help='Directory of a simulation cache; runs with unchanged tools and inputs are restored '
+                             'from it')
+    parser.add_argument('--cache-size', dest='cache_size', type=float,
+                        default=SimulationCache.default_max_size / 1e9,
+                        help='Size the simulation cache is kept under, in GB')
+    parser.add_argument('--baseline-store', dest='baseline_store', default=None,
+                        help='Directory of stored build A results; build A is only simulated if the store does not '
+                             'already have results for its baseline id')
+    parser.add_argument('--baseline-id', dest='baseline_id', default=None,
+                        help='Name of the build A baseline in the store, the git commit of a_src by default')
+    parser.add_argument('--broker', dest='broker_address', default=None,
+                        help='host:port to serve the simulations and diffs on, to workers started on other hosts with '
+                             'epregressions/broker.py; -j local workers still prepare the run directories')
+    parser.add_argument('--broker-key', dest='broker_key', default=None,
+                        help='Key the remote workers are started with, to keep other clients out; read from '
+                             '--broker-key-file or the %s environment variable if not given' % authkey_variable)
+    parser.add_argument('--broker-key-file', dest='broker_key_file', default=None,
+                        help='File whose first line is the key the remote workers are started with')
+    parser.add_argument('--resume', dest='resume_dir', default=None,
+                        help='Output directory of an interrupted suite, like a_build/Tests_20200101_120000; the '
+                             'simulations and diffs recorded in its journal are not run again')
 
     args = parser.parse_args()
+    broker_key = read_authkey(args.broker_key, args.broker_key_file)
+    if args.broker_address and not broker_key:
+        parser.error('--broker needs a key: pass --broker-key or --broker-key-file, or set %s' % authkey_variable)
 
     run_type = ForceRunType.NONE
     if args.f:
@@ -815,13 +1581,40 @@ if __name__ == "__main__":  # pragma: no cover
             if DoASingleTestRun:
                 break
 
+    baseline_id = args.baseline_id
+    if args.baseline_store and not baseline_id:
+        baseline_id = source_commit(args.a_src)
+        if not baseline_id:
+            print("ERROR: Could not find the commit of %s to name the baseline; pass --baseline-id" % args.a_src)
+            sys.exit(1)
+
     # Build the run configuration
     RunConfig = TestRunConfiguration(force_run_type=run_type,
                                      single_test_run=DoASingleTestRun,
                                      num_threads=args.j,
                                      report_freq=ReportingFreq.HOURLY,
                                      build_a=base,
-                                     build_b=mod)
+                                     build_b=mod,
+                                     pipeline=args.pipeline,
+                                     math_diff_engine=args.math_diff_engine,
+                                     cache_dir=args.cache_dir,
+                                     cache_size=int(args.cache_size * 1e9),
+                                     baseline_store=args.baseline_store,
+                                     baseline_id=baseline_id,
+                                     simulation_timeout=args.timeout * 60 if args.timeout else None,
+                                     runtime_history=args.runtime_history,
+                                     use_threads=args.use_threads,
+                                     link_inputs=args.link_inputs,
+                                     eso_diffs=args.eso_diffs,
+                                     sql_diffs=args.sql_diffs,
+                                     resume_dir=args.resume_dir,
+                                     broker_address=args.broker_address,
+                                     broker_key=broker_key,
+                                     memory_budget=args.memory_budget * 1024 if args.memory_budget else None,
+                                     trace=args.trace,
+                                     scratch_dir=args.scratch_dir,
+                                     scratch_keep=args.scratch_keep,
+                                     scratch_min_free=args.scratch_min_free * 1024)
 
     # instantiate the test suite
     Runner = SuiteRunner(RunConfig, entries)
@@ -0,0 +1,515 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals
+
+import csv
+import heapq
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from functools import partial
+from multiprocessing import Lock, Pipe, Process, Value
+
+try:
+    from multiprocessing.connection import wait as wait_for_connections
+except ImportError:  # pragma: no cover - python 2
+    def wait_for_connections(connections, timeout):
+        deadline = time.time() + timeout
+        while True:
+            ready = [c for c in connections if c.poll()]
+            if ready or time.time() >= deadline:
+                return ready
+            time.sleep(0.05)
+
+
+# the idle workers of the scheduler running the task on this thread, the count of them the task has borrowed, and the
+# programs the task started, when it runs on a thread
+task_context = threading.local()
+
+
+def borrow_worker():
+    """Borrow an idle worker of the scheduler running the task on this thread, to run something alongside the task.
+
+    Returns a function that gives the worker back when called, or None if no worker is idle or the task isn't being
+    run by a scheduler."""
+    spare_workers = getattr(task_context, 'spare_workers', None)
+    if spare_workers is None or not spare_workers.take(task_context.borrowed):
+        return None
+    return partial(spare_workers.give_back, task_context.borrowed)
+
+
+class SpareWorkers:
+    """The count of idle workers of a scheduler, shared with the worker processes.
+
+    The scheduler takes a worker for each task it starts, and a task can borrow another one to run a program alongside
+    its own, so that together they never run more than the scheduler has workers.  What a task borrowed is counted for
+    it too, and given back by the scheduler when the task finishes, so a task that is killed can't keep the workers it
+    borrowed."""
+
+    def __init__(self, count):
+        self.lock = Lock()
+        self.count = Value('i', count, lock=False)
+
+    def idle(self):
+        return self.count.value
+
+    def take(self, borrowed=None):
+        with self.lock:
+            if self.count.value < 1:
+                return False
+            self.count.value -= 1
+            if borrowed is not None:
+                borrowed.value += 1
+            return True
+
+    def give_back(self, borrowed=None):
+        with self.lock:
+            if borrowed is None:
+                self.count.value += 1
+            elif borrowed.value > 0:  # unless the scheduler already took it back along with the task
+                borrowed.value -= 1
+                self.count.value += 1
+
+    def task_finished(self, borrowed):
+        """Give back the worker of a finished task, along with any it borrowed and didn't give back"""
+        with self.lock:
+            self.count.value += 1 + borrowed.value
+            borrowed.value = 0
+
+
+def in_task_context(func):
+    """func, to run on another thread with the task context of this one, for a thread the task starts to run something
+    alongside itself"""
+    context = dict(task_context.__dict__)
+
+    def run_in_context(*args):
+        task_context.__dict__.update(context)
+        return func(*args)
+
+    return run_in_context
+
+
+def task_programs():
+    """The TaskPrograms of the task running on this thread, or None if it isn't a thread task of a scheduler"""
+    return getattr(task_context, 'programs', None)
+
+
+def kill_program(pid):
+    """Kill a program started in a process group of its own, along with anything it started"""
+    if os.name == 'nt':  # pragma: no cover - windows only
+        with open(os.devnull, 'w') as devnull:
+            subprocess.call(['taskkill', '/F', '/T', '/PID', str(pid)], stdout=devnull, stderr=devnull)
+        return
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:  # pragma: no cover - it finished in the meantime
+        pass
+
+
+class TaskPrograms:
+    """The programs a task running on a thread has started, as Popen objects.
+
+    A thread can't be killed, so the scheduler kills these instead when it stops the task, and any program the task
+    starts after that is killed as soon as it is added, so the abandoned thread runs through what is left of the task
+    without holding on to a worker's CPU and memory."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.processes = set()
+        self.stopped = False
+
+    def add(self, process):
+        with self.lock:
+            if not self.stopped:
+                self.processes.add(process)
+                return
+        kill_program(process.pid)
+
+    def remove(self, process):
+        with self.lock:
+            self.processes.discard(process)
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            processes = list(self.processes)
+        for process in processes:
+            kill_program(process.pid)
+
+
+def set_task_context(spare_workers, borrowed, programs=None):
+    task_context.spare_workers = spare_workers
+    task_context.borrowed = borrowed
+    task_context.programs = programs
+
+
+def run_task(connection, func, args, spare_workers=None, borrowed=None):  # pragma: no cover - runs in a child process
+    """Run one task in a worker process and send back (value, error)"""
+    if hasattr(os, 'setsid'):
+        # lead a new process group, so that the worker and every program it starts can be killed together
+        os.setsid()
+    set_task_context(spare_workers, borrowed)
+    try:
+        result = (func(*args), None)
+    except Exception as e:
+        result = (None, '%s: %s' % (type(e).__name__, e))
+    connection.send(result)
+    connection.close()
+
+
+def run_task_in_thread(connection, func, args, spare_workers=None, borrowed=None, programs=None):
+    """Run one task on a worker thread and send back (value, error)"""
+    set_task_context(spare_workers, borrowed, programs)
+    try:
+        result = (func(*args), None)
+    except Exception as e:
+        result = (None, '%s: %s' % (type(e).__name__, e))
+    try:
+        connection.send(result)
+    except (IOError, OSError):  # the task timed out or was cancelled, and nobody is listening anymore
+        pass
+    connection.close()
+
+
+def kill_process_tree(process):
+    """Kill a worker process along with anything it started, like a running EnergyPlus"""
+    if os.name == 'nt':  # pragma: no cover - windows only
+        with open(os.devnull, 'w') as devnull:
+            subprocess.call(['taskkill', '/F', '/T', '/PID', str(process.pid)], stdout=devnull, stderr=devnull)
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:  # pragma: no cover - the worker hasn't made its process group yet, or is already gone
+            pass
+    process.join(5)
+    if process.is_alive():  # pragma: no cover
+        process.terminate()
+        process.join()
+
+
+# the error of a task whose worker process was killed from outside, usually by the kernel when memory ran out
+killed_error = 'worker process was killed'
+
+
+class ScheduledTask:
+    def __init__(self, key, func, args, timeout, thread, memory=0.0, exclusive=False, background=False):
+        self.key = key
+        self.func = func
+        self.args = args
+        self.timeout = timeout
+        self.thread = thread
+        self.memory = memory
+        self.exclusive = exclusive
+        self.background = background
+        self.process = None
+        self.connection = None
+        self.start_time = None
+        self.borrowed = None  # the count of idle workers the task has borrowed, shared with its worker
+        self.programs = None  # the programs a thread task has started
+
+
+class TaskScheduler:
+    """Runs tasks in a pool of worker processes, one process per task.
+
+    Unlike a ProcessPoolExecutor, a task that runs too long, or a suite that is cancelled, can actually be stopped:
+    each task runs in its own process group, which is killed along with any EnergyPlus it started.  A worker that dies
+    only fails its own task.  Tasks are queued with submit and collected with wait, which returns (key, value, error)
+    for each task that finished; error is None when the task returned normally.
+
+    A task can instead be run on a thread, which is much cheaper to start and shares this process's memory, but can't
+    be killed: when a thread task times out or is cancelled the programs it started are killed, see TaskPrograms, and
+    the thread is reported and forgotten, and finishes on its own.
+
+    With a memory budget, in MB, tasks are only started while the memory expected of the running tasks, along with the
+    next one, fits in it; a task expected to take more than the whole budget still runs, once nothing else is.  Tasks
+    are started in order, so a big one isn't passed over by smaller ones while it waits for room.  An exclusive task
+    runs with no other task alongside it.
+
+    A task can borrow a worker left idle to run something alongside itself, see borrow_worker; no new task is started
+    until it is given back.  Background tasks, like copying files around, start on a thread right away without taking
+    a worker at all, and are only waited for like the others."""
+
+    def __init__(self, max_workers, print_callback=None, status_interval=60.0, memory_budget=None):
+        self.max_workers = max(1, max_workers)
+        self.spare_workers = SpareWorkers(self.max_workers)
+        self.memory_budget = memory_budget
+        self.print_callback = print_callback
+        self.status_interval = status_interval
+        self.queue = deque()
+        self.priority_queue = deque()
+        self.running = []
+        self.started_at = None
+        self.last_status_time = time.time()
+        self.busy_time = 0.0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.cancelled = 0
+        self.max_memory_in_use = 0.0
+
+    def submit(self, key, func, args, timeout=None, priority=False, thread=False, memory=0.0, exclusive=False,
+               background=False):
+        """Queue func(*args); priority tasks are started before any of the others, timeout is in seconds, thread
+        tasks run on a thread of this process, memory is the peak memory expected of the task in MB, exclusive
+        tasks run alone, and background tasks start on a thread right away, outside of the workers"""
+        if background:
+            self.start(ScheduledTask(key, func, args, timeout, True, background=True))
+            return
+        task = ScheduledTask(key, func, args, timeout, thread, memory, exclusive)
+        if priority:
+            self.priority_queue.append(task)
+        else:
+            self.queue.append(task)
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth())
+
+    def queue_depth(self):
+        return len(self.queue) + len(self.priority_queue)
+
+    def busy(self):
+        return bool(self.running or self.queue or self.priority_queue)
+
+    def memory_in_use(self):
+        return sum(task.memory for task in self.running)
+
+    def admits(self, task):
+        """Whether the task can start alongside the running ones"""
+        if not any(not t.background for t in self.running):
+            return True
+        if task.exclusive or any(t.exclusive for t in self.running):
+            return False
+        return self.memory_budget is None or self.memory_in_use() + task.memory <= self.memory_budget
+
+    def start_tasks(self):
+        while self.priority_queue or self.queue:
+            next_queue = self.priority_queue if self.priority_queue else self.queue
+            if not self.admits(next_queue[0]) or not self.spare_workers.take():
+                break
+            self.start(next_queue.popleft())
+
+    def start(self, task):
+        reader, writer = Pipe(duplex=False)
+        if task.background:
+            worker_args = (writer, task.func, task.args)
+        else:
+            task.borrowed = Value('i', 0, lock=False)
+            worker_args = (writer, task.func, task.args, self.spare_workers, task.borrowed)
+            if task.thread:
+                task.programs = TaskPrograms()
+                worker_args += (task.programs,)
+        if task.thread:
+            worker = threading.Thread(target=run_task_in_thread, args=worker_args)
+            worker.daemon = True
+            worker.start()
+        else:
+            task.process = Process(target=run_task, args=worker_args)
+            task.process.daemon = True
+            task.process.start()
+            writer.close()  # only the worker writes, and closing this end lets the reader see a worker that died
+        task.connection = reader
+        task.start_time = time.time()
+        self.running.append(task)
+        if task.background:
+            return
+        if self.started_at is None:
+            self.started_at = task.start_time
+        self.max_memory_in_use = max(self.max_memory_in_use, self.memory_in_use())
+
+    def finish(self, task, value, error):
+        self.running.remove(task)
+        task.connection.close()
+        if not task.background:
+            self.spare_workers.task_finished(task.borrowed)
+            self.busy_time += time.time() - task.start_time
+        if error:
+            self.failed += 1
+        else:
+            self.completed += 1
+        return task.key, value, error
+
+    def wait(self, timeout=1.0):
+        """Start queued tasks on free workers, then wait up to timeout seconds for running tasks to finish"""
+        self.start_tasks()
+        finished = []
+        if self.running:
+            for connection in wait_for_connections([task.connection for task in self.running], timeout):
+                task = [t for t in self.running if t.connection is connection][0]
+                try:
+                    value, error = connection.recv()
+                except (EOFError, OSError):
+                    task.process.join()
+                    if task.process.exitcode == -getattr(signal, 'SIGKILL', 9):
+                        value, error = None, killed_error
+                    else:
+                        value, error = None, 'worker process exited with code %s' % task.process.exitcode
+                else:
+                    if task.process:
+                        task.process.join()
+                finished.append(self.finish(task, value, error))
+        now = time.time()
+        for task in list(self.running):
+            if task.timeout and now - task.start_time > task.timeout:
+                self.stop(task)
+                self.timed_out += 1
+                finished.append(self.finish(task, None, 'timed out after %s seconds' % task.timeout))
+        self.start_tasks()
+        if self.print_callback and now - self.last_status_time > self.status_interval:
+            self.last_status_time = now
+            self.print_callback(self.status())
+        return finished
+
+    def cancel(self):
+        """Drop the queued tasks and kill the running ones"""
+        self.cancelled += self.queue_depth() + len(self.running)
+        self.queue.clear()
+        self.priority_queue.clear()
+        for task in self.running:
+            self.stop(task)
+            if not task.background:
+                self.spare_workers.task_finished(task.borrowed)
+            task.connection.close()
+        self.running = []
+
+    @staticmethod
+    def stop(task):
+        if task.process:
+            kill_process_tree(task.process)
+        elif task.programs:
+            task.programs.stop()
+
+    def utilization(self):
+        if self.started_at is None:
+            return 0.0
+        elapsed = time.time() - self.started_at
+        busy_time = self.busy_time + sum(time.time() - task.start_time for task in self.running if not task.background)
+        return busy_time / (elapsed * self.max_workers) if elapsed > 0 else 0.0
+
+    def status(self):
+        status = 'Scheduler: %s queued, %s of %s workers busy, %.0f%% worker utilization' % (
+            self.queue_depth(), self.max_workers - self.spare_workers.idle(), self.max_workers,
+            100.0 * self.utilization()
+        )
+        if self.memory_budget is not None:
+            status += ', %.0f of %.0f MB expected in use' % (self.memory_in_use(), self.memory_budget)
+        return status
+
+    def summary(self):
+        summary = ('Scheduler: %s tasks completed, %s failed (%s timed out), %s cancelled, at most %s queued, '
+                   '%.0f%% worker utilization') % (
+            self.completed, self.failed, self.timed_out, self.cancelled, self.max_queue_depth,
+            100.0 * self.utilization()
+        )
+        if self.memory_budget is not None:
+            summary += ', at most %.0f of %.0f MB expected in use' % (self.max_memory_in_use, self.memory_budget)
+        return summary
+
+
+class RuntimeHistory:
+    """Simulation runtimes of the cases in previous suites, read from the run_times.csv files they wrote.
+
+    Long cases that start last leave most of the workers idle while they finish, so queueing the longest cases first
+    (longest processing time first) keeps the end of the suite short.  Later files override earlier ones, and cases
+    that have never run successfully are estimated as the median of the known runtimes.  The peak memory of the runs,
+    in the files that have it, is kept the same way, for the scheduler to keep the simulations it runs together within
+    the memory of the host, and so is the size of the outputs the runs wrote, to know whether they fit in a scratch
+    directory."""
+
+    def __init__(self):
+        self.runtimes = {}  # case name: [build a runtime, build b runtime], None where unknown
+        self.peak_memory = {}  # case name: [build a peak memory, build b peak memory] in MB, None where unknown
+        self.output_size = {}  # case name: [build a output size, build b output size] in MB, None where unknown
+        self.files_read = 0
+        # the estimates of the unknown cases, worked out as the files are read rather than for every case queued
+        self.median_runtime = 0.0
+        self.median_peak_memory = 0.0
+        self.median_output_size = 0.0
+
+    def read_csv(self, csv_file_path):
+        with open(csv_file_path) as csv_file:
+            reader = csv.reader(csv_file)
+            header = next(reader, [])
+            # written after the peak memory and other measures, in files written since it was recorded
+            written_column = header.index('Written [bytes]') if 'Written [bytes]' in header else None
+            for row in reader:
+                if len(row) < 3:
+                    continue
+                runtimes = self.runtimes.setdefault(row[0], [None, None])
+                for build_index in range(2):
+                    try:
+                        runtime = float(row[build_index + 1])
+                    except ValueError:
+                        continue
+                    if runtime > 0:  # failed runs are written as -1
+                        runtimes[build_index] = runtime
+                peak_memory = self.peak_memory.setdefault(row[0], [None, None])
+                for build_index in range(2):
+                    try:
+                        memory = float(row[build_index + 3])
+                    except (IndexError, ValueError):  # written before the peak memory was
+                        continue
+                    if memory > 0:
+                        peak_memory[build_index] = memory
+                if written_column is None:
+                    continue
+                output_size = self.output_size.setdefault(row[0], [None, None])
+                for build_index in range(2):
+                    try:
+                        written = float(row[written_column + build_index])
+                    except (IndexError, ValueError):
+                        continue
+                    if written > 0:
+                        output_size[build_index] = written / (1024.0 * 1024.0)
+        self.files_read += 1
+        self.median_runtime = median(runtime for runtimes in self.runtimes.values() for runtime in runtimes if runtime)
+        self.median_peak_memory = median(memory for peaks in self.peak_memory.values() for memory in peaks if memory)
+        self.median_output_size = median(size for sizes in self.output_size.values() for size in sizes if size)
+
+    def known(self, case_name):
+        return any(runtime is not None for runtime in self.runtimes.get(case_name, []))
+
+    def estimate(self, case_name, build_index):
+        """Expected runtime in seconds of a case in build a (build_index 0) or build b (1)"""
+        runtimes = self.runtimes.get(case_name, [None, None])
+        if runtimes[build_index] is not None:
+            return runtimes[build_index]
+        if runtimes[1 - build_index] is not None:
+            return runtimes[1 - build_index]
+        return self.median_runtime
+
+    def memory_estimate(self, case_name, build_index):
+        """Expected peak memory in MB of a case in build a (build_index 0) or build b (1), estimated like the runtime,
+        and 0 when no peak memory is known at all"""
+        peak_memory = self.peak_memory.get(case_name, [None, None])
+        if peak_memory[build_index] is not None:
+            return peak_memory[build_index]
+        if peak_memory[1 - build_index] is not None:
+            return peak_memory[1 - build_index]
+        return self.median_peak_memory
+
+    def output_size_estimate(self, case_name, build_index):
+        """Expected size in MB of the outputs of a case in build a (build_index 0) or build b (1), estimated like the
+        runtime, and 0 when no output size is known at all"""
+        output_size = self.output_size.get(case_name, [None, None])
+        if output_size[build_index] is not None:
+            return output_size[build_index]
+        if output_size[1 - build_index] is not None:
+            return output_size[1 - build_index]
+        return self.median_output_size
+
+
+def median(values):
+    """The middle of the values, the upper one of the two for an even number of them, or 0 if there are none"""
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[len(values) // 2]
+
+
+def projected_makespan(runtimes, num_workers):
+    """Time to finish tasks of the given runtimes if each one, in order, starts on the first free worker"""
+    workers = [0.0] * max(1, num_workers)
+    for runtime in runtimes:
+        heapq.heapreplace(workers, workers[0] + runtime)
+    return max(workers)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals
+
+import fnmatch
+import os
+import shutil
+
+from epregressions import energyplus
+
+# the outputs the diffs read and the suite keeps track of runs with; only these are copied back from a scratch
+# directory, along with the ones the user asks to keep
+kept_outputs = [
+    'eplusout.end', 'eplusout.err', 'eplusout.csv', 'eplusmtr.csv', 'epluszsz.csv', 'eplusssz.csv', 'eplustbl.htm',
+    'eplusout.sql', 'eplusout.audit', 'eplusout.bnd', 'eplusout.dxf', 'eplusout.eio', 'eplusout.mdd',
+    'eplusout.mtd', 'eplusout.rdd', 'eplusout.shd', 'eplusout.delightin', 'eplusout.delightout', 'aa_testSuite_*',
+]
+# diffed instead of the csv files with --eso-diffs
+eso_outputs = ['eplusout.eso', 'eplusout.mtr']
+
+
+def free_space_mb(directory):
+    if hasattr(shutil, 'disk_usage'):
+        return shutil.disk_usage(directory).free / (1024.0 * 1024.0)
+    stats = os.statvfs(directory)  # pragma: no cover - python 2
+    return stats.f_bavail * stats.f_frsize / (1024.0 * 1024.0)  # pragma: no cover
+
+
+def directory_size_mb(directory):
+    """Size of the files in a directory, leaving out links, which stay links in a scratch copy of it"""
+    size = 0
+    for root, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            file_path = os.path.join(root, file_name)
+            if not os.path.islink(file_path):
+                size += os.path.getsize(file_path)
+    return size / (1024.0 * 1024.0)
+
+
+class ScratchSpace:
+    """A local directory, like /dev/shm or a node-local disk, that the simulations run in instead of the build
+    directories, which may be on slow network storage.
+
+    The suite sets space aside in the scratch directory for each case it sends there, the size it expects the case to
+    take, and the case only goes there if that still leaves at least min_free_mb free after the space set aside for
+    the cases already there; otherwise it runs in place as usual.  The free space already counts what those cases
+    have written so far, so this errs on the side of running in place.  Afterwards only the outputs matching the keep
+    patterns are copied back, the scratch copy is removed, and its space is released."""
+
+    def __init__(self, directory, keep=None, min_free_mb=1024.0):
+        self.directory = directory
+        self.keep = list(keep or [])
+        self.min_free_mb = min_free_mb
+        self.reserved = {}  # scratch run directory: MB set aside for the case running there
+
+    def run_directory(self, test_output_dir, build, case_name):
+        """Where the case runs in the scratch directory; the build is 'a' or 'b'"""
+        return os.path.join(self.directory, test_output_dir, build, case_name)
+
+    def reserve(self, scratch_run_directory, footprint_mb):
+        """Set footprint_mb aside for a case to run in scratch_run_directory, returning False instead if it doesn't
+        fit alongside the cases already there"""
+        free_mb = free_space_mb(self.directory) - sum(self.reserved.values())
+        if free_mb - footprint_mb < self.min_free_mb:
+            return False
+        self.reserved[scratch_run_directory] = footprint_mb
+        return True
+
+    def release(self, scratch_run_directory):
+        self.reserved.pop(scratch_run_directory, None)
+
+    def is_reserved(self, scratch_run_directory):
+        return scratch_run_directory in self.reserved
+
+    def kept(self, file_name):
+        return any(fnmatch.fnmatch(file_name, pattern) for pattern in self.keep)
+
+
+def execute_in_scratch(these_args, scratch_run_directory):
+    """execute_energyplus in a copy of the run directory in the scratch directory, which the suite set space aside in"""
+    if os.path.exists(scratch_run_directory):  # left over from a run that was killed
+        shutil.rmtree(scratch_run_directory)
+    if not os.path.exists(os.path.dirname(scratch_run_directory)):
+        try:
+            os.makedirs(os.path.dirname(scratch_run_directory))
+        except OSError:  # pragma: no cover - another worker just made it
+            pass
+    # the inputs linked in by the stager stay links, pointing at the shared files
+    shutil.copytree(these_args[2], scratch_run_directory, symlinks=True)
+    return energyplus.execute_energyplus(*(tuple(these_args[:2]) + (scratch_run_directory,) + tuple(these_args[3:])))
+
+
+def copy_back(scratch, scratch_run_directory, run_directory, value):
+    """Copy the outputs worth keeping from a run in the scratch directory back into its run directory, and remove the
+    scratch copy; returns value, the result of the run, unchanged"""
+    if not os.path.isdir(scratch_run_directory):  # it ran in place
+        return value
+    try:
+        for file_name in os.listdir(scratch_run_directory):
+            file_path = os.path.join(scratch_run_directory, file_name)
+            if scratch.kept(file_name) and os.path.isfile(file_path) and not os.path.islink(file_path):
+                shutil.copy2(file_path, os.path.join(run_directory, file_name))
+    finally:
+        shutil.rmtree(scratch_run_directory, ignore_errors=True)
+    return value
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals
+
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - windows
+    fcntl = None
+
+# the linux ioctl that makes a copy-on-write clone of a file, on filesystems that support it (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+
+class StageMethod:
+    REFLINK = 'reflink'
+    HARDLINK = 'hardlink'
+    SYMLINK = 'symlink'
+    COPY = 'copy'
+
+
+def reflink(source, destination):
+    if fcntl is None:  # pragma: no cover - windows
+        raise OSError('reflinks are not supported on this platform')
+    try:
+        with open(source, 'rb') as source_file:
+            with open(destination, 'wb') as destination_file:
+                fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+    except (IOError, OSError):
+        if os.path.exists(destination):
+            os.remove(destination)
+        raise OSError('could not reflink %s' % source)
+
+
+def symlink(source, destination):
+    if not hasattr(os, 'symlink'):  # pragma: no cover - python 2 on windows
+        raise OSError('symlinks are not supported on this platform')
+    os.symlink(os.path.abspath(source), destination)
+
+
+class Stager:
+    """Puts the shared inputs of the simulations, like the idd, weather and dataset files, into the run directories.
+
+    Every case of both builds gets its own copy of these files, which adds up to a lot of writing on a large suite.
+    The files are only ever read by the simulations, so they are linked into the run directories instead, using the
+    first of the methods that works: a copy-on-write reflink, a hard link, a symbolic link, and finally a plain copy.
+    A method that fails between two devices isn't tried again for them.  Files that the run modifies, like the in.idf
+    or in.imf, must never be staged this way, since writing to a hard link writes to the shared file."""
+
+    default_methods = [StageMethod.REFLINK, StageMethod.HARDLINK, StageMethod.SYMLINK, StageMethod.COPY]
+
+    def __init__(self, methods=None):
+        self.methods = methods or self.default_methods
+        self.failed_methods = set()
+        self.counts = dict((method, 0) for method in self.default_methods)
+        self.bytes_saved = 0
+        self.bytes_copied = 0
+        self.staged = []  # the destinations since the last take_staged
+
+    @staticmethod
+    def device(file_path):
+        return os.stat(file_path).st_dev
+
+    def stage_file(self, source, destination):
+        """Link or copy source to the destination file path, returning the method that was used"""
+        size = os.path.getsize(source)
+        self.staged.append(destination)
+        devices = (self.device(source), self.device(os.path.dirname(os.path.abspath(destination))))
+        for method in self.methods:
+            if method == StageMethod.COPY:
+                break
+            if (method, devices) in self.failed_methods:
+                continue
+            try:
+                if method == StageMethod.REFLINK:
+                    reflink(source, destination)
+                elif method == StageMethod.HARDLINK:
+                    os.link(source, destination)
+                elif method == StageMethod.SYMLINK:
+                    symlink(source, destination)
+            except (AttributeError, NotImplementedError, OSError):
+                self.failed_methods.add((method, devices))
+                continue
+            self.counts[method] += 1
+            self.bytes_saved += size
+            return method
+        shutil.copy(source, destination)
+        self.counts[StageMethod.COPY] += 1
+        self.bytes_copied += size
+        return StageMethod.COPY
+
+    def take_staged(self):
+        """Returns the destinations of the files staged since the last call, which are the shared inputs of the run
+        directory that was just prepared"""
+        staged, self.staged = self.staged, []
+        return staged
+
+    def merge(self, other):
+        """Add in the counts of a stager that worked on a copy of the suite, like the one in a pool worker"""
+        self.failed_methods.update(other.failed_methods)
+        for method in self.default_methods:
+            self.counts[method] += other.counts[method]
+        self.bytes_saved += other.bytes_saved
+        self.bytes_copied += other.bytes_copied
+
+    def summary(self):
+        return 'Staged inputs: %.1f MB linked instead of copied (%s), %.1f MB copied' % (
+            self.bytes_saved / 1e6,
+            ', '.join('%s %s' % (self.counts[method], method) for method in self.default_methods[:-1]),
+            self.bytes_copied / 1e6
+        )
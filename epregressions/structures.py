@@ -38,6 +38,7 @@ class TextDifferences:
     SHD = 9
     DL_IN = 10
     DL_OUT = 11
+    SQL_ERRORS = 12
     # diff types
     EQUAL = 1
     DIFFS = 2
@@ -59,12 +60,19 @@ class TextDifferences:
         response['diff_type'] = self.diff_type_to_string(self.diff_type)
         return response
 
+    @staticmethod
+    def from_dict(response):
+        if response['diff_type'] == 'equal':
+            return TextDifferences(TextDifferences.EQUAL)
+        return TextDifferences(TextDifferences.DIFFS)
+
 
 class MathDifferences:
     ESO = 1
     MTR = 2
     ZSZ = 3
     SSZ = 4
+    SQL = 5
 
     def __init__(self, args_from_math_diff):
         self.diff_type = args_from_math_diff[0]
@@ -80,6 +88,13 @@ class MathDifferences:
         response['count_of_small_diff'] = self.count_of_small_diff
         return response
 
+    @staticmethod
+    def from_dict(response):
+        return MathDifferences([
+            response['diff_type'], response['num_records'], response['count_of_big_diff'],
+            response['count_of_small_diff']
+        ])
+
 
 class TableDifferences:
     def __init__(self, args_from_table_diff):
@@ -106,6 +121,14 @@ class TableDifferences:
         response['not_in_2_count'] = self.not_in_2_count
         return response
 
+    @staticmethod
+    def from_dict(response):
+        return TableDifferences([
+            response['msg'], response['table_count'], response['big_diff_count'], response['small_diff_count'],
+            response['equal_count'], response['string_diff_count'], response['size_err_count'],
+            response['not_in_1_count'], response['not_in_2_count']
+        ])
+
 
 class EndErrSummary:
     STATUS_UNKNOWN = 1
@@ -142,18 +165,122 @@ class EndErrSummary:
             response['run_time_seconds_case2'] = self.run_time_seconds_case2
         return response
 
+    @staticmethod
+    def status_from_string(status_string):
+        for status in [EndErrSummary.STATUS_UNKNOWN, EndErrSummary.STATUS_SUCCESS, EndErrSummary.STATUS_FATAL,
+                       EndErrSummary.STATUS_MISSING]:
+            if EndErrSummary.status_to_string(status) == status_string:
+                return status
+        raise Exception('Invalid argument passed in')
+
+    @staticmethod
+    def from_dict(response):
+        return EndErrSummary(
+            EndErrSummary.status_from_string(response['simulation_status_case1']),
+            response.get('run_time_seconds_case1', 0),
+            EndErrSummary.status_from_string(response['simulation_status_case2']),
+            response.get('run_time_seconds_case2', 0)
+        )
+
+
+class ProgramUsage:
+    """What one program run for a simulation took, as accounted by the kernel when the program exited: wall time,
+    user and system CPU time in seconds, peak resident memory in MB and bytes written.  Only the start and wall time
+    are known where the platform doesn't report the rest."""
+
+    def __init__(self, tool, wall_time, user_cpu=None, system_cpu=None, peak_memory_mb=None, bytes_written=None,
+                 killed=False, start_time=None):
+        self.tool = tool
+        self.start_time = start_time  # seconds since the epoch
+        self.wall_time = wall_time
+        self.user_cpu = user_cpu
+        self.system_cpu = system_cpu
+        self.peak_memory_mb = peak_memory_mb
+        self.bytes_written = bytes_written
+        self.killed = killed
+
+    def to_dict(self):
+        return {
+            'tool': self.tool, 'wall_time': self.wall_time, 'user_cpu': self.user_cpu, 'system_cpu': self.system_cpu,
+            'peak_memory_mb': self.peak_memory_mb, 'bytes_written': self.bytes_written, 'killed': self.killed,
+            'start_time': self.start_time
+        }
+
+    @staticmethod
+    def from_dict(response):
+        return ProgramUsage(
+            response['tool'], response['wall_time'], response.get('user_cpu'), response.get('system_cpu'),
+            response.get('peak_memory_mb'), response.get('bytes_written'), response.get('killed', False),
+            response.get('start_time')
+        )
+
+
+class ToolUsage:
+    """The programs run for one simulation, in the order they ran"""
+
+    # the tools execute_energyplus runs, in the order it runs them
+    EPMACRO = 'EPMacro'
+    PARAMETRIC = 'ParametricPreprocessor'
+    EXPAND_OBJECTS = 'ExpandObjects'
+    BASEMENT = 'Basement'
+    SLAB = 'Slab'
+    ENERGYPLUS = 'EnergyPlus'
+    READ_VARS = 'ReadVarsESO'
+    TOOLS = [EPMACRO, PARAMETRIC, EXPAND_OBJECTS, BASEMENT, SLAB, ENERGYPLUS, READ_VARS]
+
+    def __init__(self, programs=None):
+        self.programs = programs or []
+
+    def add(self, program_usage):
+        self.programs.append(program_usage)
+
+    @property
+    def killed(self):
+        """Whether a program was killed, which is what the kernel does to the biggest one when memory runs out"""
+        return any(program.killed for program in self.programs)
+
+    @property
+    def peak_memory_mb(self):
+        peaks = [program.peak_memory_mb for program in self.programs if program.peak_memory_mb is not None]
+        return max(peaks) if peaks else None
+
+    def total(self, attribute, tool=None):
+        """Sum of an attribute, like wall_time, over the programs, or the runs of one tool; None if none has it"""
+        values = [getattr(program, attribute) for program in self.programs if tool is None or program.tool == tool]
+        values = [value for value in values if value is not None]
+        return sum(values) if values else None
+
+    def to_dict(self):
+        return {'programs': [program.to_dict() for program in self.programs]}
+
+    @staticmethod
+    def from_dict(response):
+        return ToolUsage([ProgramUsage.from_dict(program) for program in response['programs']])
+
 
 class TestEntry:
+    # the keys of the diffs in to_dict, and the class each of them is read back with
+    math_diff_keys = ['eso_diffs', 'mtr_diffs', 'zsz_diffs', 'ssz_diffs', 'sql_diffs']
+    table_diff_keys = ['table_diffs', 'sql_table_diffs']
+    text_diff_keys = [
+        'aud_diffs', 'bnd_diffs', 'dxf_diffs', 'eio_diffs', 'err_diffs', 'mdd_diffs', 'mtd_diffs', 'rdd_diffs',
+        'shd_diffs', 'dl_in_diffs', 'dl_out_diffs', 'sql_errors_diffs'
+    ]
 
     def __init__(self, name, epw):
         self.basename = name
         self.epw = epw
         self.summary_result = None
+        self.tool_usage_case1 = None
+        self.tool_usage_case2 = None
         self.eso_diffs = None
         self.mtr_diffs = None
         self.zsz_diffs = None
         self.ssz_diffs = None
         self.table_diffs = None
+        self.sql_diffs = None
+        self.sql_table_diffs = None
+        self.sql_errors_diffs = None
         self.aud_diffs = None
         self.bnd_diffs = None
         self.dxf_diffs = None
@@ -169,6 +296,10 @@ class TestEntry:
     def add_summary_result(self, end_err_summary):
         self.summary_result = end_err_summary
 
+    def add_tool_usage(self, tool_usage_case1, tool_usage_case2):
+        self.tool_usage_case1 = tool_usage_case1
+        self.tool_usage_case2 = tool_usage_case2
+
     def add_math_differences(self, diffs, diff_type):
         if diff_type == MathDifferences.ESO:
             self.eso_diffs = diffs
@@ -178,6 +309,8 @@ class TestEntry:
             self.zsz_diffs = diffs
         elif diff_type == MathDifferences.SSZ:
             self.ssz_diffs = diffs
+        elif diff_type == MathDifferences.SQL:
+            self.sql_diffs = diffs
 
     def add_text_differences(self, diffs, diff_type):
         if diff_type == TextDifferences.AUD:
@@ -202,15 +335,24 @@ class TestEntry:
             self.dl_in_diffs = diffs
         elif diff_type == TextDifferences.DL_OUT:
             self.dl_out_diffs = diffs
+        elif diff_type == TextDifferences.SQL_ERRORS:
+            self.sql_errors_diffs = diffs
 
     def add_table_differences(self, diffs):
         self.table_diffs = diffs
 
+    def add_sql_table_differences(self, diffs):
+        self.sql_table_diffs = diffs
+
     def to_dict(self):
         response = dict()
         response['basename'] = self.basename
         response['epw'] = self.epw
         response['summary'] = self.summary_result.to_dict()
+        if self.tool_usage_case1 and self.tool_usage_case1.programs:
+            response['tool_usage_case1'] = self.tool_usage_case1.to_dict()
+        if self.tool_usage_case2 and self.tool_usage_case2.programs:
+            response['tool_usage_case2'] = self.tool_usage_case2.to_dict()
         success_1 = self.summary_result.simulation_status_case1 == EndErrSummary.STATUS_SUCCESS
         success_2 = self.summary_result.simulation_status_case1 == EndErrSummary.STATUS_SUCCESS
         if success_1 and success_2:
@@ -246,8 +388,31 @@ class TestEntry:
                 response['dl_in_diffs'] = self.dl_in_diffs.to_dict()
             if self.dl_out_diffs:
                 response['dl_out_diffs'] = self.dl_out_diffs.to_dict()
+            if self.sql_diffs:
+                response['sql_diffs'] = self.sql_diffs.to_dict()
+            if self.sql_table_diffs:
+                response['sql_table_diffs'] = self.sql_table_diffs.to_dict()
+            if self.sql_errors_diffs:
+                response['sql_errors_diffs'] = self.sql_errors_diffs.to_dict()
         return response
 
+    @staticmethod
+    def from_dict(response):
+        """Rebuild an entry from its to_dict, like the ones kept in a results journal"""
+        this_entry = TestEntry(response['basename'], response['epw'])
+        this_entry.add_summary_result(EndErrSummary.from_dict(response['summary']))
+        this_entry.add_tool_usage(
+            ToolUsage.from_dict(response['tool_usage_case1']) if 'tool_usage_case1' in response else None,
+            ToolUsage.from_dict(response['tool_usage_case2']) if 'tool_usage_case2' in response else None
+        )
+        for keys, diff_class in [(TestEntry.math_diff_keys, MathDifferences),
+                                 (TestEntry.table_diff_keys, TableDifferences),
+                                 (TestEntry.text_diff_keys, TextDifferences)]:
+            for key in keys:
+                if key in response:
+                    setattr(this_entry, key, diff_class.from_dict(response[key]))
+        return this_entry
+
 
 class CompletedStructure:
     def __init__(self, case_a_source_dir, case_a_build_dir, case_b_source_dir, case_b_build_dir, results_dir):
@@ -273,6 +438,10 @@ class CompletedStructure:
 
     def add_test_entry(self, this_entry):
         self.entries_by_file.append(this_entry)
+        self.add_results(this_entry)
+
+    def add_results(self, this_entry):
+        """Add an entry to the lists of runs and diffs by type, without keeping the entry itself"""
         # always add the current entry because it was tested
         self.all_files.descriptions.append("%s" % this_entry.basename)
         self.all_files.base_names.add(this_entry.basename)
@@ -296,7 +465,8 @@ class CompletedStructure:
             this_entry.eso_diffs: "eso",
             this_entry.mtr_diffs: "mtr",
             this_entry.zsz_diffs: "zsz",
-            this_entry.ssz_diffs: "ssz"
+            this_entry.ssz_diffs: "ssz",
+            this_entry.sql_diffs: "sql"
         }
         for diff in math_diff_hash:
             file_type = math_diff_hash[diff]
@@ -311,15 +481,21 @@ class CompletedStructure:
                     self.small_math_diffs.base_names.add(this_entry.basename)
 
         # get tabular diffs
-        if this_entry.table_diffs:
-            self.total_files_compared.descriptions.append("%s: table" % this_entry.basename)
-            self.total_files_compared.base_names.add(this_entry.basename)
-            if this_entry.table_diffs.big_diff_count > 0:
-                self.big_table_diffs.descriptions.append("%s: %s" % (this_entry.basename, "table"))
-                self.big_table_diffs.base_names.add(this_entry.basename)
-            elif this_entry.table_diffs.small_diff_count > 0:
-                self.small_table_diffs.descriptions.append("%s: %s" % (this_entry.basename, "table"))
-                self.small_table_diffs.base_names.add(this_entry.basename)
+        table_diff_hash = {
+            this_entry.table_diffs: "table",
+            this_entry.sql_table_diffs: "sql table"
+        }
+        for diff in table_diff_hash:
+            file_type = table_diff_hash[diff]
+            if diff:
+                self.total_files_compared.descriptions.append("%s: %s" % (this_entry.basename, file_type))
+                self.total_files_compared.base_names.add(this_entry.basename)
+                if diff.big_diff_count > 0:
+                    self.big_table_diffs.descriptions.append("%s: %s" % (this_entry.basename, file_type))
+                    self.big_table_diffs.base_names.add(this_entry.basename)
+                elif diff.small_diff_count > 0:
+                    self.small_table_diffs.descriptions.append("%s: %s" % (this_entry.basename, file_type))
+                    self.small_table_diffs.base_names.add(this_entry.basename)
 
         # check the textual diffs
         text_diff_hash = {
@@ -334,6 +510,7 @@ class CompletedStructure:
             this_entry.err_diffs: "err",
             this_entry.dl_in_diffs: "delightin",
             this_entry.dl_out_diffs: "delightout",
+            this_entry.sql_errors_diffs: "sql errors",
         }
         for diff in text_diff_hash:
             file_type = text_diff_hash[diff]
@@ -348,7 +525,22 @@ class CompletedStructure:
         try:
             with open(csv_file_path, "w") as csv_file:
                 writer = csv.writer(csv_file)
-                writer.writerow(["Case", "Runtime [s]", "Runtime [s]"])
+                # each measure of the programs run for a simulation gets a column for case a and one for case b
+                usage_columns = [
+                    ("Peak memory [MB]", lambda usage: usage.peak_memory_mb),
+                    ("Wall time [s]", lambda usage: usage.total('wall_time')),
+                    ("User CPU [s]", lambda usage: usage.total('user_cpu')),
+                    ("System CPU [s]", lambda usage: usage.total('system_cpu')),
+                    ("Written [bytes]", lambda usage: usage.total('bytes_written')),
+                ]
+                for tool in ToolUsage.TOOLS:
+                    usage_columns.append(
+                        ("%s wall time [s]" % tool, lambda usage, tool=tool: usage.total('wall_time', tool))
+                    )
+                header = ["Case", "Runtime [s]", "Runtime [s]"]
+                for heading, _ in usage_columns:
+                    header += [heading, heading]
+                writer.writerow(header)
                 for this_entry in self.entries_by_file:
                     runtime1 = -1
                     runtime2 = -1
@@ -357,12 +549,30 @@ class CompletedStructure:
                             runtime1 = this_entry.summary_result.run_time_seconds_case1
                         if this_entry.summary_result.simulation_status_case2 == EndErrSummary.STATUS_SUCCESS:
                             runtime2 = this_entry.summary_result.run_time_seconds_case2
-                    writer.writerow([this_entry.basename, runtime1, runtime2])
+                    row = [this_entry.basename, runtime1, runtime2]
+                    # what a run took is worth knowing even if it failed, it may have run out of memory
+                    for _, measure in usage_columns:
+                        for tool_usage in [this_entry.tool_usage_case1, this_entry.tool_usage_case2]:
+                            value = measure(tool_usage) if tool_usage else None
+                            row.append(-1 if value is None else value)
+                    writer.writerow(row)
         except Exception as this_exception:
             print(this_exception)
             raise this_exception
 
-    def to_json_summary(self, json_file_path):
+    def to_json_summary(self, json_file_path, entry_dicts=None):
+        """Write the results of the suite to a json file.  entry_dicts is a function that returns the to_dict of each
+        entry in turn, like ResultsJournal.entries; with it, the summary is written from those one entry at a time
+        instead of from the entries kept in this structure, and it is called twice, for the lists by type first."""
+        summary = self
+        if entry_dicts is None:
+            def entry_dicts():
+                return (entry.to_dict() for entry in self.entries_by_file)
+        else:
+            summary = CompletedStructure(self.case_a_source_dir, self.case_a_build_dir, self.case_b_source_dir,
+                                         self.case_b_build_dir, self.results_dir)
+            for entry_dict in entry_dicts():
+                summary.add_results(TestEntry.from_dict(entry_dict))
         output_data = {
             'directories': {
                 'case_a_source': self.case_a_source_dir,
@@ -371,22 +581,26 @@ class CompletedStructure:
                 'case_b_build': self.case_b_build_dir
             },
             'runs': {
-                'all_files': [x for x in self.all_files.base_names],
-                'success_case_a': [x for x in self.success_case_a.base_names],
-                'failure_case_a': [x for x in self.failure_case_a.base_names],
-                'success_case_b': [x for x in self.success_case_b.base_names],
-                'failure_case_b': [x for x in self.failure_case_b.base_names],
-                'all_files_compared': [x for x in self.total_files_compared.descriptions]
+                'all_files': [x for x in summary.all_files.base_names],
+                'success_case_a': [x for x in summary.success_case_a.base_names],
+                'failure_case_a': [x for x in summary.failure_case_a.base_names],
+                'success_case_b': [x for x in summary.success_case_b.base_names],
+                'failure_case_b': [x for x in summary.failure_case_b.base_names],
+                'all_files_compared': [x for x in summary.total_files_compared.descriptions]
             },
             'diffs': {
-                'big_math': [x for x in self.big_math_diffs.descriptions],
-                'small_math': [x for x in self.small_math_diffs.descriptions],
-                'big_table': [x for x in self.big_table_diffs.descriptions],
-                'small_table': [x for x in self.small_table_diffs.descriptions],
-                'textual': [x for x in self.text_diffs.descriptions],
-            },
-            'results_by_file': [entry.to_dict() for entry in self.entries_by_file]
+                'big_math': [x for x in summary.big_math_diffs.descriptions],
+                'small_math': [x for x in summary.small_math_diffs.descriptions],
+                'big_table': [x for x in summary.big_table_diffs.descriptions],
+                'small_table': [x for x in summary.small_table_diffs.descriptions],
+                'textual': [x for x in summary.text_diffs.descriptions],
+            }
         }
-        output_string = json.dumps(output_data, indent=2)
+        # the results by file go last, written one entry at a time, as the same layout json.dump(indent=2) gives
         with open(json_file_path, 'w') as json_file:
-            json_file.write(output_string)
+            json_file.write(json.dumps(output_data, indent=2)[:-2] + ',\n  "results_by_file": [')
+            separator = '\n    '
+            for entry_dict in entry_dicts():
+                json_file.write(separator + json.dumps(entry_dict, indent=2).replace('\n', '\n    '))
+                separator = ',\n    '
+            json_file.write('\n  ]\n}' if separator != '\n    ' else ']\n}')
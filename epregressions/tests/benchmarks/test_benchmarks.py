@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import unittest
+
+from epregressions.benchmarks import generators
+from epregressions.benchmarks.suite import BenchmarkHistory, main, regressions
+from epregressions.diffs import math_diff
+from epregressions.diffs.thresh_dict import ThreshDict
+from epregressions.runtests import SuiteRunner
+from epregressions.structures import TextDifferences
+
+thresholds_file = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))),
+                               'diffs', 'math_diff.config')
+
+
+class TestGenerators(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def path(self, file_name):
+        return os.path.join(self.temp_dir, file_name)
+
+    def read(self, file_name):
+        with open(self.path(file_name)) as f:
+            return f.read()
+
+    def test_files_are_the_same_every_time(self):
+        for writer, size in [(generators.write_eio, (50,)), (generators.write_err, (50,)),
+                             (generators.write_table_report, (3, 4)), (generators.write_csv, (24, 10))]:
+            writer(self.path('one'), *size, changes=5)
+            writer(self.path('two'), *size, changes=5)
+            self.assertEqual(self.read('one'), self.read('two'))
+            writer(self.path('base'), *size)
+            self.assertNotEqual(self.read('one'), self.read('base'))
+
+    def test_changes_are_found_by_the_diffs(self):
+        generators.write_csv(self.path('base.csv'), 48, 16)
+        generators.write_csv(self.path('mod.csv'), 48, 16, changes=4)
+        diff_type, rows, big_diffs, small_diffs = math_diff.math_diff(
+            ThreshDict(thresholds_file), self.path('base.csv'), self.path('mod.csv'), self.path('abs.csv'),
+            self.path('rel.csv'), self.path('math.err'), self.path('summary.csv')
+        )
+        self.assertEqual(('Big Diffs', 48, 2, 2), (diff_type, rows, big_diffs, small_diffs))
+        generators.write_eio(self.path('base.eio'), 100)
+        generators.write_eio(self.path('same.eio'), 100)
+        generators.write_eio(self.path('mod.eio'), 100, changes=3)
+        self.assertEqual(
+            TextDifferences.EQUAL, SuiteRunner.diff_text_files(self.path('base.eio'), self.path('same.eio'), 'diff')
+        )
+        self.assertEqual(
+            TextDifferences.DIFFS, SuiteRunner.diff_text_files(
+                self.path('base.eio'), self.path('mod.eio'), self.path('eio.diff')
+            )
+        )
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+
+    def test_regressions(self):
+        previous = {'results': {
+            'a': {'seconds': 1.0, 'peak_memory_mb': 10.0},
+            'b': {'seconds': 1.0, 'peak_memory_mb': None},
+            'c': {'seconds': 1.0, 'peak_memory_mb': 10.0},
+        }}
+        results = {
+            'a': {'seconds': 1.5, 'peak_memory_mb': 10.5},
+            'b': {'seconds': 1.1, 'peak_memory_mb': 20.0},
+            'c': {'seconds': 0.5, 'peak_memory_mb': 12.0},
+            'd': {'seconds': 9.0, 'peak_memory_mb': 90.0},
+        }
+        self.assertEqual([], regressions(None, results, 0.2, 0.1))
+        self.assertEqual(
+            ['a took 1.500 s, up from 1.000 s', 'c needed 12.0 MB, up from 10.0 MB'],
+            regressions(previous, results, 0.2, 0.1)
+        )
+
+    def test_runs_are_recorded_and_compared(self):
+        history_file = os.path.join(tempfile.mkdtemp(), 'history.json')
+        args = ['--history', history_file, '--sizes', 'small', '--repeat', '1', '--filter', 'lookup']
+        self.assertEqual(0, main(args))
+        # nothing can be this much faster than the previous run
+        self.assertEqual(1, main(args + ['--time-tolerance', '-0.99999']))
+        with open(history_file) as f:
+            runs = json.load(f)
+        self.assertEqual(2, len(runs))
+        self.assertEqual(['ThreshDict.lookup-small'], list(runs[1]['results']))
+        self.assertEqual(2, len(BenchmarkHistory(history_file).runs))
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+
+from epregressions.diffs.eso_diff import EsoFile, eso_diff
+from epregressions.diffs.thresh_dict import ThreshDict
+
+
+class TestEsoFile(unittest.TestCase):
+
+    def setUp(self):
+        self.cur_dir_path = os.path.dirname(os.path.realpath(__file__))
+        self.diff_files_dir = os.path.join(self.cur_dir_path, 'eso_resources')
+
+    def test_variables_are_named_like_read_vars_eso(self):
+        eso = EsoFile(os.path.join(self.diff_files_dir, 'eplusout.eso'))
+        self.assertEqual(
+            [
+                'Environment:Site Outdoor Air Drybulb Temperature [C](Hourly)',
+                'ZONE ONE:Zone Air System Sensible Heating Rate [W](Hourly)',
+                'Environment:Site Outdoor Air Drybulb Temperature [C](Daily)',
+                'ZONE ONE:Zone Lights Electric Power [W](Hourly)',
+            ],
+            eso.headers()
+        )
+        self.assertEqual(
+            [' 01/21  01:00:00', ' 01/21  02:00:00', ' 01/21  03:00:00', ' 01/21  04:00:00', ' 01/21'], eso.records
+        )
+        temperatures = eso.columns()['Environment:Site Outdoor Air Drybulb Temperature [C](Hourly)']
+        self.assertEqual([-20.6, -20.6, -20.5, -20.4], list(temperatures.values))
+        self.assertEqual([0, 1, 2, 3], list(temperatures.records))
+        daily = eso.columns()['Environment:Site Outdoor Air Drybulb Temperature [C](Daily)']
+        self.assertEqual([4], list(daily.records))  # only the value, not the minimum and maximum
+
+    def test_meters(self):
+        mtr = EsoFile(os.path.join(self.diff_files_dir, 'eplusout.mtr'))
+        self.assertEqual(['Electricity:Facility [J](Hourly)', 'Electricity:Facility [J](Monthly)'], mtr.headers())
+        self.assertEqual([' 01/21  01:00:00', ' 01/21  02:00:00', 'January'], mtr.records)
+
+    def test_time_labels(self):
+        self.assertEqual(
+            ' 01/21  00:15:00', EsoFile.time_label(2, '2,1, 1,21, 0, 1, 0.00,15.00,WinterDesignDay'.split(','))
+        )
+        self.assertEqual('Run Period', EsoFile.time_label(5, ['5', '365']))
+        self.assertEqual('Year 2020', EsoFile.time_label(6, ['6', ' 2020']))
+
+
+class TestEsoDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.cur_dir_path = os.path.dirname(os.path.realpath(__file__))
+        self.diff_files_dir = os.path.join(self.cur_dir_path, 'eso_resources')
+        self.temp_output_dir = tempfile.mkdtemp()
+        self.thresh_dict = ThreshDict(os.path.join(self.cur_dir_path, 'csv_resources', 'test_math_diff.config'))
+
+    def diff(self, file_a, file_b):
+        return eso_diff(
+            self.thresh_dict,
+            os.path.join(self.diff_files_dir, file_a),
+            os.path.join(self.diff_files_dir, file_b),
+            os.path.join(self.temp_output_dir, 'abs_diff.csv'),
+            os.path.join(self.temp_output_dir, 'rel_diff.csv'),
+            os.path.join(self.temp_output_dir, 'math_diff.log'),
+            os.path.join(self.temp_output_dir, 'summary.csv'),
+        )
+
+    def test_identical_files(self):
+        self.assertEqual(('All Equal', 5, 0, 0), self.diff('eplusout.eso', 'eplusout.eso'))
+        self.assertFalse(os.path.exists(os.path.join(self.temp_output_dir, 'abs_diff.csv')))
+        with open(os.path.join(self.temp_output_dir, 'summary.csv')) as f:
+            self.assertIn('eso_resources,eplusout.eso,All Equal,5 records compared', f.read())
+
+    def test_small_diffs(self):
+        self.assertEqual(('Small Diffs', 5, 0, 1), self.diff('eplusout.eso', 'eplusout_small_diffs.eso'))
+        with open(os.path.join(self.temp_output_dir, 'abs_diff.csv')) as f:
+            lines = f.read().splitlines()
+        self.assertEqual('Date/Time,ZONE ONE:Zone Air System Sensible Heating Rate [W](Hourly)', lines[0])
+        self.assertEqual(' 01/21  01:00:00,5.0', lines[1])
+        self.assertEqual(' 01/21,', lines[5])  # the heating rate isn't reported daily
+
+    def test_big_diffs(self):
+        # one big heating diff, and the temperature is off by more than 0.2 C in the hourly and daily values
+        response = self.diff('eplusout.eso', 'eplusout_big_diffs.eso')
+        self.assertEqual(('Big Diffs', 5, 3, 0), response)
+        with open(os.path.join(self.temp_output_dir, 'math_diff.log')) as f:
+            log = f.read()
+        self.assertIn('Max absolute diff: 10000.0, field: ZONE ONE:Zone Air System Sensible Heating Rate', log)
+        self.assertIn('Summary of', log)
+
+    def test_changed_timestamps(self):
+        self.assertEqual(
+            ('Time series do not match', 0, 0, 0), self.diff('eplusout.eso', 'eplusout_changed_timestamps.eso')
+        )
+
+    def test_missing_and_malformed_files(self):
+        response = self.diff('eplusout.eso', 'eplusout_does_not_exist.eso')
+        self.assertIn('unable to open file', response[0])
+        malformed = os.path.join(self.temp_output_dir, 'malformed.eso')
+        with open(malformed, 'w') as f:
+            f.write('Program Version,EnergyPlus\n7,1,Environment,Temperature [C] !Hourly\n')
+        response = self.diff('eplusout.eso', malformed)
+        self.assertIn('malformed eso file', response[0])
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+from epregressions.diffs.fingerprint import csv_fingerprint
+from epregressions.diffs.math_diff import math_diff
+from epregressions.diffs.thresh_dict import ThreshDict
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def setUp(self):
+        self.cur_dir_path = os.path.dirname(os.path.realpath(__file__))
+        self.csv_files_dir = os.path.join(self.cur_dir_path, 'csv_resources')
+        self.temp_output_dir = tempfile.mkdtemp()
+
+    def test_csv_fingerprint_matches_math_diff_of_identical_files(self):
+        thresh_dict = ThreshDict(os.path.join(self.csv_files_dir, 'test_math_diff.config'))
+        for file_name in sorted(os.listdir(self.csv_files_dir)):
+            if not file_name.endswith('.csv'):
+                continue
+            csv_file = os.path.join(self.csv_files_dir, file_name)
+            fingerprint = csv_fingerprint(csv_file)
+            if fingerprint is None:
+                continue
+            response = math_diff(
+                thresh_dict,
+                csv_file,
+                csv_file,
+                os.path.join(self.temp_output_dir, 'abs_diff.csv'),
+                os.path.join(self.temp_output_dir, 'rel_diff.csv'),
+                os.path.join(self.temp_output_dir, 'math_diff.log'),
+                os.path.join(self.temp_output_dir, 'summary.csv'),
+            )
+            self.assertEqual(('All Equal', fingerprint[1], 0, 0), response, file_name)
+
+    def test_csv_fingerprint_is_none_for_files_math_diff_reports_on(self):
+        self.assertIsNone(csv_fingerprint(os.path.join(self.csv_files_dir, 'eplusout_duplicate_header.csv')))
+        self.assertIsNone(csv_fingerprint(os.path.join(self.csv_files_dir, 'eplusout_empty_data.csv')))
+        self.assertIsNone(csv_fingerprint(os.path.join(self.csv_files_dir, 'eplusout_totally_empty.csv')))
+
+    def test_csv_fingerprint_differs_for_different_files(self):
+        base = csv_fingerprint(os.path.join(self.csv_files_dir, 'eplusout.csv'))
+        small = csv_fingerprint(os.path.join(self.csv_files_dir, 'eplusout_small_temp_diffs.csv'))
+        self.assertIsNotNone(base)
+        self.assertNotEqual(base, small)
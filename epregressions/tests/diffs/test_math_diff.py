@@ -2,7 +2,12 @@ import os
 import tempfile
 import unittest
 
-from epregressions.diffs.math_diff import math_diff, DuplicateHeaderException
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from epregressions.diffs.math_diff import math_diff, DuplicateHeaderException, MathDiffEngine, read_numeric_csv
 from epregressions.diffs.thresh_dict import ThreshDict
 
 
@@ -319,3 +324,133 @@ class TestMathDiff(unittest.TestCase):
         self.assertEqual(24, response[1])  # num records compared
         self.assertEqual(0, response[2])  # big diffs
         self.assertEqual(0, response[3])  # small diffs
+
+    def run_both_engines(self, file_a, file_b, other_engine=MathDiffEngine.NUMPY):
+        results = {}
+        for engine in [MathDiffEngine.PYTHON, other_engine]:
+            out_dir = os.path.join(self.temp_output_dir, engine)
+            if not os.path.exists(out_dir):
+                os.makedirs(out_dir)
+            out_files = [os.path.join(out_dir, f) for f in ['abs_diff.csv', 'rel_diff.csv', 'math_diff.log']]
+            for out_file in out_files:
+                if os.path.exists(out_file):
+                    os.remove(out_file)
+            try:
+                response = math_diff(self.thresh_dict, file_a, file_b, out_files[0], out_files[1], out_files[2], '',
+                                     engine=engine)
+            except Exception as e:
+                response = (type(e), str(e))
+            contents = []
+            for out_file in out_files:
+                if os.path.exists(out_file):
+                    with open(out_file, 'rb') as f:
+                        contents.append(f.read())
+                else:
+                    contents.append(None)
+            results[engine] = (response, contents)
+        return results[MathDiffEngine.PYTHON], results[other_engine]
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_numpy_engine_matches_python_engine(self):
+        csv_files = sorted(f for f in os.listdir(self.diff_files_dir) if f.endswith('.csv'))
+        for file_a in csv_files:
+            for file_b in csv_files:
+                python_result, numpy_result = self.run_both_engines(
+                    os.path.join(self.diff_files_dir, file_a), os.path.join(self.diff_files_dir, file_b)
+                )
+                self.assertEqual(python_result, numpy_result, '%s vs %s' % (file_a, file_b))
+
+    def write_odd_cells_files(self, cells_a, cells_b):
+        rows_a = [['Date/Time', 'A [W](Hourly)', 'B [C](Hourly)', 'C [](Hourly)', 'D [W](Hourly)']]
+        rows_b = [list(rows_a[0])]
+        for i in range(len(cells_a)):
+            rows_a.append([' 01/01  %02d:00:00' % (i + 1), cells_a[i], cells_b[i], cells_a[-i], '1.0'])
+            rows_b.append([' 01/01  %02d:00:00' % (i + 1), cells_b[i], cells_a[i], cells_b[-i], '1.0'])
+        file_a = os.path.join(self.temp_output_dir, 'odd_a.csv')
+        file_b = os.path.join(self.temp_output_dir, 'odd_b.csv')
+        for this_file, rows in [(file_a, rows_a), (file_b, rows_b)]:
+            with open(this_file, 'w') as f:
+                f.write('\n'.join(','.join(row) for row in rows) + '\n')
+        return file_a, file_b
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_numpy_engine_matches_python_engine_on_odd_cells(self):
+        # blanks, zeros, and numbers that are equal but written differently all take special paths
+        file_a, file_b = self.write_odd_cells_files(
+            ['1.0', '0', '', '2.5', '-0.0', '1e3', '7', '0.0', '3.25', ' '],
+            ['1', '0.5', '', '2.5', '0.0', '1000.0', '', '4', '3.5', '0'],
+        )
+        python_result, numpy_result = self.run_both_engines(file_a, file_b)
+        self.assertEqual('Big Diffs', python_result[0][0])
+        self.assertEqual(python_result, numpy_result)
+        python_result, numpy_result = self.run_both_engines(file_b, file_a)
+        self.assertEqual(python_result, numpy_result)
+        # text that can't be summarized fails the same way in both engines
+        file_a, file_b = self.write_odd_cells_files(['1.0', 'abc', '2.5'], ['1.5', 'abd', '2.5'])
+        python_result, numpy_result = self.run_both_engines(file_a, file_b)
+        self.assertEqual(KeyError, python_result[0][0])
+        self.assertEqual(python_result, numpy_result)
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_numpy_engine_reads_numbers_straight_into_arrays(self):
+        file_a, file_b = self.write_odd_cells_files(
+            ['1.0', '0', '2.5', '-0.0', '1e3', '7', '0.0'],
+            ['1', '0.5', '2.5', '0.0', '1000.0', '7', '4'],
+        )
+        header, times, lines, values = read_numeric_csv(file_a)
+        self.assertEqual('Date/Time', header[0])
+        self.assertEqual(' 01/01  01:00:00', times[0])
+        self.assertEqual((7, 4), values.shape)
+        self.assertEqual(1000.0, values[4, 0])
+        python_result, numpy_result = self.run_both_engines(file_a, file_b)
+        self.assertEqual('Big Diffs', python_result[0][0])
+        self.assertEqual(python_result, numpy_result)
+        # columns in another order are matched up by name
+        with open(file_b) as f:
+            rows = [line.split(',') for line in f.read().splitlines()]
+        with open(file_b, 'w') as f:
+            f.write(''.join(','.join([r[0], r[3], r[1], r[4], r[2]]) + '\n' for r in rows))
+        python_result, numpy_result = self.run_both_engines(file_a, file_b)
+        self.assertEqual(python_result, numpy_result)
+        # anything other than numbers alone is left to mycsv
+        file_a, file_b = self.write_odd_cells_files(['1.0', '', '2.5'], ['1.5', '2', '2.5'])
+        self.assertIsNone(read_numeric_csv(file_a))
+        self.assertIsNone(read_numeric_csv(os.path.join(self.temp_output_dir, 'missing.csv')))
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_engines_write_the_same_log_for_nan_with_uncompared_fields(self):
+        file_a = os.path.join(self.temp_output_dir, 'nan_a.csv')
+        file_b = os.path.join(self.temp_output_dir, 'nan_b.csv')
+        with open(file_a, 'w') as f:
+            f.write('Date/Time,A [W](Hourly),B [C](Hourly)\n 01/01  01:00:00,nan,2.0\n 01/01  02:00:00,2.0,3.0\n')
+        with open(file_b, 'w') as f:
+            f.write('Date/Time,A [W](Hourly),C [C](Hourly)\n 01/01  01:00:00,1.5,4.0\n 01/01  02:00:00,2.0,3.0\n')
+        for other_engine in [MathDiffEngine.NUMPY, MathDiffEngine.STREAMING]:
+            python_result, other_result = self.run_both_engines(file_a, file_b, other_engine)
+            self.assertEqual(2, python_result[1][2].count(b'Not comparing field'))
+            self.assertEqual(python_result, other_result, other_engine)
+
+    def test_streaming_engine_matches_python_engine(self):
+        csv_files = sorted(f for f in os.listdir(self.diff_files_dir) if f.endswith('.csv'))
+        for file_a in csv_files:
+            for file_b in csv_files:
+                python_result, streaming_result = self.run_both_engines(
+                    os.path.join(self.diff_files_dir, file_a), os.path.join(self.diff_files_dir, file_b),
+                    MathDiffEngine.STREAMING
+                )
+                self.assertEqual(python_result, streaming_result, '%s vs %s' % (file_a, file_b))
+
+    def test_streaming_engine_matches_python_engine_on_odd_cells(self):
+        file_a, file_b = self.write_odd_cells_files(
+            ['1.0', '0', '', '2.5', '-0.0', '1e3', '7', '0.0', '3.25', ' '],
+            ['1', '0.5', '', '2.5', '0.0', '1000.0', '', '4', '3.5', '0'],
+        )
+        python_result, streaming_result = self.run_both_engines(file_a, file_b, MathDiffEngine.STREAMING)
+        self.assertEqual('Big Diffs', python_result[0][0])
+        self.assertEqual(python_result, streaming_result)
+        python_result, streaming_result = self.run_both_engines(file_b, file_a, MathDiffEngine.STREAMING)
+        self.assertEqual(python_result, streaming_result)
+        file_a, file_b = self.write_odd_cells_files(['1.0', 'abc', '2.5'], ['1.5', 'abd', '2.5'])
+        python_result, streaming_result = self.run_both_engines(file_a, file_b, MathDiffEngine.STREAMING)
+        self.assertEqual(KeyError, python_result[0][0])
+        self.assertEqual(python_result, streaming_result)
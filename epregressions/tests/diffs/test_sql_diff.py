@@ -0,0 +1,258 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from epregressions.diffs.sql_diff import SqlComparison, time_label
+from epregressions.diffs.thresh_dict import ThreshDict
+from epregressions.structures import TextDifferences
+
+SCHEMA = """
+CREATE TABLE ReportDataDictionary (ReportDataDictionaryIndex INTEGER PRIMARY KEY, IsMeter INTEGER, Type TEXT,
+    IndexGroup TEXT, TimestepType TEXT, KeyValue TEXT, Name TEXT, ReportingFrequency TEXT, ScheduleName TEXT,
+    Units TEXT);
+CREATE TABLE Time (TimeIndex INTEGER PRIMARY KEY, Year INTEGER, Month INTEGER, Day INTEGER, Hour INTEGER,
+    Minute INTEGER, Dst INTEGER, Interval INTEGER, IntervalType INTEGER, SimulationDays INTEGER, DayType TEXT,
+    EnvironmentPeriodIndex INTEGER, WarmupFlag INTEGER);
+CREATE TABLE ReportData (ReportDataIndex INTEGER PRIMARY KEY, TimeIndex INTEGER, ReportDataDictionaryIndex INTEGER,
+    Value REAL);
+CREATE TABLE Strings (StringIndex INTEGER PRIMARY KEY, StringTypeIndex INTEGER, Value TEXT);
+CREATE TABLE TabularData (TabularDataIndex INTEGER PRIMARY KEY, ReportNameIndex INTEGER,
+    ReportForStringIndex INTEGER, TableNameIndex INTEGER, RowNameIndex INTEGER, ColumnNameIndex INTEGER,
+    UnitsIndex INTEGER, SimulationIndex INTEGER, RowId INTEGER, ColumnId INTEGER, Value TEXT);
+CREATE TABLE Errors (ErrorIndex INTEGER PRIMARY KEY, SimulationIndex INTEGER, ErrorType INTEGER, ErrorMessage TEXT,
+    Count INTEGER);
+"""
+
+VARIABLES = [
+    ('Environment', 'Site Outdoor Air Drybulb Temperature', 'Hourly', 'C'),
+    ('ZONE ONE', 'Zone Air System Sensible Heating Rate', 'Hourly', 'W'),
+    ('Environment', 'Site Outdoor Air Drybulb Temperature', 'Daily', 'C'),
+    ('', 'Electricity:Facility', 'Hourly', 'J'),
+]
+
+# hourly values, then the one daily value
+BASE_VALUES = {
+    'Environment:Site Outdoor Air Drybulb Temperature [C](Hourly)': [-20.6, -20.6, -20.5, -20.4],
+    'ZONE ONE:Zone Air System Sensible Heating Rate [W](Hourly)': [40000.0, 38000.0, 37000.0, 36000.0],
+    'Environment:Site Outdoor Air Drybulb Temperature [C](Daily)': [-20.5],
+    'Electricity:Facility [J](Hourly)': [3600000.0, 3600000.0, 3600000.0, 3600000.0],
+}
+
+BASE_TABLE = [
+    # row, column, units, value
+    ('Total Site Energy', 'Total Energy', 'GJ', '       40.00'),
+    ('Total Site Energy', 'Energy Per Total Building Area', 'MJ/m2', '      431.57'),
+    ('Net Site Energy', 'Total Energy', 'GJ', '       40.00'),
+    ('Net Site Energy', 'Energy Per Total Building Area', 'MJ/m2', '      431.57'),
+]
+
+BASE_ERRORS = [
+    (0, 'GetHTSurfaceData: Surfaces with interface to Ground found but no "Ground Temperatures" were input.', 1),
+    (1, 'Weather file location will be used rather than entered (IDF) Location object.', 1),
+]
+
+
+def write_sql(file_path, values=None, tables=None, errors=None, hours=4):
+    """write an eplusout.sql with the tables the sql diffs read, holding an hourly design day with a daily value"""
+    values = BASE_VALUES if values is None else values
+    tables = {'Site and Source Energy': BASE_TABLE} if tables is None else tables
+    errors = BASE_ERRORS if errors is None else errors
+    connection = sqlite3.connect(file_path)
+    connection.executescript(SCHEMA)
+    for hour in range(hours):
+        connection.execute(
+            'INSERT INTO Time VALUES (?, 2009, 1, 21, ?, 0, 0, 60, 1, 1, ?, 1, 0)', (hour + 1, hour + 1, 'Monday')
+        )
+    daily_time = hours + 1
+    connection.execute(
+        'INSERT INTO Time VALUES (?, 2009, 1, 21, 24, 0, 0, 1440, 2, 1, ?, 1, 0)', (daily_time, 'Monday')
+    )
+    for index, (key, name, frequency, units) in enumerate(VARIABLES):
+        header = '%s [%s](%s)' % (':'.join([key, name]) if key else name, units, frequency)
+        if header not in values:
+            continue
+        connection.execute(
+            'INSERT INTO ReportDataDictionary VALUES (?, 0, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (index + 7, 'Avg', 'Zone', 'Zone', key, name, frequency, '', units)
+        )
+        for i, value in enumerate(values[header]):
+            time_index = daily_time if frequency == 'Daily' else i + 1
+            connection.execute(
+                'INSERT INTO ReportData (TimeIndex, ReportDataDictionaryIndex, Value) VALUES (?, ?, ?)',
+                (time_index, index + 7, value)
+            )
+    strings = {}
+
+    def string_index(value):
+        if value not in strings:
+            strings[value] = len(strings) + 1
+            connection.execute('INSERT INTO Strings VALUES (?, 1, ?)', (strings[value], value))
+        return strings[value]
+
+    for table_name, cells in sorted(tables.items()):
+        rows = []
+        for row_name, column_name, units, value in cells:
+            if row_name not in rows:
+                rows.append(row_name)
+            connection.execute(
+                'INSERT INTO TabularData (ReportNameIndex, ReportForStringIndex, TableNameIndex, RowNameIndex, '
+                'ColumnNameIndex, UnitsIndex, SimulationIndex, RowId, ColumnId, Value) '
+                'VALUES (?, ?, ?, ?, ?, ?, 1, ?, 0, ?)',
+                (string_index('AnnualBuildingUtilityPerformanceSummary'), string_index('Entire Facility'),
+                 string_index(table_name), string_index(row_name), string_index(column_name), string_index(units),
+                 rows.index(row_name), value)
+            )
+    for error_type, message, count in errors:
+        connection.execute(
+            'INSERT INTO Errors (SimulationIndex, ErrorType, ErrorMessage, Count) VALUES (1, ?, ?, ?)',
+            (error_type, message, count)
+        )
+    connection.commit()
+    connection.close()
+
+
+class TestSqlDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.cur_dir_path = os.path.dirname(os.path.realpath(__file__))
+        self.temp_dir = tempfile.mkdtemp()
+        self.temp_output_dir = tempfile.mkdtemp()
+        self.thresh_dict = ThreshDict(os.path.join(self.cur_dir_path, 'csv_resources', 'test_math_diff.config'))
+        self.base = os.path.join(self.temp_dir, 'base', 'eplusout.sql')
+        self.mod = os.path.join(self.temp_dir, 'mod', 'eplusout.sql')
+        for file_path in [self.base, self.mod]:
+            os.makedirs(os.path.dirname(file_path))
+        write_sql(self.base)
+
+    def output(self, file_name):
+        return os.path.join(self.temp_output_dir, file_name)
+
+    def report_data_diff(self):
+        with SqlComparison(self.base, self.mod) as comparison:
+            return comparison.report_data_diff(
+                self.thresh_dict, self.output('abs_diff.csv'), self.output('rel_diff.csv'), self.output('math.log'),
+                self.output('summary.csv')
+            )
+
+    def tabular_data_diff(self):
+        with SqlComparison(self.base, self.mod) as comparison:
+            return comparison.tabular_data_diff(
+                self.thresh_dict, self.output('table_diff.csv'), self.output('table.log'), self.output('tables.csv')
+            )
+
+    def errors_diff(self):
+        with SqlComparison(self.base, self.mod) as comparison:
+            return comparison.errors_diff(self.output('errors.diff'))
+
+    def test_identical_files(self):
+        write_sql(self.mod)
+        self.assertEqual(('All Equal', 5, 0, 0), self.report_data_diff())
+        self.assertFalse(os.path.exists(self.output('abs_diff.csv')))
+        with open(self.output('summary.csv')) as f:
+            self.assertIn('base,eplusout.sql,All Equal,5 records compared', f.read())
+        self.assertEqual(('', 1, 0, 0, 4, 0, 0, 0, 0), self.tabular_data_diff())
+        self.assertFalse(os.path.exists(self.output('table_diff.csv')))
+        with open(self.output('tables.csv')) as f:
+            self.assertEqual('base,1,0,0,4,0,0,0,0', f.read().splitlines()[1])
+        self.assertEqual(TextDifferences.EQUAL, self.errors_diff())
+
+    def test_small_report_data_diffs(self):
+        values = dict(BASE_VALUES)
+        values['ZONE ONE:Zone Air System Sensible Heating Rate [W](Hourly)'] = [40000.05, 38000.0, 37000.0, 36000.0]
+        write_sql(self.mod, values=values)
+        self.assertEqual(('Small Diffs', 5, 0, 1), self.report_data_diff())
+        with open(self.output('abs_diff.csv')) as f:
+            lines = f.read().splitlines()
+        self.assertEqual('Date/Time,ZONE ONE:Zone Air System Sensible Heating Rate [W](Hourly)', lines[0])
+        self.assertTrue(lines[1].startswith(' 01/21  01:00:00,0.05'))
+        self.assertEqual(' 01/21,', lines[5])  # the heating rate isn't reported daily
+
+    def test_big_report_data_diffs(self):
+        # one big heating diff, and the temperature is off by more than 0.2 C in the hourly and daily values
+        values = dict(BASE_VALUES)
+        values['ZONE ONE:Zone Air System Sensible Heating Rate [W](Hourly)'] = [40000.0, 38000.0, 47000.0, 36000.0]
+        values['Environment:Site Outdoor Air Drybulb Temperature [C](Hourly)'] = [-20.6, -20.6, -20.5, -20.0]
+        values['Environment:Site Outdoor Air Drybulb Temperature [C](Daily)'] = [-20.0]
+        write_sql(self.mod, values=values)
+        self.assertEqual(('Big Diffs', 5, 3, 0), self.report_data_diff())
+        with open(self.output('math.log')) as f:
+            log = f.read()
+        self.assertIn(
+            'Max absolute diff: 10000.0, field: ZONE ONE:Zone Air System Sensible Heating Rate [W](Hourly), '
+            'time:  01/21  03:00:00', log
+        )
+        self.assertIn('Summary of', log)
+
+    def test_report_data_time_series_and_fields(self):
+        write_sql(self.mod, hours=3)
+        self.assertEqual(('Time series do not match', 0, 0, 0), self.report_data_diff())
+        # a field only reported by one build is left out, with a warning
+        values = dict(BASE_VALUES)
+        del values['Electricity:Facility [J](Hourly)']
+        os.remove(self.mod)
+        write_sql(self.mod, values=values)
+        self.assertEqual(('All Equal', 5, 0, 0), self.report_data_diff())
+        with open(self.output('math.log')) as f:
+            self.assertIn('Not comparing field Electricity:Facility [J](Hourly)', f.read())
+
+    def test_table_diffs(self):
+        table = list(BASE_TABLE)
+        table[0] = ('Total Site Energy', 'Total Energy', 'GJ', '       40.02')
+        table[1] = ('Total Site Energy', 'Energy Per Total Building Area', 'MJ/m2', '      500.00')
+        table[3] = ('Net Site Energy', 'Energy Per Total Building Area', 'MJ/m2', '         N/A')
+        tables = {'Site and Source Energy': table, 'Only In Mod': BASE_TABLE}
+        write_sql(self.mod, tables=tables)
+        # 40.00 vs 40.02 GJ is a small diff under the 0.005 relative threshold, 431.57 vs 500.00 is big
+        self.assertEqual(('', 2, 1, 1, 1, 1, 0, 1, 0), self.tabular_data_diff())
+        with open(self.output('table_diff.csv')) as f:
+            lines = f.read().splitlines()
+        self.assertEqual('Report,For,Table,Row,Column,Value 1,Value 2,Abs diff,Rel diff,Diff', lines[0])
+        self.assertEqual(4, len(lines))
+        self.assertIn('Total Site Energy,Energy Per Total Building Area [MJ/m2],431.57,500.00', lines[2])
+        self.assertTrue(lines[2].endswith(',big'))
+        self.assertTrue(lines[3].endswith(',stringdiff'))
+        with open(self.output('table.log')) as f:
+            log = f.read().splitlines()
+        self.assertEqual(
+            'AnnualBuildingUtilityPerformanceSummary,Entire Facility,Only In Mod,0,0,0,0,0,1,0', log[2]
+        )
+
+    def test_table_size_and_column_changes(self):
+        renamed = [(row, 'Energy' if column == 'Total Energy' else column, units, value)
+                   for row, column, units, value in BASE_TABLE]
+        os.remove(self.base)
+        write_sql(self.base, tables={'Site and Source Energy': BASE_TABLE, 'Renamed': BASE_TABLE})
+        write_sql(self.mod, tables={'Site and Source Energy': BASE_TABLE[:2], 'Renamed': renamed})
+        # a table with a row less is a size error and isn't compared.  A renamed column is a size error, string diff
+        # and big diff, and each of its cells in the first file is another big diff
+        self.assertEqual(('', 2, 3, 0, 2, 1, 2, 0, 0), self.tabular_data_diff())
+
+    def test_errors_diff(self):
+        errors = list(BASE_ERRORS)
+        errors[1] = (1, 'Weather file location will be used rather than entered (IDF) Location object.', 2)
+        write_sql(self.mod, errors=errors)
+        self.assertEqual(TextDifferences.DIFFS, self.errors_diff())
+        with open(self.output('errors.diff')) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(2, len(lines))
+        self.assertTrue(lines[0].startswith('< [1] Weather file location'))
+        self.assertTrue(lines[1].endswith('(count 2)'))
+
+    def test_missing_and_malformed_files(self):
+        with self.assertRaises(IOError):
+            SqlComparison(self.base, self.mod)
+        self.assertFalse(os.path.exists(self.mod))
+        with open(self.mod, 'w') as f:
+            f.write('not a database')
+        self.assertIn('malformed sql file', self.report_data_diff()[0])
+        self.assertIn('malformed sql file', self.tabular_data_diff()[0])
+        self.assertEqual(TextDifferences.DIFFS, self.errors_diff())
+
+    def test_time_labels(self):
+        self.assertEqual(' 01/21  01:00:00', time_label(1, 2009, 1, 21, 1, 0))
+        self.assertEqual(' 01/21  00:15:00', time_label(0, 2009, 1, 21, 1, 15))
+        self.assertEqual(' 01/21', time_label(2, 2009, 1, 21, 24, 0))
+        self.assertEqual('January', time_label(3, 2009, 1, 31, 24, 0))
+        self.assertEqual('Run Period', time_label(4, 2009, 12, 31, 24, 0))
+        self.assertEqual('Year 2009', time_label(5, 2009, 12, 31, 24, 0))
@@ -2,10 +2,27 @@ import os
 import tempfile
 import unittest
 
-from epregressions.diffs.table_diff import table_diff
+from epregressions.diffs.table_diff import scan_tables, soup_tables, table_diff
 from epregressions.diffs.thresh_dict import ThreshDict
 
 
+def write_report(file_path, headings, value=1.0):
+    # a synthetic EnergyPlus table report, with a small table for each heading
+    parts = ['<html>\n<body>\n']
+    for heading in headings:
+        parts.append('<b>%s</b><br><br>\n<!-- FullName:%s-->\n' % (heading, heading))
+        parts.append('<table border="1" cellpadding="4" cellspacing="0">\n  <tr><td></td>\n')
+        parts.append('    <td align="right">Energy [GJ]</td>\n    <td align="right">Area [m2]</td>\n  </tr>\n')
+        for row in range(4):
+            parts.append('  <tr>\n    <td align="right">Row %s</td>\n' % row)
+            parts.append('    <td align="right">%12.2f</td>\n' % value)
+            parts.append('    <td align="right">%12.2f</td>\n  </tr>\n' % row)
+        parts.append('</table>\n<br><br>\n')
+    parts.append('</body>\n</html>\n')
+    with open(file_path, 'w') as f:
+        f.write(''.join(parts))
+
+
 class TestMathDiff(unittest.TestCase):
 
     def setUp(self):
@@ -360,3 +377,84 @@ class TestMathDiff(unittest.TestCase):
         self.assertEqual(1, response[6])  # size errors
         self.assertEqual(0, response[7])  # in file 2 but not in file 1
         self.assertEqual(0, response[8])  # in file 1 but not in file 2
+
+    @staticmethod
+    def plain_tables(tables):
+        # the souped up tables have BeautifulSoup strings in them
+        return [[str(heading), [[None if c is None else str(c) for c in row] for row in rows], num_cells]
+                for heading, rows, num_cells in tables]
+
+    def test_scanned_tables_match_souped_tables(self):
+        for file_name in sorted(os.listdir(self.diff_files_dir)):
+            if not file_name.endswith('.htm') or file_name == 'eplustbl_missing_table_header_comment.htm':
+                continue
+            with open(os.path.join(self.diff_files_dir, file_name)) as f:
+                txt = f.read()
+            scanned = scan_tables(txt)
+            self.assertIsNotNone(scanned, file_name)
+            self.assertEqual(self.plain_tables(soup_tables(txt)), self.plain_tables(scanned), file_name)
+
+    def test_scanned_tables_follow_soup_nesting(self):
+        # strings are joined across an ignored closing br, and character references are converted the same way
+        txt = (
+            '<body><br><!-- heading --><table><tr><td></td><td>A &amp; B</td></tr>'
+            '<tr><td>row</td><td>  </br>  1&#46;5</td></tr></table></body>'
+        )
+        scanned = scan_tables(txt)
+        self.assertEqual([[' heading ', [[None, 'A & B'], ['row', '    1.5']], 4]], scanned)
+        self.assertEqual(self.plain_tables(soup_tables(txt)), scanned)
+
+    def test_irregular_tables_are_left_to_soup(self):
+        for txt in [
+            '<!-- heading --><table><tr><td>1</table>',  # unclosed tags
+            '<!-- heading --><table><tr><td><b>1</b></td></tr></table>',  # cell starting with a tag
+            '<!-- heading --><table><tr><td><!-- a --><table></table></td></tr></table>',  # nested tables
+            '<!-- heading --><table><tr><td>&foo;</td></tr></table>',  # unknown entity
+            '<b>heading</b><table><tr><td>1</td></tr></table>',  # no heading comment
+        ]:
+            self.assertIsNone(scan_tables(txt), txt)
+        with open(os.path.join(self.diff_files_dir, 'eplustbl_missing_table_header_comment.htm')) as f:
+            self.assertIsNone(scan_tables(f.read()))
+
+    def run_table_diff(self, file_a, file_b):
+        return table_diff(
+            self.thresh_dict,
+            file_a,
+            file_b,
+            os.path.join(self.temp_output_dir, 'abs_diff.htm'),
+            os.path.join(self.temp_output_dir, 'rel_diff.htm'),
+            os.path.join(self.temp_output_dir, 'math_diff.log'),
+            os.path.join(self.temp_output_dir, 'summary.htm'),
+        )
+
+    def test_large_report(self):
+        # a synthetic report with a couple thousand tables, which used to take quadratic time
+        headings = ['Report_Entire Facility_Table %s' % i for i in range(2000)]
+        file_a = os.path.join(self.temp_output_dir, 'a.htm')
+        write_report(file_a, headings)
+        response = self.run_table_diff(file_a, file_a)
+        self.assertEqual(('', 2000, 0, 0, 16000, 0, 0, 0, 0), response)
+        file_b = os.path.join(self.temp_output_dir, 'b.htm')
+        write_report(file_b, headings[:-1], value=2.0)
+        response = self.run_table_diff(file_a, file_b)
+        self.assertEqual(('', 2000, 7996, 0, 7996, 0, 0, 0, 1), response)
+
+    def test_duplicate_headings_are_matched_in_order(self):
+        file_a = os.path.join(self.temp_output_dir, 'a.htm')
+        write_report(file_a, ['Table A', 'Table B', 'Table A'])
+        with open(file_a) as f:
+            txt = f.read()
+        # make the second Table A different from the first one, so they can't be compared to each other
+        second_a = txt.rindex('<!-- FullName:Table A-->')
+        with open(file_a, 'w') as f:
+            f.write(txt[:second_a] + txt[second_a:].replace('1.00', '5.00'))
+        response = self.run_table_diff(file_a, file_a)
+        self.assertEqual(('', 3, 0, 0, 24, 0, 0, 0, 0), response)
+        # the extra Table A in the first file isn't in the second one
+        file_b = os.path.join(self.temp_output_dir, 'b.htm')
+        write_report(file_b, ['Table A', 'Table B'])
+        response = self.run_table_diff(file_a, file_b)
+        self.assertEqual(('', 3, 0, 0, 16, 0, 0, 0, 1), response)
+        # and the other way around
+        response = self.run_table_diff(file_b, file_a)
+        self.assertEqual(('', 3, 0, 0, 16, 0, 0, 1, 0), response)
@@ -72,3 +72,17 @@ invalid line
 
         # check an invalid line
         # self.assertTupleEqual((0.0, 0.0), t.lookup('My Variable Name ][{Daily}'))
+
+    def test_lookups_are_remembered(self):
+        thresh_file = tempfile.mkstemp(suffix='.config')[1]
+        with open(thresh_file, 'w') as f_thresh:
+            f_thresh.write(self.typical_thresholds)
+        t = ThreshDict(thresh_file)
+        t.cache_size = 2
+        headers = ['Date/Time', 'My Variable Name [C]{Hourly}', 'Other Variable [W](Hourly)', 'Unknown [m3]']
+        self.assertEqual([(0.0, 0.0), (0.2, 100.0), (0.1, 0.005), (0.0, 0.0)], t.lookup_all(headers))
+        # only the most recent headers are kept, and a remembered header resolves the same way
+        self.assertEqual(['Other Variable [W](Hourly)', 'Unknown [m3]'], list(t.cache))
+        self.assertTupleEqual((0.1, 0.005), t.lookup('Other Variable [W](Hourly)'))
+        self.assertTupleEqual((0.2, 100.0), t.lookup('My Variable Name [C]{Hourly}'))
+        self.assertEqual(['Unknown [m3]', 'My Variable Name [C]{Hourly}'], list(t.cache))
@@ -13,14 +13,23 @@ So we are going to replicate just a few of the core functions of E+ in this bina
     "num_severe": 0,
     "end_state": "fatal" / "success" / "crash" / "unknown",
     "eso_results": "base" / "smalldiffs" / "bigdiffs",
+    "eso_native": true -- write real eso and mtr files for the eso_results instead of the json ReadVarsESO stand-in
+    "sql_results": "base" / "smalldiffs" / "bigdiffs" -- write an eplusout.sql with report data, a table and errors
     "txt_results": "base" / "diffs",
     "extra_data": "<freeform>" -- this is something like a flag for auxiliary tools to pick up
+    "sleep_seconds": 30 -- hang around for a while before writing anything, like a stuck simulation
+    "kill_once_marker": "<path>" -- get killed, like by the kernel when out of memory, unless the marker file exists,
+                                    which is created first
   }
 }
 """
 
 import json
+import os
+import signal
+import sqlite3
 import sys
+import time
 
 with open('in.idf') as f_idf:
     idf_body = f_idf.read()
@@ -30,9 +39,67 @@ with open('in.idf') as f_idf:
     except:
         sys.exit(0)
 
-if 'eso_results' in config:
-    with open('eplusout.eso', 'w') as f_eso:
-        f_eso.write(json.dumps({'output': config['eso_results']}))
+if 'kill_once_marker' in config and not os.path.exists(config['kill_once_marker']):
+    open(config['kill_once_marker'], 'w').close()
+    os.kill(os.getpid(), signal.SIGKILL)
+
+if 'sleep_seconds' in config:
+    time.sleep(config['sleep_seconds'])
+
+if 'eso_results' in config and config.get('eso_native'):
+    first_value = {'base': '40000.0', 'smalldiffs': '40005.0', 'bigdiffs': '50000.0'}[config['eso_results']]
+    for file_name, variable in [('eplusout.eso', 'ZONE ONE,Variable 2 [W]'), ('eplusout.mtr', 'Meter 1 [J]')]:
+        with open(file_name, 'w') as f_eso:
+            f_eso.write('Program Version,EnergyPlus, Version 9.3.0\n')
+            f_eso.write('2,8,Day of Simulation[],Month[],Day of Month[],DST Indicator[1=yes 0=no],Hour[],'
+                        'StartMinute[],EndMinute[],DayType\n')
+            f_eso.write('7,1,%s !Hourly\n' % variable)
+            f_eso.write('End of Data Dictionary\n')
+            for hour, value in enumerate([first_value, '40000.0', '40000.0', '40000.0']):
+                f_eso.write('2,1, 1,21, 0,%2d, 0.00,60.00,WinterDesignDay\n' % (hour + 1))
+                f_eso.write('7,%s\n' % value)
+            f_eso.write('End of Data\n')
+elif 'eso_results' in config:
+    for file_name in ['eplusout.eso', 'eplusout.mtr']:
+        with open(file_name, 'w') as f_eso:
+            f_eso.write(json.dumps({'output': config['eso_results']}))
+
+if 'sql_results' in config:
+    first_value = {'base': 40000.0, 'smalldiffs': 40000.05, 'bigdiffs': 50000.0}[config['sql_results']]
+    connection = sqlite3.connect('eplusout.sql')
+    connection.executescript('''
+        CREATE TABLE ReportDataDictionary (ReportDataDictionaryIndex INTEGER PRIMARY KEY, IsMeter INTEGER, Type TEXT,
+            IndexGroup TEXT, TimestepType TEXT, KeyValue TEXT, Name TEXT, ReportingFrequency TEXT, ScheduleName TEXT,
+            Units TEXT);
+        CREATE TABLE Time (TimeIndex INTEGER PRIMARY KEY, Year INTEGER, Month INTEGER, Day INTEGER, Hour INTEGER,
+            Minute INTEGER, Dst INTEGER, Interval INTEGER, IntervalType INTEGER, SimulationDays INTEGER, DayType TEXT,
+            EnvironmentPeriodIndex INTEGER, WarmupFlag INTEGER);
+        CREATE TABLE ReportData (ReportDataIndex INTEGER PRIMARY KEY, TimeIndex INTEGER,
+            ReportDataDictionaryIndex INTEGER, Value REAL);
+        CREATE TABLE Strings (StringIndex INTEGER PRIMARY KEY, StringTypeIndex INTEGER, Value TEXT);
+        CREATE TABLE TabularData (TabularDataIndex INTEGER PRIMARY KEY, ReportNameIndex INTEGER,
+            ReportForStringIndex INTEGER, TableNameIndex INTEGER, RowNameIndex INTEGER, ColumnNameIndex INTEGER,
+            UnitsIndex INTEGER, SimulationIndex INTEGER, RowId INTEGER, ColumnId INTEGER, Value TEXT);
+        CREATE TABLE Errors (ErrorIndex INTEGER PRIMARY KEY, SimulationIndex INTEGER, ErrorType INTEGER,
+            ErrorMessage TEXT, Count INTEGER);
+        INSERT INTO ReportDataDictionary VALUES (7, 0, 'Avg', 'Zone', 'Zone', 'ZONE ONE', 'Variable 2', 'Hourly', '',
+            'W');
+        INSERT INTO Strings VALUES (1, 1, 'AnnualBuildingUtilityPerformanceSummary');
+        INSERT INTO Strings VALUES (2, 2, 'Entire Facility');
+        INSERT INTO Strings VALUES (3, 3, 'Site and Source Energy');
+        INSERT INTO Strings VALUES (4, 4, 'Total Site Energy');
+        INSERT INTO Strings VALUES (5, 5, 'Total Energy');
+        INSERT INTO Strings VALUES (6, 6, 'GJ');
+        INSERT INTO Errors VALUES (1, 1, 0, 'Output:PreprocessorMessage="Dummy" has the following Warning', 0);
+    ''')
+    for hour, value in enumerate([first_value, 40000.0, 40000.0, 40000.0]):
+        connection.execute('INSERT INTO Time VALUES (?, 2009, 1, 21, ?, 0, 0, 60, 1, 1, ?, 1, 0)',
+                           (hour + 1, hour + 1, 'WinterDesignDay'))
+        connection.execute('INSERT INTO ReportData VALUES (?, ?, 7, ?)', (hour + 1, hour + 1, value))
+    connection.execute('INSERT INTO TabularData VALUES (1, 1, 2, 3, 4, 5, 6, 1, 0, 0, ?)',
+                       ('%12.2f' % (first_value / 1000),))
+    connection.commit()
+    connection.close()
 
 if 'txt_results' in config:
     f_audit = open('eplusout.audit', 'w')
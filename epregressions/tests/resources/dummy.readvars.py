@@ -2,7 +2,8 @@
 
 """
 So we are going to ReadVarsESO in a silly way
-1) We are going to make it expect an eplusout.eso only - not managing rvi or mvi files
+1) We are going to make it expect an eplusout.eso, or an eplusout.mtr when run with in.mvi - not reading the rvi or
+   mvi files themselves; like the real one it writes a readvars.audit naming the file it converted
 2) We expect this file to be JSON, and have one key: output
    The value of this key should be "base", "smalldiffs", or "bigdiffs"
    Based on this key, the value will write slightly different csv files
@@ -15,7 +16,13 @@ So we are going to ReadVarsESO in a silly way
 import json
 import sys
 
-with open('eplusout.eso') as f_idf:
+meters = sys.argv[1:] == ['in.mvi']
+input_file = 'eplusout.mtr' if meters else 'eplusout.eso'
+
+with open('readvars.audit', 'w') as f_audit:
+    f_audit.write('converted %s\n' % input_file)
+
+with open(input_file) as f_idf:
     idf_body = f_idf.read()
     # noinspection PyBroadException
     try:
@@ -39,37 +46,15 @@ big_output = """Date/Time,Variable 1 [C](Hourly),Variable 2 [W](Hourly),Variable
  01/21  03:00:00,20.5,40000.0,3.0
  01/21  04:00:00,20.5,40000.0,4.0"""
 
-f_csv = open('eplusout.csv', 'w')
-f_mtr = open('eplusmtr.csv', 'w')
-f_zsz = open('epluszsz.csv', 'w')
-f_ssz = open('eplusssz.csv', 'w')
 if output_mode == 'base':
-    written = True
-    f_csv.write(base_output)
-    f_mtr.write(base_output)
-    f_zsz.write(base_output)
-    f_ssz.write(base_output)
+    output = base_output
 elif output_mode == 'smalldiffs':
-    written = True
-    f_csv.write(small_output)
-    f_mtr.write(small_output)
-    f_zsz.write(small_output)
-    f_ssz.write(small_output)
+    output = small_output
 elif output_mode == 'bigdiffs':
-    written = True
-    f_csv.write(big_output)
-    f_mtr.write(big_output)
-    f_zsz.write(big_output)
-    f_ssz.write(big_output)
-else:
-    written = False
-
-f_csv.close()
-f_mtr.close()
-f_zsz.close()
-f_ssz.close()
-
-if written:
-    sys.exit(0)
+    output = big_output
 else:
     sys.exit(1)
+
+for file_name in ['eplusmtr.csv'] if meters else ['eplusout.csv', 'epluszsz.csv', 'eplusssz.csv']:
+    with open(file_name, 'w') as f_csv:
+        f_csv.write(output)
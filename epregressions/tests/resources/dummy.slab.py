@@ -1 +1,14 @@
 #!/usr/bin/env python
+
+"""
+Mimics the slab preprocessor, which reads GHTIn.idf, its idd and, unless the run is design days only, the in.epw
+weather file from its working directory.  The objects it writes to SLABSurfaceTemps.TXT, which are appended to the
+input file, name the inputs it found there.
+"""
+
+import glob
+import os
+
+inputs = [f for f in ['GHTIn.idf', 'in.epw'] if os.path.exists(f)] + sorted(glob.glob('*.idd'))
+with open('SLABSurfaceTemps.TXT', 'w') as f:
+    f.write('! slab read %s\n' % ', '.join(inputs))
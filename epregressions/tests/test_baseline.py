@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from epregressions.baseline import BaselineStore, build_digest, source_commit
+
+
+class TestBaselineStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+        self.run_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.run_dir, 'eplusout.end'), 'w') as f:
+            f.write('EnergyPlus Completed Successfully')
+
+    def test_published_baseline_is_found(self):
+        store = BaselineStore(self.store_dir, 'abc123', 'build', 'Tests-Hourly')
+        self.assertFalse(store.has_case('my_file'))
+        self.assertFalse(store.publish())  # nothing staged
+        store.start_staging()
+        store.stage(self.run_dir, 'my_file')
+        self.assertFalse(os.path.exists(store.run_directory))
+        self.assertTrue(store.publish())
+        store = BaselineStore(self.store_dir, 'abc123', 'build', 'Tests-Hourly')
+        self.assertTrue(store.has_case('my_file'))
+        self.assertFalse(store.has_case('other_file'))
+        self.assertTrue(os.path.exists(os.path.join(store.case_directory('my_file'), 'eplusout.end')))
+        # other baselines, or other run types of this one, are kept apart
+        self.assertFalse(BaselineStore(self.store_dir, 'def456', 'build', 'Tests-Hourly').has_case('my_file'))
+        self.assertFalse(BaselineStore(self.store_dir, 'abc123', 'build', 'Tests-DDOnly-Hourly').has_case('my_file'))
+        # as are other builds of the same commit
+        self.assertFalse(BaselineStore(self.store_dir, 'abc123', 'other_build', 'Tests-Hourly').has_case('my_file'))
+
+    def test_first_published_baseline_wins(self):
+        first = BaselineStore(self.store_dir, 'abc123', 'build', 'Tests-Hourly')
+        second = BaselineStore(self.store_dir, 'abc123', 'build', 'Tests-Hourly')
+        first.start_staging()
+        second.start_staging()
+        first.stage(self.run_dir, 'my_file')
+        second.stage(self.run_dir, 'my_other_file')
+        self.assertTrue(first.publish())
+        self.assertFalse(second.publish())
+        # the losing copy is cleaned up
+        self.assertEqual(['Tests-Hourly'], os.listdir(os.path.join(self.store_dir, 'abc123', 'build')))
+        self.assertTrue(BaselineStore(self.store_dir, 'abc123', 'build', 'Tests-Hourly').has_case('my_file'))
+
+    def test_build_digest(self):
+        build_dir = tempfile.mkdtemp()
+        products_dir = os.path.join(build_dir, 'Products')
+        os.makedirs(products_dir)
+        build_tree = {'build_dir': build_dir, 'energyplus': os.path.join(products_dir, 'energyplus')}
+        for tool in ['basement', 'idd_path', 'slab', 'basementidd', 'slabidd', 'expandobjects', 'epmacro', 'readvars',
+                     'parametric']:
+            build_tree[tool] = os.path.join(products_dir, tool)
+        with open(build_tree['energyplus'], 'w') as f:
+            f.write('binary')
+        with open(os.path.join(build_dir, 'CMakeCache.txt'), 'w') as f:
+            f.write('CMAKE_BUILD_TYPE:STRING=Release\n')
+        first_digest = build_digest(build_tree)
+        self.assertEqual(first_digest, build_digest(build_tree))
+        with open(os.path.join(build_dir, 'CMakeCache.txt'), 'w') as f:
+            f.write('CMAKE_BUILD_TYPE:STRING=Debug\n')
+        second_digest = build_digest(build_tree)
+        self.assertNotEqual(first_digest, second_digest)
+        with open(build_tree['energyplus'], 'w') as f:
+            f.write('another binary')
+        self.assertNotIn(build_digest(build_tree), [first_digest, second_digest])
+
+    def test_source_commit_outside_of_a_repository(self):
+        self.assertIsNone(source_commit(self.run_dir))
@@ -0,0 +1,244 @@
+import io
+import os
+import tarfile
+import tempfile
+import time
+import unittest
+from multiprocessing import AuthenticationError, Process
+from multiprocessing.connection import Client
+
+from epregressions.broker import TaskBroker, authkey_variable, pack, read_authkey, replace_paths, run_worker, \
+    snapshot, unpack
+
+
+def add(a, b):
+    return a + b
+
+
+def fail():
+    raise ValueError('bad input')
+
+
+def write_output(run_directory):
+    # like execute_energyplus, read the inputs and replace them with the outputs
+    with open(os.path.join(run_directory, 'in.idf')) as f:
+        idf = f.read()
+    with open(os.path.join(run_directory, 'eplusout.end'), 'w') as f:
+        f.write('done with %s' % idf)
+    os.remove(os.path.join(run_directory, 'in.tmp'))
+    return run_directory, os.path.join(run_directory, 'eplusout.end')
+
+
+def hang_the_first_time(marker_file):
+    if not os.path.exists(marker_file):
+        open(marker_file, 'w').close()
+        time.sleep(5)
+    return 'second try'
+
+
+def hang(marker_dir):
+    open(os.path.join(marker_dir, str(os.getpid())), 'w').close()
+    time.sleep(10)
+
+
+def read_weather(run_directory):
+    with open(os.path.join(run_directory, 'in.epw')) as f:
+        return f.read()
+
+
+def run_until_done(broker, limit=60.0):
+    results = {}
+    deadline = time.time() + limit
+    while broker.busy() and time.time() < deadline:
+        for key, value, error in broker.wait(0.1):
+            results[key] = (value, error)
+    return results
+
+
+class TestTaskBroker(unittest.TestCase):
+
+    def setUp(self):
+        self.messages = []
+        self.broker = TaskBroker('localhost:0', 'secret', 2, self.messages.append, heartbeat_timeout=10.0)
+        self.address = '%s:%s' % self.broker.address
+        self.workers = []
+
+    def tearDown(self):
+        self.broker.close()
+        for worker in self.workers:
+            worker.join(10)
+            if worker.is_alive():  # pragma: no cover
+                worker.terminate()
+
+    def start_worker(self):
+        worker = Process(target=run_worker, args=(self.address, 'secret'), kwargs={
+            'heartbeat_interval': 0.2, 'poll_interval': 0.1, 'connect_timeout': 10.0
+        })
+        worker.start()
+        self.workers.append(worker)
+        return worker
+
+    def test_remote_and_local_tasks(self):
+        for _ in range(3):
+            self.start_worker()
+        run_directory = tempfile.mkdtemp()
+        with open(os.path.join(run_directory, 'in.idf'), 'w') as f:
+            f.write('my input')
+        with open(os.path.join(run_directory, 'in.tmp'), 'w') as f:
+            f.write('scratch')
+        self.broker.submit_remote('output', write_output, (run_directory,), [(run_directory, run_directory)])
+        for i in range(5):
+            self.broker.submit_remote(i, add, (i, 1), [])
+        self.broker.submit_remote('fail', fail, (), [])
+        self.broker.submit('local', add, (2, 3))
+        results = run_until_done(self.broker)
+        self.assertEqual(8, len(results))
+        for i in range(5):
+            self.assertEqual((i + 1, None), results[i])
+        self.assertEqual((5, None), results['local'])
+        self.assertIsNone(results['fail'][0])
+        self.assertIn('ValueError: bad input', results['fail'][1])
+        # the paths in the result are the ones on this host, and the outputs were written back into the directory
+        self.assertEqual(
+            ((run_directory, os.path.join(run_directory, 'eplusout.end')), None), results['output']
+        )
+        self.assertEqual(['eplusout.end', 'in.idf'], sorted(os.listdir(run_directory)))
+        with open(os.path.join(run_directory, 'eplusout.end')) as f:
+            self.assertEqual('done with my input', f.read())
+        self.assertIn('6 remote tasks completed, 1 failed', self.broker.summary())
+        self.assertFalse(self.broker.busy())
+
+    def test_task_of_lost_worker_is_queued_again(self):
+        marker_file = os.path.join(tempfile.mkdtemp(), 'started')
+        first_worker = self.start_worker()
+        self.broker.submit_remote('hang', hang_the_first_time, (marker_file,), [])
+        deadline = time.time() + 30
+        while not os.path.exists(marker_file) and time.time() < deadline:
+            self.broker.wait(0.1)
+        first_worker.terminate()
+        self.start_worker()
+        results = run_until_done(self.broker)
+        self.assertEqual({'hang': ('second try', None)}, results)
+        self.assertEqual(1, self.broker.requeued)
+        self.assertTrue(any(m.startswith('Lost worker') for m in self.messages))
+
+    def test_task_that_loses_every_worker_fails(self):
+        self.broker.max_attempts = 2
+        marker_dir = tempfile.mkdtemp()
+        self.broker.submit_remote('hang', hang, (marker_dir,), [])
+        for attempt in range(1, 3):
+            worker = self.start_worker()
+            deadline = time.time() + 30
+            while len(os.listdir(marker_dir)) < attempt and time.time() < deadline:
+                self.broker.wait(0.1)
+            worker.terminate()
+        results = run_until_done(self.broker)
+        self.assertIsNone(results['hang'][0])
+        self.assertIn('lost the worker running it 2 times', results['hang'][1])
+        self.assertEqual(1, self.broker.requeued)
+        self.assertEqual(1, self.broker.failed)
+        self.assertTrue(any(m.endswith('its task failed after 2 attempts') for m in self.messages))
+
+    def test_shared_inputs_are_sent_once(self):
+        self.start_worker()
+        shared_dir = tempfile.mkdtemp()
+        for weather in ['chicago', 'denver']:
+            with open(os.path.join(shared_dir, weather), 'w') as f:
+                f.write(weather)
+        run_directories = []
+        for i, weather in enumerate(['chicago', 'chicago', 'denver', 'chicago']):
+            run_directory = tempfile.mkdtemp()
+            os.link(os.path.join(shared_dir, weather), os.path.join(run_directory, 'in.epw'))
+            self.broker.submit_remote(
+                i, read_weather, (run_directory,), [(run_directory, run_directory)],
+                shared_inputs=[os.path.join(run_directory, 'in.epw')]
+            )
+            run_directories.append(run_directory)
+        results = run_until_done(self.broker)
+        self.assertEqual([('chicago', None), ('chicago', None), ('denver', None), ('chicago', None)],
+                         [results[i] for i in range(4)])
+        self.assertEqual(2, self.broker.inputs_sent)
+        # the shared inputs are left as they were in the run directories
+        for run_directory in run_directories:
+            self.assertEqual(['in.epw'], os.listdir(run_directory))
+
+    def test_cancel_drops_queued_tasks(self):
+        for i in range(3):
+            self.broker.submit_remote(i, add, (i, 1), [])
+        self.assertTrue(self.broker.busy())
+        self.broker.cancel()
+        self.assertFalse(self.broker.busy())
+        self.assertEqual(3, self.broker.cancelled)
+
+    def test_client_with_wrong_key_is_rejected(self):
+        with self.assertRaises(AuthenticationError):
+            Client(self.broker.address, authkey=b'wrong')
+        # the broker keeps serving the workers that know the key
+        self.start_worker()
+        self.broker.submit_remote('sum', add, (1, 2), [])
+        self.assertEqual({'sum': (3, None)}, run_until_done(self.broker))
+
+
+class TestAuthkey(unittest.TestCase):
+
+    def test_broker_needs_a_key(self):
+        with self.assertRaises(ValueError):
+            TaskBroker('localhost:0', None, 1)
+        with self.assertRaises(ValueError):
+            TaskBroker('0.0.0.0:0', '', 1)
+
+    def test_read_authkey(self):
+        key_file = os.path.join(tempfile.mkdtemp(), 'key')
+        with open(key_file, 'w') as f:
+            f.write('from file\n')
+        environment = os.environ.pop(authkey_variable, None)
+        try:
+            self.assertIsNone(read_authkey())
+            os.environ[authkey_variable] = 'from environment'
+            self.assertEqual('from environment', read_authkey())
+            self.assertEqual('from file', read_authkey(None, key_file))
+            self.assertEqual('given', read_authkey('given', key_file))
+        finally:
+            os.environ.pop(authkey_variable, None)
+            if environment is not None:  # pragma: no cover
+                os.environ[authkey_variable] = environment
+
+
+class TestArchives(unittest.TestCase):
+
+    def test_only_changed_files_are_packed(self):
+        directory = tempfile.mkdtemp()
+        for file_name in ['a.txt', 'b.txt']:
+            with open(os.path.join(directory, file_name), 'w') as f:
+                f.write(file_name)
+        copy = tempfile.mkdtemp()
+        unpack(pack(directory)[0], copy)
+        self.assertEqual(['a.txt', 'b.txt'], sorted(os.listdir(copy)))
+        before = snapshot(copy)
+        with open(os.path.join(copy, 'c.txt'), 'w') as f:
+            f.write('new')
+        os.remove(os.path.join(copy, 'b.txt'))
+        archive_bytes, deleted = pack(copy, before)
+        self.assertEqual(['b.txt'], deleted)
+        self.assertEqual(['a.txt'], [m.name for m in tarfile.open(fileobj=io.BytesIO(pack(copy, {}, ['c.txt'])[0]))])
+        # a file linked into the directory is replaced, not written through
+        shared = os.path.join(tempfile.mkdtemp(), 'shared.txt')
+        with open(shared, 'w') as f:
+            f.write('shared')
+        os.remove(os.path.join(directory, 'a.txt'))
+        os.link(shared, os.path.join(directory, 'a.txt'))
+        archive_bytes, _ = pack(copy, {})
+        unpack(archive_bytes, directory, deleted)
+        self.assertEqual(['a.txt', 'c.txt'], sorted(os.listdir(directory)))
+        with open(shared) as f:
+            self.assertEqual('shared', f.read())
+
+    def test_replace_paths(self):
+        mapping = [(os.path.join('/suite', 'case'), os.path.join('/scratch', 'case'))]
+        value = (
+            {'build_dir': '/suite'}, [os.path.join('/suite', 'case', 'in.idf')], os.path.join('/suite', 'cases'), 3
+        )
+        self.assertEqual(
+            ({'build_dir': '/suite'}, [os.path.join('/scratch', 'case', 'in.idf')], os.path.join('/suite', 'cases'), 3),
+            replace_paths(value, mapping)
+        )
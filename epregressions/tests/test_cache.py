@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+
+from epregressions.cache import SimulationCache
+from epregressions.structures import ForceRunType, ReportingFreq
+
+
+class TestSimulationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = os.path.join(tempfile.mkdtemp(), 'cache')
+        self.build_dir = tempfile.mkdtemp()
+        self.build_tree = {'build_dir': self.build_dir}
+        for tool in SimulationCache.build_tree_tools:
+            self.build_tree[tool] = os.path.join(self.build_dir, tool)
+            with open(self.build_tree[tool], 'w') as f:
+                f.write(tool)
+        self.weather_file = os.path.join(self.build_dir, 'in.epw')
+        with open(self.weather_file, 'w') as f:
+            f.write('WEATHER')
+
+    def make_run_directory(self, idf_text='IDF'):
+        run_dir = tempfile.mkdtemp()
+        with open(os.path.join(run_dir, 'in.idf'), 'w') as f:
+            f.write(idf_text)
+        return run_dir
+
+    def key(self, cache, run_dir, run_type=ForceRunType.NONE, min_reporting_freq=ReportingFreq.HOURLY):
+        return cache.key(
+            self.build_tree, 'my_file', run_dir, run_type, min_reporting_freq, False, self.weather_file
+        )
+
+    def test_key_follows_inputs(self):
+        cache = SimulationCache(self.cache_dir, 1000000)
+        run_dir = self.make_run_directory()
+        base = self.key(cache, run_dir)
+        self.assertEqual(base, self.key(cache, self.make_run_directory()))
+        self.assertNotEqual(base, self.key(cache, self.make_run_directory('OTHER IDF')))
+        self.assertNotEqual(base, self.key(cache, run_dir, run_type=ForceRunType.ANNUAL))
+        self.assertNotEqual(base, self.key(cache, run_dir, min_reporting_freq=ReportingFreq.DAILY))
+        self.assertNotEqual(base, cache.key(
+            self.build_tree, 'my_file', run_dir, ForceRunType.NONE, ReportingFreq.HOURLY, False, self.weather_file, True
+        ))
+        with open(os.path.join(run_dir, 'in.rvi'), 'w') as f:
+            f.write('RVI')
+        self.assertNotEqual(base, self.key(cache, run_dir))
+        with open(self.build_tree['energyplus'], 'a') as f:
+            f.write(' rebuilt')
+        self.assertNotEqual(base, self.key(cache, self.make_run_directory()))
+
+    def test_design_day_runs_ignore_the_weather_file(self):
+        cache = SimulationCache(self.cache_dir, 1000000)
+        run_dir = self.make_run_directory()
+        annual = self.key(cache, run_dir)
+        dd = self.key(cache, run_dir, run_type=ForceRunType.DD)
+        with open(self.weather_file, 'w') as f:
+            f.write('OTHER WEATHER')
+        self.assertNotEqual(annual, self.key(cache, run_dir))
+        self.assertEqual(dd, self.key(cache, run_dir, run_type=ForceRunType.DD))
+
+    def test_store_and_restore(self):
+        cache = SimulationCache(self.cache_dir, 1000000)
+        run_dir = self.make_run_directory()
+        key = self.key(cache, run_dir)
+        self.assertFalse(cache.restore(key, run_dir))
+        with open(os.path.join(run_dir, 'eplusout.end'), 'w') as f:
+            f.write('EnergyPlus Completed Successfully')
+        cache.store(key, run_dir)
+        # a new cache on the same directory finds the stored run
+        cache = SimulationCache(self.cache_dir, 1000000)
+        new_run_dir = self.make_run_directory()
+        self.assertTrue(cache.restore(key, new_run_dir))
+        self.assertEqual(['eplusout.end', 'in.idf'], sorted(os.listdir(new_run_dir)))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(0, cache.misses)
+
+    def test_shared_inputs_are_not_stored(self):
+        cache = SimulationCache(self.cache_dir, 1000000)
+
+        def prepare_run_directory():
+            run_dir = self.make_run_directory()
+            os.mkdir(os.path.join(run_dir, 'datasets'))
+            for shared_input in ['in.epw', os.path.join('datasets', 'Window5DataFile.dat')]:
+                os.symlink(self.weather_file, os.path.join(run_dir, shared_input))
+            return run_dir
+
+        run_dir = prepare_run_directory()
+        key = cache.key(self.build_tree, 'my_file', run_dir, ForceRunType.NONE, ReportingFreq.HOURLY, False,
+                        self.weather_file, run_directory_digest=SimulationCache.run_directory_digest(run_dir))
+        self.assertEqual(key, self.key(cache, run_dir))
+        with open(os.path.join(run_dir, 'eplusout.end'), 'w') as f:
+            f.write('EnergyPlus Completed Successfully')
+        cache.store(key, run_dir, ['in.epw', os.path.join('datasets', 'Window5DataFile.dat')])
+        self.assertEqual(['cache_entry.json', 'datasets', 'eplusout.end', 'in.idf'],
+                         sorted(os.listdir(os.path.join(self.cache_dir, key))))
+        self.assertEqual([], os.listdir(os.path.join(self.cache_dir, key, 'datasets')))
+        self.assertEqual(len('IDF') + len('EnergyPlus Completed Successfully'), cache.size())
+        # the restored run keeps the shared inputs staged into the run directory it is restored into
+        new_run_dir = prepare_run_directory()
+        self.assertTrue(cache.restore(key, new_run_dir))
+        self.assertEqual(['datasets', 'eplusout.end', 'in.epw', 'in.idf'], sorted(os.listdir(new_run_dir)))
+        self.assertTrue(os.path.islink(os.path.join(new_run_dir, 'in.epw')))
+        self.assertTrue(os.path.islink(os.path.join(new_run_dir, 'datasets', 'Window5DataFile.dat')))
+
+    def test_least_recently_used_runs_are_evicted(self):
+        cache = SimulationCache(self.cache_dir, 25)
+        keys = []
+        for idf_text in ['IDF 1 ....', 'IDF 2 ....', 'IDF 3 ....']:
+            run_dir = self.make_run_directory(idf_text)
+            keys.append(self.key(cache, run_dir))
+            cache.store(keys[-1], run_dir)
+            if len(keys) == 2:
+                cache.restore(keys[0], self.make_run_directory())  # the first run is now used more recently
+        self.assertEqual(3, cache.stores)
+        self.assertEqual(1, cache.evictions)
+        self.assertEqual(sorted([keys[0], keys[2]]), sorted(cache.entries))
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, keys[1])))
+        self.assertEqual(20, cache.size())
+        # runs bigger than the whole cache are not stored
+        run_dir = self.make_run_directory('x' * 30)
+        cache.store(self.key(cache, run_dir), run_dir)
+        self.assertEqual(3, cache.stores)
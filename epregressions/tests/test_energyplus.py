@@ -1,8 +1,12 @@
+import json
 import os
+import stat
 import tempfile
+import threading
 import unittest
 
-from epregressions.energyplus import execute_energyplus
+from epregressions.energyplus import execute_energyplus, read_tool_usage
+from epregressions.scheduler import TaskScheduler
 from epregressions.structures import ReportingFreq, ForceRunType
 
 
@@ -17,7 +21,7 @@ class TestEnergyPlus(unittest.TestCase):
             'idd_path': os.path.join(self.resource_dir, 'dummy.Energy+.idd'),
             'slab': os.path.join(self.resource_dir, 'dummy.slab.py'),
             'basementidd': os.path.join(self.resource_dir, 'dummy.basement.idd'),
-            'slabidd': os.path.join(self.resource_dir, 'dummy.slab.py'),
+            'slabidd': os.path.join(self.resource_dir, 'dummy.slab.idd'),
             'expandobjects': os.path.join(self.resource_dir, 'dummy.expandobjects.py'),
             'epmacro': os.path.join(self.resource_dir, 'dummy.epmacro.py'),
             'readvars': os.path.join(self.resource_dir, 'dummy.readvars.py'),
@@ -43,6 +47,35 @@ class TestEnergyPlus(unittest.TestCase):
         self.assertTrue(return_val[2])
         self.assertFalse(return_val[3])
 
+    def test_eplus_records_tool_usage(self):
+        with open(os.path.join(self.run_dir, 'in.idf'), 'w') as f:
+            f.write(json.dumps({'config': {'end_state': 'success', 'eso_results': 'base'}}))
+        execute_energyplus(self.build_tree, 'entry_name', self.run_dir, ForceRunType.DD, ReportingFreq.HOURLY, False,
+                           '')
+        tool_usage = read_tool_usage(self.run_dir)
+        self.assertEqual(['ExpandObjects', 'EnergyPlus', 'ReadVarsESO', 'ReadVarsESO'],
+                         [program.tool for program in tool_usage.programs])
+        energyplus = tool_usage.programs[1]
+        self.assertGreater(energyplus.wall_time, 0)
+        self.assertGreater(energyplus.user_cpu + energyplus.system_cpu, 0)
+        self.assertGreater(energyplus.peak_memory_mb, 0)
+        self.assertGreaterEqual(energyplus.bytes_written, 0)
+        self.assertEqual(tool_usage.peak_memory_mb, max(p.peak_memory_mb for p in tool_usage.programs))
+        self.assertGreater(tool_usage.total('wall_time', 'ReadVarsESO'), tool_usage.programs[2].wall_time)
+        self.assertIsNone(tool_usage.total('wall_time', 'Slab'))
+        self.assertFalse(tool_usage.killed)
+        # a run directory without the record
+        self.assertEqual([], read_tool_usage(tempfile.mkdtemp()).programs)
+
+    def test_eplus_killed(self):
+        marker_file = os.path.join(tempfile.mkdtemp(), 'marker')
+        with open(os.path.join(self.run_dir, 'in.idf'), 'w') as f:
+            f.write(json.dumps({'config': {'end_state': 'success', 'kill_once_marker': marker_file}}))
+        execute_energyplus(self.build_tree, 'entry_name', self.run_dir, ForceRunType.DD, ReportingFreq.HOURLY, False,
+                           '')
+        self.assertTrue(read_tool_usage(self.run_dir).killed)
+        self.assertFalse(os.path.exists(os.path.join(self.run_dir, 'eplusout.end')))
+
     def test_eplus_passed_simple_dd_only_with_rvi_mvi(self):
         with open(os.path.join(self.run_dir, 'in.idf'), 'w') as f:
             f.write('')
@@ -117,6 +150,65 @@ class TestEnergyPlus(unittest.TestCase):
         self.assertTrue(return_val[2])
         self.assertFalse(return_val[3])
 
+    def test_eplus_runs_independent_programs_together_on_idle_workers(self):
+        with open(os.path.join(self.run_dir, 'in.idf'), 'w') as f:
+            f.write('HVACTEMPLATE')
+        scheduler = TaskScheduler(3)
+        scheduler.submit('case', execute_energyplus, (
+            self.build_tree, 'entry_name', self.run_dir, ForceRunType.DD, ReportingFreq.HOURLY, False, ''
+        ))
+        results = []
+        while scheduler.busy():
+            results.extend(scheduler.wait(0.1))
+        self.assertTrue(results[0][1][2])
+        self.assertEqual(3, scheduler.spare_workers.idle())
+        programs = read_tool_usage(self.run_dir).programs
+        self.assertEqual(['ExpandObjects', 'Basement', 'Slab', 'EnergyPlus', 'ReadVarsESO', 'ReadVarsESO'],
+                         [program.tool for program in programs])
+        for first, second in [(programs[1], programs[2]), (programs[4], programs[5])]:
+            self.assertLess(first.start_time, second.start_time + second.wall_time)
+            self.assertLess(second.start_time, first.start_time + first.wall_time)
+        self.assertFalse(os.path.exists(os.path.join(self.run_dir, 'GHTIn.idf')))
+
+    def test_eplus_ground_programs_read_their_inputs(self):
+        with open(os.path.join(self.run_dir, 'in.idf'), 'w') as f:
+            f.write('HVACTEMPLATE')
+        weather_file = os.path.join(self.resource_dir, 'dummy.in.epw')
+        execute_energyplus(self.build_tree, 'entry_name', self.run_dir, ForceRunType.ANNUAL, ReportingFreq.HOURLY,
+                           False, weather_file)
+        # what each one wrote from its own directory is appended to the input file, naming the inputs it found there
+        with open(os.path.join(self.run_dir, 'in.idf')) as f:
+            idf_text = f.read()
+        self.assertIn('! basement read BasementGHTIn.idf, in.epw, dummy.basement.idd', idf_text)
+        self.assertIn('! slab read GHTIn.idf, in.epw, dummy.slab.idd', idf_text)
+
+    def test_eplus_programs_run_together_keep_their_outputs_apart(self):
+        with open(os.path.join(self.run_dir, 'in.idf'), 'w') as f:
+            f.write(json.dumps({'config': {'end_state': 'success', 'eso_results': 'bigdiffs'}}))
+        scheduler = TaskScheduler(2)
+        scheduler.submit('case', execute_energyplus, (
+            self.build_tree, 'entry_name', self.run_dir, ForceRunType.DD, ReportingFreq.HOURLY, False, ''
+        ))
+        results = []
+        while scheduler.busy():
+            results.extend(scheduler.wait(0.1))
+        self.assertTrue(results[0][1][2])
+        programs = read_tool_usage(self.run_dir).programs
+        read_vars = [program for program in programs if program.tool == 'ReadVarsESO']
+        self.assertLess(read_vars[0].start_time, read_vars[1].start_time + read_vars[1].wall_time)
+        self.assertLess(read_vars[1].start_time, read_vars[0].start_time + read_vars[0].wall_time)
+        # the eso and mtr conversions each wrote their own csv files, and the audit of the mtr conversion is kept, as
+        # when they run one after the other
+        for file_name in ['eplusout.csv', 'epluszsz.csv', 'eplusssz.csv', 'eplusmtr.csv']:
+            with open(os.path.join(self.run_dir, file_name)) as f:
+                self.assertIn('50000.0', f.read())
+        with open(os.path.join(self.run_dir, 'readvars.audit')) as f:
+            self.assertEqual('converted eplusout.mtr\n', f.read())
+        self.assertEqual([], [name for name in os.listdir(self.run_dir) if name.startswith('aa_testSuite_program_')])
+        # the inputs linked in for the programs are left as they were
+        with open(os.path.join(self.run_dir, 'eplusout.mtr')) as f:
+            self.assertEqual({'output': 'bigdiffs'}, json.load(f))
+
     def test_eplus_passed_macro(self):
         with open(os.path.join(self.run_dir, 'in.imf'), 'w') as f:
             f.write('##fileprefix line\n')
@@ -187,3 +279,58 @@ class TestEnergyPlus(unittest.TestCase):
         self.assertEqual('entry_name', return_val[1])
         self.assertFalse(return_val[2])  # Fail
         self.assertFalse(return_val[3])
+
+    def test_eplus_runs_on_threads_without_sharing_state(self):
+        # an energyplus that records the directory and environment it was run with
+        recorder = os.path.join(tempfile.mkdtemp(), 'energyplus')
+        with open(recorder, 'w') as f:
+            f.write('#!/usr/bin/env python\n')
+            f.write('import json, os\n')
+            f.write('names = ["DDONLY", "FULLANNUALRUN", "MINREPORTFREQUENCY"]\n')
+            f.write('with open("recorded.json", "w") as f:\n')
+            f.write('    json.dump({"cwd": os.getcwd(), "env": {n: os.environ[n] for n in names}}, f)\n')
+        os.chmod(recorder, os.stat(recorder).st_mode | stat.S_IEXEC)
+        self.build_tree['energyplus'] = recorder
+        weather_file = os.path.join(self.resource_dir, 'dummy.in.epw')
+        start_dir = os.getcwd()
+        start_environment = dict(os.environ)
+        runs = [
+            (tempfile.mkdtemp(), ForceRunType.DD, ReportingFreq.HOURLY),
+            (tempfile.mkdtemp(), ForceRunType.ANNUAL, ReportingFreq.DAILY),
+            (tempfile.mkdtemp(), ForceRunType.NONE, ReportingFreq.MONTHLY),
+        ]
+        results = {}
+
+        def run(run_dir, run_type, reporting_frequency):
+            with open(os.path.join(run_dir, 'in.idf'), 'w') as f_idf:
+                f_idf.write('')
+            results[run_dir] = execute_energyplus(
+                build_tree=self.build_tree,
+                entry_name='entry_name',
+                test_run_directory=run_dir,
+                run_type=run_type,
+                min_reporting_freq=reporting_frequency,
+                this_parametric_file=False,
+                weather_file_name=weather_file
+            )
+
+        threads = [threading.Thread(target=run, args=this_run) for this_run in runs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(start_dir, os.getcwd())
+        self.assertEqual(start_environment, dict(os.environ))
+        expected_environments = {
+            ForceRunType.DD: {'DDONLY': 'Y', 'FULLANNUALRUN': ''},
+            ForceRunType.ANNUAL: {'DDONLY': '', 'FULLANNUALRUN': 'Y'},
+            ForceRunType.NONE: {'DDONLY': '', 'FULLANNUALRUN': ''},
+        }
+        for run_dir, run_type, reporting_frequency in runs:
+            self.assertTrue(results[run_dir][2])
+            with open(os.path.join(run_dir, 'recorded.json')) as f:
+                recorded = json.load(f)
+            self.assertEqual(os.path.realpath(run_dir), os.path.realpath(recorded['cwd']))
+            expected_environment = dict(expected_environments[run_type])
+            expected_environment['MINREPORTFREQUENCY'] = reporting_frequency.upper()
+            self.assertEqual(expected_environment, recorded['env'])
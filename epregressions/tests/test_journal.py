@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import unittest
+
+from epregressions.journal import ResultsJournal
+from epregressions.structures import CompletedStructure, EndErrSummary, MathDifferences, TestEntry
+
+
+class TestResultsJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.results_dir = tempfile.mkdtemp()
+
+    def test_records_are_read_back(self):
+        journal = ResultsJournal(self.results_dir)
+        self.assertEqual(({}, {}), journal.read())
+        journal.record_simulation('a', 'my_file', True)
+        journal.record_simulation('b', 'my_file', False)
+        this_entry = TestEntry('my_file', 'my_weather')
+        this_entry.add_summary_result(
+            EndErrSummary(EndErrSummary.STATUS_SUCCESS, 1.5, EndErrSummary.STATUS_SUCCESS, 2.5)
+        )
+        this_entry.add_math_differences(MathDifferences(['Big Diffs', 8760, 3, 0]), MathDifferences.ESO)
+        journal.record_diff(this_entry)
+        simulations, entries = ResultsJournal(self.results_dir).read()
+        self.assertEqual({('a', 'my_file'): True, ('b', 'my_file'): False}, simulations)
+        self.assertEqual(['my_file'], list(entries))
+        self.assertEqual(this_entry.to_dict(), entries['my_file'].to_dict())
+
+    def test_summary_is_written_from_the_journal(self):
+        journal = ResultsJournal(self.results_dir)
+        in_memory = CompletedStructure('/a/src', '/a/build', '/b/src', '/b/build', self.results_dir)
+        for case_name, status in [('a_file', EndErrSummary.STATUS_SUCCESS), ('b_file', EndErrSummary.STATUS_FATAL)]:
+            this_entry = TestEntry(case_name, 'my_weather')
+            this_entry.add_summary_result(EndErrSummary(status, 1.5, EndErrSummary.STATUS_SUCCESS, 2.5))
+            if status == EndErrSummary.STATUS_SUCCESS:
+                this_entry.add_math_differences(MathDifferences(['Big Diffs', 8760, 3, 0]), MathDifferences.ESO)
+            else:
+                # a case diffed again by a resumed suite is summarized from its last record
+                first_entry = TestEntry(case_name, 'my_weather')
+                first_entry.add_summary_result(
+                    EndErrSummary(EndErrSummary.STATUS_SUCCESS, 1.5, EndErrSummary.STATUS_SUCCESS, 2.5)
+                )
+                journal.record_diff(first_entry)
+            journal.record_diff(this_entry)
+            in_memory.add_test_entry(this_entry)
+        memory_path = os.path.join(self.results_dir, 'memory.json')
+        in_memory.to_json_summary(memory_path)
+        journal_path = os.path.join(self.results_dir, 'journal.json')
+        from_journal = CompletedStructure('/a/src', '/a/build', '/b/src', '/b/build', self.results_dir)
+        from_journal.to_json_summary(journal_path, lambda: journal.entries(['a_file', 'b_file', 'not_diffed']))
+        self.assertEqual([], from_journal.entries_by_file)
+        with open(memory_path) as f:
+            expected = json.load(f)
+        with open(journal_path) as f:
+            summary = json.load(f)
+        for runs in (expected['runs'], summary['runs']):
+            for key in runs:
+                runs[key].sort()  # the base names are kept in sets
+        self.assertEqual(expected, summary)
+        self.assertEqual(['a_file', 'b_file'], summary['runs']['all_files'])
+        self.assertEqual(['a_file'], summary['runs']['success_case_a'])
+        self.assertEqual(['a_file: eso'], summary['diffs']['big_math'])
+
+    def test_empty_summary_from_the_journal(self):
+        journal = ResultsJournal(self.results_dir)
+        summary_path = os.path.join(self.results_dir, 'summary.json')
+        CompletedStructure('', '', '', '', self.results_dir).to_json_summary(summary_path, lambda: journal.entries([]))
+        with open(summary_path) as f:
+            self.assertEqual([], json.load(f)['results_by_file'])
+
+    def test_interrupted_record_is_ignored(self):
+        journal = ResultsJournal(self.results_dir)
+        journal.record_simulation('a', 'my_file', True)
+        with open(os.path.join(self.results_dir, ResultsJournal.file_name), 'a') as f:
+            f.write('{"event": "simulation", "build": "b", "ca')
+        self.assertEqual(1, len(list(journal.records())))
+        simulations, _ = journal.read()
+        self.assertEqual({('a', 'my_file'): True}, simulations)
+
+    def test_resume_after_interrupted_record(self):
+        journal_path = os.path.join(self.results_dir, ResultsJournal.file_name)
+        journal = ResultsJournal(self.results_dir)
+        journal.record_simulation('a', 'first', True)
+        with open(journal_path, 'a') as f:
+            f.write('{"event": "simulation", "build": "b", "ca')
+        # the first resume adds its records after the torn one, and is interrupted in turn
+        resumed = ResultsJournal(self.results_dir)
+        self.assertEqual({('a', 'first'): True}, resumed.read()[0])
+        resumed.record_simulation('b', 'first', True)
+        resumed.record_simulation('a', 'second', False)
+        with open(journal_path, 'a') as f:
+            f.write('{"event": "diff"')
+        # the second resume still sees everything the first one wrote
+        resumed_again = ResultsJournal(self.results_dir)
+        expected = {('a', 'first'): True, ('b', 'first'): True, ('a', 'second'): False}
+        self.assertEqual(expected, resumed_again.read()[0])
+        resumed_again.record_simulation('b', 'second', True)
+        expected[('b', 'second')] = True
+        self.assertEqual(expected, ResultsJournal(self.results_dir).read()[0])
+        with open(journal_path) as f:
+            self.assertEqual(4, len(f.read().splitlines()))
+
+    def test_unreadable_lines_are_skipped(self):
+        journal = ResultsJournal(self.results_dir)
+        journal.record_simulation('a', 'first', True)
+        with open(os.path.join(self.results_dir, ResultsJournal.file_name), 'a') as f:
+            f.write('not json\n')
+        journal.record_simulation('a', 'second', True)
+        self.assertEqual({('a', 'first'): True, ('a', 'second'): True}, ResultsJournal(self.results_dir).read()[0])
@@ -1,10 +1,20 @@
 import json
 import os
 import shutil
+import socket
 import tempfile
 import unittest
+from multiprocessing import Process
 
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from epregressions.baseline import build_digest
+from epregressions.broker import run_worker
 from epregressions.builds.makefile import CMakeCacheMakeFileBuildDirectory
+from epregressions.diffs.math_diff import MathDiffEngine
 from epregressions.runtests import TestRunConfiguration, SuiteRunner
 from epregressions.structures import (
     EndErrSummary, ForceRunType, ReportingFreq, TestEntry, TextDifferences
@@ -83,6 +93,15 @@ class TestTestSuiteRunner(unittest.TestCase):
     def dummy_callback(*args, **kwargs):
         pass
 
+    @staticmethod
+    def entry_dicts(results):
+        """The entries of a suite as dicts, without what the runs took, which differs from run to run"""
+        entries = [e.to_dict() for e in results.entries_by_file]
+        for entry in entries:
+            for key in ['tool_usage_case1', 'tool_usage_case2']:
+                entry.pop(key, None)
+        return entries
+
     def test_both_success_no_diffs_no_force(self):
         base = CMakeCacheMakeFileBuildDirectory()
         self.establish_build_folder(
@@ -740,6 +759,78 @@ class TestTestSuiteRunner(unittest.TestCase):
         self.assertEqual('Big Diffs', results_for_file.ssz_diffs.diff_type)
         self.assertEqual('Big Diffs', results_for_file.zsz_diffs.diff_type)
 
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_big_diffs_numpy_math_diff_engine(self):
+        base = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_base_build_dir,
+            self.temp_base_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base"
+                }
+            }
+        )
+        base.set_build_directory(self.temp_base_build_dir)
+        base.run = True
+
+        mod = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_mod_build_dir,
+            self.temp_mod_source_dir,
+            {
+                "config": {
+                    "run_time_string": "00hr 10min  0.17sec",
+                    "num_warnings": 2,
+                    "num_severe": 1,
+                    "end_state": "success",
+                    "eso_results": "bigdiffs",
+                    "txt_results": "base"
+                }
+            }
+        )
+        mod.set_build_directory(self.temp_mod_build_dir)
+        mod.run = True
+
+        entries = [TestEntry('my_file', 'my_weather')]
+        config = TestRunConfiguration(
+            force_run_type=ForceRunType.NONE,
+            single_test_run=False,
+            num_threads=1,
+            report_freq=ReportingFreq.HOURLY,
+            build_a=base,
+            build_b=mod,
+            math_diff_engine=MathDiffEngine.NUMPY
+        )
+        r = SuiteRunner(config, entries)
+        r.add_callbacks(
+            print_callback=TestTestSuiteRunner.dummy_callback,
+            simstarting_callback=TestTestSuiteRunner.dummy_callback,
+            casecompleted_callback=TestTestSuiteRunner.dummy_callback,
+            simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+            diffcompleted_callback=TestTestSuiteRunner.dummy_callback,
+            alldone_callback=TestTestSuiteRunner.dummy_callback,
+            cancel_callback=TestTestSuiteRunner.dummy_callback
+        )
+        diff_results = r.run_test_suite()
+        # there should be 1 file result
+        self.assertEqual(1, len(diff_results.entries_by_file))
+        results_for_file = diff_results.entries_by_file[0]
+        # the numpy engine should find the same diffs the default engine does
+        self.assertEqual('Big Diffs', results_for_file.eso_diffs.diff_type)
+        self.assertEqual('Big Diffs', results_for_file.mtr_diffs.diff_type)
+        self.assertEqual('Big Diffs', results_for_file.ssz_diffs.diff_type)
+        self.assertEqual('Big Diffs', results_for_file.zsz_diffs.diff_type)
+        # and it should have written the diff files out in the case a results directory
+        file_results_dir = os.path.join(diff_results.results_dir, 'my_file')
+        self.assertTrue(os.path.exists(os.path.join(file_results_dir, 'eplusout.csv.absdiff.csv')))
+        self.assertTrue(os.path.exists(os.path.join(file_results_dir, 'eplusout.csv.percdiff.csv')))
+
     def test_text_diffs(self):
         base = CMakeCacheMakeFileBuildDirectory()
         self.establish_build_folder(
@@ -889,6 +980,1365 @@ class TestTestSuiteRunner(unittest.TestCase):
         self.assertTrue(os.path.exists(os.path.join(file_results_dir, 'eplusout.end')))
         self.assertTrue(os.path.exists(os.path.join(file_results_dir, 'eplusout.csv')))
 
+    def test_parallel_diffs_match_serial_diffs(self):
+        base = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_base_build_dir,
+            self.temp_base_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base"
+                }
+            }
+        )
+        base.set_build_directory(self.temp_base_build_dir)
+        base.run = True
+
+        mod = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_mod_build_dir,
+            self.temp_mod_source_dir,
+            {
+                "config": {
+                    "run_time_string": "00hr 10min  0.17sec",
+                    "num_warnings": 2,
+                    "num_severe": 1,
+                    "end_state": "success",
+                    "eso_results": "smalldiffs",
+                    "txt_results": "diffs"
+                }
+            }
+        )
+        mod.set_build_directory(self.temp_mod_build_dir)
+        mod.run = True
+
+        entries = [
+            TestEntry('my_file', 'my_weather'),
+            TestEntry('my_macro_file', 'my_weather'),
+            TestEntry('my_file_DOES_NOT_EXIST', 'my_weather')
+        ]
+        config = TestRunConfiguration(
+            force_run_type=ForceRunType.NONE,
+            single_test_run=False,
+            num_threads=1,
+            report_freq=ReportingFreq.HOURLY,
+            build_a=base,
+            build_b=mod
+        )
+        r = SuiteRunner(config, entries)
+        r.add_callbacks(
+            print_callback=TestTestSuiteRunner.dummy_callback,
+            simstarting_callback=TestTestSuiteRunner.dummy_callback,
+            casecompleted_callback=TestTestSuiteRunner.dummy_callback,
+            simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+            diffcompleted_callback=TestTestSuiteRunner.dummy_callback,
+            alldone_callback=TestTestSuiteRunner.dummy_callback,
+            cancel_callback=TestTestSuiteRunner.dummy_callback
+        )
+        serial_results = r.run_test_suite()
+        # now re-diff the same output directories using a process pool
+        config = TestRunConfiguration(
+            force_run_type=ForceRunType.NONE,
+            single_test_run=False,
+            num_threads=3,
+            report_freq=ReportingFreq.HOURLY,
+            build_a=base,
+            build_b=mod
+        )
+        parallel_entries = [
+            TestEntry('my_file', 'my_weather'),
+            TestEntry('my_macro_file', 'my_weather'),
+            TestEntry('my_file_DOES_NOT_EXIST', 'my_weather')
+        ]
+        r = SuiteRunner(config, parallel_entries)
+        r.test_output_dir = os.path.basename(serial_results.results_dir)
+        diffed_cases = []
+        r.add_callbacks(
+            print_callback=TestTestSuiteRunner.dummy_callback,
+            simstarting_callback=TestTestSuiteRunner.dummy_callback,
+            casecompleted_callback=TestTestSuiteRunner.dummy_callback,
+            simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+            diffcompleted_callback=diffed_cases.append,
+            alldone_callback=TestTestSuiteRunner.dummy_callback,
+            cancel_callback=TestTestSuiteRunner.dummy_callback
+        )
+        parallel_results = r.diff_logs_for_build()
+        # every case should have fired the diff callback, and the results should come back in the original order
+        self.assertEqual(
+            sorted(['my_file', 'my_macro_file', 'my_file_DOES_NOT_EXIST']), sorted(diffed_cases)
+        )
+        self.assertEqual(
+            [e.basename for e in serial_results.entries_by_file],
+            [e.basename for e in parallel_results.entries_by_file]
+        )
+        self.assertEqual(
+            TestTestSuiteRunner.entry_dicts(serial_results), TestTestSuiteRunner.entry_dicts(parallel_results)
+        )
+        self.assertEqual('Small Diffs', parallel_results.entries_by_file[0].eso_diffs.diff_type)
+        self.assertEqual(TextDifferences.DIFFS, parallel_results.entries_by_file[0].eio_diffs.diff_type)
+
+    def test_pipelined_simulations_and_diffs(self):
+        base = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_base_build_dir,
+            self.temp_base_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base"
+                }
+            }
+        )
+        base.set_build_directory(self.temp_base_build_dir)
+        base.run = True
+
+        mod = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_mod_build_dir,
+            self.temp_mod_source_dir,
+            {
+                "config": {
+                    "run_time_string": "00hr 10min  0.17sec",
+                    "num_warnings": 2,
+                    "num_severe": 1,
+                    "end_state": "success",
+                    "eso_results": "bigdiffs",
+                    "txt_results": "base"
+                }
+            }
+        )
+        mod.set_build_directory(self.temp_mod_build_dir)
+        mod.run = True
+
+        entries = [
+            TestEntry('my_file', 'my_weather'),
+            TestEntry('my_file_DOES_NOT_EXIST', 'my_weather'),
+            TestEntry('my_macro_file', 'my_weather')
+        ]
+        config = TestRunConfiguration(
+            force_run_type=ForceRunType.NONE,
+            single_test_run=False,
+            num_threads=2,
+            report_freq=ReportingFreq.HOURLY,
+            build_a=base,
+            build_b=mod,
+            pipeline=True
+        )
+        r = SuiteRunner(config, entries)
+        completed_cases = []
+        diffed_cases = []
+        r.add_callbacks(
+            print_callback=TestTestSuiteRunner.dummy_callback,
+            simstarting_callback=TestTestSuiteRunner.dummy_callback,
+            casecompleted_callback=completed_cases.append,
+            simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+            diffcompleted_callback=diffed_cases.append,
+            alldone_callback=TestTestSuiteRunner.dummy_callback,
+            cancel_callback=TestTestSuiteRunner.dummy_callback
+        )
+        diff_results = r.run_test_suite()
+        # two real cases in two builds, plus the missing file reported once per build
+        self.assertEqual(6, len(completed_cases))
+        self.assertEqual(3, len(diffed_cases))
+        # the results should still be in the original entry order
+        self.assertEqual(
+            ['my_file', 'my_file_DOES_NOT_EXIST', 'my_macro_file'],
+            [e.basename for e in diff_results.entries_by_file]
+        )
+        results_for_file = diff_results.entries_by_file[0]
+        self.assertEqual(EndErrSummary.STATUS_SUCCESS, results_for_file.summary_result.simulation_status_case1)
+        self.assertEqual(EndErrSummary.STATUS_SUCCESS, results_for_file.summary_result.simulation_status_case2)
+        self.assertEqual('Big Diffs', results_for_file.eso_diffs.diff_type)
+        missing_file = diff_results.entries_by_file[1]
+        self.assertEqual(EndErrSummary.STATUS_MISSING, missing_file.summary_result.simulation_status_case1)
+        results_dir = diff_results.results_dir
+        self.assertTrue(os.path.exists(os.path.join(results_dir, 'test_results.json')))
+        self.assertTrue(os.path.exists(os.path.join(results_dir, 'run_times.csv')))
+
+    def test_eso_diffs_without_read_vars(self):
+        base = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_base_build_dir,
+            self.temp_base_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "eso_native": True,
+                    "txt_results": "base"
+                }
+            }
+        )
+        base.set_build_directory(self.temp_base_build_dir)
+        base.run = True
+
+        mod = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_mod_build_dir,
+            self.temp_mod_source_dir,
+            {
+                "config": {
+                    "run_time_string": "00hr 10min  0.17sec",
+                    "num_warnings": 2,
+                    "num_severe": 1,
+                    "end_state": "success",
+                    "eso_results": "bigdiffs",
+                    "eso_native": True,
+                    "txt_results": "base"
+                }
+            }
+        )
+        mod.set_build_directory(self.temp_mod_build_dir)
+        mod.run = True
+
+        entries = [TestEntry('my_file', 'my_weather')]
+        config = TestRunConfiguration(
+            force_run_type=ForceRunType.NONE,
+            single_test_run=False,
+            num_threads=1,
+            report_freq=ReportingFreq.HOURLY,
+            build_a=base,
+            build_b=mod,
+            eso_diffs=True
+        )
+        r = SuiteRunner(config, entries)
+        r.add_callbacks(
+            print_callback=TestTestSuiteRunner.dummy_callback,
+            simstarting_callback=TestTestSuiteRunner.dummy_callback,
+            casecompleted_callback=TestTestSuiteRunner.dummy_callback,
+            simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+            diffcompleted_callback=TestTestSuiteRunner.dummy_callback,
+            alldone_callback=TestTestSuiteRunner.dummy_callback,
+            cancel_callback=TestTestSuiteRunner.dummy_callback
+        )
+        diff_results = r.run_test_suite()
+        results_for_file = diff_results.entries_by_file[0]
+        self.assertEqual('Big Diffs', results_for_file.eso_diffs.diff_type)
+        self.assertEqual(4, results_for_file.eso_diffs.num_records)
+        self.assertEqual('Big Diffs', results_for_file.mtr_diffs.diff_type)
+        # ReadVarsESO never ran
+        base_run_dir = os.path.join(self.temp_base_build_dir, r.test_output_dir, 'my_file')
+        self.assertFalse(os.path.exists(os.path.join(base_run_dir, 'eplusout.csv')))
+        self.assertTrue(os.path.exists(os.path.join(base_run_dir, 'eplusout.eso.absdiff.csv')))
+
+    def test_sql_diffs(self):
+        base = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_base_build_dir,
+            self.temp_base_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "sql_results": "base",
+                    "eso_results": "base",
+                    "txt_results": "base"
+                }
+            }
+        )
+        base.set_build_directory(self.temp_base_build_dir)
+        base.run = True
+
+        mod = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_mod_build_dir,
+            self.temp_mod_source_dir,
+            {
+                "config": {
+                    "run_time_string": "00hr 10min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "sql_results": "bigdiffs",
+                    "eso_results": "bigdiffs",
+                    "txt_results": "base"
+                }
+            }
+        )
+        mod.set_build_directory(self.temp_mod_build_dir)
+        mod.run = True
+
+        def run_suite(sql_diffs):
+            config = TestRunConfiguration(
+                force_run_type=ForceRunType.NONE,
+                single_test_run=False,
+                num_threads=1,
+                report_freq=ReportingFreq.HOURLY,
+                build_a=base,
+                build_b=mod,
+                sql_diffs=sql_diffs
+            )
+            r = SuiteRunner(config, [TestEntry('my_file', 'my_weather')])
+            r.add_callbacks(
+                print_callback=TestTestSuiteRunner.dummy_callback,
+                simstarting_callback=TestTestSuiteRunner.dummy_callback,
+                casecompleted_callback=TestTestSuiteRunner.dummy_callback,
+                simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+                diffcompleted_callback=TestTestSuiteRunner.dummy_callback,
+                alldone_callback=TestTestSuiteRunner.dummy_callback,
+                cancel_callback=TestTestSuiteRunner.dummy_callback
+            )
+            return r, r.run_test_suite()
+
+        # without the flag, the sql files are left alone and the csv and html outputs are diffed as usual
+        r, diff_results = run_suite(sql_diffs=False)
+        results_for_file = diff_results.entries_by_file[0]
+        self.assertIsNone(results_for_file.sql_diffs)
+        self.assertEqual('Big Diffs', results_for_file.eso_diffs.diff_type)
+        self.assertIsNotNone(results_for_file.table_diffs)
+        shutil.rmtree(os.path.join(self.temp_base_build_dir, r.test_output_dir))
+        shutil.rmtree(os.path.join(self.temp_mod_build_dir, r.test_output_dir))
+        # with it, the sql files are diffed instead of them
+        r, diff_results = run_suite(sql_diffs=True)
+        results_for_file = diff_results.entries_by_file[0]
+        self.assertIsNone(results_for_file.eso_diffs)
+        self.assertIsNone(results_for_file.mtr_diffs)
+        self.assertIsNone(results_for_file.table_diffs)
+        self.assertEqual('Big Diffs', results_for_file.sql_diffs.diff_type)
+        self.assertEqual(4, results_for_file.sql_diffs.num_records)
+        self.assertEqual(1, results_for_file.sql_diffs.count_of_big_diff)
+        self.assertEqual(1, results_for_file.sql_table_diffs.table_count)
+        self.assertEqual(1, results_for_file.sql_table_diffs.big_diff_count)
+        self.assertEqual(TextDifferences.EQUAL, results_for_file.sql_errors_diffs.diff_type)
+        self.assertIn('my_file: sql', diff_results.big_math_diffs.descriptions)
+        self.assertIn('my_file: sql table', diff_results.big_table_diffs.descriptions)
+        base_run_dir = os.path.join(self.temp_base_build_dir, r.test_output_dir, 'my_file')
+        self.assertTrue(os.path.exists(os.path.join(base_run_dir, 'eplusout.sql.absdiff.csv')))
+        self.assertTrue(os.path.exists(os.path.join(base_run_dir, 'eplusout.sql.tablediff.csv')))
+
+    def test_simulation_cache(self):
+        base = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_base_build_dir,
+            self.temp_base_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base"
+                }
+            }
+        )
+        base.set_build_directory(self.temp_base_build_dir)
+        base.run = True
+
+        mod = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_mod_build_dir,
+            self.temp_mod_source_dir,
+            {
+                "config": {
+                    "run_time_string": "00hr 10min  0.17sec",
+                    "num_warnings": 2,
+                    "num_severe": 1,
+                    "end_state": "success",
+                    "eso_results": "bigdiffs",
+                    "txt_results": "base"
+                }
+            }
+        )
+        mod.set_build_directory(self.temp_mod_build_dir)
+        mod.run = True
+
+        cache_dir = tempfile.mkdtemp()
+        entries = [
+            TestEntry('my_file', 'my_weather'),
+            TestEntry('my_macro_file', 'my_weather')
+        ]
+
+        weather_files = []
+
+        def run_suite(num_threads=1, pipeline=False):
+            config = TestRunConfiguration(
+                force_run_type=ForceRunType.NONE,
+                single_test_run=False,
+                num_threads=num_threads,
+                report_freq=ReportingFreq.HOURLY,
+                build_a=base,
+                build_b=mod,
+                pipeline=pipeline,
+                cache_dir=cache_dir
+            )
+            r = SuiteRunner(config, entries)
+            completed_cases = []
+            messages = []
+            r.add_callbacks(
+                print_callback=messages.append,
+                simstarting_callback=TestTestSuiteRunner.dummy_callback,
+                casecompleted_callback=completed_cases.append,
+                simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+                diffcompleted_callback=TestTestSuiteRunner.dummy_callback,
+                alldone_callback=TestTestSuiteRunner.dummy_callback,
+                cancel_callback=TestTestSuiteRunner.dummy_callback
+            )
+            diff_results = r.run_test_suite()
+            weather_files.append(sorted(
+                os.path.exists(os.path.join(build_dir, r.test_output_dir, entry.basename, 'in.epw'))
+                for build_dir in [self.temp_base_build_dir, self.temp_mod_build_dir] for entry in entries
+            ))
+            # the test output directories are named to the second, keep the runs apart
+            shutil.rmtree(os.path.join(self.temp_base_build_dir, r.test_output_dir))
+            shutil.rmtree(os.path.join(self.temp_mod_build_dir, r.test_output_dir))
+            cache_summary = [m for m in messages if m.startswith('Simulation cache:')]
+            return diff_results, [c.name_of_thread == 'cache' for c in completed_cases], cache_summary
+
+        first_results, first_hits, cache_summary = run_suite()
+        self.assertEqual([False] * 4, first_hits)
+        self.assertIn('Simulation cache: 0 hits, 4 misses, 4 stored, 0 evicted', cache_summary[0])
+        # the weather file staged into every run directory isn't stored with each run
+        for key in os.listdir(cache_dir):
+            self.assertFalse(os.path.exists(os.path.join(cache_dir, key, 'in.epw')))
+        second_results, second_hits, cache_summary = run_suite()
+        self.assertEqual([True] * 4, second_hits)
+        self.assertIn('Simulation cache: 4 hits, 0 misses, 0 stored, 0 evicted', cache_summary[0])
+        # and the restored runs have the one staged for this suite
+        self.assertEqual([[True] * 4] * 2, weather_files)
+        for first, second in zip(first_results.entries_by_file, second_results.entries_by_file):
+            self.assertEqual(
+                first.summary_result.simulation_status_case1, second.summary_result.simulation_status_case1
+            )
+            self.assertEqual(
+                first.summary_result.simulation_status_case2, second.summary_result.simulation_status_case2
+            )
+            self.assertEqual(first.eso_diffs.diff_type, second.eso_diffs.diff_type)
+        self.assertEqual('Big Diffs', second_results.entries_by_file[0].eso_diffs.diff_type)
+        # a change to a tool in build b means its runs are simulated again, and only build a comes from the cache
+        with open(os.path.join(self.temp_mod_build_dir, 'Products', 'energyplus'), 'a') as f:
+            f.write('\n# rebuilt\n')
+        _, third_hits, _ = run_suite(num_threads=2)
+        self.assertEqual(4, len(third_hits))
+        self.assertEqual(2, sum(third_hits))
+        # and the pipelined runner finds those runs from the cache too
+        _, fourth_hits, _ = run_suite(num_threads=2, pipeline=True)
+        self.assertEqual([True] * 4, fourth_hits)
+
+    def test_baseline_store(self):
+        base = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_base_build_dir,
+            self.temp_base_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base"
+                }
+            }
+        )
+        base.set_build_directory(self.temp_base_build_dir)
+        base.run = True
+        # a failed build A run isn't stored as part of the baseline
+        with open(os.path.join(self.temp_base_source_dir, 'testfiles', 'my_macro_file.imf'), 'w') as f:
+            f.write(json.dumps({"config": {"run_time_string": "00hr 00min  0.17sec", "end_state": "fatal"}}))
+
+        mod = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_mod_build_dir,
+            self.temp_mod_source_dir,
+            {
+                "config": {
+                    "run_time_string": "00hr 10min  0.17sec",
+                    "num_warnings": 2,
+                    "num_severe": 1,
+                    "end_state": "success",
+                    "eso_results": "bigdiffs",
+                    "txt_results": "base"
+                }
+            }
+        )
+        mod.set_build_directory(self.temp_mod_build_dir)
+        mod.run = True
+
+        store_dir = tempfile.mkdtemp()
+        entries = [
+            TestEntry('my_file', 'my_weather'),
+            TestEntry('my_macro_file', 'my_weather')
+        ]
+
+        def run_suite(num_threads=1, pipeline=False):
+            config = TestRunConfiguration(
+                force_run_type=ForceRunType.NONE,
+                single_test_run=False,
+                num_threads=num_threads,
+                report_freq=ReportingFreq.HOURLY,
+                build_a=base,
+                build_b=mod,
+                pipeline=pipeline,
+                baseline_store=store_dir,
+                baseline_id='develop'
+            )
+            r = SuiteRunner(config, entries)
+            completed_cases = []
+            r.add_callbacks(
+                print_callback=TestTestSuiteRunner.dummy_callback,
+                simstarting_callback=TestTestSuiteRunner.dummy_callback,
+                casecompleted_callback=completed_cases.append,
+                simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+                diffcompleted_callback=TestTestSuiteRunner.dummy_callback,
+                alldone_callback=TestTestSuiteRunner.dummy_callback,
+                cancel_callback=TestTestSuiteRunner.dummy_callback
+            )
+            diff_results = r.run_test_suite()
+            a_output_dir = os.path.join(self.temp_base_build_dir, r.test_output_dir)
+            a_files = sorted(os.listdir(os.path.join(a_output_dir, 'my_file')))
+            # the test output directories are named to the second, keep the runs apart
+            shutil.rmtree(a_output_dir)
+            shutil.rmtree(os.path.join(self.temp_mod_build_dir, r.test_output_dir))
+            return diff_results, [c.name_of_thread for c in completed_cases], a_files
+
+        first_results, first_threads, first_a_files = run_suite()
+        self.assertNotIn('baseline', first_threads)
+        baseline_dir = os.path.join(
+            store_dir, 'develop', build_digest(base.get_build_tree()), 'Tests-%s' % ReportingFreq.HOURLY
+        )
+        self.assertEqual(['baseline.json', 'my_file'], sorted(os.listdir(baseline_dir)))
+        baseline_files = sorted(os.listdir(os.path.join(baseline_dir, 'my_file')))
+        self.assertIn('eplusout.end', baseline_files)
+        # the diffs aren't part of the baseline
+        self.assertIn('eplusout.csv.absdiff.csv', first_a_files)
+        self.assertNotIn('eplusout.csv.absdiff.csv', baseline_files)
+        for num_threads, pipeline in [(1, False), (2, False), (2, True)]:
+            results, threads, a_files = run_suite(num_threads, pipeline)
+            # build a comes from the baseline, which is left alone, apart from the case that failed
+            self.assertEqual(1, threads.count('baseline'))
+            self.assertEqual(4, len(threads))
+            self.assertEqual(baseline_files, sorted(os.listdir(os.path.join(baseline_dir, 'my_file'))))
+            self.assertIn('eplusout.csv.absdiff.csv', a_files)
+            self.assertNotIn('eplusout.end', a_files)
+            for first, this in zip(first_results.entries_by_file, results.entries_by_file):
+                self.assertEqual(
+                    first.summary_result.simulation_status_case1, this.summary_result.simulation_status_case1
+                )
+                if first.eso_diffs:
+                    self.assertEqual(first.eso_diffs.diff_type, this.eso_diffs.diff_type)
+            self.assertEqual('Big Diffs', results.entries_by_file[0].eso_diffs.diff_type)
+        # a build of the same commit configured differently doesn't share the baseline
+        with open(os.path.join(self.temp_base_build_dir, 'CMakeCache.txt'), 'a') as f:
+            f.write('CMAKE_BUILD_TYPE:STRING=Debug\n')
+        _, threads, _ = run_suite()
+        self.assertNotIn('baseline', threads)
+
+    def test_resume_interrupted_suite(self):
+        base = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_base_build_dir,
+            self.temp_base_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base"
+                }
+            }
+        )
+        base.set_build_directory(self.temp_base_build_dir)
+        base.run = True
+
+        mod = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_mod_build_dir,
+            self.temp_mod_source_dir,
+            {
+                "config": {
+                    "run_time_string": "00hr 10min  0.17sec",
+                    "num_warnings": 2,
+                    "num_severe": 1,
+                    "end_state": "success",
+                    "eso_results": "bigdiffs",
+                    "txt_results": "base"
+                }
+            }
+        )
+        mod.set_build_directory(self.temp_mod_build_dir)
+        mod.run = True
+
+        entries = [
+            TestEntry('my_file', 'my_weather'),
+            TestEntry('my_macro_file', 'my_weather')
+        ]
+
+        def run_suite(num_threads=1, pipeline=False, resume_dir=None):
+            config = TestRunConfiguration(
+                force_run_type=ForceRunType.NONE,
+                single_test_run=False,
+                num_threads=num_threads,
+                report_freq=ReportingFreq.HOURLY,
+                build_a=base,
+                build_b=mod,
+                pipeline=pipeline,
+                resume_dir=resume_dir
+            )
+            r = SuiteRunner(config, [TestEntry(e.basename, e.epw) for e in entries])
+            completed_cases = []
+            diffed_cases = []
+            r.add_callbacks(
+                print_callback=TestTestSuiteRunner.dummy_callback,
+                simstarting_callback=TestTestSuiteRunner.dummy_callback,
+                casecompleted_callback=completed_cases.append,
+                simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+                diffcompleted_callback=diffed_cases.append,
+                alldone_callback=TestTestSuiteRunner.dummy_callback,
+                cancel_callback=TestTestSuiteRunner.dummy_callback
+            )
+            diff_results = r.run_test_suite()
+            return diff_results, [c.name_of_thread for c in completed_cases], r.test_output_dir, diffed_cases
+
+        first_results, first_threads, test_output_dir, _ = run_suite()
+        self.assertNotIn('journal', first_threads)
+        output_dir = os.path.join(self.temp_base_build_dir, test_output_dir)
+        journal_path = os.path.join(output_dir, 'journal.jsonl')
+        with open(journal_path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(
+            [('simulation', 'a', 'my_file'), ('simulation', 'a', 'my_macro_file'), ('simulation', 'b', 'my_file'),
+             ('simulation', 'b', 'my_macro_file'), ('diff', None, 'my_file'), ('diff', None, 'my_macro_file')],
+            [(r['event'], r.get('build'), r['case']) for r in records]
+        )
+        self.assertEqual(first_results.entries_by_file[0].to_dict(), records[4]['entry'])
+        # interrupt the suite after my_file is diffed and my_macro_file is simulated by build a, part way through
+        # writing the next record
+        interrupted = [r for r in records if r['case'] == 'my_file' or r.get('build') == 'a']
+        interrupted_journal = ''.join(json.dumps(r) + '\n' for r in interrupted) + '{"event": "simul'
+        for num_threads, pipeline in [(1, False), (2, False), (2, True)]:
+            with open(journal_path, 'w') as f:
+                f.write(interrupted_journal)
+            results, threads, resumed_output_dir, diffed_cases = run_suite(num_threads, pipeline, output_dir)
+            self.assertEqual(test_output_dir, resumed_output_dir)
+            # the case diffed before the interruption is reported as completed along with the other
+            self.assertEqual(['my_file', 'my_macro_file'], sorted(diffed_cases))
+            # only build b of my_macro_file is simulated again
+            self.assertEqual(3, threads.count('journal'))
+            self.assertEqual(4, len(threads))
+            self.assertEqual(
+                TestTestSuiteRunner.entry_dicts(first_results), TestTestSuiteRunner.entry_dicts(results)
+            )
+            self.assertEqual(first_results.big_math_diffs.descriptions, results.big_math_diffs.descriptions)
+            self.assertTrue(os.path.exists(os.path.join(output_dir, 'test_results.json')))
+        # a run without its end file is simulated again
+        os.remove(os.path.join(output_dir, 'my_macro_file', 'eplusout.end'))
+        with open(journal_path, 'w') as f:
+            f.write(interrupted_journal)
+        results, threads, _, _ = run_suite(resume_dir=output_dir)
+        self.assertEqual(2, threads.count('journal'))
+        self.assertEqual('Big Diffs', results.entries_by_file[1].eso_diffs.diff_type)
+
+    def test_remote_workers(self):
+        base = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_base_build_dir,
+            self.temp_base_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base"
+                }
+            }
+        )
+        base.set_build_directory(self.temp_base_build_dir)
+        base.run = True
+
+        mod = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_mod_build_dir,
+            self.temp_mod_source_dir,
+            {
+                "config": {
+                    "run_time_string": "00hr 10min  0.17sec",
+                    "num_warnings": 2,
+                    "num_severe": 1,
+                    "end_state": "success",
+                    "eso_results": "bigdiffs",
+                    "txt_results": "base"
+                }
+            }
+        )
+        mod.set_build_directory(self.temp_mod_build_dir)
+        mod.run = True
+
+        entries = [
+            TestEntry('my_file', 'my_weather'),
+            TestEntry('my_macro_file', 'my_weather')
+        ]
+
+        def run_suite(pipeline, broker_address=None):
+            config = TestRunConfiguration(
+                force_run_type=ForceRunType.NONE,
+                single_test_run=False,
+                num_threads=2,
+                report_freq=ReportingFreq.HOURLY,
+                build_a=base,
+                build_b=mod,
+                pipeline=pipeline,
+                broker_address=broker_address,
+                broker_key='secret'
+            )
+            r = SuiteRunner(config, [TestEntry(e.basename, e.epw) for e in entries])
+            messages = []
+            r.add_callbacks(
+                print_callback=messages.append,
+                simstarting_callback=TestTestSuiteRunner.dummy_callback,
+                casecompleted_callback=TestTestSuiteRunner.dummy_callback,
+                simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+                diffcompleted_callback=TestTestSuiteRunner.dummy_callback,
+                alldone_callback=TestTestSuiteRunner.dummy_callback,
+                cancel_callback=TestTestSuiteRunner.dummy_callback
+            )
+            diff_results = r.run_test_suite()
+            a_files = sorted(os.listdir(os.path.join(self.temp_base_build_dir, r.test_output_dir, 'my_file')))
+            # the test output directories are named to the second, keep the runs apart
+            shutil.rmtree(os.path.join(self.temp_base_build_dir, r.test_output_dir))
+            shutil.rmtree(os.path.join(self.temp_mod_build_dir, r.test_output_dir))
+            return diff_results, messages, a_files
+
+        local_results, _, local_files = run_suite(False)
+        for pipeline in [False, True]:
+            # workers start before the suite, and wait for it to start serving tasks
+            free_port = socket.socket()
+            free_port.bind(('localhost', 0))
+            address = 'localhost:%s' % free_port.getsockname()[1]
+            free_port.close()
+            workers = [
+                Process(target=run_worker, args=(address, 'secret'), kwargs={
+                    'heartbeat_interval': 0.2, 'poll_interval': 0.1, 'connect_timeout': 30.0
+                }) for _ in range(3)
+            ]
+            for worker in workers:
+                worker.start()
+            results, messages, a_files = run_suite(pipeline, address)
+            for worker in workers:
+                # a worker that was still waiting to connect when the suite finished keeps waiting
+                worker.join(1)
+                if worker.is_alive():
+                    worker.terminate()
+            self.assertTrue([m for m in messages if m.startswith('Worker') and m.endswith(' connected')])
+            summaries = [m for m in messages if m.startswith('Broker:')]
+            self.assertTrue(summaries)
+            self.assertNotIn(' 0 remote tasks completed', summaries[-1])
+            self.assertIn('0 failed', summaries[-1])
+            # the weather and idd files staged into the run directories went to each worker once, not with each task
+            self.assertNotIn(' 0 shared inputs sent', summaries[-1])
+            # the outputs and diff files came back into the run directories of this host
+            self.assertEqual(local_files, a_files)
+            self.assertEqual(
+                TestTestSuiteRunner.entry_dicts(local_results), TestTestSuiteRunner.entry_dicts(results)
+            )
+            self.assertEqual('Big Diffs', results.entries_by_file[0].eso_diffs.diff_type)
+
+    def test_hung_simulation_times_out(self):
+        base = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_base_build_dir,
+            self.temp_base_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base"
+                }
+            }
+        )
+        base.set_build_directory(self.temp_base_build_dir)
+        base.run = True
+
+        mod = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_mod_build_dir,
+            self.temp_mod_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base",
+                    "sleep_seconds": 60
+                }
+            }
+        )
+        mod.set_build_directory(self.temp_mod_build_dir)
+        mod.run = True
+
+        entries = [TestEntry('my_file', 'my_weather')]
+        config = TestRunConfiguration(
+            force_run_type=ForceRunType.NONE,
+            single_test_run=False,
+            num_threads=2,
+            report_freq=ReportingFreq.HOURLY,
+            build_a=base,
+            build_b=mod,
+            simulation_timeout=2
+        )
+        r = SuiteRunner(config, entries)
+        completed_cases = []
+        messages = []
+        r.add_callbacks(
+            print_callback=messages.append,
+            simstarting_callback=TestTestSuiteRunner.dummy_callback,
+            casecompleted_callback=completed_cases.append,
+            simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+            diffcompleted_callback=TestTestSuiteRunner.dummy_callback,
+            alldone_callback=TestTestSuiteRunner.dummy_callback,
+            cancel_callback=TestTestSuiteRunner.dummy_callback
+        )
+        diff_results = r.run_test_suite()
+        self.assertEqual([True, False], [c.run_success for c in completed_cases])
+        self.assertTrue(any('timed out after 2 seconds' in m for m in messages))
+        results_for_file = diff_results.entries_by_file[0]
+        self.assertEqual(EndErrSummary.STATUS_SUCCESS, results_for_file.summary_result.simulation_status_case1)
+        self.assertEqual(EndErrSummary.STATUS_MISSING, results_for_file.summary_result.simulation_status_case2)
+
+    def test_simulation_killed_for_memory_runs_again_alone(self):
+        base = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_base_build_dir,
+            self.temp_base_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base"
+                }
+            }
+        )
+        base.set_build_directory(self.temp_base_build_dir)
+        base.run = True
+
+        mod = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_mod_build_dir,
+            self.temp_mod_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base",
+                    "kill_once_marker": os.path.join(self.temp_mod_build_dir, 'killed_once')
+                }
+            }
+        )
+        mod.set_build_directory(self.temp_mod_build_dir)
+        mod.run = True
+
+        history_file = os.path.join(self.temp_base_build_dir, 'run_times.csv')
+        with open(history_file, 'w') as f:
+            f.write('Case,Runtime [s],Runtime [s],Peak memory [MB],Peak memory [MB]\nmy_file,10,10,500,600\n')
+
+        for pipeline in [False, True]:
+            entries = [TestEntry('my_file', 'my_weather')]
+            config = TestRunConfiguration(
+                force_run_type=ForceRunType.NONE,
+                single_test_run=False,
+                num_threads=2,
+                report_freq=ReportingFreq.HOURLY,
+                build_a=base,
+                build_b=mod,
+                pipeline=pipeline,
+                runtime_history=[history_file],
+                memory_budget=1000
+            )
+            r = SuiteRunner(config, entries)
+            r.test_output_dir += '_%s' % pipeline
+            completed_cases = []
+            messages = []
+            r.add_callbacks(
+                print_callback=messages.append,
+                simstarting_callback=TestTestSuiteRunner.dummy_callback,
+                casecompleted_callback=completed_cases.append,
+                simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+                diffcompleted_callback=TestTestSuiteRunner.dummy_callback,
+                alldone_callback=TestTestSuiteRunner.dummy_callback,
+                cancel_callback=TestTestSuiteRunner.dummy_callback
+            )
+            if os.path.exists(os.path.join(self.temp_mod_build_dir, 'killed_once')):
+                os.remove(os.path.join(self.temp_mod_build_dir, 'killed_once'))
+            diff_results = r.run_test_suite()
+            # the two runs together are expected to take more than the budget, so they ran one at a time
+            self.assertTrue(any('at most 600 of 1000 MB expected in use' in m for m in messages))
+            self.assertEqual(1, sum('was killed, most likely for running out of memory' in m for m in messages))
+            self.assertEqual([True, True], [c.run_success for c in completed_cases])
+            results_for_file = diff_results.entries_by_file[0]
+            self.assertEqual(EndErrSummary.STATUS_SUCCESS, results_for_file.summary_result.simulation_status_case2)
+            self.assertGreater(results_for_file.tool_usage_case2.peak_memory_mb, 0)
+            self.assertTrue(completed_cases[1].tool_usage.programs)
+            results_dir = os.path.join(self.temp_base_build_dir, r.test_output_dir)
+            with open(os.path.join(results_dir, 'run_times.csv')) as f:
+                self.assertIn('EnergyPlus wall time [s]', f.readline())
+            with open(os.path.join(results_dir, 'test_results.json')) as f:
+                tool_usage = json.load(f)['results_by_file'][0]['tool_usage_case2']
+            self.assertIn('EnergyPlus', [program['tool'] for program in tool_usage['programs']])
+
+    def test_trace_of_suite(self):
+        base = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_base_build_dir,
+            self.temp_base_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base"
+                }
+            }
+        )
+        base.set_build_directory(self.temp_base_build_dir)
+        base.run = True
+
+        mod = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_mod_build_dir,
+            self.temp_mod_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "smalldiffs",
+                    "txt_results": "diffs"
+                }
+            }
+        )
+        mod.set_build_directory(self.temp_mod_build_dir)
+        mod.run = True
+
+        for num_threads, pipeline, trace in [(1, False, True), (2, True, True), (2, True, False)]:
+            entries = [TestEntry('my_file', 'my_weather')]
+            config = TestRunConfiguration(
+                force_run_type=ForceRunType.NONE,
+                single_test_run=False,
+                num_threads=num_threads,
+                report_freq=ReportingFreq.HOURLY,
+                build_a=base,
+                build_b=mod,
+                pipeline=pipeline,
+                trace=trace
+            )
+            r = SuiteRunner(config, entries)
+            r.test_output_dir += '_%s_%s' % (num_threads, trace)
+            r.add_callbacks(
+                print_callback=TestTestSuiteRunner.dummy_callback,
+                simstarting_callback=TestTestSuiteRunner.dummy_callback,
+                casecompleted_callback=TestTestSuiteRunner.dummy_callback,
+                simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+                diffcompleted_callback=TestTestSuiteRunner.dummy_callback,
+                alldone_callback=TestTestSuiteRunner.dummy_callback,
+                cancel_callback=TestTestSuiteRunner.dummy_callback
+            )
+            r.run_test_suite()
+            trace_file = os.path.join(self.temp_base_build_dir, r.test_output_dir, 'trace.json')
+            if not trace:
+                self.assertFalse(os.path.exists(trace_file))
+                continue
+            with open(trace_file) as f:
+                events = [e for e in json.load(f)['traceEvents'] if e['ph'] == 'X']
+            spans = set((e['name'], e['args']['case'], e['args'].get('build')) for e in events)
+            for build in ['a', 'b']:
+                for name in ['Prepare', 'Simulate', 'ExpandObjects', 'EnergyPlus', 'ReadVarsESO']:
+                    self.assertIn((name, 'my_file', build), spans)
+            for name in ['Diff', 'Math diffs', 'Table diffs', 'SQL diffs', 'Text diffs']:
+                self.assertIn((name, 'my_file', None), spans)
+            self.assertTrue(all(e['args']['worker'] for e in events))
+            # the tools of a simulation are nested in it, the ones that ran alongside another on a row of their own
+            simulate = [e for e in events if e['name'] == 'Simulate'][0]
+            tools = [e for e in events if e['cat'] == 'simulation' and e['args'] == simulate['args']]
+            self.assertEqual(5, len(tools))
+            simulate_end = simulate['ts'] + simulate['dur'] + 1
+            for tool in tools:
+                self.assertTrue(simulate['ts'] <= tool['ts'] <= tool['ts'] + tool['dur'] <= simulate_end)
+
+    def test_simulations_in_scratch_directory(self):
+        base = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_base_build_dir,
+            self.temp_base_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base"
+                }
+            }
+        )
+        base.set_build_directory(self.temp_base_build_dir)
+        base.run = True
+
+        mod = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_mod_build_dir,
+            self.temp_mod_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "bigdiffs",
+                    "txt_results": "base"
+                }
+            }
+        )
+        mod.set_build_directory(self.temp_mod_build_dir)
+        mod.run = True
+
+        scratch_dir = os.path.join(tempfile.mkdtemp(), 'scratch')
+        # an earlier suite in which the case wrote more than the scratch directory could ever hold
+        huge_history = os.path.join(tempfile.mkdtemp(), 'run_times.csv')
+        with open(huge_history, 'w') as f:
+            f.write('Case,Runtime [s],Runtime [s],Written [bytes],Written [bytes]\nmy_file,1,1,1e20,1e20\n')
+        runs = [
+            (1, False, [], 0, None), (2, False, [], 0, None), (2, True, ['*.eso'], 0, None), (2, True, [], 1e12, None),
+            (1, False, [], 0, [huge_history]), (2, True, [], 0, [huge_history])
+        ]
+        for num_threads, pipeline, scratch_keep, scratch_min_free, runtime_history in runs:
+            entries = [TestEntry('my_file', 'my_weather')]
+            config = TestRunConfiguration(
+                force_run_type=ForceRunType.NONE,
+                single_test_run=False,
+                num_threads=num_threads,
+                report_freq=ReportingFreq.HOURLY,
+                build_a=base,
+                build_b=mod,
+                pipeline=pipeline,
+                scratch_dir=scratch_dir,
+                scratch_keep=scratch_keep,
+                scratch_min_free=scratch_min_free,
+                runtime_history=runtime_history
+            )
+            r = SuiteRunner(config, entries)
+            r.test_output_dir += '_%s_%s_%s_%s' % (num_threads, pipeline, len(scratch_keep), bool(runtime_history))
+            completed_cases = []
+            r.add_callbacks(
+                print_callback=TestTestSuiteRunner.dummy_callback,
+                simstarting_callback=TestTestSuiteRunner.dummy_callback,
+                casecompleted_callback=completed_cases.append,
+                simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+                diffcompleted_callback=TestTestSuiteRunner.dummy_callback,
+                alldone_callback=TestTestSuiteRunner.dummy_callback,
+                cancel_callback=TestTestSuiteRunner.dummy_callback
+            )
+            diff_results = r.run_test_suite()
+            self.assertEqual([True, True], [c.run_success for c in completed_cases])
+            self.assertTrue(all(c.tool_usage.programs for c in completed_cases))
+            results_for_file = diff_results.entries_by_file[0]
+            self.assertEqual(EndErrSummary.STATUS_SUCCESS, results_for_file.summary_result.simulation_status_case2)
+            self.assertEqual('Big Diffs', results_for_file.eso_diffs.diff_type)
+            self.assertEqual(TextDifferences.EQUAL, results_for_file.eio_diffs.diff_type)
+            # only the outputs worth keeping came back, unless the case had to run in place, and nothing is left behind
+            for build_dir in [self.temp_base_build_dir, self.temp_mod_build_dir]:
+                run_dir = os.path.join(build_dir, r.test_output_dir, 'my_file')
+                for file_name in ['eplusout.end', 'eplusout.csv', 'eplustbl.htm', 'aa_testSuite_usage.json']:
+                    self.assertTrue(os.path.exists(os.path.join(run_dir, file_name)))
+                in_place = scratch_min_free > 0 or bool(runtime_history)
+                self.assertEqual(bool(scratch_keep) or in_place, os.path.exists(os.path.join(run_dir, 'eplusout.eso')))
+                # the simulation removes the idd it was given when done, in the scratch copy when it ran there
+                self.assertEqual(not in_place, os.path.exists(os.path.join(run_dir, 'Energy+.idd')))
+            self.assertEqual([], [f for _, _, files in os.walk(scratch_dir) for f in files])
+
+    def test_longest_cases_are_queued_first(self):
+        base = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_base_build_dir,
+            self.temp_base_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base"
+                }
+            }
+        )
+        base.set_build_directory(self.temp_base_build_dir)
+        base.run = True
+
+        mod = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_mod_build_dir,
+            self.temp_mod_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base"
+                }
+            }
+        )
+        mod.set_build_directory(self.temp_mod_build_dir)
+        mod.run = True
+
+        # an earlier suite of the same run type found my_macro_file to be the slow one
+        earlier_suite = os.path.join(self.temp_base_build_dir, 'Tests_20190101_000000')
+        os.makedirs(earlier_suite)
+        with open(os.path.join(earlier_suite, 'run_times.csv'), 'w') as f:
+            f.write('Case,Runtime [s],Runtime [s]\nmy_file,60,60\nold_file,600,600\nmy_macro_file,2400,2400\n')
+        # but suites of other run types don't count
+        other_suite = os.path.join(self.temp_base_build_dir, 'Tests-Annual_20190101_000000')
+        os.makedirs(other_suite)
+        with open(os.path.join(other_suite, 'run_times.csv'), 'w') as f:
+            f.write('Case,Runtime [s],Runtime [s]\nmy_file,99999,99999\n')
+
+        entries = [
+            TestEntry('my_file', 'my_weather'),
+            TestEntry('my_file_DOES_NOT_EXIST', 'my_weather'),
+            TestEntry('EMSTestMathAndKill', 'my_weather'),
+            TestEntry('my_macro_file', 'my_weather')
+        ]
+        config = TestRunConfiguration(
+            force_run_type=ForceRunType.NONE,
+            single_test_run=False,
+            num_threads=2,
+            report_freq=ReportingFreq.HOURLY,
+            build_a=base,
+            build_b=mod
+        )
+        r = SuiteRunner(config, entries)
+        messages = []
+        r.add_callbacks(
+            print_callback=messages.append,
+            simstarting_callback=TestTestSuiteRunner.dummy_callback,
+            casecompleted_callback=TestTestSuiteRunner.dummy_callback,
+            simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+            diffcompleted_callback=TestTestSuiteRunner.dummy_callback,
+            alldone_callback=TestTestSuiteRunner.dummy_callback,
+            cancel_callback=TestTestSuiteRunner.dummy_callback
+        )
+        diff_results = r.run_test_suite()
+        self.assertIn('Read runtimes of 3 cases from 1 earlier suites', messages)
+        self.assertTrue(any(
+            m.startswith('Queued 4 runs longest first, projected to take 40.0 minutes on 2 workers '
+                         '(2 cases without a runtime history)') for m in messages
+        ))
+        self.assertTrue(any(m.startswith('Simulations took') for m in messages))
+        # the results are still in the original order
+        self.assertEqual(
+            ['my_file', 'my_file_DOES_NOT_EXIST', 'EMSTestMathAndKill', 'my_macro_file'],
+            [e.basename for e in diff_results.entries_by_file]
+        )
+        # cases of both builds are ordered together, and unknown cases get the median runtime
+        runs = [(0, tree, TestEntry(case, None)) for case in ['my_file', 'new_case', 'my_macro_file'] for tree in [
+            r.build_tree_a, r.build_tree_b
+        ]]
+        ordered, projected_time = r.longest_first(runs)
+        self.assertEqual(
+            ['my_macro_file', 'my_macro_file', 'new_case', 'new_case', 'my_file', 'my_file'],
+            [run[2].basename for run in ordered]
+        )
+        self.assertEqual(2400 + 600 + 60, projected_time)
+
+    def test_threaded_simulations_and_diffs(self):
+        base = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_base_build_dir,
+            self.temp_base_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base"
+                }
+            }
+        )
+        base.set_build_directory(self.temp_base_build_dir)
+        base.run = True
+
+        mod = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_mod_build_dir,
+            self.temp_mod_source_dir,
+            {
+                "config": {
+                    "run_time_string": "00hr 10min  0.17sec",
+                    "num_warnings": 2,
+                    "num_severe": 1,
+                    "end_state": "success",
+                    "eso_results": "bigdiffs",
+                    "txt_results": "base"
+                }
+            }
+        )
+        mod.set_build_directory(self.temp_mod_build_dir)
+        mod.run = True
+
+        entries = [
+            TestEntry('my_file', 'my_weather'),
+            TestEntry('my_file_DOES_NOT_EXIST', 'my_weather'),
+            TestEntry('my_macro_file', 'my_weather')
+        ]
+        for pipeline in [False, True]:
+            config = TestRunConfiguration(
+                force_run_type=ForceRunType.NONE,
+                single_test_run=False,
+                num_threads=2,
+                report_freq=ReportingFreq.HOURLY,
+                build_a=base,
+                build_b=mod,
+                pipeline=pipeline,
+                use_threads=True
+            )
+            r = SuiteRunner(config, entries)
+            completed_cases = []
+            diffed_cases = []
+            r.add_callbacks(
+                print_callback=TestTestSuiteRunner.dummy_callback,
+                simstarting_callback=TestTestSuiteRunner.dummy_callback,
+                casecompleted_callback=completed_cases.append,
+                simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+                diffcompleted_callback=diffed_cases.append,
+                alldone_callback=TestTestSuiteRunner.dummy_callback,
+                cancel_callback=TestTestSuiteRunner.dummy_callback
+            )
+            diff_results = r.run_test_suite()
+            self.assertEqual(6, len(completed_cases))
+            self.assertEqual(3, len(diffed_cases))
+            # the simulations ran on threads of this process
+            self.assertEqual(4, len([c for c in completed_cases if c.name_of_thread.startswith('MainProcess')]))
+            results_for_file = diff_results.entries_by_file[0]
+            self.assertEqual(EndErrSummary.STATUS_SUCCESS, results_for_file.summary_result.simulation_status_case1)
+            self.assertEqual(EndErrSummary.STATUS_SUCCESS, results_for_file.summary_result.simulation_status_case2)
+            self.assertEqual('Big Diffs', results_for_file.eso_diffs.diff_type)
+            self.assertEqual(
+                EndErrSummary.STATUS_MISSING, diff_results.entries_by_file[1].summary_result.simulation_status_case1
+            )
+            shutil.rmtree(os.path.join(self.temp_base_build_dir, r.test_output_dir))
+            shutil.rmtree(os.path.join(self.temp_mod_build_dir, r.test_output_dir))
+
+    def test_shared_inputs_are_linked(self):
+        base = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_base_build_dir,
+            self.temp_base_source_dir,
+            {
+                "config": {
+                    "run_time_string": "01hr 20min  0.17sec",
+                    "num_warnings": 1,
+                    "num_severe": 0,
+                    "end_state": "success",
+                    "eso_results": "base",
+                    "txt_results": "base"
+                }
+            }
+        )
+        base.set_build_directory(self.temp_base_build_dir)
+        base.run = True
+
+        mod = CMakeCacheMakeFileBuildDirectory()
+        self.establish_build_folder(
+            self.temp_mod_build_dir,
+            self.temp_mod_source_dir,
+            {
+                "config": {
+                    "run_time_string": "00hr 10min  0.17sec",
+                    "num_warnings": 2,
+                    "num_severe": 1,
+                    "end_state": "success",
+                    "eso_results": "bigdiffs",
+                    "txt_results": "base"
+                }
+            }
+        )
+        mod.set_build_directory(self.temp_mod_build_dir)
+        mod.run = True
+
+        entries = [
+            TestEntry('my_file', 'my_weather'),
+            TestEntry('my_macro_file', 'my_weather')
+        ]
+        weather_file = os.path.join(self.temp_base_source_dir, 'weather', 'my_weather.epw')
+        weather_size = os.path.getsize(weather_file)
+        # with more than one thread the cases are prepared by the workers, which hand back their staging counts
+        for link_inputs, num_threads in [(True, 1), (True, 2), (False, 2)]:
+            config = TestRunConfiguration(
+                force_run_type=ForceRunType.NONE,
+                single_test_run=False,
+                num_threads=num_threads,
+                report_freq=ReportingFreq.HOURLY,
+                build_a=base,
+                build_b=mod,
+                link_inputs=link_inputs
+            )
+            r = SuiteRunner(config, entries)
+            messages = []
+            r.add_callbacks(
+                print_callback=messages.append,
+                simstarting_callback=TestTestSuiteRunner.dummy_callback,
+                casecompleted_callback=TestTestSuiteRunner.dummy_callback,
+                simulationscomplete_callback=TestTestSuiteRunner.dummy_callback,
+                diffcompleted_callback=TestTestSuiteRunner.dummy_callback,
+                alldone_callback=TestTestSuiteRunner.dummy_callback,
+                cancel_callback=TestTestSuiteRunner.dummy_callback
+            )
+            diff_results = r.run_test_suite()
+            results_for_file = diff_results.entries_by_file[0]
+            self.assertEqual(EndErrSummary.STATUS_SUCCESS, results_for_file.summary_result.simulation_status_case1)
+            self.assertEqual(EndErrSummary.STATUS_SUCCESS, results_for_file.summary_result.simulation_status_case2)
+            self.assertEqual(1, len([m for m in messages if m.startswith('Staged inputs:')]))
+            run_weather = os.path.join(self.temp_base_build_dir, r.test_output_dir, 'my_file', 'in.epw')
+            linked = os.path.islink(run_weather) or os.stat(run_weather).st_nlink > 1
+            self.assertEqual(link_inputs, linked)
+            # the macro file is rewritten in the run directory, so it's always a real copy
+            run_macro = os.path.join(self.temp_base_build_dir, r.test_output_dir, 'my_macro_file', 'in.imf')
+            self.assertFalse(os.path.islink(run_macro))
+            self.assertEqual(1, os.stat(run_macro).st_nlink)
+            if link_inputs:
+                # the idd, weather file and extra macro files of two cases in two builds
+                self.assertGreaterEqual(r.stager.bytes_saved, 4 * weather_size)
+                self.assertEqual(0, r.stager.bytes_copied)
+            else:
+                self.assertEqual(0, r.stager.bytes_saved)
+            shutil.rmtree(os.path.join(self.temp_base_build_dir, r.test_output_dir))
+            shutil.rmtree(os.path.join(self.temp_mod_build_dir, r.test_output_dir))
+
     def test_window5_file_gets_dependencies(self):
         base = CMakeCacheMakeFileBuildDirectory()
         self.establish_build_folder(
@@ -0,0 +1,330 @@
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from epregressions.energyplus import run_program
+from epregressions.scheduler import RuntimeHistory, TaskScheduler, borrow_worker, killed_error, projected_makespan
+
+
+def add(a, b):
+    return a + b
+
+
+def fail():
+    raise ValueError('bad input')
+
+
+def crash():
+    os._exit(3)
+
+
+def kill_self():
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def record_start(log_file, name, seconds):
+    with open(log_file, 'a') as f:
+        f.write('%s start %s\n' % (name, time.time()))
+    time.sleep(seconds)
+    with open(log_file, 'a') as f:
+        f.write('%s end %s\n' % (name, time.time()))
+
+
+def overlapping(log_file):
+    """Pairs of the tasks in the log that ran at the same time"""
+    times = {}
+    with open(log_file) as f:
+        for line in f:
+            name, event, timestamp = line.split()
+            times.setdefault(name, {})[event] = float(timestamp)
+    names = sorted(times)
+    return [(a, b) for i, a in enumerate(names) for b in names[i + 1:]
+            if times[a]['start'] < times[b]['end'] and times[b]['start'] < times[a]['end']]
+
+
+def borrow_and_keep(log_file, name, seconds):
+    # borrow an idle worker and never give it back, like a task killed while running a program alongside itself
+    borrowed = borrow_worker() is not None
+    record_start(log_file, name, seconds)
+    return borrowed
+
+
+def start_and_hang(pid_file):
+    # like execute_energyplus, start another program and wait on it
+    child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    with open(pid_file, 'w') as f:
+        f.write(str(child.pid))
+    child.communicate()
+
+
+def run_and_hang(pid_file):
+    # like a simulation on a thread, run a program through run_program and wait on it
+    run_program('sleep', 'echo $$ > "%s"; exec sleep 60' % pid_file, os.path.dirname(pid_file))
+    # a stopped task that carries on has the next program it starts killed right away
+    return run_program('sleep', 'sleep 60', os.path.dirname(pid_file))
+
+
+def process_exists(pid):
+    # the kill is delivered asynchronously, give it a moment
+    for _ in range(50):
+        if not process_running(pid):
+            return False
+        time.sleep(0.1)
+    return True
+
+
+def process_running(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    # a killed child of a killed worker may linger as a zombie until init reaps it
+    try:
+        with open('/proc/%s/stat' % pid) as f:
+            return f.read().split(')')[-1].split()[0] != 'Z'
+    except IOError:  # pragma: no cover - no procfs
+        return True
+
+
+def run_until_done(scheduler, limit=30.0):
+    results = {}
+    deadline = time.time() + limit
+    while scheduler.busy() and time.time() < deadline:
+        for key, value, error in scheduler.wait(0.1):
+            results[key] = (value, error)
+    return results
+
+
+class TestTaskScheduler(unittest.TestCase):
+
+    def test_tasks_return_values(self):
+        scheduler = TaskScheduler(2)
+        for i in range(5):
+            scheduler.submit(i, add, (i, 10))
+        self.assertEqual(5, scheduler.queue_depth())
+        results = run_until_done(scheduler)
+        self.assertEqual({i: (i + 10, None) for i in range(5)}, results)
+        self.assertEqual(5, scheduler.completed)
+        self.assertEqual(5, scheduler.max_queue_depth)
+        self.assertFalse(scheduler.busy())
+        self.assertIn('5 tasks completed, 0 failed', scheduler.summary())
+        self.assertIn('0 queued, 0 of 2 workers busy', scheduler.status())
+
+    def test_failures_are_isolated(self):
+        scheduler = TaskScheduler(1)
+        scheduler.submit('raises', fail, ())
+        scheduler.submit('crashes', crash, ())
+        scheduler.submit('works', add, (1, 2))
+        results = run_until_done(scheduler)
+        self.assertEqual((None, 'ValueError: bad input'), results['raises'])
+        self.assertEqual((None, 'worker process exited with code 3'), results['crashes'])
+        self.assertEqual((3, None), results['works'])
+        self.assertEqual(2, scheduler.failed)
+
+    def test_priority_tasks_go_first(self):
+        scheduler = TaskScheduler(1)
+        scheduler.submit('first', add, (0, 0))
+        scheduler.submit('second', add, (0, 0))
+        scheduler.submit('urgent', add, (0, 0), priority=True)
+        order = []
+        while scheduler.busy():
+            order.extend(key for key, _, _ in scheduler.wait(0.1))
+        self.assertEqual(['urgent', 'first', 'second'], order)
+
+    @unittest.skipIf(os.name == 'nt', 'checks for the killed process on posix')
+    def test_timeout_kills_the_whole_task(self):
+        pid_file = os.path.join(tempfile.mkdtemp(), 'pid.txt')
+        scheduler = TaskScheduler(2)
+        scheduler.submit('hangs', start_and_hang, (pid_file,), timeout=1)
+        scheduler.submit('works', add, (1, 2))
+        start = time.time()
+        results = run_until_done(scheduler)
+        self.assertLess(time.time() - start, 30)
+        self.assertEqual((None, 'timed out after 1 seconds'), results['hangs'])
+        self.assertEqual((3, None), results['works'])
+        self.assertEqual(1, scheduler.timed_out)
+        with open(pid_file) as f:
+            self.assertFalse(process_exists(int(f.read())))
+
+    @unittest.skipIf(os.name == 'nt', 'checks for the killed process on posix')
+    def test_cancel_kills_running_tasks(self):
+        pid_file = os.path.join(tempfile.mkdtemp(), 'pid.txt')
+        scheduler = TaskScheduler(1)
+        scheduler.submit('hangs', start_and_hang, (pid_file,))
+        scheduler.submit('never runs', add, (1, 2))
+        deadline = time.time() + 30
+        while not os.path.exists(pid_file) and time.time() < deadline:
+            self.assertEqual([], scheduler.wait(0.1))
+        time.sleep(0.1)  # let the pid finish writing
+        scheduler.cancel()
+        self.assertFalse(scheduler.busy())
+        self.assertEqual(2, scheduler.cancelled)
+        with open(pid_file) as f:
+            self.assertFalse(process_exists(int(f.read())))
+
+    def test_thread_tasks(self):
+        scheduler = TaskScheduler(2)
+        scheduler.submit('works', add, (1, 2), thread=True)
+        scheduler.submit('raises', fail, (), thread=True)
+        scheduler.submit('hangs', time.sleep, (5,), timeout=0.5, thread=True)
+        scheduler.submit('process', add, (3, 4))
+        start = time.time()
+        results = run_until_done(scheduler)
+        self.assertLess(time.time() - start, 4)  # the hung thread is left behind, not waited on
+        self.assertEqual((3, None), results['works'])
+        self.assertEqual((None, 'ValueError: bad input'), results['raises'])
+        self.assertEqual((None, 'timed out after 0.5 seconds'), results['hangs'])
+        self.assertEqual((7, None), results['process'])
+
+    @unittest.skipIf(os.name == 'nt', 'checks for the killed process on posix')
+    def test_thread_tasks_have_their_programs_killed(self):
+        for stop in ['timeout', 'cancel']:
+            pid_file = os.path.join(tempfile.mkdtemp(), 'pid.txt')
+            scheduler = TaskScheduler(1)
+            scheduler.submit('hangs', run_and_hang, (pid_file,), timeout=1 if stop == 'timeout' else None, thread=True)
+            deadline = time.time() + 30
+            while not os.path.exists(pid_file) and time.time() < deadline:
+                self.assertEqual([], scheduler.wait(0.1))
+            time.sleep(0.1)  # the pid is written as soon as the file is created
+            if stop == 'timeout':
+                self.assertEqual({'hangs': (None, 'timed out after 1 seconds')}, run_until_done(scheduler))
+            else:
+                scheduler.cancel()
+            with open(pid_file) as f:
+                self.assertFalse(process_exists(int(f.read())))
+            self.assertEqual(1, scheduler.spare_workers.idle())
+
+    def test_memory_budget_holds_back_tasks(self):
+        log_file = os.path.join(tempfile.mkdtemp(), 'log')
+        scheduler = TaskScheduler(3, memory_budget=1000)
+        # big and medium don't fit together, medium and small do, and huge runs once it is alone
+        scheduler.submit('big', record_start, (log_file, 'big', 0.5), memory=800)
+        scheduler.submit('medium', record_start, (log_file, 'medium', 0.5), memory=500)
+        scheduler.submit('small', record_start, (log_file, 'small', 0.5), memory=100)
+        scheduler.submit('huge', record_start, (log_file, 'huge', 0.5), memory=5000)
+        results = run_until_done(scheduler)
+        self.assertEqual(4, len(results))
+        self.assertEqual([('medium', 'small')], overlapping(log_file))
+        self.assertIn('at most 5000 of 1000 MB expected in use', scheduler.summary())
+
+    def test_exclusive_tasks_run_alone(self):
+        log_file = os.path.join(tempfile.mkdtemp(), 'log')
+        scheduler = TaskScheduler(3)
+        scheduler.submit('first', record_start, (log_file, 'first', 0.5))
+        scheduler.submit('alone', record_start, (log_file, 'alone', 0.5), exclusive=True)
+        scheduler.submit('second', record_start, (log_file, 'second', 0.5))
+        scheduler.submit('third', record_start, (log_file, 'third', 0.5))
+        run_until_done(scheduler)
+        self.assertEqual([('second', 'third')], overlapping(log_file))
+
+    def test_tasks_borrow_idle_workers(self):
+        for thread in [False, True]:
+            log_file = os.path.join(tempfile.mkdtemp(), 'log')
+            scheduler = TaskScheduler(2)
+            scheduler.submit('borrows', borrow_and_keep, (log_file, 'borrows', 0.5), thread=thread)
+            deadline = time.time() + 30
+            while not os.path.exists(log_file) and time.time() < deadline:
+                scheduler.wait(0.05)
+            # the other worker is lent out, so the next task waits, and gets it back once the borrower finishes
+            scheduler.submit('waits', record_start, (log_file, 'waits', 0.1), thread=thread)
+            results = run_until_done(scheduler)
+            self.assertEqual((True, None), results['borrows'])
+            self.assertEqual([], overlapping(log_file))
+            self.assertEqual(2, scheduler.spare_workers.idle())
+        # with no worker idle, or no scheduler at all, there is nothing to borrow
+        scheduler = TaskScheduler(1)
+        scheduler.submit('borrows', borrow_and_keep, (log_file, 'alone', 0.0))
+        self.assertEqual({'borrows': (False, None)}, run_until_done(scheduler))
+        self.assertIsNone(borrow_worker())
+
+    def test_background_tasks_take_no_worker(self):
+        log_file = os.path.join(tempfile.mkdtemp(), 'log')
+        scheduler = TaskScheduler(1)
+        scheduler.submit('worker', record_start, (log_file, 'worker', 0.5))
+        scheduler.wait(0.05)
+        scheduler.submit('background', record_start, (log_file, 'background', 0.1), background=True)
+        self.assertEqual(0, scheduler.spare_workers.idle())
+        results = run_until_done(scheduler)
+        self.assertEqual({'worker': (None, None), 'background': (None, None)}, results)
+        self.assertEqual([('background', 'worker')], overlapping(log_file))
+        self.assertEqual(1, scheduler.spare_workers.idle())
+
+    def test_killed_worker(self):
+        scheduler = TaskScheduler(1)
+        scheduler.submit('killed', kill_self, ())
+        self.assertEqual({'killed': (None, killed_error)}, run_until_done(scheduler))
+
+
+class TestRuntimeHistory(unittest.TestCase):
+
+    def test_later_suites_override_earlier_ones(self):
+        history_dir = tempfile.mkdtemp()
+        first = os.path.join(history_dir, 'first.csv')
+        with open(first, 'w') as f:
+            f.write('Case,Runtime [s],Runtime [s]\nlong,2400,2500\nshort,10,12\nbroken,-1,-1\nonly_b,-1,30\n')
+        second = os.path.join(history_dir, 'second.csv')
+        with open(second, 'w') as f:
+            f.write('Case,Runtime [s],Runtime [s]\nshort,20,-1\n')
+        history = RuntimeHistory()
+        history.read_csv(first)
+        history.read_csv(second)
+        self.assertEqual(2, history.files_read)
+        self.assertEqual(2400, history.estimate('long', 0))
+        self.assertEqual(2500, history.estimate('long', 1))
+        self.assertEqual(20, history.estimate('short', 0))
+        self.assertEqual(12, history.estimate('short', 1))  # the failed run in the second suite doesn't count
+        self.assertEqual(30, history.estimate('only_b', 0))  # the other build is the next best guess
+        self.assertTrue(history.known('only_b'))
+        self.assertFalse(history.known('broken'))
+        # cases that never ran get the median of the known runtimes: 12, 20, 30, 2400, 2500, worked out once
+        self.assertEqual(30, history.median_runtime)
+        self.assertEqual(30, history.estimate('broken', 0))
+        self.assertEqual(30, history.estimate('new_case', 1))
+
+    def test_peak_memory(self):
+        history_dir = tempfile.mkdtemp()
+        old = os.path.join(history_dir, 'old.csv')
+        with open(old, 'w') as f:
+            f.write('Case,Runtime [s],Runtime [s]\nbig,100,100\n')
+        new = os.path.join(history_dir, 'new.csv')
+        with open(new, 'w') as f:
+            f.write('Case,Runtime [s],Runtime [s],Peak memory [MB],Peak memory [MB]\n'
+                    'big,100,100,2000,2200\nsmall,10,-1,50,-1\nmedium,-1,-1,300,400\n')
+        history = RuntimeHistory()
+        history.read_csv(old)
+        self.assertEqual(0.0, history.memory_estimate('big', 0))
+        history.read_csv(new)
+        self.assertEqual(2000, history.memory_estimate('big', 0))
+        self.assertEqual(2200, history.memory_estimate('big', 1))
+        self.assertEqual(50, history.memory_estimate('small', 1))
+        # a failed run still took memory; unknown cases get the median of 50, 300, 400, 2000, 2200
+        self.assertEqual(400, history.memory_estimate('medium', 1))
+        self.assertEqual(400, history.memory_estimate('new_case', 0))
+
+    def test_output_size(self):
+        history_csv = os.path.join(tempfile.mkdtemp(), 'run_times.csv')
+        with open(history_csv, 'w') as f:
+            f.write('Case,Runtime [s],Runtime [s],Peak memory [MB],Peak memory [MB],Written [bytes],Written [bytes]\n'
+                    'big,100,100,2000,2200,%s,-1\nsmall,10,10,50,50,%s,%s\n' % (2 ** 30, 2 ** 20, 2 ** 21))
+        history = RuntimeHistory()
+        history.read_csv(history_csv)
+        self.assertEqual(1024, history.output_size_estimate('big', 0))
+        self.assertEqual(1024, history.output_size_estimate('big', 1))
+        self.assertEqual(2, history.output_size_estimate('small', 1))
+        # the median of 1, 2 and 1024
+        self.assertEqual(2, history.output_size_estimate('new_case', 0))
+        self.assertEqual(0.0, RuntimeHistory().output_size_estimate('new_case', 0))
+
+    def test_empty_history(self):
+        self.assertEqual(0.0, RuntimeHistory().estimate('new_case', 0))
+
+    def test_projected_makespan(self):
+        self.assertEqual(0.0, projected_makespan([], 4))
+        self.assertEqual(10.0, projected_makespan([10, 4, 3, 3], 2))
+        # the long case last leaves the other worker idle
+        self.assertEqual(14.0, projected_makespan([4, 3, 3, 10], 2))
+        self.assertEqual(20.0, projected_makespan([10, 4, 3, 3], 1))
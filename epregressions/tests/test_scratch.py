@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+
+from epregressions.scratch import ScratchSpace, copy_back, directory_size_mb, free_space_mb, kept_outputs
+
+
+class TestScratchSpace(unittest.TestCase):
+
+    def test_only_kept_outputs_are_copied_back(self):
+        scratch = ScratchSpace(tempfile.mkdtemp(), kept_outputs + ['*.rdd'])
+        run_directory = tempfile.mkdtemp()
+        scratch_run_directory = scratch.run_directory('Tests', 'a', 'my_file')
+        os.makedirs(scratch_run_directory)
+        shared = os.path.join(tempfile.mkdtemp(), 'in.epw')
+        with open(shared, 'w') as f:
+            f.write('weather')
+        os.symlink(shared, os.path.join(scratch_run_directory, 'in.epw'))
+        for file_name in ['eplusout.end', 'eplusout.rdd', 'eplusout.eso', 'aa_testSuite_usage.json']:
+            with open(os.path.join(scratch_run_directory, file_name), 'w') as f:
+                f.write(file_name)
+        self.assertEqual('result', copy_back(scratch, scratch_run_directory, run_directory, 'result'))
+        self.assertEqual(['aa_testSuite_usage.json', 'eplusout.end', 'eplusout.rdd'], sorted(os.listdir(run_directory)))
+        self.assertFalse(os.path.exists(scratch_run_directory))
+        # a case that ran in place has nothing to copy back
+        self.assertEqual('result', copy_back(scratch, scratch_run_directory, run_directory, 'result'))
+
+    def test_room_is_set_aside_for_each_case(self):
+        directory = tempfile.mkdtemp()
+        free_mb = free_space_mb(directory)
+        self.assertGreater(free_mb, 0)
+        scratch = ScratchSpace(directory, min_free_mb=free_mb / 2)
+        # a third of the free space leaves enough, but not a second third while the first case is still there
+        self.assertTrue(scratch.reserve('first', free_mb / 3))
+        self.assertTrue(scratch.is_reserved('first'))
+        self.assertFalse(scratch.reserve('second', free_mb / 3))
+        self.assertFalse(scratch.is_reserved('second'))
+        scratch.release('first')
+        self.assertTrue(scratch.reserve('second', free_mb / 3))
+        self.assertFalse(ScratchSpace(directory, min_free_mb=1e12).reserve('first', 0))
+
+    def test_directory_size(self):
+        directory = tempfile.mkdtemp()
+        with open(os.path.join(directory, 'in.idf'), 'w') as f:
+            f.write('x' * 1024 * 1024)
+        shared = os.path.join(tempfile.mkdtemp(), 'in.epw')
+        with open(shared, 'w') as f:
+            f.write('x' * 1024 * 1024)
+        os.symlink(shared, os.path.join(directory, 'in.epw'))
+        self.assertAlmostEqual(1.0, directory_size_mb(directory))
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from epregressions.staging import StageMethod, Stager
+
+
+class TestStager(unittest.TestCase):
+
+    def setUp(self):
+        self.source_dir = tempfile.mkdtemp()
+        self.run_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.source_dir, 'Energy+.idd')
+        with open(self.source, 'w') as f:
+            f.write('!IDD_Version 9.9.9\n' * 100)
+        self.size = os.path.getsize(self.source)
+
+    def staged_contents(self, destination):
+        with open(destination) as f:
+            return f.read()
+
+    def test_files_are_linked_when_possible(self):
+        stager = Stager()
+        destination = os.path.join(self.run_dir, 'Energy+.idd')
+        method = stager.stage_file(self.source, destination)
+        self.assertIn(method, [StageMethod.REFLINK, StageMethod.HARDLINK, StageMethod.SYMLINK])
+        self.assertEqual(self.size, stager.bytes_saved)
+        self.assertEqual(0, stager.bytes_copied)
+        self.assertEqual(1, stager.counts[method])
+        self.assertEqual('!IDD_Version 9.9.9\n' * 100, self.staged_contents(destination))
+        self.assertIn('0.0 MB copied', stager.summary())
+
+    def test_failed_methods_fall_through_and_are_remembered(self):
+        stager = Stager([StageMethod.HARDLINK, StageMethod.COPY])
+        self.assertEqual(StageMethod.HARDLINK, stager.stage_file(self.source, os.path.join(self.run_dir, 'a.idd')))
+        self.assertEqual(2, os.stat(self.source).st_nlink)
+        # a destination in the way makes the link fail, and the copy is the last resort
+        with open(os.path.join(self.run_dir, 'b.idd'), 'w') as f:
+            f.write('in the way')
+        self.assertEqual(StageMethod.COPY, stager.stage_file(self.source, os.path.join(self.run_dir, 'b.idd')))
+        # and linking isn't tried again between these devices
+        self.assertEqual(StageMethod.COPY, stager.stage_file(self.source, os.path.join(self.run_dir, 'c.idd')))
+        self.assertEqual(2, os.stat(self.source).st_nlink)
+        self.assertEqual(self.size, stager.bytes_saved)
+        self.assertEqual(2 * self.size, stager.bytes_copied)
+        self.assertEqual(self.staged_contents(self.source), self.staged_contents(os.path.join(self.run_dir, 'b.idd')))
+
+    def test_copy_only(self):
+        stager = Stager([StageMethod.COPY])
+        destination = os.path.join(self.run_dir, 'Energy+.idd')
+        self.assertEqual(StageMethod.COPY, stager.stage_file(self.source, destination))
+        self.assertFalse(os.path.islink(destination))
+        self.assertEqual(1, os.stat(destination).st_nlink)
+        self.assertEqual(0, stager.bytes_saved)
+        self.assertIn('0 reflink, 0 hardlink, 0 symlink', stager.summary())
+
+    def test_worker_counts_are_merged(self):
+        stager = Stager()
+        worker_stager = Stager(stager.methods)
+        worker_stager.stage_file(self.source, os.path.join(self.run_dir, 'Energy+.idd'))
+        stager.merge(worker_stager)
+        stager.merge(worker_stager)
+        self.assertEqual(2 * self.size, stager.bytes_saved)
+        self.assertEqual(2, sum(stager.counts.values()))
+
+    def test_staged_files_are_taken_once(self):
+        stager = Stager([StageMethod.COPY])
+        stager.stage_file(self.source, os.path.join(self.run_dir, 'Energy+.idd'))
+        stager.stage_file(self.source, os.path.join(self.run_dir, 'in.epw'))
+        self.assertEqual(
+            [os.path.join(self.run_dir, 'Energy+.idd'), os.path.join(self.run_dir, 'in.epw')], stager.take_staged()
+        )
+        self.assertEqual([], stager.take_staged())
@@ -8,7 +8,9 @@ from epregressions.structures import (
     TableDifferences,
     EndErrSummary,
     TestEntry,
-    CompletedStructure
+    CompletedStructure,
+    ProgramUsage,
+    ToolUsage
 )
 
 
@@ -96,6 +98,10 @@ class TestTestEntry(unittest.TestCase):
     @staticmethod
     def fully_populated_entry_successful(t):
         t.add_summary_result(EndErrSummary(EndErrSummary.STATUS_SUCCESS, 1, EndErrSummary.STATUS_SUCCESS, 1))
+        t.add_tool_usage(ToolUsage([
+            ProgramUsage(ToolUsage.EXPAND_OBJECTS, 0.5, 0.25, 0.125, 20.5, 1024),
+            ProgramUsage(ToolUsage.ENERGYPLUS, 10.5, 9.0, 1.0, 120.5, 4096)
+        ]), None)
         t.add_math_differences(MathDifferences([1, 2, 3, 4]), MathDifferences.ESO)
         t.add_math_differences(MathDifferences([1, 2, 3, 4]), MathDifferences.MTR)
         t.add_math_differences(MathDifferences([1, 2, 0, 4]), MathDifferences.ZSZ)
@@ -112,6 +118,9 @@ class TestTestEntry(unittest.TestCase):
         t.add_text_differences(TextDifferences(TextDifferences.EQUAL), TextDifferences.DL_IN)
         t.add_text_differences(TextDifferences(TextDifferences.EQUAL), TextDifferences.DL_OUT)
         t.add_table_differences(TableDifferences([1, 1, 1, 1, 1, 1, 1, 1, 1]))
+        t.add_math_differences(MathDifferences([1, 2, 0, 4]), MathDifferences.SQL)
+        t.add_sql_table_differences(TableDifferences([1, 1, 0, 1, 1, 1, 1, 1, 1]))
+        t.add_text_differences(TextDifferences(TextDifferences.DIFFS), TextDifferences.SQL_ERRORS)
         return t
 
     @staticmethod
@@ -138,6 +147,9 @@ class TestTestEntry(unittest.TestCase):
         self.assertIsNone(t.dl_in_diffs)
         self.assertIsNone(t.dl_out_diffs)
         self.assertIsNone(t.table_diffs)
+        self.assertIsNone(t.sql_diffs)
+        self.assertIsNone(t.sql_table_diffs)
+        self.assertIsNone(t.sql_errors_diffs)
         t = TestTestEntry.fully_populated_entry_successful(t)
         self.assertIsNotNone(t.summary_result)
         self.assertIsNotNone(t.eso_diffs)
@@ -156,8 +168,21 @@ class TestTestEntry(unittest.TestCase):
         self.assertIsNotNone(t.dl_in_diffs)
         self.assertIsNotNone(t.dl_out_diffs)
         self.assertIsNotNone(t.dl_out_diffs)
+        self.assertIsNotNone(t.sql_diffs)
+        self.assertIsNotNone(t.sql_table_diffs)
+        self.assertIsNotNone(t.sql_errors_diffs)
         obj = t.to_dict()
         self.assertIsInstance(obj, dict)
+        self.assertIn('sql_diffs', obj)
+        self.assertIn('sql_table_diffs', obj)
+        self.assertIn('sql_errors_diffs', obj)
+
+    def test_from_dict(self):
+        for populate in [TestTestEntry.fully_populated_entry_successful, TestTestEntry.fully_populated_entry_failure]:
+            obj = populate(TestEntry('filename', 'weather')).to_dict()
+            self.assertEqual(obj, TestEntry.from_dict(json.loads(json.dumps(obj))).to_dict())
+        with self.assertRaises(Exception):
+            EndErrSummary.status_from_string('crashed')
 
 
 class TestCompletedStructure(unittest.TestCase):
@@ -181,7 +206,15 @@ class TestCompletedStructure(unittest.TestCase):
         t = TestTestEntry.fully_populated_entry_successful(t)
         c.add_test_entry(t)
         valid_temp_csv_file = tempfile.mkstemp(suffix='.csv')[1]
-        c.to_runtime_summary(valid_temp_csv_file)  # not asserting anything, it should just pass
+        c.to_runtime_summary(valid_temp_csv_file)
+        with open(valid_temp_csv_file) as f:
+            rows = f.read().splitlines()
+        self.assertTrue(rows[0].startswith('Case,Runtime [s],Runtime [s],Peak memory [MB],Peak memory [MB],'))
+        self.assertIn('EnergyPlus wall time [s],EnergyPlus wall time [s]', rows[0])
+        self.assertEqual(3 + 2 * (5 + len(ToolUsage.TOOLS)), len(rows[0].split(',')))
+        # peak memory, wall time, user cpu, system cpu, bytes written, and the time of the tools that ran
+        self.assertTrue(rows[1].startswith('filename,1,1,120.5,-1,11.0,-1,9.25,-1,1.125,-1,5120,-1,'))
+        self.assertIn(',0.5,-1,-1,-1,-1,-1,10.5,-1,', rows[1])
         with self.assertRaises(Exception):
             c.to_runtime_summary('/invalid/path')
 
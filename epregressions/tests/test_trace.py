@@ -0,0 +1,60 @@
+import json
+import os
+import pickle
+import tempfile
+import unittest
+
+from epregressions.trace import SuiteTrace
+
+
+class TestSuiteTrace(unittest.TestCase):
+
+    def test_disabled_trace_records_nothing(self):
+        trace = SuiteTrace(False)
+        with trace.span('Diff', 'diff', case='my_case'):
+            pass
+        trace.add('EnergyPlus', 'simulation', 100.0, 1.0, {})
+        trace.merge([('Diff', 'diff', 100.0, 1.0, {}, 'lane')])
+        self.assertIs(trace.null_span, trace.span('Diff', 'diff'))
+        self.assertEqual([], trace.events)
+        self.assertEqual({'traceEvents': []}, trace.to_chrome_trace())
+
+    def test_spans_are_tagged_and_nested(self):
+        trace = SuiteTrace()
+        with trace.span('Diff', 'diff', case='my_case'):
+            with trace.span('Math diffs', 'diff', case='my_case'):
+                pass
+        self.assertEqual(['Math diffs', 'Diff'], [event[0] for event in trace.events])
+        diff = trace.events[1]
+        self.assertEqual({'case': 'my_case', 'worker': 'suite'}, diff[4])
+        math = trace.events[0]
+        self.assertTrue(diff[2] <= math[2] and math[2] + math[3] <= diff[2] + diff[3])
+
+    def test_forks_are_packed_onto_rows(self):
+        trace = SuiteTrace()
+        worker_traces = [trace.fork('worker %s' % i) for i in range(3)]
+        # the first two overlap, the third starts after the first is done
+        worker_traces[0].add('Prepare', 'preparation', 100.0, 2.0, {'case': 'a'})
+        worker_traces[1].add('Prepare', 'preparation', 101.0, 5.0, {'case': 'b'})
+        worker_traces[2].add('Prepare', 'preparation', 102.5, 1.0, {'case': 'c'})
+        trace.add('EnergyPlus', 'simulation', 100.5, 1.0, {'case': 'a'}, ('simulation', 'a', 'a'))
+        for worker_trace in worker_traces:
+            # the events come back from worker processes pickled
+            trace.merge(pickle.loads(pickle.dumps(worker_trace.events)))
+        chrome_trace = trace.to_chrome_trace()
+        spans = dict((e['args']['case'] + e['name'], e) for e in chrome_trace['traceEvents'] if e['ph'] == 'X')
+        self.assertEqual(0, spans['aPrepare']['tid'])
+        self.assertEqual(0, spans['aPrepare']['ts'])
+        self.assertEqual(2e6, spans['aPrepare']['dur'])
+        self.assertEqual(1, spans['aEnergyPlus']['tid'])
+        self.assertEqual(2, spans['bPrepare']['tid'])
+        self.assertEqual(0, spans['cPrepare']['tid'])
+        self.assertEqual(2.5e6, spans['cPrepare']['ts'])
+        names = [e['args']['name'] for e in chrome_trace['traceEvents'] if e['name'] == 'thread_name']
+        self.assertEqual(['worker 0', 'worker 1', 'worker 2'], names)
+        # a fork only ships its own settings, not the events of the suite
+        self.assertEqual([], pickle.loads(pickle.dumps(trace)).events)
+        trace_file = os.path.join(tempfile.mkdtemp(), SuiteTrace.file_name)
+        trace.write(trace_file)
+        with open(trace_file) as f:
+            self.assertEqual(chrome_trace, json.load(f))
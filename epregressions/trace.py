@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import threading
+import time
+
+
+class NullSpan:
+    """What a disabled trace hands out for every span; entering and leaving it does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class Span:
+    def __init__(self, trace, name, category, args):
+        self.trace = trace
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start_time = None
+
+    def __enter__(self):
+        self.start_time = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.trace.add(self.name, self.category, self.start_time, time.time() - self.start_time, self.args)
+        return False
+
+
+class SuiteTrace:
+    """Spans of the work of a suite, tagged with the case, build and worker, to be written out as a Chrome trace.
+
+    Spans are recorded where the work happens: each worker task records into a fork of the suite's trace, and hands
+    back its events to be merged into the suite's.  Every fork is a lane of its own; lanes that never overlap in time
+    are packed onto the same row of the timeline when the trace is written, so there is about one row per worker
+    rather than one per task.  A disabled trace records nothing and hands out a shared do-nothing span, so leaving the
+    spans in place costs next to nothing."""
+
+    file_name = 'trace.json'
+
+    def __init__(self, enabled=True, lane='suite', worker='suite'):
+        self.enabled = enabled
+        self.lane = lane
+        self.worker = worker  # the name of the process, and thread, doing the work, spans are tagged with it
+        self.events = []  # (name, category, start time, duration, args, lane)
+        self.null_span = NullSpan()
+
+    def __getstate__(self):
+        # a worker starts with an empty trace of its own, and hands back what it recorded
+        state = self.__dict__.copy()
+        state['events'] = []
+        return state
+
+    def fork(self, worker):
+        """An empty trace for a worker task to record into, on a lane of its own"""
+        return SuiteTrace(self.enabled, (os.getpid(), threading.current_thread().ident, time.time()), worker)
+
+    def span(self, name, category, **args):
+        """A context manager that records a span around the work in it"""
+        if not self.enabled:
+            return self.null_span
+        args.setdefault('worker', self.worker)
+        return Span(self, name, category, args)
+
+    def add(self, name, category, start_time, duration, args, lane=None):
+        """Record a span that already happened, on this trace's lane unless given another; times are in seconds since
+        the epoch"""
+        if self.enabled:
+            self.events.append((name, category, start_time, duration, args, lane or self.lane))
+
+    def merge(self, events):
+        if self.enabled:
+            self.events.extend(tuple(event) for event in events)
+
+    def rows(self):
+        """Row of each lane: lanes are taken in the order they start, each on the first row that is free by then"""
+        extents = {}
+        for _, _, start_time, duration, _, lane in self.events:
+            first, last = extents.get(lane, (start_time, start_time + duration))
+            extents[lane] = (min(first, start_time), max(last, start_time + duration))
+        row_ends = []
+        rows = {}
+        for lane, (first, last) in sorted(extents.items(), key=lambda item: item[1]):
+            for row, row_end in enumerate(row_ends):
+                if row_end <= first:
+                    break
+            else:
+                row = len(row_ends)
+                row_ends.append(0)
+            row_ends[row] = last
+            rows[lane] = row
+        return rows
+
+    def to_chrome_trace(self):
+        """The spans as Chrome trace events, which chrome://tracing and Perfetto read, in microseconds from the
+        start of the first span"""
+        if not self.events:
+            return {'traceEvents': []}
+        rows = self.rows()
+        origin = min(event[2] for event in self.events)
+        trace_events = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'tid': 0, 'args': {'name': 'suite'}}]
+        for row in range(max(rows.values()) + 1):
+            trace_events.append(
+                {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': row, 'args': {'name': 'worker %s' % row}}
+            )
+        # longer spans first, so that spans starting together nest the right way round
+        for name, category, start_time, duration, args, lane in sorted(self.events, key=lambda e: (e[2], -e[3])):
+            trace_events.append({
+                'name': name, 'cat': category, 'ph': 'X', 'pid': 1, 'tid': rows[lane],
+                'ts': round((start_time - origin) * 1e6, 1), 'dur': round(duration * 1e6, 1), 'args': args
+            })
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def write(self, json_file_path):
+        with io.open(json_file_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self.to_chrome_trace(), ensure_ascii=False))
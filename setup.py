@@ -11,4 +11,5 @@ setup(
     description='A Python 3 library for evaluating regressions between EnergyPlus builds with a PyGTK-based GUI.',
     test_suite='nose.collector',
     tests_require=['nose'],
+    extras_require={'numpy': ['numpy']},
 )